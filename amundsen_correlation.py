@@ -1,5 +1,6 @@
 from numpy import *
 from scipy.stats import linregress
+from expt_timeseries import *
 
 def amundsen_correlation ():
 
@@ -13,9 +14,9 @@ def amundsen_correlation ():
     control_expt = 'highres_spinup/'
     # Title 
     control_title = 'CONTROL'
-    # Logfile names
-    amundsen_log = 'amundsen.log'
-    massloss_log = 'massloss.log'
+    # Timeseries store names
+    amundsen_store = 'amundsen.nc'
+    massloss_store = 'massloss.nc'
     # Index of PIG in timeseries_massloss.py
     pig_index = 6
     # Years to consider
@@ -28,72 +29,18 @@ def amundsen_correlation ():
 
     num_years = year_end - year_start + 1
 
-    # Amundsen Sea ice-to-ocean freshwater flux
-    ice2ocn = empty([num_rcps+1, num_years])
-    # Loop over RCP experiments
-    for expt in range(num_rcps):
-        # Read logfile
-        ice2ocn_tmp = []
-        f = open(directory_head + rcp_expt[expt] + amundsen_log, 'r')
-        f.readline()
-        for line in f:
-            ice2ocn_tmp.append(float(line))
-        f.close()
-        # Calculate annual averages
-        for year in range(num_years):
-            ice2ocn[expt,year] = mean(array(ice2ocn_tmp[peryear*year:peryear*(year+1)]))
-    # Control experiment
-    ice2ocn_tmp = []
-    f = open(directory_head + control_expt + amundsen_log, 'r')
-    f.readline()
-    for line in f:
-        ice2ocn_tmp.append(float(line))
-    f.close()
-    # Throw away first 2 repetitions
-    ice2ocn_tmp = ice2ocn_tmp[control_skipyears*peryear:]
-    for year in range(num_years):
-        ice2ocn[-1,year] = mean(array(ice2ocn_tmp[peryear*year:peryear*(year+1)]))
+    # Throw away first 2 repetitions of the control
+    skip = [0]*num_rcps + [control_skipyears*peryear]
+
+    # Amundsen Sea ice-to-ocean freshwater flux, annual averages
+    rcp_files = [directory_head + expt + amundsen_store for expt in rcp_expt]
+    control_file = directory_head + control_expt + amundsen_store
+    ice2ocn = annual_avg(expt_timeseries(rcp_files + [control_file], 'ice2ocn', skip=skip, num_records=num_years*peryear), peryear)
 
     # PIG basal mass loss
-    pig_massloss = empty([num_rcps+1, num_years])
-    for expt in range(num_rcps):
-        f = open(directory_head + rcp_expt[expt] + massloss_log, 'r')
-        f.readline()
-        # Read the ice shelves before PIG
-        for index in range(pig_index):
-            for line in f:
-                try:
-                    tmp = float(line)
-                except(ValueError):
-                    break
-        # Now read PIG
-        pig_massloss_tmp = []
-        for line in f:
-            try:
-                pig_massloss_tmp.append(float(line))
-            except(ValueError):
-                break
-        f.close()
-        for year in range(num_years):
-            pig_massloss[expt,year] = mean(array(pig_massloss_tmp[peryear*year:peryear*(year+1)]))
-    f = open(directory_head + control_expt + massloss_log, 'r')
-    f.readline()
-    for index in range(pig_index):
-        for line in f:
-            try:
-                tmp = float(line)
-            except(ValueError):
-                break
-    pig_massloss_tmp = []
-    for line in f:
-        try:
-            pig_massloss_tmp.append(float(line))
-        except(ValueError):
-            break
-    f.close()
-    pig_massloss_tmp = pig_massloss_tmp[control_skipyears*peryear:]
-    for year in range(num_years):
-        pig_massloss[-1,year] = mean(array(pig_massloss_tmp[peryear*year:peryear*(year+1)]))
+    rcp_files = [directory_head + expt + massloss_store for expt in rcp_expt]
+    control_file = directory_head + control_expt + massloss_store
+    pig_massloss = annual_avg(expt_timeseries(rcp_files + [control_file], 'massloss', skip=skip, num_records=num_years*peryear)[:,pig_index,:], peryear)
 
     for expt in range(num_rcps):
         slope, intercept, r_value, p_value, std_err = linregress(ice2ocn[expt,:], pig_massloss[expt,:])
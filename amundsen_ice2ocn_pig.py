@@ -1,5 +1,6 @@
 from numpy import *
 from matplotlib.pyplot import *
+from timeseries_store import *
 
 def amundsen_ice2ocn_pig (smoothing_years, fig_name):
 
@@ -17,9 +18,9 @@ def amundsen_ice2ocn_pig (smoothing_years, fig_name):
     control_title = 'CONTROL'
     # Colour for plotting
     control_colour = 'black'
-    # Logfile names
-    amundsen_log = 'amundsen.log'
-    massloss_log = 'massloss.log'
+    # Timeseries store names
+    amundsen_store = 'amundsen.nc'
+    massloss_store = 'massloss.nc'
     # Index of PIG in timeseries_massloss.py
     pig_index = 6
     # Years to plot
@@ -47,68 +48,30 @@ def amundsen_ice2ocn_pig (smoothing_years, fig_name):
     ice2ocn_full = empty([num_rcps+1, num_years])
     # Loop over RCP experiments
     for expt in range(num_rcps):
-        # Read logfile
-        ice2ocn_tmp = []
-        f = open(directory_head + rcp_expt[expt] + amundsen_log, 'r')
-        f.readline()
-        for line in f:
-            ice2ocn_tmp.append(float(line))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + rcp_expt[expt] + amundsen_store, ['ice2ocn'])
+        ice2ocn_tmp = series['ice2ocn']
         # Calculate annual averages
         for year in range(num_years):
-            ice2ocn_full[expt,year] = mean(array(ice2ocn_tmp[peryear*year:peryear*(year+1)]))
+            ice2ocn_full[expt,year] = mean(ice2ocn_tmp[peryear*year:peryear*(year+1)])
     # Control experiment
-    ice2ocn_tmp = []
-    f = open(directory_head + control_expt + amundsen_log, 'r')
-    f.readline()
-    for line in f:
-        ice2ocn_tmp.append(float(line))
-    f.close()
+    time_tmp, series = read_timeseries(directory_head + control_expt + amundsen_store, ['ice2ocn'])
     # Throw away first 2 repetitions
-    ice2ocn_tmp = ice2ocn_tmp[control_skipyears*peryear:]
+    ice2ocn_tmp = series['ice2ocn'][control_skipyears*peryear:]
     for year in range(num_years):
-        ice2ocn_full[-1,year] = mean(array(ice2ocn_tmp[peryear*year:peryear*(year+1)]))    
+        ice2ocn_full[-1,year] = mean(ice2ocn_tmp[peryear*year:peryear*(year+1)])
 
     # PIG basal mass loss
     pig_massloss_full = empty([num_rcps+1, num_years])
     for expt in range(num_rcps):
-        f = open(directory_head + rcp_expt[expt] + massloss_log, 'r')
-        f.readline()
-        # Read the ice shelves before PIG
-        for index in range(pig_index):
-            for line in f:
-                try:
-                    tmp = float(line)
-                except(ValueError):
-                    break
-        # Now read PIG
-        pig_massloss_tmp = []
-        for line in f:
-            try:
-                pig_massloss_tmp.append(float(line))
-            except(ValueError):
-                break
-        f.close()
+        time_tmp, series = read_timeseries(directory_head + rcp_expt[expt] + massloss_store, ['massloss'])
+        pig_massloss_tmp = series['massloss'][pig_index,:]
         for year in range(num_years):
-            pig_massloss_full[expt,year] = mean(array(pig_massloss_tmp[peryear*year:peryear*(year+1)]))
-    f = open(directory_head + control_expt + massloss_log, 'r')
-    f.readline()
-    for index in range(pig_index):
-        for line in f:
-            try:
-                tmp = float(line)
-            except(ValueError):
-                break
-    pig_massloss_tmp = []
-    for line in f:
-        try:
-            pig_massloss_tmp.append(float(line))
-        except(ValueError):
-            break
-    f.close()
-    pig_massloss_tmp = pig_massloss_tmp[control_skipyears*peryear:]
+            pig_massloss_full[expt,year] = mean(pig_massloss_tmp[peryear*year:peryear*(year+1)])
+    time_tmp, series = read_timeseries(directory_head + control_expt + massloss_store, ['massloss'])
+    pig_massloss_tmp = series['massloss'][pig_index,control_skipyears*peryear:]
     for year in range(num_years):
-        pig_massloss_full[-1,year] = mean(array(pig_massloss_tmp[peryear*year:peryear*(year+1)]))
+        pig_massloss_full[-1,year] = mean(pig_massloss_tmp[peryear*year:peryear*(year+1)])
 
     # Running mean
     if even:
@@ -1,5 +1,7 @@
 from netCDF4 import Dataset
 from numpy import *
+from dataset_pool import *
+from output_writer import *
 
 # Calculate a climatology of the given type of FESOM output file (eg oce.mean)
 # over the given years. It will have the same frequency as the existing files
@@ -14,6 +16,8 @@ def average_years (directory, file_type, start_year, end_year, out_file):
 
     # Filename head
     expt_name = 'MK44005'
+    # Number of time records to read at once
+    block_size = 10
 
     # Variables to process, depending on file type
     if file_type == 'forcing.diag':
@@ -33,7 +37,7 @@ def average_years (directory, file_type, start_year, end_year, out_file):
     print 'Setting up file and processing year ' + str(start_year)
     # Look at the first variable in the first file to figure out sizes of each
     # dimension
-    id_in = Dataset(directory + expt_name + '.' + str(start_year) + '.' + file_type + '.nc', 'r')
+    id_in = get_dataset(directory + expt_name + '.' + str(start_year) + '.' + file_type + '.nc')
     dimensions = id_in.variables[vars[0]].shape
     # First dimension is time
     num_time = dimensions[0]
@@ -66,27 +70,20 @@ def average_years (directory, file_type, start_year, end_year, out_file):
     time = id_in.variables['time'][:]
 
     # Set up output file
-    id_out = Dataset(out_file, 'w')
-    id_out.createDimension('nodes_2d', num_2d)
+    dims = [('nodes_2d', num_2d)]
     if file_type == 'oce.mean':
-        id_out.createDimension('nodes_3d', num_3d)
-    id_out.createDimension('T', None)
-    id_out.createVariable('time', 'f8', ('T'))
-    id_out.variables['time'].long_name = 'model time'
-    id_out.variables['time'].units = 's'
-    id_out.variables['time'][:] = time
+        dims.append(('nodes_3d', num_3d))
+    dims.append(('T', None))
+    id_out = create_output(out_file, dims, title='climatology of ' + file_type + ' over ' + str(start_year) + '-' + str(end_year))
+    create_var(id_out, 'time', ('T'), units='s', long_name='model time', data=time)
     # Loop over variables
     for i in range(len(vars)):
-        # Define variable
-        if file_type == 'oce.mean':
-            # Figure out if 2D or 3D
-            if is_3d[i]:
-                id_out.createVariable(vars[i], 'f8', ('T', 'nodes_3d'))
-            else:
-                id_out.createVariable(vars[i], 'f8', ('T', 'nodes_2d'))
+        # Define variable, chunked by record to match how it's written
+        if file_type == 'oce.mean' and is_3d[i]:
+            create_var(id_out, vars[i], ('T', 'nodes_3d'), access='map', zlib=True)
         else:
-            # Definitely 2D
-            id_out.createVariable(vars[i], 'f8', ('T', 'nodes_2d'))
+            # 2D
+            create_var(id_out, vars[i], ('T', 'nodes_2d'), access='map', zlib=True)
         # Carry forward any attributes
         if 'description' in id_in.variables[vars[i]].ncattrs():
             id_out.variables[vars[i]].description = id_in.variables[vars[i]].description
@@ -94,16 +91,19 @@ def average_years (directory, file_type, start_year, end_year, out_file):
             id_out.variables[vars[i]].units = id_in.variables[vars[i]].units
         # Copy the data for the first year
         id_out.variables[vars[i]][:,:] = id_in.variables[vars[i]][:,:]
-    id_in.close()
 
     # Loop over the other years
     for year in range(start_year+1, end_year+1):
         print 'Processing year ' + str(year)
-        id_in = Dataset(directory + expt_name + '.' + str(year) + '.' + file_type + '.nc', 'r')
-        for var_name in vars:
-            # Accumulate the data in the output file
-            id_out.variables[var_name][:,:] = id_out.variables[var_name][:,:] + id_in.variables[var_name][:,:]
-        id_in.close()
+        file_path = directory + expt_name + '.' + str(year) + '.' + file_type + '.nc'
+        # Read all the variables together, a block of records at a time so
+        # that memory use doesn't get out of hand
+        for t_start in range(0, num_time, block_size):
+            t_end = min(t_start+block_size, num_time)
+            data = read_vars(file_path, dict([(var_name, (var_name, slice(t_start, t_end))) for var_name in vars]))
+            for var_name in vars:
+                # Accumulate the data in the output file
+                id_out.variables[var_name][t_start:t_end,:] = id_out.variables[var_name][t_start:t_end,:] + data[var_name]
 
     # Convert from sums to averages (over each timestep in climatology)
     num_years = end_year - start_year + 1
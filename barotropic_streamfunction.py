@@ -4,6 +4,8 @@ from matplotlib.pyplot import *
 from fesom_grid import *
 from unrotate_vector import *
 from in_triangle import *
+from column_kernels import *
+from vis_cache import *
 
 def barotropic_streamfunction (mesh_path, file_path, tstep, save=False, fig_name=None):
 
@@ -22,41 +24,11 @@ def barotropic_streamfunction (mesh_path, file_path, tstep, save=False, fig_name
 
     print 'Building mesh'
     elements = fesom_grid(mesh_path, circumpolar=False, cross_180=True)
-    # Read number of 2D nodes
-    f = open(mesh_path + 'nod2d.out', 'r')
-    n2d = int(f.readline())
-    f.close()
-    # Read (rotated) lon, lat, and depth, at each 3D node
-    f = open(mesh_path + 'nod3d.out', 'r')
-    f.readline()
-    rlon = []
-    rlat = []
-    node_depth = []
-    for line in f:
-        tmp = line.split()
-        lon_tmp = float(tmp[1])
-        lat_tmp = float(tmp[2])
-        node_depth_tmp = -1*float(tmp[3])
-        if lon_tmp < -180:
-            lon_tmp += 360
-        elif lon_tmp > 180:
-            lon_tmp -= 360
-        rlon.append(lon_tmp)
-        rlat.append(lat_tmp)
-        node_depth.append(node_depth_tmp)
-    f.close()
-    rlon = array(rlon)
-    rlat = array(rlat)
-    node_depth = array(node_depth)
-    # Read lists of which nodes are directly below which
-    f = open(mesh_path + 'aux3d.out', 'r')
-    max_num_layers = int(f.readline())
-    node_columns = zeros([n2d, max_num_layers])
-    for n in range(n2d):
-        for k in range(max_num_layers):
-            node_columns[n,k] = int(f.readline())
-    node_columns = node_columns.astype(int)
-    f.close()
+    # Read (rotated) lon and lat at each 3D node
+    rlon, rlat = rotated_lonlat(mesh_path + 'nod3d.out')
+    # Build the operator which vertically integrates down each water column
+    # (or get it from the cache)
+    int_op = integration_operator(mesh_path)
     # Set up regular grid
     # Start with boundaries
     lon_reg_edges = linspace(lon_min, lon_max, num_lon+1)
@@ -68,10 +40,8 @@ def barotropic_streamfunction (mesh_path, file_path, tstep, save=False, fig_name
     dlon = lon_reg_edges[1:] - lon_reg_edges[:-1]
     dlat = lat_reg_edges[1:] - lat_reg_edges[:-1]
     # Make 2D versions
-    lon_reg_2d, lat_reg_2d = meshgrid(lon_reg, lat_reg)
     dlon_2d, dlat_2d = meshgrid(dlon, dlat)
-    # Calculate differentials in Cartesian space
-    dx = r*cos(lat_reg_2d*deg2rad)*dlon_2d*deg2rad
+    # Calculate north-south differential in Cartesian space
     dy = r*dlat_2d*deg2rad
 
     print 'Reading data'
@@ -83,19 +53,7 @@ def barotropic_streamfunction (mesh_path, file_path, tstep, save=False, fig_name
     # Unrotate
     u, v = unrotate_vector(rlon, rlat, ur, vr)
     # Vertically integrate u*dz
-    int_udz = zeros(n2d)
-    # Loop over nodes
-    for n in range(n2d):
-        # Loop over depth
-        for k in range(max_num_layers-1):
-            if node_columns[n,k+1] == -999:
-                # Reached the bottom
-                break
-            # Trapezoidal rule
-            top_id = node_columns[n,k]
-            bot_id = node_columns[n,k+1]
-            dz = node_depth[bot_id-1] - node_depth[top_id-1]
-            int_udz[n] += 0.5*(u[top_id-1] + u[bot_id-1])*dz
+    int_udz = integrate_columns(int_op, u)
 
     print 'Interpolating to regular grid'
     int_udz_reg = zeros([num_lat, num_lon])
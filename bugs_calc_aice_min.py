@@ -1,32 +1,25 @@
 from numpy import *
+from timeseries_store import *
 
-def bugs_calc_aice_min (extent_log_old, extent_log_new):
+def bugs_calc_aice_min (extent_store_old, extent_store_new):
 
     start_year = 1992
     end_year = 2016
     num_years = end_year - start_year + 1
 
-    extent_5day_old = []
-    f = open(extent_log_old, 'r')
-    f.readline()
-    for line in f:
-        extent_5day_old.append(float(line))
-    f.close()
+    time, series = read_timeseries(extent_store_old, ['extent'])
+    extent_5day_old = series['extent']
     feb_extent_old = zeros(num_years)
     for year in range(start_year, end_year+1):
-        # First timestep of year in 5-day logfile
+        # First timestep of year in 5-day timeseries
         t0 = (year-start_year)*73
         # Feburary: 4/5 of index 7, indices 8-11, and 4/5 of index 12
         feb_extent_old[year-start_year] = (extent_5day_old[t0+6]*4 + sum(extent_5day_old[t0+7:t0+11]*5) + extent_5day_old[t0+11]*4)/28.0
     mean_old = mean(feb_extent_old)
     print 'Mean February sea ice extent in old simulation: ' + str(mean_old)
 
-    extent_5day_new = []
-    f = open(extent_log_new, 'r')
-    f.readline()
-    for line in f:
-        extent_5day_new.append(float(line))
-    f.close()
+    time, series = read_timeseries(extent_store_new, ['extent'])
+    extent_5day_new = series['extent']
     feb_extent_new = zeros(num_years)
     for year in range(start_year, end_year+1):
         t0 = (year-start_year)*73
@@ -39,9 +32,9 @@ def bugs_calc_aice_min (extent_log_old, extent_log_new):
 # Command-line interface
 if __name__ == "__main__":
 
-    extent_log_old = raw_input("Path to sea ice extent timeseries from old simulation: ")
-    extent_log_new = raw_input("Path to sea ice extent timeseries from new simulation: ")
-    bugs_calc_aice_min(extent_log_old, extent_log_new)
+    extent_store_old = raw_input("Path to sea ice extent timeseries from old simulation: ")
+    extent_store_new = raw_input("Path to sea ice extent timeseries from new simulation: ")
+    bugs_calc_aice_min(extent_store_old, extent_store_new)
     
 
     
@@ -1,9 +1,8 @@
 from netCDF4 import Dataset
 from numpy import *
-from matplotlib.collections import PatchCollection
 from matplotlib.pyplot import *
 from matplotlib.cm import *
-from patches import *
+from mesh_raster import *
 
 # Make a circumpolar plot of bottom water temperature annually averaged over
 # the given year of FESOM simulation.
@@ -13,14 +12,20 @@ from patches import *
 # save = optional boolean indicating to save the figure, rather than display
 #        it on the screen
 # fig_name = if save=True, filename for figure
-def bwtemp (mesh_path, file_path, save=False, fig_name=None):
+# raster = optional boolean indicating to draw the plot from a pre-computed
+#          raster of the mesh (see mesh_raster.py) rather than one polygon
+#          per element. The raster is built the first time and saved in the
+#          mesh directory, so this is much faster for making lots of plots.
+def bwtemp (mesh_path, file_path, save=False, fig_name=None, raster=False):
 
     # Plotting parameters
     lat_max = -30 + 90
     circumpolar=True
+    # Image size if raster=True
+    num_pixels = 1600
 
     # Build FESOM mesh
-    elements, patches = make_patches(mesh_path, circumpolar)
+    elements, verts, index = mesh_geometry(mesh_path, circumpolar)
 
     # Calculate annual average of bottom water temperature
     file = Dataset(file_path, 'r')
@@ -40,11 +45,14 @@ def bwtemp (mesh_path, file_path, save=False, fig_name=None):
     # Plot
     fig = figure(figsize=(16,12))
     ax = fig.add_subplot(1,1,1,aspect='equal')
-    img = PatchCollection(patches, cmap=jet)
-    img.set_array(array(values))
-    img.set_edgecolor('face')
-    img.set_clim(vmin=-2.5, vmax=2.5)
-    ax.add_collection(img)
+    if raster:
+        elm_index, weights = element_raster(mesh_path, -lat_max, lat_max, -lat_max, lat_max, num_pixels, num_pixels, circumpolar)
+        img = raster_show(ax, raster_image(elm_index, array(values)), -lat_max, lat_max, -lat_max, lat_max, cmap=jet, vmin=-2.5, vmax=2.5)
+    else:
+        img = element_collection(verts, array(values)[index], cmap=jet)
+        img.set_edgecolor('face')
+        img.set_clim(vmin=-2.5, vmax=2.5)
+        ax.add_collection(img)
     xlim([-lat_max, lat_max])
     ylim([-lat_max, lat_max])
     axis('off')
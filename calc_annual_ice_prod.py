@@ -1,5 +1,7 @@
 from netCDF4 import Dataset
 from numpy import *
+from prefetch import *
+from output_writer import *
 
 def calc_annual_ice_prod (model_dir, start_year, end_year, out_file):
 
@@ -12,20 +14,23 @@ def calc_annual_ice_prod (model_dir, start_year, end_year, out_file):
     id.close()
     ice_prod = zeros(n2d)
 
-    for year in range(start_year, end_year+1):
-        id = Dataset(file_head + str(year) + file_tail, 'r')
+    # Read each year's thermodynamic growth rate in the background, so the
+    # next year is being read while this one is added on
+    def read_thdgr (file_name):
+        id = Dataset(file_name, 'r')
         thdgr = id.variables['thdgr'][:,:]
         id.close()
+        return thdgr
+
+    for file_name, thdgr in prefetch([file_head + str(year) + file_tail for year in range(start_year, end_year+1)], read_thdgr):
+        # Ignore melting
         index = thdgr < 0
         thdgr[index] = 0
         ice_prod += sum(thdgr, axis=0)*sec_per_step
     ice_prod = ice_prod/(end_year-start_year+1)
 
-    id = Dataset(out_file, 'w')
-    id.createDimension('nodes_2d', size(ice_prod))
-    id.createVariable('ice_prod', 'f8', ('nodes_2d'))
-    id.variables['ice_prod'].units = 'm/y'
-    id.variables['ice_prod'][:] = ice_prod
+    id = create_output(out_file, [('nodes_2d', size(ice_prod))], title='annual sea ice production averaged over ' + str(start_year) + '-' + str(end_year))
+    create_var(id, 'ice_prod', ('nodes_2d'), units='m/y', long_name='annual thermodynamic sea ice production', data=ice_prod, zlib=True)
     id.close()
 
 
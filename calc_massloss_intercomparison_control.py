@@ -1,6 +1,7 @@
 from numpy import *
+from timeseries_store import *
 
-def calc_massloss_intercomparison_control (intercomparison_logfile, control_logfile):
+def calc_massloss_intercomparison_control (intercomparison_store, control_store):
 
     # Year simulations start
     year_start = 1992
@@ -15,62 +16,13 @@ def calc_massloss_intercomparison_control (intercomparison_logfile, control_logf
 
     # Read timeseries
     # Intercomparison (high-res)
-    tmp = []
-    f = open(intercomparison_logfile, 'r')
-    # Skip the first line (header)
-    f.readline()
-    # Read total mass loss
-    num_time = 0
-    for line in f:
-        try:
-            tmp.append(float(line))
-            num_time += 1
-        except(ValueError):
-            # Reached the header for the next variable
-            break
-    # Set up array for mass loss values at each ice shelf
-    massloss_ts_intercomparison = empty([num_shelves, num_time])
-    # Save the total values in the first index
-    massloss_ts_intercomparison[0,:] = array(tmp)
-    # Loop over ice shelves
-    index = 1
-    while index < num_shelves:
-        t = 0
-        for line in f:
-            try:
-                massloss_ts_intercomparison[index,t] = float(line)
-                t += 1
-            except(ValueError):
-                # Reached the header for the next ice shelf
-                break
-        index += 1
-    f.close()
+    time, series = read_timeseries(intercomparison_store, ['massloss'])
+    massloss_ts_intercomparison = series['massloss']
     # Average between given years
     massloss_intercomparison = mean(massloss_ts_intercomparison[:,peryear*(calc_start-year_start):peryear*(calc_end+1-year_start)], axis=1)
     # Control simulation from RCP paper
-    tmp = []
-    f = open(control_logfile, 'r')
-    f.readline()
-    num_time = 0
-    for line in f:
-        try:
-            tmp.append(float(line))
-            num_time += 1
-        except(ValueError):
-            break
-    massloss_ts_control = empty([num_shelves, num_time])
-    massloss_ts_control[0,:] = array(tmp)
-    index = 1
-    while index < num_shelves:
-        t = 0
-        for line in f:
-            try:
-                massloss_ts_control[index,t] = float(line)
-                t += 1
-            except(ValueError):
-                break
-        index += 1
-    f.close()
+    time, series = read_timeseries(control_store, ['massloss'])
+    massloss_ts_control = series['massloss']
     massloss_control = mean(massloss_ts_control[:,peryear*(calc_start-year_start):peryear*(calc_end+1-year_start)], axis=1)
 
     # Print results
@@ -85,6 +37,6 @@ def calc_massloss_intercomparison_control (intercomparison_logfile, control_logf
 # Command-line interface
 if __name__ == "__main__":
 
-    intercomparison_logfile = raw_input("Path to massloss logfile for high-res intercomparison experiment: ")
-    control_logfile = raw_input("Path to massloss logfile for RCP control experiment: ")
-    calc_massloss_intercomparison_control(intercomparison_logfile, control_logfile)
+    intercomparison_store = raw_input("Path to massloss timeseries store for high-res intercomparison experiment: ")
+    control_store = raw_input("Path to massloss timeseries store for RCP control experiment: ")
+    calc_massloss_intercomparison_control(intercomparison_store, control_store)
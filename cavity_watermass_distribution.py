@@ -1,7 +1,7 @@
 from netCDF4 import Dataset
 from numpy import *
 from matplotlib.pyplot import *
-from fesom_grid import *
+from ts_census import *
 
 def cavity_watermass_distribution():
 
@@ -11,9 +11,6 @@ def cavity_watermass_distribution():
     ts_file = '/short/y99/kaa561/FESOM/highres_spinup/rep3/annual_avg.oce.mean.nc'
     # Number of temperature and salinity bins
     num_bins = 1000
-    # Mesh parameters
-    circumpolar = True
-    cross_180 = False
     # Bounds on temperature and salinity bins (pre-computed, change if needed)
     min_salt = 32.8
     max_salt = 35
@@ -33,52 +30,16 @@ def cavity_watermass_distribution():
     # Repeat for salinity
     salt_bins = linspace(min_salt, max_salt, num=num_bins)
     salt_centres = 0.5*(salt_bins[:-1] + salt_bins[1:])
-    # Set up a 2D array of temperature bins x salinity bins to increment with
-    # volume of water masses
-    ts_vals = zeros([size(temp_centres), size(salt_centres)])
     # Calculate surface freezing point as a function of salinity: this is the
     # equation the FESOM sea ice code uses
     freezing_pt = -0.0575*salt_centres + 1.7105e-3*sqrt(salt_centres**3) - 2.155e-4*salt_centres**2
 
-    # Make FESOM mesh elements
-    elements = fesom_grid(mesh_path, circumpolar, cross_180)
-    # Loop over elements
-    for elm in elements:
-        # Only consider ice shelf cavities
-        if elm.cavity:
-            # Get area of 2D triangle
-            area = elm.area()
-            nodes = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-            # Loop downward
-            while True:
-                if nodes[0].below is None or nodes[1].below is None or nodes[2].below is None:
-                    # We've reached the bottom
-                    break
-                # Calculate average temperature, salinity, and layer thickness
-                # over this 3D triangular prism
-                temp_vals = []
-                salt_vals = []
-                dz = []
-                for i in range(3):
-                    # Average temperature over 6 nodes
-                    temp_vals.append(temp[nodes[i].id])
-                    temp_vals.append(temp[nodes[i].below.id])
-                    # Average salinity over 6 nodes
-                    salt_vals.append(salt[nodes[i].id])
-                    salt_vals.append(salt[nodes[i].below.id])
-                    # Average dz over 3 vertical edges
-                    dz.append(abs(nodes[i].depth - nodes[i].below.depth))
-                    # Get ready for next repetition of loop
-                    nodes[i] = nodes[i].below
-                temp_elm = mean(array(temp_vals))
-                salt_elm = mean(array(salt_vals))
-                # Calculate volume of 3D triangular prism
-                volume = area*mean(array(dz))
-                # Figure out which bins this falls into
-                temp_index = nonzero(temp_bins > temp_elm)[0][0] - 1
-                salt_index = nonzero(salt_bins > salt_elm)[0][0] - 1
-                # Increment bins with volume
-                ts_vals[temp_index, salt_index] += volume
+    # Get the prisms making up the mesh
+    elements, elm_index, top, bottom, volume = prism_table(mesh_path)
+    # Only consider ice shelf cavities
+    in_cavity = array([elm.cavity for elm in elements])[elm_index]
+    # Add up the volume of the prisms in each temperature and salinity bin
+    ts_vals = ts_census(prism_mean(temp, top, bottom), prism_mean(salt, top, bottom), volume, temp_bins, salt_bins, in_cavity)
     # Mask bins with zero volume
     ts_vals = ma.masked_where(ts_vals==0, ts_vals)
 
@@ -1,10 +1,10 @@
 from netCDF4 import Dataset
 from numpy import *
-from matplotlib.collections import PatchCollection
+from matplotlib.collections import PolyCollection
 from matplotlib.pyplot import *
 from matplotlib.cm import *
-from matplotlib.patches import Polygon
 from fesom_grid_2d import *
+from mesh_render import *
 
 def check_2d (mesh_path):
 
@@ -12,20 +12,12 @@ def check_2d (mesh_path):
 
     elements = fesom_grid_2d(mesh_path, True)
     elements_global = fesom_grid_2d(mesh_path, False)
-    patches = []
-    shelf_patches = []
-    ocean_patches = []
-    for elm in elements:
-        coord = transpose(vstack((elm.x, elm.y)))
-        if elm.cavity:
-            shelf_patches.append(Polygon(coord, True, linewidth=0.))
-        else:
-            ocean_patches.append(Polygon(coord, True, linewidth=0.))
-        patches.append(Polygon(coord, True, linewidth=0.))
-    patches_global = []
-    for elm in elements_global:
-        coord = transpose(vstack((elm.x, elm.y)))
-        patches_global.append(Polygon(coord, True, linewidth=0.))
+    # Corners of every element, and split into ice shelf and open ocean
+    patches = element_verts(elements)
+    cavity = array([elm.cavity for elm in elements])
+    shelf_patches = patches[cavity]
+    ocean_patches = patches[~cavity]
+    patches_global = element_verts(elements_global)
 
     node_shelf = []
     f = open(mesh_path + 'shelf.out', 'r')
@@ -57,12 +49,12 @@ def check_2d (mesh_path):
     fig = figure(figsize=(128, 96))
     ax = fig.add_subplot(1,1,1, aspect='equal')
     contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-    img = PatchCollection(shelf_patches, cmap='jet')
+    img = PolyCollection(shelf_patches, cmap='jet')
     img.set_array(array(elm_shelf))
     img.set_edgecolor('face')
     img.set_clim(vmin=0, vmax=2300)
     ax.add_collection(img)
-    overlay = PatchCollection(ocean_patches, facecolor=(1,1,1))
+    overlay = PolyCollection(ocean_patches, facecolor=(1,1,1))
     overlay.set_edgecolor('face')
     ax.add_collection(overlay)
     xlim([-lat_max, lat_max])
@@ -76,7 +68,7 @@ def check_2d (mesh_path):
     fig = figure(figsize=(128, 96))
     ax = fig.add_subplot(1,1,1, aspect='equal')
     contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-    img = PatchCollection(patches, cmap='jet')
+    img = PolyCollection(patches, cmap='jet')
     img.set_array(array(elm_depth))
     img.set_edgecolor('face')
     img.set_clim(vmin=0, vmax=2800)
@@ -91,7 +83,7 @@ def check_2d (mesh_path):
 
     fig = figure(figsize=(128, 96))
     ax = fig.add_subplot(1,1,1, aspect='equal')
-    img = PatchCollection(patches, cmap='jet')
+    img = PolyCollection(patches, cmap='jet')
     img.set_array(array(elm_res))
     img.set_edgecolor('face')
     img.set_clim(vmin=0, vmax=10)
@@ -106,7 +98,7 @@ def check_2d (mesh_path):
 
     fig = figure(figsize=(16,8))
     ax = fig.add_subplot(1,1,1)
-    img = PatchCollection(patches_global, cmap='jet')
+    img = PolyCollection(patches_global, cmap='jet')
     img.set_array(array(elm_res_global))
     img.set_edgecolor('face')
     img.set_clim(vmin=0, vmax=225)
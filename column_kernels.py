@@ -0,0 +1,340 @@
+from numpy import *
+from scipy.sparse import coo_matrix
+from os.path import abspath, getmtime
+from fesom_grid import *
+
+# Vertical integrals and averages over every water column of the FESOM mesh
+# at once. Instead of following node.below down each column (see
+# fesom_grid.py), the columns are stored as a table of 3D node indices with
+# one row per surface node and one column per level, read from aux3d.out.
+# The integrals loop over levels only, and each step works on all the
+# columns together. Data is assumed to vary linearly with depth between
+# nodes, so layers which are cut by a depth bound are integrated exactly.
+
+# Column tables which have already been read: absolute mesh path ->
+# (modification times, columns, depth)
+_column_cache = {}
+# Integration operators which have already been built: (absolute mesh path,
+# shallow bound, deep bound) -> (modification times, operator)
+_operator_cache = {}
+# Prism tables which have already been built: absolute mesh path ->
+# (modification times, elements, elm_index, top, bottom, volume)
+_prism_cache = {}
+
+
+# Get the modification times of the mesh files which the column table is
+# built from. Caches of anything built from the column table can store this
+# and check it, to find out when they are out of date.
+# Input: mesh_path = path to FESOM mesh directory
+# Output: list of modification times
+def column_stamp (mesh_path):
+
+    return [getmtime(mesh_path + file_name) for file_name in ['nod2d.out', 'nod3d.out', 'aux3d.out']]
+
+
+# Get the modification times of the mesh files which the prism table is built
+# from (the column table's files, plus elem2d.out), in the same way as
+# column_stamp.
+# Input: mesh_path = path to FESOM mesh directory
+# Output: list of modification times
+def prism_stamp (mesh_path):
+
+    return column_stamp(mesh_path) + [getmtime(mesh_path + 'elem2d.out')]
+
+
+# Read (or get from the cache) the table of nodes in each water column.
+# Input: mesh_path = path to FESOM mesh directory
+# Output:
+# columns = integer array of size n2d x max_num_layers containing the 0-based
+#           3D node index at each level of each column, from the surface
+#           down, or -1 below the seafloor. columns[n,0] is surface node n.
+# depth = array of size n3d containing the depth of each 3D node (positive,
+#         in metres)
+def column_table (mesh_path):
+
+    key = abspath(mesh_path)
+    stamp = column_stamp(mesh_path)
+    if key in _column_cache and _column_cache[key][0] == stamp:
+        return _column_cache[key][1:]
+
+    f = open(mesh_path + 'nod2d.out', 'r')
+    n2d = int(f.readline())
+    f.close()
+    depth = -1*loadtxt(mesh_path + 'nod3d.out', skiprows=1, usecols=(3,))
+    f = open(mesh_path + 'aux3d.out', 'r')
+    max_num_layers = int(f.readline())
+    # The table is followed by other information, so only read n2d columns
+    ids = fromfile(f, dtype=int, count=n2d*max_num_layers, sep=' ')
+    f.close()
+    columns = reshape(ids, (n2d, max_num_layers))
+    # Convert to 0-based indices, with -1 (from -999) below the seafloor
+    columns = where(columns > 0, columns-1, -1)
+
+    _column_cache[key] = (stamp, columns, depth)
+    return columns, depth
+
+
+# Integrate a 3D field down every water column, optionally between two
+# depths.
+# Input:
+# data = array of size n3d containing the field at each 3D node
+# columns, depth = from column_table
+# shallow_bound, deep_bound = optional depth bounds (positive, in metres) to
+#                             integrate between. Default is the entire water
+#                             column.
+# Output:
+# integral = array of size n2d containing the integral of data with respect
+#            to depth over the part of each column within the bounds
+# thickness = array of size n2d containing the thickness of that part of the
+#             column (zero if the column doesn't reach into the bounds)
+def column_integral (data, columns, depth, shallow_bound=None, deep_bound=None):
+
+    if shallow_bound is None:
+        shallow_bound = -inf
+    if deep_bound is None:
+        deep_bound = inf
+    data = ma.filled(data, 0)
+    n2d = size(columns,0)
+    integral = zeros(n2d)
+    thickness = zeros(n2d)
+    for k in range(size(columns,1)-1):
+        # Layer between levels k and k+1
+        top = columns[:,k]
+        bottom = columns[:,k+1]
+        valid = nonzero(bottom >= 0)[0]
+        if size(valid) == 0:
+            # No columns go this deep
+            break
+        top = top[valid]
+        bottom = bottom[valid]
+        z1 = depth[top]
+        z2 = depth[bottom]
+        v1 = data[top]
+        v2 = data[bottom]
+        # Part of the layer within the bounds
+        za = maximum(z1, shallow_bound)
+        zb = minimum(z2, deep_bound)
+        dz = maximum(zb - za, 0)
+        # Linearly interpolate the data to the ends of this part, and
+        # integrate with the trapezoidal rule (exact for linear data)
+        slope = (v2 - v1)/(z2 - z1)
+        va = v1 + slope*(za - z1)
+        vb = v1 + slope*(zb - z1)
+        integral[valid] += 0.5*(va + vb)*dz
+        thickness[valid] += dz
+    return integral, thickness
+
+
+# Build (or get from the cache) a sparse matrix which integrates a 3D field
+# down every water column with the trapezoidal rule, optionally between two
+# depths. Multiplying by it does the same as column_integral, but all the
+# work of finding the layers is done once, so integrating many fields (eg
+# every record in a file, or several variables) is just a sparse product.
+# For example, water column thickness is the integral of 1, heat content is
+# rho_0*Cp times the integral of temperature, and so on.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# shallow_bound, deep_bound = optional depth bounds (positive, in metres) to
+#                             integrate between. Default is the entire water
+#                             column.
+# Output: sparse matrix of size n2d x n3d. Use it with integrate_columns.
+def integration_operator (mesh_path, shallow_bound=None, deep_bound=None):
+
+    key = (abspath(mesh_path), shallow_bound, deep_bound)
+    columns, depth = column_table(mesh_path)
+    stamp = column_stamp(mesh_path)
+    if key in _operator_cache and _operator_cache[key][0] == stamp:
+        return _operator_cache[key][1]
+
+    if shallow_bound is None:
+        shallow_bound = -inf
+    if deep_bound is None:
+        deep_bound = inf
+    n2d = size(columns,0)
+    rows = []
+    cols = []
+    coeffs = []
+    for k in range(size(columns,1)-1):
+        # Layer between levels k and k+1
+        valid = nonzero(columns[:,k+1] >= 0)[0]
+        if size(valid) == 0:
+            # No columns go this deep
+            break
+        top = columns[valid,k]
+        bottom = columns[valid,k+1]
+        z1 = depth[top]
+        z2 = depth[bottom]
+        # Part of the layer within the bounds
+        za = maximum(z1, shallow_bound)
+        zb = minimum(z2, deep_bound)
+        dz = maximum(zb - za, 0)
+        # Fractional positions of the ends of this part within the layer
+        a = (za - z1)/(z2 - z1)
+        b = (zb - z1)/(z2 - z1)
+        # Trapezoidal rule with the data linearly interpolated to the ends
+        rows.extend([valid, valid])
+        cols.extend([top, bottom])
+        coeffs.extend([0.5*dz*(2 - a - b), 0.5*dz*(a + b)])
+    operator = coo_matrix((concatenate(coeffs), (concatenate(rows), concatenate(cols))), shape=(n2d, size(depth))).tocsr()
+
+    _operator_cache[key] = (stamp, operator)
+    return operator
+
+
+# Integrate one or more 3D fields down every water column, using a sparse
+# operator from integration_operator.
+# Input:
+# operator = sparse matrix from integration_operator
+# data = array of size n3d, or of size (any leading dimensions, eg time) x
+#        n3d. Masked values count as zero.
+# Output: array of size (any leading dimensions) x n2d
+def integrate_columns (operator, data):
+
+    data = ma.filled(data, 0)
+    lead_shape = shape(data)[:-1]
+    data = reshape(data, (-1, shape(data)[-1]))
+    return reshape(operator.dot(transpose(data)).T, lead_shape + (operator.shape[0],))
+
+
+# Build (or get from the cache) the table of 3D triangular prisms making up
+# the mesh. Each prism is one element between two levels, and the prisms of
+# each element go down until the shallowest of its 3 columns ends. This is
+# the same set of prisms found by following node.below from every element,
+# but stored as arrays so that a field can be averaged over every prism at
+# once (see prism_mean).
+# Input: mesh_path = path to FESOM mesh directory
+# Output:
+# elements = list of Element objects from fesom_grid (not circumpolar, not
+#            crossing 180E), in the order of elem2d.out. Use it to choose
+#            which prisms to consider, eg with elm.cavity or elm.lat. Don't
+#            modify it, because it is shared with anyone else who asks for
+#            this mesh.
+# elm_index = integer array of size num_prisms containing the index in
+#             elements of the element each prism is under
+# top, bottom = integer arrays of size num_prisms x 3 containing the 0-based
+#               3D node indices at the top and bottom of each prism
+# volume = array of size num_prisms containing the volume of each prism in
+#          m^3 (element area times the average thickness of the 3 edges)
+def prism_table (mesh_path):
+
+    key = abspath(mesh_path)
+    stamp = prism_stamp(mesh_path)
+    if key in _prism_cache and _prism_cache[key][0] == stamp:
+        return _prism_cache[key][1:]
+
+    columns, depth = column_table(mesh_path)
+    elements = fesom_grid(mesh_path, circumpolar=False, cross_180=False)
+    node_ids = array([[node.id for node in elm.nodes] for elm in elements])
+    area = array([elm.area() for elm in elements])
+    elm_index = []
+    top = []
+    bottom = []
+    for k in range(size(columns,1)-1):
+        # Elements whose 3 columns all go below level k
+        valid = nonzero(all(columns[node_ids,k+1] >= 0, axis=1))[0]
+        if size(valid) == 0:
+            # No prisms go this deep
+            break
+        elm_index.append(valid)
+        top.append(columns[node_ids[valid,:],k])
+        bottom.append(columns[node_ids[valid,:],k+1])
+    elm_index = concatenate(elm_index)
+    top = concatenate(top)
+    bottom = concatenate(bottom)
+    volume = area[elm_index]*mean(depth[bottom] - depth[top], axis=1)
+
+    _prism_cache[key] = (stamp, elements, elm_index, top, bottom, volume)
+    return elements, elm_index, top, bottom, volume
+
+
+# Average a 3D field over every prism (the 6 nodes at its corners).
+# Input:
+# data = array of size n3d, or of size (any leading dimensions, eg
+#        experiments) x n3d
+# top, bottom = from prism_table, or any subset of the prisms
+# Output: array of size (any leading dimensions) x num_prisms, NaN where any
+#         of the nodes are masked
+def prism_mean (data, top, bottom):
+
+    data = ma.filled(data, NaN)
+    return (sum(data[...,top], axis=-1) + sum(data[...,bottom], axis=-1))/6.0
+
+
+# Depth-weighted average of a 3D field in every water column, optionally
+# between two depths.
+# Input: as for column_integral
+# Output: masked array of size n2d containing the average in each column,
+#         masked where the column doesn't reach into the bounds
+def column_average (data, columns, depth, shallow_bound=None, deep_bound=None):
+
+    integral, thickness = column_integral(data, columns, depth, shallow_bound, deep_bound)
+    thickness = ma.masked_where(thickness == 0, thickness)
+    return integral/thickness
+
+
+# Mixed layer depth in every water column, defined as the depth where
+# potential density first exceeds the surface density by a given amount (as
+# in Sallee et al 2013). If it never does, the mixed layer goes all the way to
+# the seafloor.
+# Input:
+# density = array of size n3d containing potential density at each 3D node,
+#           or of size (any leading dimensions, eg time) x n3d to calculate
+#           the mixed layer depth for many records at once
+# columns, depth = from column_table
+# density_anom = optional density threshold in kg/m^3 (default 0.03)
+# interpolate = optional boolean flag indicating to linearly interpolate
+#               between the nodes above and below the threshold. Default is
+#               the depth of the first node which exceeds it.
+# Output: array of size (any leading dimensions) x n2d containing the mixed
+#         layer depth in each column (positive, in metres)
+def mixed_layer_depth (density, columns, depth, density_anom=0.03, interpolate=False):
+
+    density = ma.filled(density, NaN)
+    threshold = density[...,columns[:,0]] + density_anom
+    # Default is the depth of the seafloor
+    bottom = columns[arange(size(columns,0)), sum(columns >= 0, axis=1)-1]
+    mld = zeros(shape(threshold)) + depth[bottom]
+    found = zeros(shape(threshold), dtype=bool)
+    for k in range(1, size(columns,1)):
+        valid = nonzero(columns[:,k] >= 0)[0]
+        if size(valid) == 0:
+            # No columns go this deep
+            break
+        rho = density[...,columns[valid,k]]
+        # Columns which exceed the threshold for the first time at this level
+        new = (rho >= threshold[...,valid])*invert(found[...,valid])
+        z = depth[columns[valid,k]]
+        if interpolate:
+            rho_above = density[...,columns[valid,k-1]]
+            z_above = depth[columns[valid,k-1]]
+            # rho > rho_above wherever new is True
+            drho = where(new, rho - rho_above, 1)
+            z = z_above + (z - z_above)*(threshold[...,valid] - rho_above)/drho
+        mld[...,valid] = where(new, z, mld[...,valid])
+        found[...,valid] += new
+    return mld
+
+
+# Average a field at the surface nodes to the elements.
+# Input:
+# node_values = array (can be masked) of size n2d with one value per surface
+#               node (eg from column_average), or of size (any leading
+#               dimensions) x n2d
+# node_ids = integer array of size num_elements x 3 containing the surface
+#            node indices of each element (see element_node_ids in
+#            mesh_raster.py)
+# exclude = optional boolean array of size num_elements x 3, True for nodes
+#           to leave out of each element's average (eg ice shelf cavity
+#           nodes, using elm.cavity_nodes)
+# Output: masked array of size (any leading dimensions) x num_elements,
+#         masked if any of the nodes which are averaged are masked
+def element_mean (node_values, node_ids, exclude=None):
+
+    values = ma.asarray(node_values)[...,node_ids]
+    if exclude is None:
+        exclude = zeros(shape(node_ids), dtype=bool)
+    weights = invert(exclude).astype(float)
+    num_nodes = sum(weights, axis=-1)
+    elm_mask = any(ma.getmaskarray(values)*invert(exclude), axis=-1) + (num_nodes == 0)
+    avg = sum(ma.filled(values, 0)*weights, axis=-1)/maximum(num_nodes, 1)
+    return ma.masked_where(elm_mask, avg)
@@ -3,6 +3,8 @@ from numpy.linalg import inv
 from scipy.interpolate import griddata
 from monthly_avg import *
 from unrotate_vector import *
+from output_writer import *
+from fe_operators import *
 
 # For various 2D fields, calculate the monthly climatology of FESOM output and
 # interpolate to a regular grid (quarter-degree, circumpolar to 50S) for easy
@@ -24,10 +26,6 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
     res = 0.25
     # Northern boundary to interpolate to
     nbdry = -50
-    # Radius of the Earth in metres
-    r = 6.371e6
-    # Degrees to radians conversion factor
-    deg2rad = pi/180.0
     # Name stamped on FESOM output files
     expt_name = 'MK44005'
 
@@ -35,13 +33,6 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
     # Make the latitude and longitude arrays for the common grid
     lon_common = arange(-180, 180+res, res)
     lat_common = arange(-90, nbdry+res, res)
-    # Get a 2D version of each to calculate dx and dy in metres
-    lon_2d, lat_2d = meshgrid(lon_common, lat_common)
-    # dx = r*cos(lat)*dlon where lat and dlon (i.e. res) are in radians    
-    dx = r*cos(lat_2d*deg2rad)*res*deg2rad
-    # dy = r*dlat where dlat (i.e. res) is in radians
-    # This is constant so reshape to an array of the right dimensions
-    dy = zeros(shape(dx)) + r*res*deg2rad
 
     # Read the land mask from the existing ROMS common grid file
     id = Dataset(common_file, 'r')
@@ -71,60 +62,26 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
     lon_fesom, lat_fesom = unrotate_grid(rlon, rlat)
 
     print 'Setting up ' + out_file
-    id = Dataset(out_file, 'w')
-    id.createDimension('longitude', size(lon_common))
-    id.createDimension('latitude', size(lat_common))
-    id.createDimension('time', None)
-    id.createVariable('longitude', 'f8', ('longitude'))
-    id.variables['longitude'].units = 'degrees'
-    id.variables['longitude'][:] = lon_common
-    id.createVariable('latitude', 'f8', ('latitude'))
-    id.variables['latitude'].units = 'degrees'
-    id.variables['latitude'][:] = lat_common
-    id.createVariable('time', 'f8', ('time'))
-    id.variables['time'].units = 'months'
-    id.createVariable('mask', 'f8', ('latitude', 'longitude'))
-    id.variables['mask'].units = '1'
-    id.variables['mask'][:,:] = mask_common
-    id.createVariable('sst', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['sst'].long_name = 'sea surface temperature'
-    id.variables['sst'].units = 'C'
-    id.createVariable('sss', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['sss'].long_name = 'sea surface salinity'
-    id.variables['sss'].units = 'psu'
-    id.createVariable('shflux', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['shflux'].long_name = 'surface heat flux into ocean'
-    id.variables['shflux'].units = 'W/m^2'
-    id.createVariable('ssflux', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['ssflux'].long_name = 'surface virtual salinity flux into ocean'
-    id.variables['ssflux'].units = 'psu m/s'
-    id.createVariable('aice', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['aice'].long_name = 'sea ice concentration'
-    id.variables['aice'].units = '1'
-    id.createVariable('hice', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['hice'].long_name = 'sea ice thickness'
-    id.variables['hice'].units = 'm'
-    id.createVariable('uocn', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['uocn'].long_name = 'ocean surface velocity eastward'
-    id.variables['uocn'].units = 'm/s'
-    id.createVariable('vocn', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['vocn'].long_name = 'ocean surface velocity northward'
-    id.variables['vocn'].units = 'm/s'
-    id.createVariable('uice', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['uice'].long_name = 'sea ice velocity eastward'
-    id.variables['uice'].units = 'm/s'
-    id.createVariable('vice', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['vice'].long_name = 'sea ice velocity northward'
-    id.variables['vice'].units = 'm/s'
-    id.createVariable('sustr', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['sustr'].long_name = 'zonal surface stress'
-    id.variables['sustr'].units = 'N/m^2'
-    id.createVariable('svstr', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['svstr'].long_name = 'meridional surface stress'
-    id.variables['svstr'].units = 'N/m^2'
-    id.createVariable('curl_str', 'f8', ('time', 'latitude', 'longitude'))
-    id.variables['curl_str'].long_name = 'curl of surface stress'
-    id.variables['curl_str'].units = 'N/m^3'    
+    id = create_output(out_file, [('longitude', size(lon_common)), ('latitude', size(lat_common)), ('time', None)], title='FESOM monthly fields on the common grid')
+    create_var(id, 'longitude', ('longitude'), units='degrees', long_name='longitude', data=lon_common)
+    create_var(id, 'latitude', ('latitude'), units='degrees', long_name='latitude', data=lat_common)
+    create_var(id, 'time', ('time'), units='months', long_name='time')
+    create_var(id, 'mask', ('latitude', 'longitude'), units='1', long_name='land mask', data=mask_common, zlib=True)
+    # The rest are read one month at a time, and the land points compress
+    # well
+    create_var(id, 'sst', ('time', 'latitude', 'longitude'), units='C', long_name='sea surface temperature', access='map', zlib=True)
+    create_var(id, 'sss', ('time', 'latitude', 'longitude'), units='psu', long_name='sea surface salinity', access='map', zlib=True)
+    create_var(id, 'shflux', ('time', 'latitude', 'longitude'), units='W/m^2', long_name='surface heat flux into ocean', access='map', zlib=True)
+    create_var(id, 'ssflux', ('time', 'latitude', 'longitude'), units='psu m/s', long_name='surface virtual salinity flux into ocean', access='map', zlib=True)
+    create_var(id, 'aice', ('time', 'latitude', 'longitude'), units='1', long_name='sea ice concentration', access='map', zlib=True)
+    create_var(id, 'hice', ('time', 'latitude', 'longitude'), units='m', long_name='sea ice thickness', access='map', zlib=True)
+    create_var(id, 'uocn', ('time', 'latitude', 'longitude'), units='m/s', long_name='ocean surface velocity eastward', access='map', zlib=True)
+    create_var(id, 'vocn', ('time', 'latitude', 'longitude'), units='m/s', long_name='ocean surface velocity northward', access='map', zlib=True)
+    create_var(id, 'uice', ('time', 'latitude', 'longitude'), units='m/s', long_name='sea ice velocity eastward', access='map', zlib=True)
+    create_var(id, 'vice', ('time', 'latitude', 'longitude'), units='m/s', long_name='sea ice velocity northward', access='map', zlib=True)
+    create_var(id, 'sustr', ('time', 'latitude', 'longitude'), units='N/m^2', long_name='zonal surface stress', access='map', zlib=True)
+    create_var(id, 'svstr', ('time', 'latitude', 'longitude'), units='N/m^2', long_name='meridional surface stress', access='map', zlib=True)
+    create_var(id, 'curl_str', ('time', 'latitude', 'longitude'), units='N/m^3', long_name='curl of surface stress', access='map', zlib=True)
 
     for year in range(start_year, end_year+1):
         print 'Processing year ' + str(year)
@@ -138,12 +95,14 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             oce_mean_file = output_dir + expt_name + '.' + str(year) + '.oce.mean.nc'
             forcing_diag_file = output_dir + expt_name + '.' + str(year) + '.forcing.diag.nc'
             ice_mean_file = output_dir + expt_name + '.' + str(year) + '.ice.mean.nc'
+            # Get monthly averages of every variable we need from each file
+            # in one go. 3D variables are at surface nodes only.
+            oce_avg = monthly_avg_vars(oce_mean_file, ['temp', 'salt', 'u', 'v'], month, nodes=arange(n2d))
+            forcing_avg = monthly_avg_vars(forcing_diag_file, ['qnet', 'virtual_salt', 'stress_x', 'stress_y'], month)
+            ice_avg = monthly_avg_vars(ice_mean_file, ['area', 'hice', 'uice', 'vice'], month)
 
             print '...sea surface temperature'
-            # Get monthly average of 3D variable
-            temp_fesom = monthly_avg(oce_mean_file, 'temp', month)
-            # Select surface nodes
-            sst_fesom = temp_fesom[:n2d]
+            sst_fesom = oce_avg['temp']
             # Interpolate to common grid
             sst_common = interp_fesom2common(lon_common, lat_common, lon_fesom, lat_fesom, sst_fesom)
             # Apply land mask
@@ -152,10 +111,7 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             id.variables['sst'][curr_month,:,:] = sst
 
             print '...sea surface salinity'
-            # Get monthly average of 3D variable
-            salt_fesom = monthly_avg(oce_mean_file, 'salt', month)
-            # Select surface nodes
-            sss_fesom = salt_fesom[:n2d]
+            sss_fesom = oce_avg['salt']
             # Interpolate to common grid
             sss_common = interp_fesom2common(lon_common, lat_common, lon_fesom, lat_fesom, sss_fesom)
             # Apply land mask
@@ -164,8 +120,7 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             id.variables['sss'][curr_month,:,:] = sss            
 
             print '...surface heat flux'
-            # Get monthly average
-            shflux_fesom = monthly_avg(forcing_diag_file, 'qnet', month)
+            shflux_fesom = forcing_avg['qnet']
             # Interpolate to common grid
             shflux_common = interp_fesom2common(lon_common, lat_common, lon_fesom, lat_fesom, shflux_fesom)
             # Apply land mask
@@ -174,8 +129,7 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             id.variables['shflux'][curr_month,:,:] = shflux
 
             print '...surface salt flux'
-            # Get monthly average
-            ssflux_fesom = monthly_avg(forcing_diag_file, 'virtual_salt', month)
+            ssflux_fesom = forcing_avg['virtual_salt']
             # Interpolate to common grid
             ssflux_common = interp_fesom2common(lon_common, lat_common, lon_fesom, lat_fesom, ssflux_fesom)
             # Apply land mask
@@ -184,8 +138,7 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             id.variables['ssflux'][curr_month,:,:] = ssflux
 
             print '...sea ice concentration'
-            # Get monthly average
-            aice_fesom = monthly_avg(ice_mean_file, 'area', month)
+            aice_fesom = ice_avg['area']
             # Interpolate to common grid
             aice_common = interp_fesom2common(lon_common, lat_common, lon_fesom, lat_fesom, aice_fesom)
             # Apply land mask
@@ -194,8 +147,7 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             id.variables['aice'][curr_month,:,:] = aice
 
             print '...sea ice thickness'
-            # Get monthly average
-            hice_fesom = monthly_avg(ice_mean_file, 'hice', month)
+            hice_fesom = ice_avg['hice']
             # Interpolate to common grid
             hice_common = interp_fesom2common(lon_common, lat_common, lon_fesom, lat_fesom, hice_fesom)
             # Apply land mask
@@ -204,12 +156,8 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             id.variables['hice'][curr_month,:,:] = hice
 
             print '...surface ocean velocity vector'
-            # Get monthly averages of both vector components in 3D
-            uocn_3d_tmp = monthly_avg(oce_mean_file, 'u', month)
-            vocn_3d_tmp = monthly_avg(oce_mean_file, 'v', month)
-            # Select surface nodes
-            uocn_tmp = uocn_3d_tmp[:n2d]
-            vocn_tmp = vocn_3d_tmp[:n2d]
+            uocn_tmp = oce_avg['u']
+            vocn_tmp = oce_avg['v']
             # Unrotate
             uocn_fesom, vocn_fesom = unrotate_vector(rlon, rlat, uocn_tmp, vocn_tmp)
             # Interpolate to common grid
@@ -223,9 +171,8 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             id.variables['vocn'][curr_month,:,:] = vocn
 
             print '...sea ice velocity vector'
-            # Get monthly averages of both vector components
-            uice_tmp = monthly_avg(ice_mean_file, 'uice', month)
-            vice_tmp = monthly_avg(ice_mean_file, 'vice', month)
+            uice_tmp = ice_avg['uice']
+            vice_tmp = ice_avg['vice']
             # Unrotate
             uice_fesom, vice_fesom = unrotate_vector(rlon, rlat, uice_tmp, vice_tmp)
             # Interpolate to common grid
@@ -240,9 +187,8 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
 
             print '...surface stress vector'
             # Surface stresses
-            # Get monthly averages of both vector components
-            sustr_tmp = monthly_avg(forcing_diag_file, 'stress_x', month)
-            svstr_tmp = monthly_avg(forcing_diag_file, 'stress_y', month)
+            sustr_tmp = forcing_avg['stress_x']
+            svstr_tmp = forcing_avg['stress_y']
             # Unrotate
             sustr_fesom, svstr_fesom = unrotate_vector(rlon, rlat, sustr_tmp, svstr_tmp)
             # Interpolate to common grid
@@ -256,18 +202,12 @@ def common_grid (mesh_path, output_dir, start_year, end_year, common_file, out_f
             id.variables['svstr'][curr_month,:,:] = svstr
 
             print '...curl of surface stress vector'
-            # Curl of surface stress = d/dx (svstr) - d/dy (sustr)
-            # First calculate the two derivatives
-            dsvstr_dx = ma.empty(shape(svstr_common))
-            # Forward difference approximation
-            dsvstr_dx[:,:-1] = (svstr_common[:,1:] - svstr_common[:,:-1])/dx[:,:-1]
-            # Backward difference for the last row
-            dsvstr_dx[:,-1] = (svstr_common[:,-1] - svstr_common[:,-2])/dx[:,-1]
-            dsustr_dy = ma.empty(shape(sustr_common))
-            dsustr_dy[:-1,:] = (sustr_common[1:,:] - sustr_common[:-1,:])/dy[:-1,:]
-            dsustr_dy[-1,:] = (sustr_common[-1,:] - sustr_common[-2,:])/dy[-1,:]
-            curl_str = dsvstr_dx - dsustr_dy
-            curl_str = ma.masked_where(mask_common==0, curl_str)
+            # Calculate the curl on the FESOM mesh (straight from the rotated
+            # components) and then interpolate it
+            curl_fesom = curl(mesh_path, sustr_tmp, svstr_tmp)
+            curl_common = interp_fesom2common(lon_common, lat_common, lon_fesom, lat_fesom, curl_fesom)
+            # Apply land mask
+            curl_str = ma.masked_where(mask_common==0, curl_common)
             # Write to file
             id.variables['curl_str'][curr_month,:,:] = curl_str
 
@@ -1,11 +1,11 @@
 from netCDF4 import Dataset
 from numpy import *
-from matplotlib.collections import PatchCollection
+from matplotlib.collections import PolyCollection
 from matplotlib.pyplot import *
 from matplotlib.cm import *
 from matplotlib.colors import ListedColormap
-from matplotlib.patches import Polygon
 from fesom_grid import *
+from mesh_render import *
 
 def compare_mesh_topo ():
 
@@ -43,16 +43,10 @@ def compare_mesh_topo ():
     # Build mesh
     elements_A = fesom_grid(mesh_path_A, circumpolar=True, cross_180=True)
     # Build patches for ocean, open ocean, and ice shelves
-    patches_A = []
-    shelf_patches_A = []
-    ocean_patches_A = []
-    for elm in elements_A:
-        coord = transpose(vstack((elm.x, elm.y)))
-        if elm.cavity:
-            shelf_patches_A.append(Polygon(coord, True, linewidth=0.))
-        else:
-            ocean_patches_A.append(Polygon(coord, True, linewidth=0.))
-        patches_A.append(Polygon(coord, True, linewidth=0.))
+    patches_A = element_verts(elements_A)
+    cavity_A = array([elm.cavity for elm in elements_A])
+    shelf_patches_A = patches_A[cavity_A]
+    ocean_patches_A = patches_A[~cavity_A]
     # Calculate bathy, draft, wct at each element
     bathy_A = []
     draft_A = []
@@ -69,16 +63,10 @@ def compare_mesh_topo ():
 
     print 'Reading mesh B'
     elements_B = fesom_grid(mesh_path_B, circumpolar=True, cross_180=True)
-    patches_B = []
-    shelf_patches_B = []
-    ocean_patches_B = []
-    for elm in elements_B:
-        coord = transpose(vstack((elm.x, elm.y)))
-        if elm.cavity:
-            shelf_patches_B.append(Polygon(coord, True, linewidth=0.))
-        else:
-            ocean_patches_B.append(Polygon(coord, True, linewidth=0.))
-        patches_B.append(Polygon(coord, True, linewidth=0.))
+    patches_B = element_verts(elements_B)
+    cavity_B = array([elm.cavity for elm in elements_B])
+    shelf_patches_B = patches_B[cavity_B]
+    ocean_patches_B = patches_B[~cavity_B]
     bathy_B = []
     draft_B = []
     wct_B = []
@@ -90,16 +78,10 @@ def compare_mesh_topo ():
 
     print 'Reading mesh C'
     elements_C = fesom_grid(mesh_path_C, circumpolar=True, cross_180=True)
-    patches_C = []
-    shelf_patches_C = []
-    ocean_patches_C = []
-    for elm in elements_C:
-        coord = transpose(vstack((elm.x, elm.y)))
-        if elm.cavity:
-            shelf_patches_C.append(Polygon(coord, True, linewidth=0.))
-        else:
-            ocean_patches_C.append(Polygon(coord, True, linewidth=0.))
-        patches_C.append(Polygon(coord, True, linewidth=0.))
+    patches_C = element_verts(elements_C)
+    cavity_C = array([elm.cavity for elm in elements_C])
+    shelf_patches_C = patches_C[cavity_C]
+    ocean_patches_C = patches_C[~cavity_C]
     bathy_C = []
     draft_C = []
     wct_C = []
@@ -111,16 +93,10 @@ def compare_mesh_topo ():
 
     print 'Reading mesh D'
     elements_D = fesom_grid(mesh_path_D, circumpolar=True, cross_180=True)
-    patches_D = []
-    shelf_patches_D = []
-    ocean_patches_D = []
-    for elm in elements_D:
-        coord = transpose(vstack((elm.x, elm.y)))
-        if elm.cavity:
-            shelf_patches_D.append(Polygon(coord, True, linewidth=0.))
-        else:
-            ocean_patches_D.append(Polygon(coord, True, linewidth=0.))
-        patches_D.append(Polygon(coord, True, linewidth=0.))
+    patches_D = element_verts(elements_D)
+    cavity_D = array([elm.cavity for elm in elements_D])
+    shelf_patches_D = patches_D[cavity_D]
+    ocean_patches_D = patches_D[~cavity_D]
     bathy_D = []
     draft_D = []
     wct_D = []
@@ -132,16 +108,10 @@ def compare_mesh_topo ():
 
     print 'Reading mesh E'
     elements_E = fesom_grid(mesh_path_E, circumpolar=True, cross_180=True)
-    patches_E = []
-    shelf_patches_E = []
-    ocean_patches_E = []
-    for elm in elements_E:
-        coord = transpose(vstack((elm.x, elm.y)))
-        if elm.cavity:
-            shelf_patches_E.append(Polygon(coord, True, linewidth=0.))
-        else:
-            ocean_patches_E.append(Polygon(coord, True, linewidth=0.))
-        patches_E.append(Polygon(coord, True, linewidth=0.))
+    patches_E = element_verts(elements_E)
+    cavity_E = array([elm.cavity for elm in elements_E])
+    shelf_patches_E = patches_E[cavity_E]
+    ocean_patches_E = patches_E[~cavity_E]
     bathy_E = []
     draft_E = []
     wct_E = []
@@ -153,16 +123,10 @@ def compare_mesh_topo ():
 
     print 'Reading mesh F'
     elements_F = fesom_grid(mesh_path_F, circumpolar=True, cross_180=True)
-    patches_F = []
-    shelf_patches_F = []
-    ocean_patches_F = []
-    for elm in elements_F:
-        coord = transpose(vstack((elm.x, elm.y)))
-        if elm.cavity:
-            shelf_patches_F.append(Polygon(coord, True, linewidth=0.))
-        else:
-            ocean_patches_F.append(Polygon(coord, True, linewidth=0.))
-        patches_F.append(Polygon(coord, True, linewidth=0.))
+    patches_F = element_verts(elements_F)
+    cavity_F = array([elm.cavity for elm in elements_F])
+    shelf_patches_F = patches_F[cavity_F]
+    ocean_patches_F = patches_F[~cavity_F]
     bathy_F = []
     draft_F = []
     wct_F = []
@@ -383,7 +347,7 @@ def compare_mesh_topo ():
         # Start with land background
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
         # Add bathymetry data
-        img = PatchCollection(patches_A, cmap='jet')
+        img = PolyCollection(patches_A, cmap='jet')
         img.set_array(array(bathy_A))
         img.set_edgecolor('face')
         img.set_clim(vmin=bathy_min, vmax=bathy_max)
@@ -395,13 +359,13 @@ def compare_mesh_topo ():
         # Ice shelf draft
         ax = subplot(gs[1,1], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_A, cmap='jet')
+        img = PolyCollection(shelf_patches_A, cmap='jet')
         img.set_array(array(draft_A))
         img.set_edgecolor('face')
         img.set_clim(vmin=draft_min, vmax=draft_max)
         ax.add_collection(img)
         # Mask out the open ocean in white
-        overlay = PatchCollection(ocean_patches_A, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_A, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -411,12 +375,12 @@ def compare_mesh_topo ():
         # Water column thickness in cavity
         ax = subplot(gs[2,1], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_A, cmap='jet')
+        img = PolyCollection(shelf_patches_A, cmap='jet')
         img.set_array(array(wct_A))
         img.set_edgecolor('face')
         img.set_clim(vmin=wct_min, vmax=wct_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_A, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_A, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -430,7 +394,7 @@ def compare_mesh_topo ():
         # Bathymetry
         ax = subplot(gs[0,2], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(patches_B, cmap='jet')
+        img = PolyCollection(patches_B, cmap='jet')
         img.set_array(array(bathy_B))
         img.set_edgecolor('face')
         img.set_clim(vmin=bathy_min, vmax=bathy_max)
@@ -442,12 +406,12 @@ def compare_mesh_topo ():
         # Ice shelf draft
         ax = subplot(gs[1,2], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_B, cmap='jet')
+        img = PolyCollection(shelf_patches_B, cmap='jet')
         img.set_array(array(draft_B))
         img.set_edgecolor('face')
         img.set_clim(vmin=draft_min, vmax=draft_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_B, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_B, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -457,12 +421,12 @@ def compare_mesh_topo ():
         # Water column thickness in cavity
         ax = subplot(gs[2,2], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_B, cmap='jet')
+        img = PolyCollection(shelf_patches_B, cmap='jet')
         img.set_array(array(wct_B))
         img.set_edgecolor('face')
         img.set_clim(vmin=wct_min, vmax=wct_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_B, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_B, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -475,7 +439,7 @@ def compare_mesh_topo ():
         # Bathymetry
         ax = subplot(gs[0,3], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(patches_C, cmap='jet')
+        img = PolyCollection(patches_C, cmap='jet')
         img.set_array(array(bathy_C))
         img.set_edgecolor('face')
         img.set_clim(vmin=bathy_min, vmax=bathy_max)
@@ -489,12 +453,12 @@ def compare_mesh_topo ():
         # Ice shelf draft
         ax = subplot(gs[1,3], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_C, cmap='jet')
+        img = PolyCollection(shelf_patches_C, cmap='jet')
         img.set_array(array(draft_C))
         img.set_edgecolor('face')
         img.set_clim(vmin=draft_min, vmax=draft_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_C, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_C, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -505,12 +469,12 @@ def compare_mesh_topo ():
         # Water column thickness in cavity
         ax = subplot(gs[2,3], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_C, cmap='jet')
+        img = PolyCollection(shelf_patches_C, cmap='jet')
         img.set_array(array(wct_C))
         img.set_edgecolor('face')
         img.set_clim(vmin=wct_min, vmax=wct_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_C, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_C, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -524,7 +488,7 @@ def compare_mesh_topo ():
         # Bathymetry
         ax = subplot(gs[0,4], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(patches_D, cmap='jet')
+        img = PolyCollection(patches_D, cmap='jet')
         img.set_array(array(bathy_D))
         img.set_edgecolor('face')
         img.set_clim(vmin=bathy_min, vmax=bathy_max)
@@ -536,12 +500,12 @@ def compare_mesh_topo ():
         # Ice shelf draft
         ax = subplot(gs[1,4], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_D, cmap='jet')
+        img = PolyCollection(shelf_patches_D, cmap='jet')
         img.set_array(array(draft_D))
         img.set_edgecolor('face')
         img.set_clim(vmin=draft_min, vmax=draft_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_D, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_D, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -551,12 +515,12 @@ def compare_mesh_topo ():
         # Water column thickness in cavity
         ax = subplot(gs[2,4], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_D, cmap='jet')
+        img = PolyCollection(shelf_patches_D, cmap='jet')
         img.set_array(array(wct_D))
         img.set_edgecolor('face')
         img.set_clim(vmin=wct_min, vmax=wct_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_D, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_D, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -569,7 +533,7 @@ def compare_mesh_topo ():
         # Bathymetry
         ax = subplot(gs[0,5], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(patches_E, cmap='jet')
+        img = PolyCollection(patches_E, cmap='jet')
         img.set_array(array(bathy_E))
         img.set_edgecolor('face')
         img.set_clim(vmin=bathy_min, vmax=bathy_max)
@@ -581,12 +545,12 @@ def compare_mesh_topo ():
         # Ice shelf draft
         ax = subplot(gs[1,5], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_E, cmap='jet')
+        img = PolyCollection(shelf_patches_E, cmap='jet')
         img.set_array(array(draft_E))
         img.set_edgecolor('face')
         img.set_clim(vmin=draft_min, vmax=draft_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_E, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_E, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -596,12 +560,12 @@ def compare_mesh_topo ():
         # Water column thickness in cavity
         ax = subplot(gs[2,5], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_E, cmap='jet')
+        img = PolyCollection(shelf_patches_E, cmap='jet')
         img.set_array(array(wct_E))
         img.set_edgecolor('face')
         img.set_clim(vmin=wct_min, vmax=wct_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_E, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_E, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -614,7 +578,7 @@ def compare_mesh_topo ():
         # Bathymetry
         ax = subplot(gs[0,6], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(patches_F, cmap='jet')
+        img = PolyCollection(patches_F, cmap='jet')
         img.set_array(array(bathy_F))
         img.set_edgecolor('face')
         img.set_clim(vmin=bathy_min, vmax=bathy_max)
@@ -629,12 +593,12 @@ def compare_mesh_topo ():
         # Ice shelf draft
         ax = subplot(gs[1,6], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_F, cmap='jet')
+        img = PolyCollection(shelf_patches_F, cmap='jet')
         img.set_array(array(draft_F))
         img.set_edgecolor('face')
         img.set_clim(vmin=draft_min, vmax=draft_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_F, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_F, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -646,12 +610,12 @@ def compare_mesh_topo ():
         # Water column thickness in cavity
         ax = subplot(gs[2,6], aspect='equal')
         contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-        img = PatchCollection(shelf_patches_F, cmap='jet')
+        img = PolyCollection(shelf_patches_F, cmap='jet')
         img.set_array(array(wct_F))
         img.set_edgecolor('face')
         img.set_clim(vmin=wct_min, vmax=wct_max)
         ax.add_collection(img)
-        overlay = PatchCollection(ocean_patches_F, facecolor=(1,1,1))
+        overlay = PolyCollection(ocean_patches_F, facecolor=(1,1,1))
         overlay.set_edgecolor('face')
         ax.add_collection(overlay)
         xlim([x_min[index], x_max[index]])
@@ -0,0 +1,120 @@
+from netCDF4 import Dataset
+from numpy import *
+from os.path import abspath, getmtime
+from threading import RLock
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
+import atexit
+
+# Shared pool of open FESOM output files, so that scripts which read several
+# variables (or several slices of the same variable) from the same file don't
+# pay for opening the file and parsing its metadata every time. The most
+# recently used files are kept open, up to max_open of them, and the least
+# recently used file is closed when another one is needed. A file which has
+# changed on disk since it was opened is opened again.
+# Several variables can be requested in a single call to read_vars, which
+# hands them out to a pool of threads. The netCDF library itself is not
+# thread-safe, so the actual reads take turns, but any processing of the data
+# (eg averaging over time) happens outside the lock and overlaps with the
+# next read.
+
+# Maximum number of files to keep open at once
+max_open = 16
+# Number of threads to use in read_vars
+num_threads = 4
+
+# Open files: absolute path -> (modification time, Dataset), in order of use
+_datasets = OrderedDict()
+# Lock around every call to the netCDF library
+_lock = RLock()
+# Thread pool, started the first time it's needed
+_threads = None
+
+
+# Get an open handle to the given file from the pool, opening it if needed.
+# Don't close it yourself; it will be closed when the pool needs the space, or
+# by close_datasets.
+# Input: file_path = path to NetCDF file
+# Output: Dataset opened read-only
+def get_dataset (file_path):
+
+    key = abspath(file_path)
+    mtime = getmtime(file_path)
+    with _lock:
+        if key in _datasets:
+            old_mtime, id = _datasets.pop(key)
+            if old_mtime == mtime:
+                # Move to the end, as the most recently used
+                _datasets[key] = (old_mtime, id)
+                return id
+            # The file has changed, so open it again
+            id.close()
+        while len(_datasets) >= max_open:
+            # Close the least recently used file
+            old_key, (old_mtime, old_id) = _datasets.popitem(last=False)
+            old_id.close()
+        id = Dataset(file_path, 'r')
+        _datasets[key] = (mtime, id)
+        return id
+
+
+# Close every file in the pool. This happens automatically when python exits.
+def close_datasets ():
+
+    with _lock:
+        while len(_datasets) > 0:
+            key, (mtime, id) = _datasets.popitem()
+            id.close()
+
+
+# Get the lock which is held around every call to the netCDF library in this
+# module. Anything else which reads NetCDF files from a background thread
+# (eg prefetch.py) should hold it too.
+# Output: threading.RLock
+def netcdf_lock ():
+
+    return _lock
+
+
+# Read several variables (or slices of variables) from the given file at once.
+# Input:
+# file_path = path to NetCDF file
+# requests = either a list of variable names, each of which will be read in
+#            full, or a dictionary of key -> (variable name, index) where
+#            index is anything you could put in square brackets after the
+#            variable (eg slice(0,12), or (slice(0,12), slice(0,n2d)) for
+#            the first 12 records at the surface nodes). The same variable
+#            can appear more than once with different indices.
+# process = optional function to apply to each array after it is read, eg to
+#           average over time. It is called from the worker threads, so it
+#           shouldn't touch any NetCDF files itself.
+# Output: dictionary of variable name (or key, if requests was a dictionary) ->
+#         array of data (after process, if it's set)
+def read_vars (file_path, requests, process=None):
+
+    global _threads
+
+    if isinstance(requests, dict):
+        items = [(key, requests[key][0], requests[key][1]) for key in requests]
+    else:
+        items = [(var, var, slice(None)) for var in requests]
+
+    def read_one (item):
+        key, var, index = item
+        with _lock:
+            data = get_dataset(file_path).variables[var][index]
+        if process is not None:
+            data = process(data)
+        return key, data
+
+    if len(items) == 1 or num_threads < 2:
+        results = [read_one(item) for item in items]
+    else:
+        if _threads is None:
+            _threads = ThreadPool(num_threads)
+        results = _threads.map(read_one, items)
+
+    return dict(results)
+
+
+atexit.register(close_datasets)
@@ -1,4 +1,5 @@
 from numpy import *
+from timeseries_store import *
 
 def dpt_change ():
 
@@ -21,34 +22,25 @@ def dpt_change ():
     # Output steps per year
     peryear = 365/5
 
-    f = open(directory_head + control_expt + 'dpt.log', 'r')
-    f.readline()
-    dpt_tmp = []
-    for line in f:
-        dpt_tmp.append(float(line))
-    f.close()
-    dpt_tmp = dpt_tmp[control_skipyears*peryear:]
+    time_tmp, series = read_timeseries(directory_head + control_expt + 'dpt.nc', ['dpt'])
+    dpt_tmp = series['dpt'][control_skipyears*peryear:]
     dpt_baseline = zeros(num_years_present)
     for year in range(num_years_present):
-        dpt_baseline[year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
+        dpt_baseline[year] = mean(dpt_tmp[peryear*year:peryear*(year+1)])
     dpt_beg = mean(dpt_baseline[-10:])
     print '1996-2005: ' + str(dpt_beg)
     dpt_control = zeros(num_years_rcp)
     for year in range(num_years_rcp):
-        dpt_control[year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
+        dpt_control[year] = mean(dpt_tmp[peryear*year:peryear*(year+1)])
     dpt_drift = mean(dpt_control[-10:])
     print '2091-2100, CONTROL : ' + str(dpt_drift) + ', change of ' + str((dpt_drift-dpt_beg)/dpt_beg*100) + '%'
 
     dpt = empty([num_rcps, num_years_rcp])
     for expt in range(num_rcps):
-        f = open(directory_head + rcp_expt[expt] + 'dpt.log', 'r')
-        f.readline()
-        dpt_tmp = []
-        for line in f:
-            dpt_tmp.append(float(line))
-        f.close()
+        time_tmp, series = read_timeseries(directory_head + rcp_expt[expt] + 'dpt.nc', ['dpt'])
+        dpt_tmp = series['dpt']
         for year in range(num_years_rcp):
-            dpt[expt, year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
+            dpt[expt, year] = mean(dpt_tmp[peryear*year:peryear*(year+1)])
         dpt_end = mean(dpt[expt,-10:])
         print '2091-2100, ' + str(rcp_titles[expt]) + ': ' + str(dpt_end) + ', change of ' + str((dpt_end-dpt_beg)/dpt_beg*100) + '%'
 
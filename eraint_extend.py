@@ -1,10 +1,16 @@
 from netCDF4 import Dataset
 from numpy import *
+from multiprocessing import Pool
+from output_writer import *
 
 # Given ERA-Interim files for 1992-2016, each containing atmospheric forcing
 # data for multiple variables but one year at a time, unravel into FESOM
 # forcing files, each containing one variable and one time of the day but
 # all years.
+# Each variable is converted by its own worker process, which reads that
+# variable from each year's input file once, splits it into times of day
+# with strided slices, and writes whole years at a time into output files
+# which are already the right size.
 def eraint_extend ():
 
     # Path to directory containing ERA-Interim subdaily files
@@ -33,6 +39,9 @@ def eraint_extend ():
     # Years to process
     year_start = 1992
     year_end = 2016
+    # Number of variables to process at once. Each worker holds one year of
+    # one variable in memory.
+    num_procs = 4
 
     # Read grid
     id = Dataset(input_dir + infile_head_6h + str(year_start) + infile_tail, 'r')
@@ -40,109 +49,100 @@ def eraint_extend ():
     lat = id.variables['latitude'][:]
     id.close()
 
-    # Loop over 6-hourly variables
+    # Figure out number of days in each year
+    num_days = []
+    for year in range(year_start, year_end+1):
+        if year % 4 == 0:
+            num_days.append(366)
+        else:
+            num_days.append(365)
+
+    # Build a list of jobs, one for each variable
+    jobs = []
+    # 6-hourly variables
     for i in range(len(var_names_6h)):
         var = var_names_6h[i]
-        print 'Processing variable ' + var
-        # Loop over time of day
-        for j in range(4):
-            # Construct output filename
-            file_name = output_dir + file_heads_6h[i] + file_tails_6h[j]
-            print 'Setting up ' + file_name
-            o_id = Dataset(file_name, 'w')
-            o_id.createDimension('longitude', size(lon))
-            o_id.createDimension('latitude', size(lat))
-            o_id.createDimension('time', None)
-            o_id.createVariable('longitude', 'f8', ('longitude'))
-            o_id.variables['longitude'].units = 'degrees'
-            o_id.variables['longitude'][:] = lon
-            o_id.createVariable('latitude', 'f8', ('latitude'))
-            o_id.variables['latitude'].units = 'degrees'
-            o_id.variables['latitude'][:] = lat
-            o_id.createVariable('time', 'f8', ('time'))
-            o_id.variables['time'].units = 'hours since 1900-1-1 00:00:00'
-            o_id.variables['time'].calendar = 'standard'
-            o_id.createVariable(var, 'f8', ('time', 'latitude', 'longitude'))
-            o_id.variables[var].units = var_units_6h[i]
-            t_posn = 0  # Day of simulation
-            # Loop over years
-            for year in range(year_start, year_end+1):
-                print 'Year ' + str(year)
-                # Open input file for this year
-                infile_name = input_dir + infile_head_6h + str(year) + infile_tail
-                id = Dataset(infile_name, 'r')
-                # Figure out number of days in this year
-                num_days = 365
-                if year % 4 == 0:
-                    num_days = 366
-                # Loop over days
-                for t in range(num_days):
-                    # Select correct index and save to output file
-                    time = id.variables['time'][4*t+j]
-                    o_id.variables['time'][t_posn] = time
-                    data = id.variables[var][4*t+j,:,:]
-                    o_id.variables[var][t_posn,:,:] = data
-                    t_posn += 1
-            o_id.close()
-
-    # Loop over 12-hourly variables
+        infile_names = [input_dir + infile_head_6h + str(year) + infile_tail for year in range(year_start, year_end+1)]
+        outfile_names = [output_dir + file_heads_6h[i] + file_tail for file_tail in file_tails_6h]
+        jobs.append((var, var_units_6h[i], infile_names, outfile_names, num_days, lon, lat))
+    # 12-hourly variables
     for i in range(len(var_names_12h)):
         var = var_names_12h[i]
-        print 'Processing variable ' + var
-        # Loop over time of day
-        for j in range(2):
-            # Construct output filename
-            file_name = output_dir + file_heads_12h[i] + file_tails_12h[j]
-            print 'Setting up ' + file_name
-            o_id = Dataset(file_name, 'w')
-            o_id.createDimension('longitude', size(lon))
-            o_id.createDimension('latitude', size(lat))
-            o_id.createDimension('time', None)
-            o_id.createVariable('longitude', 'f8', ('longitude'))
-            o_id.variables['longitude'].units = 'degrees'
-            o_id.variables['longitude'][:] = lon
-            o_id.createVariable('latitude', 'f8', ('latitude'))
-            o_id.variables['latitude'].units = 'degrees'
-            o_id.variables['latitude'][:] = lat
-            o_id.createVariable('time', 'f8', ('time'))
-            o_id.variables['time'].units = 'hours since 1900-1-1 00:00:00'
-            o_id.variables['time'].calendar = 'standard'
-            o_id.createVariable(var, 'f8', ('time', 'latitude', 'longitude'))
-            o_id.variables[var].units = var_units_12h[i]
-            t_posn = 0  # Day of simulation
-            # Loop over years
-            for year in range(year_start, year_end+1):
-                print 'Year ' + str(year)
-                # Open input file for this year
-                # First figure out which file it's in
-                if var in ['tp', 'sf']:
-                    # Always in FC file
-                    infile_head_12h = infile_head_12h_1
-                elif var in ['ssrd', 'strd']:
-                    # Always in ER file
+        infile_names = []
+        for year in range(year_start, year_end+1):
+            # Figure out which file it's in
+            if var in ['tp', 'sf']:
+                # Always in FC file
+                infile_head_12h = infile_head_12h_1
+            elif var in ['ssrd', 'strd']:
+                # Always in ER file
+                infile_head_12h = infile_head_12h_2
+            elif var == 'e':
+                # In ER file from 1992-2005, FC file from 2006-2016
+                if year <= 2005:
                     infile_head_12h = infile_head_12h_2
-                elif var == 'e':
-                    # In ER file from 1992-2005, FC file from 2006-2016
-                    if year <= 2005:
-                        infile_head_12h = infile_head_12h_2
-                    else:
-                        infile_head_12h = infile_head_12h_1
-                infile_name = input_dir + infile_head_12h + str(year) + infile_tail
-                id = Dataset(infile_name, 'r')
-                # Figure out number of days in this year
-                num_days = 365
-                if year % 4 == 0:
-                    num_days = 366
-                # Loop over days
-                for t in range(num_days):
-                    # Select correct index and save to output file
-                    time = id.variables['time'][2*t+j]
-                    o_id.variables['time'][t_posn] = time
-                    data = id.variables[var][2*t+j,:,:]
-                    o_id.variables[var][t_posn,:,:] = data
-                    t_posn += 1
-            o_id.close()
-    
+                else:
+                    infile_head_12h = infile_head_12h_1
+            infile_names.append(input_dir + infile_head_12h + str(year) + infile_tail)
+        outfile_names = [output_dir + file_heads_12h[i] + file_tail for file_tail in file_tails_12h]
+        jobs.append((var, var_units_12h[i], infile_names, outfile_names, num_days, lon, lat))
+
+    # Hand the variables out to the worker processes
+    pool = Pool(num_procs)
+    pool.map(convert_var, jobs)
+    pool.close()
+    pool.join()
+
+
+# Convert one ERA-Interim variable into FESOM forcing files, one for each time
+# of day. This is called by eraint_extend in a worker process.
+# Input: job = tuple containing
+#              var = variable name in ERA-Interim files
+#              units = units of variable
+#              infile_names = list of paths to ERA-Interim files for each year
+#              outfile_names = list of paths to output files for each time of
+#                              day (eg 4 files for 6-hourly variables)
+#              num_days = list of number of days in each year
+#              lon, lat = 1D arrays of longitude and latitude on the
+#                         ERA-Interim grid
+def convert_var (job):
+
+    var, units, infile_names, outfile_names, num_days, lon, lat = job
+    # Number of records per day
+    num_steps = len(outfile_names)
+
+    print 'Processing variable ' + var
+    o_ids = []
+    for file_name in outfile_names:
+        print 'Setting up ' + file_name
+        # Make the time axis the right length from the start
+        o_id = create_output(file_name, [('longitude', size(lon)), ('latitude', size(lat)), ('time', sum(num_days))], title='ERA-Interim ' + var + ' forcing for FESOM')
+        create_var(o_id, 'longitude', ('longitude'), units='degrees', long_name='longitude', data=lon)
+        create_var(o_id, 'latitude', ('latitude'), units='degrees', long_name='latitude', data=lat)
+        create_var(o_id, 'time', ('time'), units='hours since 1900-1-1 00:00:00', long_name='time')
+        o_id.variables['time'].calendar = 'standard'
+        # One chunk per day, which is how FESOM reads it
+        create_var(o_id, var, ('time', 'latitude', 'longitude'), units=units, access='map')
+        o_ids.append(o_id)
+
+    t_posn = 0  # Day of simulation
+    # Loop over years
+    for infile_name, num_days_year in zip(infile_names, num_days):
+        print var + ': ' + infile_name
+        # Read the whole year of this variable at once
+        id = Dataset(infile_name, 'r')
+        time = id.variables['time'][:num_steps*num_days_year]
+        data = id.variables[var][:num_steps*num_days_year,:,:]
+        id.close()
+        # Pull out each time of day and write the whole year to its file
+        for j in range(num_steps):
+            o_ids[j].variables['time'][t_posn:t_posn+num_days_year] = time[j::num_steps]
+            o_ids[j].variables[var][t_posn:t_posn+num_days_year,:,:] = data[j::num_steps,:,:]
+        t_posn += num_days_year
+
+    for o_id in o_ids:
+        o_id.close()
+
 
 # Command-line interface
 if __name__ == "__main__":
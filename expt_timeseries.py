@@ -0,0 +1,126 @@
+from numpy import *
+from os.path import abspath, getsize, getmtime
+from timeseries_store import *
+
+# Tools for comparing timeseries across several experiments (eg the RCP
+# experiments plus the control), as read from the stores written by the
+# timeseries_*.py scripts. Each experiment can have its own rules for which
+# records to throw away (eg spinup repetitions) and where it starts on the
+# common time axis, and the result is a single array which can be averaged
+# over years or decades with reshapes instead of loops.
+
+# Parsed timeseries which have already been read, so that rerunning a plotting
+# script in the same python session doesn't read every store again. Keys are
+# (absolute file path, variable name), values are (file size, modification
+# time, data). A store which has changed on disk is read again.
+_cache = {}
+
+
+# Read the given variable from the timeseries store of each experiment, and
+# line them all up in a single array.
+# Input:
+# store_files = list of paths to the timeseries store for each experiment
+# var = name of variable to read (eg 'massloss')
+# skip = optional number of records to throw away from the beginning of each
+#        experiment (eg control_skipyears*peryear). Either an integer which
+#        applies to all experiments, or a list with one integer per experiment.
+#        Default 0.
+# offset = optional number of records to pad the beginning of each experiment
+#          with, so that experiments which start later line up with the others
+#          on a common time axis. Either an integer or a list, as for skip.
+#          Default 0.
+# num_records = optional number of records to keep for each experiment. The
+#               default is the length of the longest experiment after skip and
+#               offset are applied.
+# Output: array of size num_experiments x (any extra dimensions of the
+#         variable, eg ice shelf) x num_records. Records which don't exist for
+#         a given experiment (including padding from offset) are NaN.
+def expt_timeseries (store_files, var, skip=0, offset=0, num_records=None):
+
+    num_expts = len(store_files)
+    skip = _per_expt(skip, num_expts)
+    offset = _per_expt(offset, num_expts)
+
+    data = []
+    for expt in range(num_expts):
+        data_tmp = _read_cached(store_files[expt], var)[...,skip[expt]:]
+        if offset[expt] > 0:
+            pad = nan*ones(data_tmp.shape[:-1] + (offset[expt],))
+            data_tmp = concatenate((pad, data_tmp), axis=-1)
+        data.append(data_tmp)
+    if num_records is None:
+        num_records = max([data_tmp.shape[-1] for data_tmp in data])
+
+    all_data = nan*ones((num_expts,) + data[0].shape[:-1] + (num_records,))
+    for expt in range(num_expts):
+        num_keep = min(num_records, data[expt].shape[-1])
+        all_data[expt,...,:num_keep] = data[expt][...,:num_keep]
+    return all_data
+
+
+# Calculate annual averages of 5-day (or other regular) timeseries along the
+# last axis. Any incomplete year at the end is thrown away.
+# Input:
+# data = array of any shape, with time as the last axis
+# peryear = optional number of records per year (default 365/5)
+# Output: array of the same shape as data, except the last axis now has one
+#         value per year
+def annual_avg (data, peryear=365/5):
+
+    return _block_avg(data, peryear)
+
+
+# Calculate decadal averages of annually averaged timeseries along the last
+# axis. Any incomplete decade at the end is thrown away.
+# Input: data = array of any shape, with annual time as the last axis
+# Output: array of the same shape as data, except the last axis now has one
+#         value per decade
+def decadal_avg (data):
+
+    return _block_avg(data, 10)
+
+
+# Calculate the average of the given records along the last axis, eg to get
+# a baseline for scaling timeseries as a percentage. The result keeps the last
+# axis (with size 1) so it broadcasts against the original timeseries.
+# Input:
+# data = array of any shape, with time as the last axis
+# start, end = range of time indices to average over (end is exclusive, as
+#              for slicing)
+# Output: array of the same shape as data, except the last axis has size 1
+def baseline_avg (data, start, end):
+
+    return mean(data[...,start:end], axis=-1)[...,newaxis]
+
+
+# Helper function to average along the last axis in blocks of the given size,
+# by reshaping so that each block is its own axis.
+def _block_avg (data, block_size):
+
+    num_blocks = data.shape[-1]//block_size
+    data_blocks = reshape(data[...,:num_blocks*block_size], data.shape[:-1] + (num_blocks, block_size))
+    return mean(data_blocks, axis=-1)
+
+
+# Helper function to expand a skip/offset rule into one value per experiment.
+def _per_expt (rule, num_expts):
+
+    if isinstance(rule, (list, tuple)):
+        if len(rule) != num_expts:
+            raise ValueError('Need one value per experiment, but got ' + str(len(rule)) + ' for ' + str(num_expts) + ' experiments')
+        return [int(val) for val in rule]
+    return [int(rule)]*num_expts
+
+
+# Helper function to read a variable from a timeseries store, using the cache
+# if the store hasn't changed since it was last read. Returns a copy, so the
+# caller can modify it in place without changing the cached array.
+def _read_cached (store_file, var):
+
+    key = (abspath(store_file), var)
+    size = getsize(store_file)
+    mtime = getmtime(store_file)
+    if key not in _cache or _cache[key][:2] != (size, mtime):
+        time, series = read_timeseries(store_file, [var])
+        _cache[key] = (size, mtime, series[var])
+    return _cache[key][2].copy()
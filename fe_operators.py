@@ -0,0 +1,266 @@
+from numpy import *
+from scipy.sparse import coo_matrix
+from os.path import abspath, getmtime
+from unrotate_vector import *
+from vis_cache import *
+
+# Gradient, divergence and curl on the native FESOM mesh. A field at the
+# surface nodes is linear within each element, so its derivatives are
+# constant in each element and follow exactly from the positions of the 3
+# nodes. Instead of interpolating to a regular grid and taking finite
+# differences (which smears out the coastline), each operator is a sparse
+# matrix built once per mesh, and applying it to any number of fields is one
+# sparse product. The element geometry is worked out on the sphere in 3D
+# Cartesian coordinates, so there are no metric terms and nothing special
+# happens near the poles. Divergence and curl don't depend on which way the
+# grid is rotated, so they can be applied straight to the rotated vector
+# components in the output files, without unrotating them first. Results are
+# averaged from the elements to the nodes, weighted by element area.
+
+# Element geometry which has already been calculated: absolute mesh path ->
+# (modification times, geometry)
+_geometry_cache = {}
+# Operators which have already been built: (absolute mesh path, operator
+# type, options) -> (modification times, operators)
+_derivative_cache = {}
+
+
+# Coefficients to unrotate vectors at the given points, so that the
+# geographic components are ug = a*ur + b*vr and vg = c*ur + d*vr.
+# Input: rlon, rlat = arrays of rotated longitude and latitude in degrees
+# Output: a, b, c, d = arrays of the same size as rlon and rlat
+def unrotation_coeffs (rlon, rlat):
+
+    # unrotate_vector converts the coordinates in place, so give it copies
+    rlon = array(rlon, dtype=float)
+    rlat = array(rlat, dtype=float)
+    a, c = unrotate_vector(rlon, rlat, ones(shape(rlon)), zeros(shape(rlon)))
+    b, d = unrotate_vector(rlon, rlat, zeros(shape(rlon)), ones(shape(rlon)))
+    return a, b, c, d
+
+
+# Build (or get from the cache) the sparse divergence and curl operators for
+# vector fields at the surface nodes.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# rotated = optional boolean flag indicating that the vector components are
+#           on the rotated grid, as in the FESOM output files (default
+#           True). Otherwise they have already been unrotated (eg by
+#           unrotate_vector or read_field).
+# on_nodes = optional boolean flag indicating to average the results to the
+#            surface nodes (default True). Otherwise there is one result per
+#            element, in the order of elem2d.out.
+# Output:
+# div_op, curl_op = sparse matrices of size (n2d or num_elements) x 2*n2d,
+#                   which act on the u and v components joined together.
+#                   Use them with divergence and curl.
+def vector_operators (mesh_path, rotated=True, on_nodes=True):
+
+    key = (abspath(mesh_path), 'vector', rotated, on_nodes)
+    node_ids, grad, normal, area, node_basis, centre_basis = _element_geometry(mesh_path)
+    stamp = _geometry_cache[abspath(mesh_path)][0]
+    if key in _derivative_cache and _derivative_cache[key][0] == stamp:
+        return _derivative_cache[key][1]
+
+    if rotated:
+        east, north = node_basis[:2]
+    else:
+        east, north = node_basis[2:]
+    num_elm = size(node_ids,0)
+    n2d = size(east,0)
+    rows = []
+    cols = []
+    div_coeffs = []
+    curl_coeffs = []
+    for k in range(3):
+        # Contribution of the u and v components at node k of every element:
+        # the vector is u*east + v*north in Cartesian space, its divergence
+        # is the sum of grad.vector over the nodes and its curl is the
+        # outward component of the sum of grad x vector
+        for basis, offset in [(east, 0), (north, n2d)]:
+            vec = basis[node_ids[:,k],:]
+            rows.append(arange(num_elm))
+            cols.append(node_ids[:,k] + offset)
+            div_coeffs.append(sum(grad[:,k,:]*vec, axis=1))
+            curl_coeffs.append(sum(normal*cross(grad[:,k,:], vec), axis=1))
+    rows = concatenate(rows)
+    cols = concatenate(cols)
+    div_op = coo_matrix((concatenate(div_coeffs), (rows, cols)), shape=(num_elm, 2*n2d)).tocsr()
+    curl_op = coo_matrix((concatenate(curl_coeffs), (rows, cols)), shape=(num_elm, 2*n2d)).tocsr()
+    if on_nodes:
+        avg_op = _node_average(node_ids, area, n2d)
+        div_op = avg_op.dot(div_op).tocsr()
+        curl_op = avg_op.dot(curl_op).tocsr()
+
+    _derivative_cache[key] = (stamp, (div_op, curl_op))
+    return div_op, curl_op
+
+
+# Build (or get from the cache) the sparse gradient operators for scalar
+# fields at the surface nodes.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# on_nodes = as for vector_operators
+# Output:
+# ddx_op, ddy_op = sparse matrices of size (n2d or num_elements) x n2d giving
+#                  the eastward and northward (geographic, not rotated)
+#                  components of the gradient, in units per metre. Use them
+#                  with gradient.
+def gradient_operators (mesh_path, on_nodes=True):
+
+    key = (abspath(mesh_path), 'gradient', on_nodes)
+    node_ids, grad, normal, area, node_basis, centre_basis = _element_geometry(mesh_path)
+    stamp = _geometry_cache[abspath(mesh_path)][0]
+    if key in _derivative_cache and _derivative_cache[key][0] == stamp:
+        return _derivative_cache[key][1]
+
+    num_elm = size(node_ids,0)
+    n2d = size(node_basis[0],0)
+    rows = tile(arange(num_elm), 3)
+    cols = transpose(node_ids).ravel()
+    ops = []
+    # Geographic east and north at the centre of each element
+    for basis in centre_basis[2:]:
+        coeffs = concatenate([sum(grad[:,k,:]*basis, axis=1) for k in range(3)])
+        ops.append(coo_matrix((coeffs, (rows, cols)), shape=(num_elm, n2d)).tocsr())
+    if on_nodes:
+        avg_op = _node_average(node_ids, area, n2d)
+        ops = [avg_op.dot(op).tocsr() for op in ops]
+
+    _derivative_cache[key] = (stamp, tuple(ops))
+    return tuple(ops)
+
+
+# Calculate the divergence of one or more vector fields at the surface nodes.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# u, v = arrays of size n2d containing the vector components at each surface
+#        node, or of size (any leading dimensions, eg time) x n2d. Masked
+#        values count as zero.
+# rotated, on_nodes = as for vector_operators
+# Output: array of size (any leading dimensions) x (n2d or num_elements), in
+#         the units of u and v per metre
+def divergence (mesh_path, u, v, rotated=True, on_nodes=True):
+
+    div_op = vector_operators(mesh_path, rotated, on_nodes)[0]
+    return _apply_operator(div_op, concatenate((ma.filled(u, 0), ma.filled(v, 0)), axis=-1))
+
+
+# Calculate the curl (the vertical component) of one or more vector fields at
+# the surface nodes.
+# Input: as for divergence
+# Output: array of size (any leading dimensions) x (n2d or num_elements), in
+#         the units of u and v per metre
+def curl (mesh_path, u, v, rotated=True, on_nodes=True):
+
+    curl_op = vector_operators(mesh_path, rotated, on_nodes)[1]
+    return _apply_operator(curl_op, concatenate((ma.filled(u, 0), ma.filled(v, 0)), axis=-1))
+
+
+# Calculate the gradient of one or more scalar fields at the surface nodes.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# data = array of size n2d, or of size (any leading dimensions) x n2d. Masked
+#        values count as zero.
+# on_nodes = as for vector_operators
+# Output: ddx, ddy = arrays of size (any leading dimensions) x (n2d or
+#         num_elements) containing the eastward and northward components of
+#         the gradient, in the units of data per metre
+def gradient (mesh_path, data, on_nodes=True):
+
+    ddx_op, ddy_op = gradient_operators(mesh_path, on_nodes)
+    return _apply_operator(ddx_op, data), _apply_operator(ddy_op, data)
+
+
+# Helper function to apply a sparse operator to the last dimension of data.
+def _apply_operator (operator, data):
+
+    data = ma.filled(data, 0)
+    lead_shape = shape(data)[:-1]
+    data = reshape(data, (-1, shape(data)[-1]))
+    return reshape(operator.dot(transpose(data)).T, lead_shape + (operator.shape[0],))
+
+
+# Helper function to calculate (or get from the cache) the geometry of every
+# element. Returns:
+# node_ids = integer array of size num_elements x 3 containing the 0-based
+#            surface node indices of each element
+# grad = array of size num_elements x 3 x 3 containing the gradient (per
+#        metre, as a Cartesian vector) of the linear function which is 1 at
+#        each node of the element and 0 at the other two
+# normal = array of size num_elements x 3 containing the outward unit vector
+#          at the centre of each element
+# area = array of size num_elements containing the area of each element in m^2
+# node_basis, centre_basis = the rotated east and north, and geographic east
+#                            and north, unit vectors (Cartesian, each of
+#                            size n2d x 3 or num_elements x 3) at each node
+#                            and at the centre of each element
+def _element_geometry (mesh_path):
+
+    # Radius of the Earth in metres
+    r = 6.371e6
+    # Degrees to radians conversion factor
+    deg2rad = pi/180.0
+
+    key = abspath(mesh_path)
+    stamp = [getmtime(mesh_path + file_name) for file_name in ['nod2d.out', 'elem2d.out']]
+    if key in _geometry_cache and _geometry_cache[key][0] == stamp:
+        return _geometry_cache[key][1]
+
+    rlon, rlat = rotated_lonlat(mesh_path + 'nod2d.out')
+    node_ids = loadtxt(mesh_path + 'elem2d.out', skiprows=1, dtype=int) - 1
+    # Position of each node on the unit sphere, in the rotated frame
+    lon = rlon*deg2rad
+    lat = rlat*deg2rad
+    pos = transpose([cos(lat)*cos(lon), cos(lat)*sin(lon), sin(lat)])
+    corners = pos[node_ids,:]
+    # Normal to the plane of each element, with length twice its area
+    cross_prod = cross(corners[:,1,:] - corners[:,0,:], corners[:,2,:] - corners[:,0,:])
+    norm2 = sum(cross_prod**2, axis=1)
+    # The gradient of each linear function is in the plane of the element
+    # and perpendicular to the opposite edge. This is the same whichever way
+    # round the nodes are listed.
+    grad = zeros(shape(corners))
+    for k in range(3):
+        edge = corners[:,(k+2)%3,:] - corners[:,(k+1)%3,:]
+        grad[:,k,:] = cross(cross_prod, edge)/norm2[:,None]/r
+    area = 0.5*sqrt(norm2)*r**2
+    centre = mean(corners, axis=1)
+    normal = centre/sqrt(sum(centre**2, axis=1))[:,None]
+    centre_lon = arctan2(normal[:,1], normal[:,0])/deg2rad
+    centre_lat = arcsin(normal[:,2])/deg2rad
+    node_basis = _unit_vectors(rlon, rlat)
+    centre_basis = _unit_vectors(centre_lon, centre_lat)
+
+    geometry = (node_ids, grad, normal, area, node_basis, centre_basis)
+    _geometry_cache[key] = (stamp, geometry)
+    return geometry
+
+
+# Helper function to get the rotated east and north, and geographic east and
+# north, unit vectors (Cartesian, in the rotated frame) at the given rotated
+# longitude and latitude.
+def _unit_vectors (rlon, rlat):
+
+    deg2rad = pi/180.0
+    lon = rlon*deg2rad
+    lat = rlat*deg2rad
+    east = transpose([-sin(lon), cos(lon), zeros(size(lon))])
+    north = transpose([-sin(lat)*cos(lon), -sin(lat)*sin(lon), cos(lat)])
+    # A geographic vector (ug, vg) is (a*ug + c*vg, b*ug + d*vg) on the
+    # rotated grid, because the unrotation is orthogonal
+    a, b, c, d = unrotation_coeffs(rlon, rlat)
+    geo_east = a[:,None]*east + b[:,None]*north
+    geo_north = c[:,None]*east + d[:,None]*north
+    return east, north, geo_east, geo_north
+
+
+# Helper function to build the sparse matrix (size n2d x num_elements) which
+# averages values on the elements to the nodes, weighted by element area.
+def _node_average (node_ids, area, n2d):
+
+    rows = node_ids.ravel()
+    cols = repeat(arange(size(node_ids,0)), 3)
+    weights = repeat(area, 3)
+    total = bincount(rows, weights=weights, minlength=n2d)
+    return coo_matrix((weights/total[rows], (rows, cols)), shape=(n2d, size(node_ids,0))).tocsr()
@@ -1,9 +1,13 @@
-from patches import *
+from mesh_render import *
 from lonlat_plot import *
 from zonal_slice_plot import *
 from zonal_avg_plot import *
 
-# Command-line interface for FESOM plots
+# Command-line interface for FESOM plots. Meshes (see mesh_render.py) and
+# recently read fields (see vis_cache.py) are kept for the rest of the
+# session, so changing only the colour bounds, timestep, or depth doesn't
+# reload everything.
+
 
 def fesom_vis_lonlat ():
 
@@ -84,11 +88,11 @@ def fesom_vis_lonlat ():
         print "Problem with save/display choice"
         exit()
 
-    # Build FESOM grid
-    elements, patches = make_patches(mesh_path, circumpolar, mask_cavities)
+    # Build FESOM grid (or get it from the session cache)
+    elements, verts, index = mesh_geometry(mesh_path, circumpolar, mask_cavities)
 
     # Call lonlat_plot
-    lonlat_plot(mesh_path, file_path, var_name, depth_key, depth, depth_bounds, tstep, circumpolar, elements, patches, mask_cavities, save, fig_name, set_limits, limits)
+    lonlat_plot(mesh_path, file_path, var_name, depth_key, depth, depth_bounds, tstep, circumpolar, elements, verts, mask_cavities, save, fig_name, set_limits, limits)
 
     # Repeat until the user wants to exit
     while True:
@@ -184,11 +188,12 @@ def fesom_vis_lonlat ():
                 fig_name = raw_input("File name for figure: ")
 
             if new_grid:
-                # Build a new grid if necessary
-                elements, patches = make_patches(mesh_path, circumpolar, mask_cavities)
+                # Build a new grid if necessary (or get it from the
+                # session cache)
+                elements, verts, index = mesh_geometry(mesh_path, circumpolar, mask_cavities)
                 
             # Call lonlat_plot
-            lonlat_plot(mesh_path, file_path, var_name, depth_key, depth, depth_bounds, tstep, circumpolar, elements, patches, mask_cavities, save, fig_name, set_limits, limits)
+            lonlat_plot(mesh_path, file_path, var_name, depth_key, depth, depth_bounds, tstep, circumpolar, elements, verts, mask_cavities, save, fig_name, set_limits, limits)
 
         else:
             break
@@ -0,0 +1,88 @@
+from multiprocessing import Pool, cpu_count
+import traceback
+
+# Render a batch of figures (eg one per ice shelf, region or year) in a pool
+# of worker processes instead of one after the other. Each figure is
+# described by a "spec" (anything that can be pickled, eg an index or a
+# tuple of arguments) which is passed to a plotting function along with any
+# data shared by all the figures (eg the mesh, patches, or timeseries).
+# The shared data is handed to the workers when they are forked, so it is
+# never copied through a pipe, and because it is only read the operating
+# system shares the memory between processes. The workers use the
+# non-interactive Agg backend, so the plotting function should save its
+# figure rather than show it.
+
+# Data shared by all the figures in the current batch
+_shared = None
+# Plotting function for the current batch
+_plot_func = None
+
+
+# Render the given figures in parallel.
+# Input:
+# plot_func = function which takes (spec, shared) and makes and saves one
+#             figure. It must be defined at the top level of a module (not
+#             inside another function) so the workers can find it.
+# specs = list of specs, one for each figure
+# shared = optional data (eg a dictionary of arrays) to pass to every call of
+#          plot_func
+# num_procs = optional number of worker processes (default the number of
+#             CPUs). If 1, the figures are made one after the other in this
+#             process, which is easier for debugging.
+# Output: list of the values returned by plot_func for each spec, in order.
+#         If any figure fails, the others are still made, and then a
+#         ValueError is raised listing the failures.
+def render_figures (plot_func, specs, shared=None, num_procs=None):
+
+    global _shared, _plot_func
+
+    specs = list(specs)
+    if num_procs is None:
+        num_procs = cpu_count()
+    num_procs = max(min(num_procs, len(specs)), 1)
+
+    _shared = shared
+    _plot_func = plot_func
+    try:
+        if num_procs == 1:
+            results = [_render_one(spec) for spec in specs]
+        else:
+            # Workers are forked from here, so they inherit _shared and
+            # _plot_func
+            pool = Pool(num_procs, initializer=_init_worker)
+            try:
+                results = pool.map(_render_one, specs, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _shared = None
+        _plot_func = None
+
+    failures = [(spec, error) for spec, (value, error) in zip(specs, results) if error is not None]
+    if len(failures) > 0:
+        raise ValueError(str(len(failures)) + ' of ' + str(len(specs)) + ' figures failed:\n' + '\n'.join(['Figure ' + str(spec) + ':\n' + error for spec, error in failures]))
+    return [value for value, error in results]
+
+
+# Helper function to set up each worker process.
+def _init_worker ():
+
+    import matplotlib.pyplot
+    matplotlib.pyplot.switch_backend('Agg')
+
+
+# Helper function to make one figure, catching any error so that the rest of
+# the batch carries on.
+def _render_one (spec):
+
+    import matplotlib.pyplot
+    try:
+        value = _plot_func(spec, _shared)
+        error = None
+    except Exception:
+        value = None
+        error = traceback.format_exc()
+    # Free the memory for this figure before starting the next one
+    matplotlib.pyplot.close('all')
+    return value, error
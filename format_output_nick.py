@@ -1,5 +1,6 @@
 from netCDF4 import Dataset
 from unrotate_grid import *
+from read_nodes import *
 
 def format_output_nick (model_dir, start_year, end_year, output_head):
 
@@ -42,18 +43,20 @@ def format_output_nick (model_dir, start_year, end_year, output_head):
         else:
             print 'Problem'
     f.close()
+    # Indices of cavity nodes
+    cavity_nodes = [n for n in range(n2d) if cavity[n]]
 
     # Loop over years
     for year in range(start_year, end_year+1):
         print 'Processing ' + str(year)
-        # Read melt rate (annually averaged) and convert to m/y
-        id = Dataset(model_dir + expt_name + str(year) + melt_tail, 'r')
-        melt = mean(id.variables['wnet'][:,:], axis=0)*24*60*60*365.25
-        id.close()
-        # Read first n2d nodes of temperature (annually averaged)
-        id = Dataset(model_dir + expt_name + str(year) + temp_tail, 'r')
-        temp = mean(id.variables['temp'][:,:n2d], axis=0)
-        id.close()
+        # Read melt rate at cavity nodes (annually averaged) and convert to
+        # m/y
+        melt, node_map = read_nodes(model_dir + expt_name + str(year) + melt_tail, 'wnet', cavity_nodes)
+        melt = mean(melt, axis=0)*24*60*60*365.25
+        # Read temperature at cavity nodes (all in the surface layer, ie the
+        # first n2d nodes) and annually average
+        temp, node_map = read_nodes(model_dir + expt_name + str(year) + temp_tail, 'temp', cavity_nodes)
+        temp = mean(temp, axis=0)
         # Set up output file
         f = open(output_head + str(year), 'w')
         # Loop over nodes
@@ -65,9 +68,9 @@ def format_output_nick (model_dir, start_year, end_year, output_head):
                 # Latitude
                 f.write('{0:16}'.format(str(round(lat[n],8))))
                 # Melt rate
-                f.write('{0:16}'.format(str(round(melt[n],8))))
+                f.write('{0:16}'.format(str(round(melt[node_map[n]],8))))
                 # Temperature
-                f.write('{0:16}'.format(str(round(temp[n],8))))
+                f.write('{0:16}'.format(str(round(temp[node_map[n]],8))))
                 # Finished
                 f.write('\n')
         f.close()
@@ -0,0 +1,96 @@
+from numpy import *
+from scipy.sparse import coo_matrix
+from os.path import abspath
+from column_kernels import *
+
+# Volume averages over the ice shelf fronts. The front is the set of elements
+# which have some nodes in an ice shelf cavity and some not, optionally
+# widened by a number of neighbouring elements on either side. For a given
+# list of ice shelves (each one a set of lon-lat boxes), the prisms of the
+# front elements in each box are found once per mesh (see prism_table in
+# column_kernels.py) and their volume weights are stored in a sparse matrix,
+# so that volume-averaging any 3D field over every ice shelf front is one
+# sparse product.
+
+# Front operators which have already been built: (absolute mesh path, boxes,
+# buffer) -> (modification times, operator, volume)
+_front_cache = {}
+
+
+# Find the elements at the ice shelf fronts.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# buffer = optional number of neighbour hops to widen the front by (default
+#          0). Each hop adds every element which shares a node with the
+#          front, on both the cavity side and the open ocean side.
+# Output: boolean array, True for front elements, in the order of the
+#         elements from prism_table
+def front_elements (mesh_path, buffer=0):
+
+    elements = prism_table(mesh_path)[0]
+    node_ids = array([[node.id for node in elm.nodes] for elm in elements])
+    num_cavity = sum(array([elm.cavity_nodes for elm in elements], dtype=bool), axis=1)
+    # Some of the 3 nodes are in a cavity, some aren't
+    front = (num_cavity > 0)*(num_cavity < 3)
+    for hop in range(buffer):
+        # Nodes belonging to the front so far
+        front_nodes = zeros(amax(node_ids)+1, dtype=bool)
+        front_nodes[node_ids[front,:]] = True
+        front = any(front_nodes[node_ids], axis=1)
+    return front
+
+
+# Build (or get from the cache) the sparse matrix which volume-averages a 3D
+# field over the front of each ice shelf.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# boxes = list with one entry for each ice shelf, containing a list of
+#         (lon_min, lon_max, lat_min, lat_max) boxes. A front element counts
+#         towards the ice shelf if it is entirely inside one of its boxes.
+# buffer = optional number of neighbour hops to widen the front by, as for
+#          front_elements
+# Output:
+# operator = sparse matrix of size len(boxes) x n3d, such that
+#            operator.dot(temp) is the volume-averaged temperature at each
+#            ice shelf front (for temp at each 3D node, or a matrix of size
+#            n3d x num_records)
+# volume = array of size len(boxes) containing the total volume of each ice
+#          shelf front (m^3). The average is zero wherever this is zero.
+def front_operator (mesh_path, boxes, buffer=0):
+
+    key = (abspath(mesh_path), tuple([tuple([tuple(box) for box in shelf_boxes]) for shelf_boxes in boxes]), buffer)
+    elements, elm_index, top, bottom, prism_vol = prism_table(mesh_path)
+    stamp = prism_stamp(mesh_path)
+    if key in _front_cache and _front_cache[key][0] == stamp:
+        return _front_cache[key][1:]
+
+    lon = array([elm.lon for elm in elements])
+    lat = array([elm.lat for elm in elements])
+    front = front_elements(mesh_path, buffer)
+    n3d = size(column_table(mesh_path)[1])
+    rows = []
+    cols = []
+    coeffs = []
+    volume = zeros(len(boxes))
+    for index in range(len(boxes)):
+        in_shelf = zeros(len(elements), dtype=bool)
+        for lon_min, lon_max, lat_min, lat_max in boxes[index]:
+            in_shelf += all((lon >= lon_min)*(lon <= lon_max)*(lat >= lat_min)*(lat <= lat_max), axis=1)
+        prisms = nonzero((front*in_shelf)[elm_index])[0]
+        volume[index] = sum(prism_vol[prisms])
+        if volume[index] == 0:
+            continue
+        # Each prism's value is the average of its 6 nodes
+        weights = prism_vol[prisms]/(6*volume[index])
+        for nodes in [top[prisms,:], bottom[prisms,:]]:
+            rows.append(index*ones(size(nodes), dtype=int))
+            cols.append(nodes.ravel())
+            coeffs.append(repeat(weights, 3))
+    if len(rows) > 0:
+        rows = concatenate(rows)
+        cols = concatenate(cols)
+        coeffs = concatenate(coeffs)
+    operator = coo_matrix((coeffs, (rows, cols)), shape=(len(boxes), n3d)).tocsr()
+
+    _front_cache[key] = (stamp, operator, volume)
+    return operator, volume
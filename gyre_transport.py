@@ -0,0 +1,151 @@
+from netCDF4 import Dataset
+from numpy import *
+from scipy.sparse import coo_matrix
+from multiprocessing import Pool
+from os.path import abspath
+from unrotate_vector import *
+from column_kernels import *
+from vis_cache import *
+from mesh_render import *
+from mesh_raster import *
+
+# Strength of the subpolar gyres, measured as the most negative value of the
+# barotropic streamfunction within a lon-lat box around each gyre. The
+# depth-integrated zonal velocity is interpolated to a regular grid in each
+# box and integrated from south to north. The interpolation weights come from
+# a raster of the mesh (see mesh_raster.py, which saves them in the mesh
+# directory), and are turned into a sparse matrix once per mesh, so the
+# streamfunction for any number of years is one sparse product. Each year's
+# output file is read and vertically integrated by its own worker process.
+
+# Default boxes for each gyre: name -> list of (lon_min, lon_max, lat_min,
+# lat_max). The Ross Sea gyre crosses 180E so it is split into two boxes.
+gyre_boxes = {'ws_trans':[(-60, 30, -90, -50)], 'rs_trans':[(150, 180, -90, -60), (-180, -140, -90, -60)]}
+
+# Interpolation operators which have already been built: (absolute mesh
+# path, box, resolution) -> (modification times, operator, number of
+# latitudes, number of longitudes)
+_box_cache = {}
+# Rotated coordinates and integration operator for the worker processes in
+# depth_integrated_u
+_shared = None
+
+
+# Calculate the transport of each gyre.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# int_udz = array of size num_records x n2d containing the depth-integral of
+#           unrotated zonal velocity (eg from depth_integrated_u)
+# boxes = optional dictionary of gyre boxes, in the same format as
+#         gyre_boxes (the default)
+# res = optional resolution of the regular grids, in degrees (default 0.1)
+# Output: dictionary of gyre name -> array of size num_records containing
+#         the gyre transport (positive, in Sv)
+def gyre_transport (mesh_path, int_udz, boxes=None, res=0.1):
+
+    # Radius of the Earth in metres
+    r = 6.371e6
+    # Degrees to radians conversion factor
+    deg2rad = pi/180.0
+
+    if boxes is None:
+        boxes = gyre_boxes
+    int_udz = reshape(int_udz, (-1, shape(int_udz)[-1]))
+    transport = {}
+    for name in boxes:
+        strf_min = None
+        for box in boxes[name]:
+            operator, num_lat, num_lon = box_operator(mesh_path, box, res)
+            # Interpolate every record to the regular grid at once
+            int_udz_reg = reshape(operator.dot(transpose(int_udz)).T, (-1, num_lat, num_lon))
+            # Indefinite integral from south to north of udz*dy, convert to Sv
+            dy = r*(box[3] - box[2])/num_lat*deg2rad
+            strf = cumsum(int_udz_reg*dy, axis=1)*1e-6
+            # Find most negative value over all the boxes for this gyre
+            box_min = amin(reshape(strf, (size(strf,0), -1)), axis=1)
+            if strf_min is None:
+                strf_min = box_min
+            else:
+                strf_min = minimum(strf_min, box_min)
+        transport[name] = -1*strf_min
+    return transport
+
+
+# Build (or get from the cache) the sparse matrix which interpolates a field
+# at the surface nodes to the centres of a regular grid covering the given
+# box. Grid points which aren't in any element (eg land) get zero.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# box = tuple of (lon_min, lon_max, lat_min, lat_max)
+# res = resolution of the regular grid, in degrees
+# Output:
+# operator = sparse matrix of size (num_lat*num_lon) x n2d
+# num_lat, num_lon = size of the regular grid
+def box_operator (mesh_path, box, res):
+
+    key = (abspath(mesh_path), tuple(box), res)
+    # Mesh files for the column table, and the elements, which together cover
+    # everything the raster is built from
+    stamp = prism_stamp(mesh_path)
+    if key in _box_cache and _box_cache[key][0] == stamp:
+        return _box_cache[key][1:]
+
+    lon_min, lon_max, lat_min, lat_max = box
+    num_lon = int(round((lon_max - lon_min)/float(res)))
+    num_lat = int(round((lat_max - lat_min)/float(res)))
+    elm_index, weights = element_raster(mesh_path, lon_min, lon_max, lat_min, lat_max, num_lon, num_lat, circumpolar=False)
+    elements = mesh_geometry(mesh_path)[0]
+    node_ids = element_node_ids(elements)
+    n2d = size(column_table(mesh_path)[0], 0)
+    # Pixels which are inside an element
+    pixels = nonzero(elm_index.ravel() >= 0)[0]
+    rows = repeat(pixels, 3)
+    cols = node_ids[elm_index.ravel()[pixels],:].ravel()
+    coeffs = reshape(weights, (-1, 3))[pixels,:].ravel()
+    operator = coo_matrix((coeffs, (rows, cols)), shape=(num_lat*num_lon, n2d)).tocsr()
+
+    _box_cache[key] = (stamp, operator, num_lat, num_lon)
+    return operator, num_lat, num_lon
+
+
+# Read the annually averaged velocity from each file, unrotate it, and
+# integrate the zonal component down every water column. The files are
+# handed out to a pool of worker processes.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# file_names = list of paths to FESOM oce.mean.nc files, eg one per year
+# num_procs = optional number of worker processes (default 4)
+# Output: array of size len(file_names) x n2d
+def depth_integrated_u (mesh_path, file_names, num_procs=4):
+
+    global _shared
+
+    rlon, rlat = rotated_lonlat(mesh_path + 'nod3d.out')
+    # Workers are forked after this, so they inherit the coordinates and the
+    # operator instead of building their own
+    _shared = (rlon, rlat, integration_operator(mesh_path))
+    try:
+        if num_procs == 1:
+            int_udz = [_file_udz(file_name) for file_name in file_names]
+        else:
+            pool = Pool(num_procs)
+            try:
+                int_udz = pool.map(_file_udz, file_names, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _shared = None
+    return array(int_udz)
+
+
+# Helper function to process one file in depth_integrated_u.
+def _file_udz (file_name):
+
+    rlon, rlat, int_op = _shared
+    id = Dataset(file_name, 'r')
+    ur = mean(id.variables['u'][:,:], axis=0)
+    vr = mean(id.variables['v'][:,:], axis=0)
+    id.close()
+    u, v = unrotate_vector(rlon, rlat, ur, vr)
+    return integrate_columns(int_op, u)
@@ -1,7 +1,7 @@
 from netCDF4 import Dataset
 from numpy import *
 from matplotlib.pyplot import *
-from fesom_grid import *
+from ts_census import *
 
 def hssw_aabw_distribution ():
 
@@ -14,9 +14,6 @@ def hssw_aabw_distribution ():
     # Titles for plotting
     expt_names = ['RCP 4.5 MMM', 'RCP 4.5 ACCESS', 'RCP 8.5 MMM', 'RCP 8.5 ACCESS', 'CONTROL']
     num_expts = len(directories)
-    # Mesh parameters
-    circumpolar = False
-    cross_180 = False
     # Northern boundary of water masses to consider
     nbdry = -65
     # Number of temperature and salinity bins
@@ -49,15 +46,14 @@ def hssw_aabw_distribution ():
     # Repeat for salinity
     salt_bins = linspace(min_salt, max_salt, num=num_bins)
     salt_centres = 0.5*(salt_bins[:-1] + salt_bins[1:])
-    # Set up a 3D array of experiment x temperature bins x salinity bins to
-    # increment with volume of water masses
-    ts_vals = zeros([num_expts+1, size(temp_centres), size(salt_centres)])
     # Calculate surface freezing point as a function of salinity as seen by
     # sea ice model
     freezing_pt = -0.0575*salt_centres + 1.7105e-3*sqrt(salt_centres**3) - 2.155e-4*salt_centres**2
 
     print 'Building mesh'
-    elements = fesom_grid(mesh_path, circumpolar, cross_180)
+    elements, elm_index, top, bottom, volume = prism_table(mesh_path)
+    # Only consider prisms in the region of interest
+    in_region = array([all(elm.lat < nbdry) for elm in elements])[elm_index]
 
     print 'Reading data'
     # 1996-2005
@@ -75,47 +71,10 @@ def hssw_aabw_distribution ():
         salt_nodes[expt+1,:] = id.variables['salt'][0,:]
         id.close()
 
-    print 'Binning elements'
-    for elm in elements:
-        # See if we're in the region of interest
-        if all(elm.lat < nbdry):
-            # Get area of 2D triangle
-            area = elm.area()
-            nodes = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-            # Loop downward
-            while True:
-                if nodes[0].below is None or nodes[1].below is None or nodes[2].below is None:
-                    # We've reached the bottom
-                    break
-                # Calculate average temperature and salinity for each
-                # experiment, as well as layer thickness, over this 3D
-                # triangular prism.
-                temp_vals = empty([num_expts+1, 6])
-                salt_vals = empty([num_expts+1, 6])
-                dz = empty(3)
-                for i in range(3):
-                    # Loop over experiments
-                    for expt in range(num_expts+1):
-                        # Average temperature over 6 nodes
-                        temp_vals[expt,i] = temp_nodes[expt,nodes[i].id]
-                        temp_vals[expt,i+3] = temp_nodes[expt,nodes[i].below.id]
-                        salt_vals[expt,i] = salt_nodes[expt,nodes[i].id]
-                        salt_vals[expt,i+3] = salt_nodes[expt,nodes[i].below.id]
-                    # Average dz over 3 vertical edges
-                    dz[i] = abs(nodes[i].depth - nodes[i].below.depth)
-                    # Get ready for next repetition of loop
-                    nodes[i] = nodes[i].below
-                temp_elm = mean(temp_vals, axis=1)
-                salt_elm = mean(salt_vals, axis=1)
-                # Calculate volume of 3D triangular prism
-                volume = area*mean(dz)
-                # Loop over experiments again
-                for expt in range(num_expts+1):
-                    # Figure out which bins this falls into
-                    temp_index = nonzero(temp_bins > temp_elm[expt])[0][0] - 1
-                    salt_index = nonzero(salt_bins > salt_elm[expt])[0][0] - 1
-                    # Increment bins with volume
-                    ts_vals[expt, temp_index, salt_index] += volume
+    print 'Binning prisms'
+    # Volume in each experiment x temperature bin x salinity bin, for all
+    # the experiments at once
+    ts_vals = ts_census(prism_mean(temp_nodes, top, bottom), prism_mean(salt_nodes, top, bottom), volume, temp_bins, salt_bins, in_region)
     # Mask bins with zero volume
     ts_vals = ma.masked_where(ts_vals==0, ts_vals)
 
@@ -1,6 +1,7 @@
 from netCDF4 import Dataset
 from numpy import *
 from scipy.interpolate import griddata
+from output_writer import *
 
 # Read Martin and Adcroft's monthly climatology of freshwater fluxes
 # from iceberg melt, and make an input forcing file on the ERA-Interim
@@ -43,25 +44,13 @@ def iceberg_melt (out_file):
     lon_iceberg[index] = lon_iceberg[index] + 360
 
     # Set up output file
-    out_id = Dataset(out_file, 'w')
-    # Define dimensions
-    out_id.createDimension('longitude', num_lon)
-    out_id.createDimension('latitude', num_lat)
-    out_id.createDimension('time', None)
+    out_id = create_output(out_file, [('longitude', num_lon), ('latitude', num_lat), ('time', None)], title='iceberg meltwater flux on the ERA-Interim grid')
     # Define variables
-    out_id.createVariable('longitude', 'f8', ('longitude'))
-    out_id.variables['longitude'].units = 'degrees_east'
-    out_id.variables['longitude'].long_name = 'longitude'
-    out_id.variables['longitude'][:] = lon_era_1d
-    out_id.createVariable('latitude', 'f8', ('latitude'))
-    out_id.variables['latitude'].units = 'degrees_north'
-    out_id.variables['latitude'].long_name = 'latitude'
-    out_id.variables['latitude'][:] = lat_era_1d
-    out_id.createVariable('time', 'f8', ('time'))
-    out_id.variables['time'].units = 'months'
-    out_id.createVariable('icebergs', 'f8', ('time', 'latitude', 'longitude'))
-    out_id.variables['icebergs'].long_name = 'freshwater flux from iceberg melt'
-    out_id.variables['icebergs'].units = 'm_per_12hr'
+    create_var(out_id, 'longitude', ('longitude'), units='degrees_east', long_name='longitude', data=lon_era_1d)
+    create_var(out_id, 'latitude', ('latitude'), units='degrees_north', long_name='latitude', data=lat_era_1d)
+    create_var(out_id, 'time', ('time'), units='months', long_name='time')
+    # FESOM reads one month at a time
+    create_var(out_id, 'icebergs', ('time', 'latitude', 'longitude'), units='m_per_12hr', long_name='freshwater flux from iceberg melt', access='map')
 
     # Loop over months
     for month in range(12):
@@ -3,17 +3,18 @@ from numpy import *
 from matplotlib.collections import PatchCollection, LineCollection
 from matplotlib.pyplot import *
 from patches import *
+from timeseries_store import *
 
 # Make a map of unexplained percent error in annually averaged simulated melt
 # rate from each ice shelf that is over 5,000 km^2 in Rignot et al., 2013.
 # Input:
 # mesh_path = path to FESOM mesh directory
-# log_path = path to log file created by timeseries_massloss.py
+# store_path = path to timeseries store created by timeseries_massloss.py
 # res_flag = integer flag indicating low resolution mesh (1) or high (2)
 # save = optional boolean to save the figure to a file, rather than displaying
 #        it on the screen
 # fig_name = if save=True, path to the desired filename for the figure
-def ismr_map (mesh_path, log_path, res_flag, save=False, fig_name=None):
+def ismr_map (mesh_path, store_path, res_flag, save=False, fig_name=None):
 
     # Limits on longitude and latitude for each ice shelf
     # These depend on the source geometry, in this case RTopo 1.05
@@ -51,35 +52,11 @@ def ismr_map (mesh_path, log_path, res_flag, save=False, fig_name=None):
     elements, mask_patches = make_patches(mesh_path, circumpolar, mask_cavities, only_major=True)
     patches = iceshelf_mask(elements, only_major=True)
 
-    # Read log file
-    f = open(log_path, 'r')
-    # Skip the first line (header)
-    f.readline()
-    # Count the number of time indices for the first variable (total mass loss
-    # for all ice shelves, which we don't care about)
-    num_time = 0
-    for line in f:
-        try:
-            tmp = float(line)
-            num_time += 1
-        except(ValueError):
-            # Reached header for first individual ice shelf
-            break
-    # Set up array for melt rate values at each ice shelf
-    ismr_ts = empty([len(obs_ismr), num_time])
-    index = 0
-    # Loop over ice shelves
-    while index < len(obs_ismr):
-        t = 0
-        for line in f:
-            try:
-                # Convert from mass loss to area-averaged melt rate
-                ismr_ts[index,t] = float(line)*1e12/(rho_ice*area[index])
-                t += 1
-            except(ValueError):
-                # Reached the header for the next ice shelf
-                break
-        index += 1
+    # Read timeseries store, skipping the total mass loss for all ice shelves
+    # (which we don't care about)
+    time, series = read_timeseries(store_path, ['massloss'])
+    # Convert from mass loss to area-averaged melt rate at each ice shelf
+    ismr_ts = series['massloss'][1:,:]*1e12/(rho_ice*array(area)[:,None])
 
     # Find unexplained error in annual average
     ismr = empty(len(obs_ismr))
@@ -187,7 +164,7 @@ def ismr_map (mesh_path, log_path, res_flag, save=False, fig_name=None):
 if __name__ == "__main__":
 
     mesh_path = raw_input("Path to FESOM mesh directory: ")
-    log_path = raw_input("Path to mass loss logfile: ")
+    store_path = raw_input("Path to mass loss timeseries store: ")
     res_flag = int(raw_input("Low resolution (1) or high (2)? "))
     action = raw_input("Save figure (s) or display in window (d)? ")
     if action == 's':
@@ -196,7 +173,7 @@ if __name__ == "__main__":
     elif action == 'd':
         save = False
         fig_name = None
-    ismr_map(mesh_path, log_path, res_flag, save, fig_name)
+    ismr_map(mesh_path, store_path, res_flag, save, fig_name)
         
                 
                 
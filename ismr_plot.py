@@ -1,10 +1,11 @@
 from netCDF4 import Dataset
 from numpy import *
-from matplotlib.collections import PatchCollection, LineCollection
+from matplotlib.collections import LineCollection
 from matplotlib.pyplot import *
 from matplotlib.cm import *
-from matplotlib.colors import LinearSegmentedColormap
-from patches import *
+from matplotlib.colors import LinearSegmentedColormap, ListedColormap
+from mesh_render import *
+from mesh_raster import *
 
 # Make a circumpolar plot of ice shelf melt rates annually averaged over the
 # given year of FESOM simulation.
@@ -14,12 +15,17 @@ from patches import *
 # save = optional boolean indicating to save the figure, rather than display
 #        it on the screen
 # fig_name = if save=True, filename for figure
-def ismr_plot (mesh_path, file_path, save=False, fig_name=None):
+# raster = optional boolean indicating to draw the plot from a pre-computed
+#          raster of the mesh (see mesh_raster.py) rather than one polygon
+#          per element
+def ismr_plot (mesh_path, file_path, save=False, fig_name=None, raster=False):
 
     # Plotting parameters
     lat_max = -63 + 90
     circumpolar = True
     mask_cavities = True
+    # Image size if raster=True
+    num_pixels = 1600
     # Seconds per year
     sec_per_year = 365.25*24*3600
 
@@ -39,9 +45,8 @@ def ismr_plot (mesh_path, file_path, save=False, fig_name=None):
     mf_cmap = LinearSegmentedColormap.from_list('melt_freeze', cmap_list)
 
     # Build FESOM mesh
-    # Get separate patches for the open ocean elements so we can mask them out
-    elements, mask_patches = make_patches(mesh_path, circumpolar, mask_cavities)
-    patches = iceshelf_mask(elements)
+    # Get separate corners for the open ocean elements so we can mask them out
+    elements, mask_verts, index = mesh_geometry(mesh_path, circumpolar, mask_cavities)
 
     # Read freshwater flux
     file = Dataset(file_path, 'r')
@@ -66,15 +71,25 @@ def ismr_plot (mesh_path, file_path, save=False, fig_name=None):
     ax = fig.add_subplot(1,1,1,aspect='equal')
     # Start with grey square background for land
     contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-    img = PatchCollection(patches, cmap=mf_cmap)
-    img.set_array(array(values))
-    img.set_edgecolor('face')
-    img.set_clim(vmin=-0.1, vmax=8)
-    ax.add_collection(img)
-    # Mask out the open ocean in white
-    overlay = PatchCollection(mask_patches, facecolor=(1,1,1))
-    overlay.set_edgecolor('face')
-    ax.add_collection(overlay)
+    if raster:
+        elm_index, weights = element_raster(mesh_path, -lat_max, lat_max, -lat_max, lat_max, num_pixels, num_pixels, circumpolar)
+        # Fill in the ice shelf values, and mask the open ocean
+        cavity = array([elm.cavity for elm in elements])
+        values_all = ma.masked_all(len(elements))
+        values_all[cavity] = values
+        img = raster_show(ax, raster_image(elm_index, values_all), -lat_max, lat_max, -lat_max, lat_max, cmap=mf_cmap, vmin=-0.1, vmax=8)
+        # Mask out the open ocean in white
+        ocean = ma.masked_where(cavity, ones(len(elements)))
+        raster_show(ax, raster_image(elm_index, ocean), -lat_max, lat_max, -lat_max, lat_max, cmap=ListedColormap([(1,1,1)]))
+    else:
+        img = element_collection(iceshelf_verts(elements), values, cmap=mf_cmap)
+        img.set_edgecolor('face')
+        img.set_clim(vmin=-0.1, vmax=8)
+        ax.add_collection(img)
+        # Mask out the open ocean in white
+        overlay = element_collection(mask_verts, facecolor=(1,1,1))
+        overlay.set_edgecolor('face')
+        ax.add_collection(overlay)
 
     # Contour ice shelf fronts
     contour_lines = []
@@ -1,11 +1,18 @@
 from netCDF4 import Dataset
 from numpy import *
-from matplotlib.collections import PatchCollection
 from matplotlib.pyplot import *
 from matplotlib.cm import *
-from matplotlib.patches import Polygon
-from patches import *
+from mesh_render import *
 from unrotate_vector import *
+from vis_cache import *
+from column_kernels import *
+from mesh_raster import *
+from os.path import abspath, getmtime
+from collections import OrderedDict
+
+# Element values which have already been calculated this session, most
+# recently used last (see element_values)
+_values_cache = OrderedDict()
 
 
 # Create a plot of a specified variable on a lon-lat domain.
@@ -23,9 +30,9 @@ from unrotate_vector import *
 # tstep = int specifying index of time axis in file_path
 # circumpolar = boolean flag indicating whether to use the circumpolar domain
 #               or the global domain
-# elements = array of Elements for the FESOM grid (created using fesom_grid)
-# patches = array of Polygon patches corresponding to elements (created using
-#           make_patches)
+# elements = list of Elements for the FESOM grid (from mesh_geometry)
+# verts = array of the corners of the elements to plot (from mesh_geometry,
+#         with the same mask_cavities)
 # mask_cavities = optional boolean flag indicating whether to mask ice shelf
 #                 cavities in grey
 # save = optional boolean flag indicating whether to save plot to file
@@ -34,7 +41,7 @@ from unrotate_vector import *
 # set_limits = optional boolean flag indicating whether or not to set manual
 #              limits on colourbar (otherwise limits determined automatically)
 # limits = optional array containing min and max limits
-def lonlat_plot (mesh_path, file_path, var_name, depth_key, depth, depth_bounds, tstep, circumpolar, elements, patches, mask_cavities=False, save=False, fig_name=None, set_limits=False, limits=None):
+def lonlat_plot (mesh_path, file_path, var_name, depth_key, depth, depth_bounds, tstep, circumpolar, elements, verts, mask_cavities=False, save=False, fig_name=None, set_limits=False, limits=None):
 
     # Set bounds for domain
     if circumpolar:
@@ -53,55 +60,11 @@ def lonlat_plot (mesh_path, file_path, var_name, depth_key, depth, depth_bounds,
     # Seconds per year, for conversion of ice shelf melt rate
     sec_per_year = 365.25*24*3600
 
-    # Read data
-    file = Dataset(file_path, 'r')
-    varid = file.variables[var_name]
-    data = varid[tstep-1,:]
-    # Check for vector variables that need to be unrotated
-    if var_name in ['uwind', 'vwind', 'stress_x', 'stress_y', 'uhice', 'vhice', 'uhsnow', 'vhsnow', 'uice', 'vice', 'u', 'v']:
-        # Read the rotated lat and lon
-        if var_name in ['u', 'v']:
-            # 3D variable
-            mesh_file = mesh_path + 'nod3d.out'
-        else:
-            # 2D variable
-            mesh_file = mesh_path + 'nod2d.out'
-        fid = open(mesh_file, 'r')
-        fid.readline()
-        lon = []
-        lat = []
-        for line in fid:
-            tmp = line.split()
-            lon_tmp = float(tmp[1])
-            lat_tmp = float(tmp[2])
-            if lon_tmp < -180:
-                lon_tmp += 360
-            elif lon_tmp > 180:
-                lon_tmp -= 360
-            lon.append(lon_tmp)
-            lat.append(lat_tmp)
-        fid.close()
-        lon = array(lon)
-        lat = array(lat)
-        if var_name in ['uwind', 'stress_x', 'uhice', 'uhsnow', 'uice', 'u']:
-            # u-variable
-            u_data = data[:]
-            if var_name == 'stress_x':
-                v_data = file.variables['stress_y'][tstep-1,:]
-            else:
-                v_data = file.variables[var_name.replace('u','v')][tstep-1,:]
-            u_data_lonlat, v_data_lonlat = unrotate_vector(lon, lat, u_data, v_data)
-            data = u_data_lonlat[:]
-        elif var_name in ['vwind', 'stress_y', 'vhice', 'vhsnow', 'vice', 'v']:
-            # v-variable
-            v_data = data[:]
-            if var_name == 'stress_y':
-                u_data = file.variables['stress_x'][tstep-1,:]
-            else:
-                u_data = file.variables[var_name.replace('v','u')][tstep-1,:]
-            u_data_lonlat, v_data_lonlat = unrotate_vector(lon, lat, u_data, v_data)
-            data = v_data_lonlat[:]
-    
+    # Read data (or get it from the session cache), unrotating vector
+    # variables
+    data = read_field(mesh_path, file_path, var_name, tstep)
+    varid = get_dataset(file_path).variables[var_name]
+
     # Set descriptive variable name and units for title
     if var_name == 'area':
         name = 'ice concentration'
@@ -128,206 +91,38 @@ def lonlat_plot (mesh_path, file_path, var_name, depth_key, depth, depth_bounds,
     elif depth_key == 4:
         depth_string = 'vertically averaged between '+str(depth_bounds[0])+' and '+str(depth_bounds[1])+' m'
 
-    # Build an array of data values corresponding to each Element
-    values = []
-    plot_patches = []
-    for elm in elements:
-        # If mask_cavities is true, only include elements which are not inside
-        # an ice shelf cavity; otherwise, include all elements
-        if (mask_cavities and not elm.cavity) or (not mask_cavities):
-
-            if depth_key == 0:
-                # Surface nodes; this is easy
-                # Average the data value for each of the three component nodes
-                values.append(mean([data[elm.nodes[0].id], data[elm.nodes[1].id], data[elm.nodes[2].id]]))
-
-            elif depth_key == 1:
-                # Bottom nodes
-                values_tmp = []
-                # For each of the three component nodes, find the id of the
-                # bottom node beneath it
-                for node in elm.nodes:
-                    id = node.find_bottom().id
-                    values_tmp.append(data[id])
-                # Average over these three values
-                values.append(mean(values_tmp))
-
-            elif depth_key == 2:                
-                # Vertical average throughout entire water column
-                # First calculate volume: area of triangular face * water
-                # column thickness (mean of three corners)
-                wct = []
-                for node in elm.nodes:
-                    wct.append(abs(node.find_bottom().depth - node.depth))
-                area = elm.area()
-                volume = area*mean(array(wct))
-                # Now integrate down
-                integral = 0
-                nodes = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-                while True:
-                    if nodes[0].below is None or nodes[1].below is None or nodes[2].below is None:
-                        break
-                    # Calculate mean of data at six corners of this triangular
-                    # prism, and mean depths at three edges
-                    values_tmp = []
-                    dz_tmp = []
-                    # Must loop over indices of nodes array, not entries,
-                    # because we want to change the contents of the nodes array
-                    for i in range(3):
-                        values_tmp.append(data[nodes[i].id])
-                        values_tmp.append(data[nodes[i].below.id])
-                        dz_tmp.append(abs(nodes[i].depth - nodes[i].below.depth))
-                        # Get ready for next iteration of the while loop
-                        nodes[i] = nodes[i].below
-                    # Integrand is mean of data at corners * area of upper face
-                    # * mean of depths at edges
-                    integral += mean(array(values_tmp))*area*mean(array(dz_tmp))
-                # All done; divide integral by volume to get the average
-                values.append(integral/volume)    
-
-            elif depth_key == 3:
-                # Specified depth
-                values_tmp = []
-                # For each of the three component nodes, linearly interpolate
-                # to the correct depth
-                for i in range(3):
-                    # Find the ids of the nodes above and below this depth,
-                    # and the coefficients for the linear interpolation
-                    id1, id2, coeff1, coeff2 = elm.nodes[i].find_depth(depth)
-                    if any(isnan(array([id1, id2, coeff1, coeff2]))):
-                        # No such node at this depth
-                        values_tmp.append(NaN)
-                    else:
-                        values_tmp.append(coeff1*data[id1] + coeff2*data[id2])
-                if any (isnan(array(values_tmp))):
-                    pass
-                else:
-                    values.append(mean(values_tmp))
-                    coord = transpose(vstack((elm.x, elm.y)))
-                    # Make new patches for elements which exist at this depth
-                    plot_patches.append(Polygon(coord, True, linewidth=0.))
-
-            elif depth_key == 4:
-                # Vertical average between two specified depths
-                shallow_bound = depth_bounds[0]
-                deep_bound = depth_bounds[1]
-                area = elm.area()
-                # Volume is area of triangular face * difference between
-                # depth bounds
-                volume = abs(deep_bound - shallow_bound)*area
-                nodes = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-                # Check if we're already too deep
-                if nodes[0].depth > deep_bound or nodes[1].depth > deep_bound or nodes[2].depth > deep_bound:
-                    pass
-                # Check if the seafloor is shallower than shallow_bound
-                elif nodes[0].find_bottom().depth <= shallow_bound or nodes[1].find_bottom().depth <= shallow_bound or nodes[2].find_bottom().depth <= shallow_bound:
-                    pass
-
-                else:
-                    # Here we go
-
-                    # Find the first 3D element which is entirely below
-                    # shallow_bound
-                    while True:
-                        if nodes[0].depth > shallow_bound and nodes[1].depth > shallow_bound and nodes[2].depth > shallow_bound:
-                            # Save these nodes
-                            first_nodes = []
-                            for i in range(3):
-                                first_nodes.append(nodes[i])
-                            break
-                        else:
-                            for i in range(3):
-                                nodes[i] = nodes[i].below
-
-                    # Integrate downward until one of the next nodes hits the
-                    # seafloor, or is deeper than deep_bound
-                    integral = 0
-                    while True:
-                        if nodes[0].below is None or nodes[1].below is None or nodes[2].below is None:
-                            # We've reached the seafloor
-                            last_nodes = None
-                            break
-                        if nodes[0].below.depth > deep_bound or nodes[1].below.depth > deep_bound or nodes[2].below.depth > deep_bound:
-                            # At least one of the next nodes will pass
-                            # deep_bound; save the current nodes
-                            last_nodes = []
-                            for i in range(3):
-                                last_nodes.append(nodes[i])
-                            break
-                        else:
-                            # Calculate mean of data at six corners of this
-                            # triangular prism, and mean depths at three edges
-                            values_tmp = []
-                            dz_tmp = []
-                            for i in range(3):
-                                values_tmp.append(data[nodes[i].id])
-                                values_tmp.append(data[nodes[i].below.id])
-                                dz_tmp.append(abs(nodes[i].depth - nodes[i].below.depth))
-                                # Get ready for next iteration of while loop
-                                nodes[i] = nodes[i].below
-                            # Integrand is mean of data at corners *
-                            # area of upper face * mean of depths at edges
-                            integral += mean(array(values_tmp))*area*mean(array(dz_tmp))
-
-                    # Now integrate from shallow_bound to first_nodes by
-                    # linearly interpolating each node to shallow_bound
-                    values_tmp = []
-                    dz_tmp = []
-                    for i in range(3):
-                        values_tmp.append(data[first_nodes[i].id])
-                        id1, id2, coeff1, coeff2 = elm.nodes[i].find_depth(shallow_bound)
-                        if any(isnan(array([id1, id2, coeff1, coeff2]))):
-                            # first_nodes[i] was the shallowest node, we can't
-                            # interpolate above it
-                            values_tmp.append(NaN)
-                        else:
-                            values_tmp.append(coeff1*data[id1] + coeff2*data[id2])
-                        dz_tmp.append(abs(first_nodes[i].depth - shallow_bound))
-                    if any(isnan(array(values_tmp))):
-                        pass
-                    else:
-                        integral += mean(array(values_tmp))*area*mean(array(dz_tmp))  
-
-                    # Now integrate from last_nodes to deep_bound by linearly
-                    # interpolating each node to deep_bound, unless we hit
-                    # the seafloor earlier
-                    if last_nodes is not None:
-                        values_tmp = []
-                        dz_tmp = []
-                        for i in range(3):
-                            values_tmp.append(data[last_nodes[i].id])
-                            id1, id2, coeff1, coeff2 = elm.nodes[i].find_depth(deep_bound)
-                            if any(isnan(array([id1, id2, coeff1, coeff2]))):
-                                # last_nodes[i] was the deepest node, we can't
-                                # interpolate below it
-                                values_tmp.append(NaN)
-                            else:
-                                values_tmp.append(coeff1*data[id1] + coeff2*data[id2])
-                            dz_tmp.append(abs(deep_bound - last_nodes[i].depth))
-                        if any(isnan(array(values_tmp))):
-                            pass
-                        else:
-                            integral += mean(array(values_tmp))*area*mean(array(dz_tmp))
-
-                    # All done; divide integral by volume to get the average
-                    values.append(integral/volume)                    
-                    # Make new patches for elements which exist at this depth
-                    coord = transpose(vstack((elm.x, elm.y)))
-                    plot_patches.append(Polygon(coord, True, linewidth=0.))
+    # Build an array of data values corresponding to each Element, unless
+    # the same field was already plotted on these Elements (eg with different
+    # colour bounds)
+    if depth_key == 3:
+        depth_info = depth
+    elif depth_key == 4:
+        depth_info = tuple(depth_bounds)
+    else:
+        depth_info = None
+    values_key = (abspath(file_path), getmtime(file_path), var_name, tstep, depth_key, depth_info, mask_cavities)
+    if values_key in _values_cache and _values_cache[values_key][0] is elements:
+        values, plot_verts = _values_cache.pop(values_key)[1:]
+    else:
+        values, plot_verts = element_values(mesh_path, elements, data, depth_key, depth, depth_bounds, mask_cavities)
+        while len(_values_cache) >= max_fields:
+            _values_cache.popitem(last=False)
+    # Move to the end, as the most recently used
+    _values_cache[values_key] = (elements, values, plot_verts)
 
     if depth_key < 3:
-        # Use all patches
-        plot_patches = patches[:]
+        # Use all elements
+        plot_verts = verts
 
     if mask_cavities:
-        # Get mask array of patches for ice shelf cavity elements
-        mask_patches = iceshelf_mask(elements)
+        # Get corners of ice shelf cavity elements, for the mask
+        mask_verts = iceshelf_verts(elements)
         if var_name == 'wnet':
-            # Swap with regular patches so that open ocean elements are masked,
-            # ice shelf cavity nodes are not
-            tmp = plot_patches
-            plot_patches = mask_patches
-            mask_patches = tmp
+            # Swap with regular elements so that open ocean elements are
+            # masked, ice shelf cavity nodes are not
+            tmp = plot_verts
+            plot_verts = mask_verts
+            mask_verts = tmp
 
     # Choose colour bounds
     if set_limits:
@@ -361,15 +156,14 @@ def lonlat_plot (mesh_path, file_path, var_name, depth_key, depth, depth_bounds,
     else:
         fig = figure(figsize=(16,8))
         ax = fig.add_subplot(1,1,1)
-    # Set colourmap for patches, and refer it to the values array
-    img = PatchCollection(plot_patches, cmap=colour_map)
-    img.set_array(array(values))
+    # Set colourmap for elements, and refer it to the values array
+    img = element_collection(plot_verts, values, cmap=colour_map)
     img.set_edgecolor('face')
-    # Add patches to plot
+    # Add elements to plot
     ax.add_collection(img)
     if mask_cavities:
-        # Set colour to light grey for patches in mask
-        overlay = PatchCollection(mask_patches, facecolor=(0.6, 0.6, 0.6))
+        # Set colour to light grey for elements in mask
+        overlay = element_collection(mask_verts, facecolor=(0.6, 0.6, 0.6))
         overlay.set_edgecolor('face')
         # Add mask to plot
         ax.add_collection(overlay)
@@ -411,3 +205,86 @@ def lonlat_plot (mesh_path, file_path, var_name, depth_key, depth, depth_bounds,
         fig.savefig(fig_name)
     else:
         fig.show()
+
+
+# Calculate the value of the given field on each Element, at the depth (or
+# vertical average) requested. This is the slow part of lonlat_plot, so its
+# results are kept in the session cache.
+# Input:
+# mesh_path, elements, depth_key, depth, depth_bounds, mask_cavities = as in
+#            lonlat_plot
+# data = array of data at each node
+# Output:
+# values = list of data values for each Element to plot
+# plot_verts = array of the corners of these Elements (as for
+#              element_verts), if depth_key is 3 or 4 (only some Elements
+#              exist at these depths); otherwise None, as all the elements
+#              from mesh_geometry are used
+def element_values (mesh_path, elements, data, depth_key, depth, depth_bounds, mask_cavities):
+
+    if depth_key in [2, 4]:
+        # Vertical averages are calculated for every water column at once
+        # (see column_kernels.py) and then averaged to the Elements
+        if mask_cavities:
+            elements = [elm for elm in elements if not elm.cavity]
+        columns, node_depth = column_table(mesh_path)
+        if depth_key == 2:
+            # Entire water column
+            node_avg = column_average(data, columns, node_depth)
+        else:
+            # Between two specified depths
+            node_avg = column_average(data, columns, node_depth, depth_bounds[0], depth_bounds[1])
+        elm_avg = element_mean(node_avg, element_node_ids(elements))
+        if depth_key == 2:
+            return list(ma.filled(elm_avg, NaN)), None
+        # Only plot elements which exist at these depths
+        keep = nonzero(invert(ma.getmaskarray(elm_avg)))[0]
+        return list(elm_avg[keep]), element_verts(elements)[keep]
+
+    values = []
+    # Elements which exist at the specified depth, if depth_key is 3
+    plot_elements = []
+    for elm in elements:
+        # If mask_cavities is true, only include elements which are not inside
+        # an ice shelf cavity; otherwise, include all elements
+        if (mask_cavities and not elm.cavity) or (not mask_cavities):
+
+            if depth_key == 0:
+                # Surface nodes; this is easy
+                # Average the data value for each of the three component nodes
+                values.append(mean([data[elm.nodes[0].id], data[elm.nodes[1].id], data[elm.nodes[2].id]]))
+
+            elif depth_key == 1:
+                # Bottom nodes
+                values_tmp = []
+                # For each of the three component nodes, find the id of the
+                # bottom node beneath it
+                for node in elm.nodes:
+                    id = node.find_bottom().id
+                    values_tmp.append(data[id])
+                # Average over these three values
+                values.append(mean(values_tmp))
+
+            elif depth_key == 3:
+                # Specified depth
+                values_tmp = []
+                # For each of the three component nodes, linearly interpolate
+                # to the correct depth
+                for i in range(3):
+                    # Find the ids of the nodes above and below this depth,
+                    # and the coefficients for the linear interpolation
+                    id1, id2, coeff1, coeff2 = elm.nodes[i].find_depth(depth)
+                    if any(isnan(array([id1, id2, coeff1, coeff2]))):
+                        # No such node at this depth
+                        values_tmp.append(NaN)
+                    else:
+                        values_tmp.append(coeff1*data[id1] + coeff2*data[id2])
+                if any (isnan(array(values_tmp))):
+                    pass
+                else:
+                    values.append(mean(values_tmp))
+                    plot_elements.append(elm)
+
+    if depth_key == 3:
+        return values, element_verts(plot_elements)
+    return values, None
@@ -1,6 +1,6 @@
 from netCDF4 import Dataset
 from numpy import *
-from scipy.spatial import KDTree
+from scipy.spatial import cKDTree
 
 # Make a FESOM initial conditions file using ECCO2 temperature and salinity for
 # January 1992.
@@ -24,23 +24,23 @@ def make_ini ():
     salt_fid.close()
 
     # Fill land masks with nearest neighbours
-    # Loop over z-levels
     print 'Filling land mask with nearest neighbours'
+    theta_mask = ma.getmaskarray(theta)
+    salt_mask = ma.getmaskarray(salt)
+    theta = ma.getdata(theta)
+    salt = ma.getdata(salt)
+    # Loop over z-levels
     for k in range(size(depth_ecco)):
         print '...vertical level ' + str(k+1) + ' of ' + str(size(depth_ecco))
-        for var in range(2):
-            if var == 0:
-                tmp = theta[k,:,:]
-            else:
-                tmp = salt[k,:,:]
-            j,i = mgrid[0:tmp.shape[0], 0:tmp.shape[1]]
-            jigood = array((j[~tmp.mask], i[~tmp.mask])).T
-            jibad = array((j[tmp.mask], i[tmp.mask])).T
-            tmp[tmp.mask] = tmp[~tmp.mask][KDTree(jigood).query(jibad)[1]]
-            if var == 0:
-                theta[k,:,:] = tmp
-            else:
-                salt[k,:,:] = tmp
+        # The land masks are normally the same for both variables, so only
+        # search for the nearest neighbours once
+        index = nearest_unmasked(theta_mask[k,:,:])
+        tmp = theta[k,:,:]
+        tmp[theta_mask[k,:,:]] = tmp[~theta_mask[k,:,:]][index]
+        if any(salt_mask[k,:,:] != theta_mask[k,:,:]):
+            index = nearest_unmasked(salt_mask[k,:,:])
+        tmp = salt[k,:,:]
+        tmp[salt_mask[k,:,:]] = tmp[~salt_mask[k,:,:]][index]
 
     f=open(out_file, 'w')
 
@@ -50,82 +50,49 @@ def make_ini ():
     print 'Writing grid'
     sizes.tofile(f, ' ')
     f.write('\n')
-
     # Columns of 5
-    posn = 0
-    while True:
-        end = min(posn+5, size(lon_ecco))
-        data = lon_ecco[posn:end]
-        data.tofile(f, ' ')
-        f.write('\n')
-        if end == size(lon_ecco):
-            break
-        else:
-            posn = posn+5
+    write_columns(f, lon_ecco)
+    write_columns(f, lat_ecco)
+    write_columns(f, depth_ecco)
+
+    # Flatten the 3D arrays so that depth varies fastest, then latitude, then
+    # longitude
+    print 'Writing temperature'
+    write_columns(f, transpose(theta, (2,1,0)))
+    print 'Writing salinity'
+    write_columns(f, transpose(salt, (2,1,0)))
+    f.close()
 
-    posn = 0
-    while True:
-        end = min(posn+5, size(lat_ecco))
-        data = lat_ecco[posn:end]
-        data.tofile(f, ' ')
-        f.write('\n')
-        if end == size(lat_ecco):
-            break
-        else:
-            posn = posn+5
 
-    posn = 0
-    while True:
-        end = min(posn+5, size(depth_ecco))
-        data = depth_ecco[posn:end]
-        data.tofile(f, ' ')
-        f.write('\n')
-        if end == size(depth_ecco):
-            break
-        else:
-            posn = posn+5
+# Find the nearest unmasked point to every masked point in a 2D field.
+# Input: mask = 2D boolean array which is True where the field is missing
+# Output: 1D array containing, for each point in field[mask], its nearest
+#         neighbour as an index into field[~mask]
+def nearest_unmasked (mask):
 
-    print 'Setting up temperature'
-    # Flatten the 3D array
-    theta_flat = []
-    for i in range(size(lon_ecco)):
-        for j in range(size(lat_ecco)):
-            for k in range(size(depth_ecco)):
-                theta_flat.append(theta[k,j,i])
+    j,i = mgrid[0:mask.shape[0], 0:mask.shape[1]]
+    jigood = array((j[~mask], i[~mask])).T
+    jibad = array((j[mask], i[mask])).T
+    return cKDTree(jigood).query(jibad)[1]
 
-    print 'Writing temperature'
-    theta_flat = array(theta_flat)
-    posn = 0
-    while True:
-        end = min(posn+5, size(theta_flat))
-        data = theta_flat[posn:end]
-        data.tofile(f, ' ')
-        f.write('\n')
-        if end == size(theta_flat):
-            break
-        else:
-            posn = posn+5
 
-    print 'Setting up salinity'
-    salt_flat = []
-    for i in range(size(lon_ecco)):
-        for j in range(size(lat_ecco)):
-            for k in range(size(depth_ecco)):
-                salt_flat.append(salt[k,j,i])
+# Write the given array to a text file, 5 values per line, in the same format
+# as numpy's tofile (each value is printed with repr). The array is flattened
+# in C order and formatted a large block at a time.
+# Input:
+# f = file object open for writing
+# data = array of any shape
+# num_cols = optional number of values per line (default 5)
+def write_columns (f, data, num_cols=5):
 
-    print 'Writing salinity'
-    salt_flat = array(salt_flat)
-    posn = 0
-    while True:
-        end = min(posn+5, size(salt_flat))
-        data = salt_flat[posn:end]
-        data.tofile(f, ' ')
-        f.write('\n')
-        if end == size(salt_flat):
-            break
-        else:
-            posn = posn+5
-    f.close()
+    # Number of values to format at once; a multiple of num_cols so only the
+    # last line can be short
+    block_size = 100000*num_cols
+    data = ravel(data)
+    for start in range(0, size(data), block_size):
+        values = [repr(x) for x in data[start:start+block_size].tolist()]
+        lines = [' '.join(values[n:n+num_cols]) for n in range(0, len(values), num_cols)]
+        f.write('\n'.join(lines) + '\n')
     
 
 if __name__ == "__main__":
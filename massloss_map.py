@@ -1,18 +1,19 @@
 from netCDF4 import Dataset
 from numpy import *
-from matplotlib.collections import PatchCollection, LineCollection
+from matplotlib.collections import LineCollection
 from matplotlib.pyplot import *
-from patches import *
+from mesh_render import *
+from timeseries_store import *
 
 # Make a map of unexplained percent error in annually averaged simulated basal
 # mass loss from each ice shelf that is over 5,000 km^2 in Rignot et al., 2013.
 # Input:
 # mesh_path = path to FESOM mesh directory
-# log_path = path to log file created by timeseries_massloss.py
+# store_path = path to timeseries store created by timeseries_massloss.py
 # save = optional boolean to save the figure to a file, rather than displaying
 #        it on the screen
 # fig_name = if save=True, path to the desired filename for the figure
-def massloss_map (mesh_path, log_path, save=False, fig_name=None):
+def massloss_map (mesh_path, store_path, save=False, fig_name=None):
 
     # Limits on longitude and latitude for each ice shelf
     # These depend on the source geometry, in this case RTopo 1.05
@@ -40,39 +41,15 @@ def massloss_map (mesh_path, log_path, save=False, fig_name=None):
     peryear=365/5
 
     # Build FESOM mesh
-    # Get separate patches for the open ocean and minor ice shelf elements
+    # Get separate corners for the open ocean and minor ice shelf elements
     # so we can mask them out
-    elements, mask_patches = make_patches(mesh_path, circumpolar, mask_cavities, only_major=True)
-    patches = iceshelf_mask(elements, only_major=True)
-
-    # Read log file
-    f = open(log_path, 'r')
-    # Skip the first line (header)
-    f.readline()
-    # Count the number of time indices for the first variable (total mass loss
-    # for all ice shelves, which we don't care about)
-    num_time = 0
-    for line in f:
-        try:
-            tmp = float(line)
-            num_time += 1
-        except(ValueError):
-            # Reached header for first individual ice shelf
-            break
-    # Set up array for mass loss values at each ice shelf
-    massloss_ts = empty([len(obs_massloss), num_time])
-    index = 0
-    # Loop over ice shelves
-    while index < len(obs_massloss):
-        t = 0
-        for line in f:
-            try:
-                massloss_ts[index,t] = float(line)
-                t += 1
-            except(ValueError):
-                # Reached the header for the next ice shelf
-                break
-        index += 1
+    elements, mask_verts = mesh_geometry(mesh_path, circumpolar, mask_cavities, only_major=True)[:2]
+    shelf_verts = iceshelf_verts(elements, only_major=True)
+
+    # Read timeseries store, skipping the total mass loss for all ice shelves
+    # (which we don't care about)
+    time, series = read_timeseries(store_path, ['massloss'])
+    massloss_ts = series['massloss'][1:,:]
 
     # Find unexplained error in annual average
     massloss = empty(len(obs_massloss))
@@ -128,13 +105,12 @@ def massloss_map (mesh_path, log_path, save=False, fig_name=None):
     ax = fig.add_subplot(1,1,1,aspect='equal')
     # Start with grey square background for land
     contourf(x_reg, y_reg, land_square, 1, colors=(('0.6', '0.6', '0.6')))
-    img = PatchCollection(patches, cmap='RdBu_r')
-    img.set_array(array(values))
+    img = element_collection(shelf_verts, values, cmap='RdBu_r')
     img.set_edgecolor('face')
     img.set_clim(-max_val, max_val)
     ax.add_collection(img)
     # Mask out the open ocean in white
-    overlay = PatchCollection(mask_patches, facecolor=(1,1,1))
+    overlay = element_collection(mask_verts, facecolor=(1,1,1))
     overlay.set_edgecolor('face')
     ax.add_collection(overlay)
 
@@ -179,7 +155,7 @@ def massloss_map (mesh_path, log_path, save=False, fig_name=None):
 if __name__ == "__main__":
 
     mesh_path = raw_input("Path to FESOM mesh directory: ")
-    log_path = raw_input("Path to mass loss logfile: ")
+    store_path = raw_input("Path to mass loss timeseries store: ")
     action = raw_input("Save figure (s) or display in window (d)? ")
     if action == 's':
         save = True
@@ -187,7 +163,7 @@ if __name__ == "__main__":
     elif action == 'd':
         save = False
         fig_name = None
-    massloss_map(mesh_path, log_path, save, fig_name)
+    massloss_map(mesh_path, store_path, save, fig_name)
         
                 
                 
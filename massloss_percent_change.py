@@ -4,16 +4,17 @@ from matplotlib.collections import PatchCollection, LineCollection
 from matplotlib.pyplot import *
 from matplotlib.colors import LinearSegmentedColormap
 from patches import *
+from timeseries_store import *
 
 # Make a circumpolar plot of the percentage change in mass loss for each major
 # ice shelf over the given RCP simulation (2091-2100 average minus 2006-2015).
 # Input:
 # mesh_path = path to FESOM mesh directory
-# log_path = path to logfile from timeseries_massloss.py, containing 5-day
+# store_path = path to timeseries store from timeseries_massloss.py, containing 5-day
 #            averages from 1992 to 2100 inclusive
 # save = optional boolean indicating to save the figure rather than display
 # fig_name = if save=True, filename for figure
-def massloss_percent_change (mesh_path, log_path, save=False, fig_name=None):
+def massloss_percent_change (mesh_path, store_path, save=False, fig_name=None):
 
     # Limits on longitude and latitude for each ice shelf
     # These depend on the source geometry, in this case RTopo 1.05
@@ -42,36 +43,14 @@ def massloss_percent_change (mesh_path, log_path, save=False, fig_name=None):
     elements, mask_patches = make_patches(mesh_path, circumpolar, mask_cavities, only_major=True)
     patches = iceshelf_mask(elements, only_major=True)
 
-    # Read log file
-    f = open(log_path, 'r')
-    # Skip the first line (header)
-    f.readline()
-    # Count the number of time indices for the first variable (total mass loss
-    # for all ice shelves, which we don't care about)
-    num_time = 0
-    for line in f:
-        try:
-            tmp = float(line)
-            num_time += 1
-        except(ValueError):
-            # Reached header for first individual ice shelf
-            break
-    # Set up array for mass loss percent change at each ice shelf
-    massloss_change = empty(num_shelves)
-    index = 0
-    # Loop over ice shelves
-    while index < num_shelves:
-        massloss_tmp = []
-        for line in f:
-            try:
-                massloss_tmp.append(float(line))
-            except(ValueError):
-                # Reached the header for the next ice shelf
-                break
-        massloss_start = mean(array(massloss_tmp[skipyears*peryear:(skipyears+10)*peryear]))
-        massloss_end = mean(array(massloss_tmp[-10*peryear:]))
-        massloss_change[index] = (massloss_end - massloss_start)/massloss_start*100
-        index += 1
+    # Read timeseries store, skipping the total mass loss for all ice shelves
+    # (which we don't care about)
+    time, series = read_timeseries(store_path, ['massloss'])
+    massloss_ts = series['massloss'][1:num_shelves+1,:]
+    # Calculate mass loss percent change at each ice shelf
+    massloss_start = mean(massloss_ts[:,skipyears*peryear:(skipyears+10)*peryear], axis=1)
+    massloss_end = mean(massloss_ts[:,-10*peryear:], axis=1)
+    massloss_change = (massloss_end - massloss_start)/massloss_start*100
 
     # Set up colour map
     max_val = amax(massloss_change)
@@ -165,7 +144,7 @@ def massloss_percent_change (mesh_path, log_path, save=False, fig_name=None):
 if __name__ == "__main__":
 
     mesh_path = raw_input("Path to FESOM mesh directory: ")
-    log_path = raw_input("Path to mass loss logfile for RCP: ")
+    store_path = raw_input("Path to mass loss timeseries store for RCP: ")
     action = raw_input("Save figure (s) or display in window (d)? ")
     if action == 's':
         save = True
@@ -173,7 +152,7 @@ if __name__ == "__main__":
     elif action == 'd':
         save = False
         fig_name = None
-    massloss_percent_change(mesh_path, log_path, save, fig_name)
+    massloss_percent_change(mesh_path, store_path, save, fig_name)
         
                 
                 
@@ -4,6 +4,7 @@ from matplotlib.collections import PatchCollection, LineCollection
 from matplotlib.pyplot import *
 from matplotlib.colors import LinearSegmentedColormap
 from patches import *
+from timeseries_store import *
 
 # Make a circumpolar plot of the percentage change in mass loss for each major
 # ice shelf in the high-res spinup (1992-2005 average, rep3) compared to
@@ -47,24 +48,10 @@ def massloss_percent_change_res ():
     # simulation
     massloss = empty([2, num_shelves])
     for expt in range(2):
-        # Read log file
-        f = open(directory_head + expt_paths[expt] + '/massloss.log', 'r')
-        f.readline()
-        for line in f:
-            try:
-                tmp = float(line)
-            except(ValueError):
-                break
-        for index in range(num_shelves):
-            massloss_tmp = []
-            for line in f:
-                try:
-                    massloss_tmp.append(float(line))
-                except(ValueError):
-                    break
-            # Calculate average over third repetition of 1992-2005
-            massloss_tmp = mean(array(massloss_tmp[skipyears*peryear:(skipyears+num_years)*peryear]))
-            massloss[expt,index] = massloss_tmp
+        # Read timeseries store, skipping the total for all ice shelves
+        time_tmp, series = read_timeseries(directory_head + expt_paths[expt] + '/massloss.nc', ['massloss'])
+        # Calculate average over third repetition of 1992-2005
+        massloss[expt,:] = mean(series['massloss'][1:,skipyears*peryear:(skipyears+num_years)*peryear], axis=1)
 
     # Calculate percent change
     percent_change = (massloss[1,:] - massloss[0,:])/massloss[0,:]*100
@@ -0,0 +1,155 @@
+from numpy import *
+from os.path import join, exists, getmtime
+from mesh_render import *
+
+# Pre-rasterised plotting on the FESOM mesh. For a given mesh, projection
+# (circumpolar or global), plot bounds and image size, work out which element
+# contains the centre of each pixel, and the barycentric weights of the
+# element's 3 nodes at that point. This is slow, but it only has to be done
+# once: the raster is saved to a file in the mesh directory (or anywhere
+# else) and reused. After that, drawing any field is just an array lookup and
+# imshow, which makes it practical to plot hundreds of maps or animation
+# frames.
+
+# Rasters which have already been built or read in this session
+_raster_cache = {}
+
+
+# Get the raster for the given mesh, bounds and image size, building it and
+# saving it to disk if it doesn't exist yet.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# x_min, x_max, y_min, y_max = bounds of the plot, in the plotting coordinates
+#                              (lon/lat for global plots, or the polar
+#                              coordinates from fesom_grid for circumpolar)
+# nx, ny = number of pixels in the x and y directions
+# circumpolar = optional boolean flag indicating a circumpolar Antarctic
+#               projection (default True), otherwise global
+# cache_dir = optional directory to save the raster in (default mesh_path)
+# Output:
+# elm_index = integer array of size ny x nx containing the index (in the
+#             list of elements from mesh_geometry) of the element containing
+#             each pixel, or -1 if the pixel isn't in any element (eg land)
+# weights = array of size ny x nx x 3 containing the barycentric weights of
+#           the 3 nodes of that element at the centre of each pixel
+def element_raster (mesh_path, x_min, x_max, y_min, y_max, nx, ny, circumpolar=True, cache_dir=None):
+
+    if cache_dir is None:
+        cache_dir = mesh_path
+    if circumpolar:
+        proj = 'circumpolar'
+    else:
+        proj = 'global'
+    raster_file = join(cache_dir, 'raster_' + proj + '_' + '_'.join([str(val) for val in [x_min, x_max, y_min, y_max, nx, ny]]) + '.npz')
+    stamp = _mesh_stamp(mesh_path)
+
+    if raster_file in _raster_cache and _raster_cache[raster_file][0] == stamp:
+        return _raster_cache[raster_file][1:]
+    if exists(raster_file):
+        raster = load(raster_file)
+        if list(raster['stamp']) == stamp:
+            elm_index = raster['elm_index']
+            weights = raster['weights']
+            _raster_cache[raster_file] = (stamp, elm_index, weights)
+            return elm_index, weights
+        print 'Mesh has changed since ' + raster_file + ' was built'
+
+    print 'Building raster ' + raster_file
+    elements, verts, index = mesh_geometry(mesh_path, circumpolar)
+    elm_index, weights = _rasterise(verts, x_min, x_max, y_min, y_max, nx, ny)
+    savez(raster_file, stamp=array(stamp), elm_index=elm_index, weights=weights)
+    _raster_cache[raster_file] = (stamp, elm_index, weights)
+    return elm_index, weights
+
+
+# Turn a field with one value per element into an image, using a raster from
+# element_raster.
+# Input:
+# elm_index = raster from element_raster
+# values = array (can be masked) with one value for each element in the mesh,
+#          in the same order as the elements from mesh_geometry
+# Output: masked array of size ny x nx, masked wherever there is no element
+#         or the element's value is masked
+def raster_image (elm_index, values):
+
+    values = ma.asarray(values)
+    image = values[maximum(elm_index, 0)]
+    return ma.masked_where((elm_index < 0) + ma.getmaskarray(image), image)
+
+
+# Turn a field defined at the nodes of each element into a smooth image,
+# interpolating within each element using the barycentric weights.
+# Input:
+# elm_index, weights = raster from element_raster
+# node_values = array of size num_elements x 3 containing the value at each
+#               node of each element (eg data[node_ids] where node_ids comes
+#               from element_node_ids)
+# Output: masked array of size ny x nx, masked wherever there is no element
+def raster_image_nodes (elm_index, weights, node_values):
+
+    image = sum(weights*node_values[maximum(elm_index, 0),:], axis=-1)
+    return ma.masked_where(elm_index < 0, image)
+
+
+# Get the node indices of every element, for use with raster_image_nodes.
+# Input: elements = list of Element objects
+# Output: integer array of size num_elements x 3
+def element_node_ids (elements):
+
+    return array([[node.id for node in elm.nodes] for elm in elements])
+
+
+# Show an image from raster_image or raster_image_nodes on the given axes.
+# Input:
+# ax = Axes object
+# image = array of size ny x nx
+# x_min, x_max, y_min, y_max = bounds used to build the raster
+# Any other keyword arguments (eg cmap, vmin, vmax) are passed to imshow.
+# Output: AxesImage object, which can be used for colorbar
+def raster_show (ax, image, x_min, x_max, y_min, y_max, **kwargs):
+
+    return ax.imshow(image, extent=[x_min, x_max, y_min, y_max], origin='lower', interpolation='nearest', **kwargs)
+
+
+# Helper function to find which element contains the centre of each pixel.
+# Each element only looks at the pixels within its bounding box.
+def _rasterise (verts, x_min, x_max, y_min, y_max, nx, ny):
+
+    dx = float(x_max - x_min)/nx
+    dy = float(y_max - y_min)/ny
+    elm_index = -1*ones([ny, nx], dtype=int32)
+    weights = zeros([ny, nx, 3], dtype=float32)
+
+    # Range of pixel indices whose centres could be inside each element
+    i_start = maximum(ceil((amin(verts[:,:,0], axis=1) - x_min)/dx - 0.5), 0).astype(int)
+    i_end = minimum(floor((amax(verts[:,:,0], axis=1) - x_min)/dx - 0.5), nx-1).astype(int)
+    j_start = maximum(ceil((amin(verts[:,:,1], axis=1) - y_min)/dy - 0.5), 0).astype(int)
+    j_end = minimum(floor((amax(verts[:,:,1], axis=1) - y_min)/dy - 0.5), ny-1).astype(int)
+
+    for e in nonzero((i_start <= i_end)*(j_start <= j_end))[0]:
+        i, j = meshgrid(arange(i_start[e], i_end[e]+1), arange(j_start[e], j_end[e]+1))
+        x = x_min + (i+0.5)*dx
+        y = y_min + (j+0.5)*dy
+        x1, x2, x3 = verts[e,:,0]
+        y1, y2, y3 = verts[e,:,1]
+        det = (y2-y3)*(x1-x3) + (x3-x2)*(y1-y3)
+        if det == 0:
+            # Degenerate element
+            continue
+        w1 = ((y2-y3)*(x-x3) + (x3-x2)*(y-y3))/det
+        w2 = ((y3-y1)*(x-x3) + (x1-x3)*(y-y3))/det
+        w3 = 1 - w1 - w2
+        inside = (w1 >= 0)*(w2 >= 0)*(w3 >= 0)
+        elm_index[j[inside], i[inside]] = e
+        weights[j[inside], i[inside], 0] = w1[inside]
+        weights[j[inside], i[inside], 1] = w2[inside]
+        weights[j[inside], i[inside], 2] = w3[inside]
+
+    return elm_index, weights
+
+
+# Helper function to get the modification times of the mesh files, so that
+# a raster built for an older version of the mesh isn't used.
+def _mesh_stamp (mesh_path):
+
+    return [getmtime(join(mesh_path, file_name)) for file_name in ['nod2d.out', 'elem2d.out', 'nod3d.out'] if exists(join(mesh_path, file_name))]
@@ -0,0 +1,122 @@
+from numpy import *
+from matplotlib.collections import PolyCollection
+from os.path import abspath, getmtime
+from fesom_grid import *
+
+# Fast plotting of fields on the FESOM mesh. Instead of one Polygon patch per
+# element (see patches.py), the corners of every element are kept in a single
+# array of size num_elm x 3 x 2, which matplotlib can draw in one go as a
+# PolyCollection. The elements and their corners are built once per mesh and
+# cached, so making several figures in the same python session (or the same
+# figure again) doesn't read the mesh every time.
+
+# Bounds on longitude and latitude of the major ice shelves, used to mask only
+# these shelves (only_major=True). The last two boxes are both parts of the
+# Ross Ice Shelf, on either side of 180E.
+major_lon_min = [-62.67, -65.5, -79.17, -85, -104.17, -102.5, -108.33, -114.5, -135.67, -149.17, -155, 144, 115, 94.17, 80.83, 65, 33.83, 19, 12.9, 9.33, -10.05, -28.33, -181, 158.33]
+major_lon_max = [-59.33, -60, -66.67, -28.33, -88.83, -99.17, -103.33, -111.5, -114.33, -140, -145, 146.62, 123.33, 102.5, 89.17, 75, 37.67, 33.33, 16.17, 12.88, 7.6, -10.33, -146.67, 181]
+major_lat_min = [-73.03, -69.35, -74.17, -83.5, -73.28, -75.5, -75.5, -75.33, -74.9, -76.42, -78, -67.83, -67.17, -66.67, -67.83, -73.67, -69.83, -71.67, -70.5, -70.75, -71.83, -76.33, -85, -84.5]
+major_lat_max = [-69.37, -66.13, -69.5, -74.67, -71.67, -74.17, -74.67, -73.67, -73, -75.17, -76.41, -66.67, -66.5, -64.83, -66.17, -68.33, -68.67, -68.33, -69.33, -69.83, -69.33, -71.5, -77.77, -77]
+
+# Meshes which have already been built. Keys are (absolute mesh path,
+# circumpolar, cross_180), values are (modification times, elements, verts,
+# cavity, major).
+_mesh_cache = {}
+
+
+# Get the corners of the given elements as a single array.
+# Input: elements = list of Element objects (from fesom_grid or similar)
+# Output: array of size len(elements) x 3 x 2 containing the x and y
+#         coordinates of the 3 corners of each element
+def element_verts (elements):
+
+    x = array([elm.x for elm in elements])
+    y = array([elm.y for elm in elements])
+    return dstack((x, y))
+
+
+# Find which elements are entirely inside one of the major ice shelves (as
+# defined by the bounds above). This is the same test used by make_patches
+# and iceshelf_mask with only_major=True.
+# Input: elements = list of Element objects
+# Output: boolean array, True for elements in major ice shelves
+def major_shelf_flags (elements):
+
+    lon = array([elm.lon for elm in elements])
+    lat = array([elm.lat for elm in elements])
+    major = zeros(len(elements), dtype=bool)
+    for index in range(len(major_lon_min)):
+        major += all((lon >= major_lon_min[index])*(lon <= major_lon_max[index])*(lat >= major_lat_min[index])*(lat <= major_lat_max[index]), axis=1)
+    return major
+
+
+# Build (or get from the cache) the mesh and the corners of the elements to
+# plot.
+# Input:
+# mesh_path = path to directory containing grid files
+# circumpolar = optional boolean flag indicating if the plot will be
+#               circumpolar Antarctic (otherwise global)
+# mask_cavities = optional boolean flag indicating if elements in ice shelf
+#                 cavities should be left out
+# only_major = optional boolean flag indicating that, if mask_cavities is
+#              set, only the major ice shelves should be left out
+# cross_180 = optional boolean flag passed on to fesom_grid (default True)
+# Output:
+# elements = list of all the Element objects in the mesh. Don't modify them,
+#            because they are shared with anyone else who asks for this mesh.
+# verts = array of size num_plot x 3 x 2 containing the corners of each
+#         element to plot
+# index = integer array of size num_plot containing the index in elements of
+#         each element in verts, so that a field defined on all elements can
+#         be plotted with values[index]
+def mesh_geometry (mesh_path, circumpolar=False, mask_cavities=False, only_major=False, cross_180=True):
+
+    key = (abspath(mesh_path), circumpolar, cross_180)
+    # Build the mesh again if the grid files have changed since it was cached
+    stamp = [getmtime(mesh_path + file_name) for file_name in ['nod2d.out', 'elem2d.out', 'cavity_flag_nod2d.out']]
+    if key not in _mesh_cache or _mesh_cache[key][0] != stamp:
+        elements = fesom_grid(mesh_path, circumpolar, cross_180)
+        cavity = array([elm.cavity for elm in elements], dtype=bool)
+        _mesh_cache[key] = (stamp, elements, element_verts(elements), cavity, major_shelf_flags(elements))
+    stamp, elements, verts, cavity, major = _mesh_cache[key]
+
+    if not mask_cavities:
+        index = arange(len(elements))
+    elif only_major:
+        index = nonzero(~(cavity*major))[0]
+    else:
+        index = nonzero(~cavity)[0]
+    return elements, verts[index], index
+
+
+# Get the corners of the ice shelf elements, for masking the ice shelves.
+# This is the equivalent of iceshelf_mask in patches.py.
+# Input:
+# elements = list of Element objects
+# only_major = optional boolean flag indicating to only include the major ice
+#              shelves
+# Output: array of size num_shelf x 3 x 2 containing the corners of each ice
+#         shelf element
+def iceshelf_verts (elements, only_major=False):
+
+    keep = array([elm.cavity for elm in elements], dtype=bool)
+    if only_major:
+        keep *= major_shelf_flags(elements)
+    return element_verts(elements)[keep]
+
+
+# Make a collection of elements which can be added to a plot with
+# ax.add_collection, coloured by the given values.
+# Input:
+# verts = array of element corners, from mesh_geometry, element_verts, or
+#         iceshelf_verts
+# values = optional array of values, one per element in verts
+# Any other keyword arguments (eg cmap, facecolor) are passed on to
+# PolyCollection.
+# Output: PolyCollection object
+def element_collection (verts, values=None, **kwargs):
+
+    img = PolyCollection(verts, **kwargs)
+    if values is not None:
+        img.set_array(array(values))
+    return img
@@ -1,10 +1,11 @@
 from netCDF4 import Dataset
 from numpy import *
-from matplotlib.collections import PatchCollection
 from matplotlib.pyplot import *
-from patches import *
 from seasonal_avg import *
 from unesco import *
+from column_kernels import *
+from mesh_render import *
+from mesh_raster import *
 
 # Make a circumpolar Antarctic plot of the change in the winter (JJA average)
 # mixed layer depth (defined as in Sallee et al 2013: depth at which potential
@@ -33,7 +34,7 @@ def mld_jja_diff (mesh_path, file_path_beg, file_path_end, save=False, fig_name=
     font_sizes = [30, 24, 20]
 
     print 'Building grid'
-    elements, patches = make_patches(mesh_path, circumpolar, mask_cavities)
+    elements, verts, index = mesh_geometry(mesh_path, circumpolar, mask_cavities)
 
     print 'Reading data'
     # First 10 years
@@ -47,75 +48,32 @@ def mld_jja_diff (mesh_path, file_path_beg, file_path_end, save=False, fig_name=
     temp_end = tmp[2,:]
     tmp = seasonal_avg(file_path_beg, file_path_end, 'salt')
     salt_end = tmp[2,:]
-    # Calculate potential density (depth 0)
+    # Calculate potential density (depth 0) for both periods at once
     print 'Calculating density'
-    density_beg = unesco(temp_beg, salt_beg, zeros(shape(temp_beg)))
-    density_end = unesco(temp_end, salt_end, zeros(shape(temp_end)))
+    density = unesco(array([temp_beg, temp_end]), array([salt_beg, salt_end]), zeros([2, size(temp_beg)]))
 
-    # Calculate mixed layer depth at each element
+    # Calculate mixed layer depth in every water column, for both periods at
+    # once
     print 'Calculating mixed layer depth'
-    # First 10 years
-    mld_beg = []
-    for elm in elements:
-        if (mask_cavities and not elm.cavity) or (not mask_cavities):
-            # Get mixed layer depth at each node
-            mld_nodes = []
-            # Make sure we exclude ice shelf cavity nodes from element mean
-            # (an Element can be a non-cavity element and still have up to 2
-            # cavity nodes)
-            for i in range(3):
-                if (mask_cavities and not elm.cavity_nodes[i]) or (not mask_cavities):
-                    node = elm.nodes[i]
-                    density_sfc = density_beg[node.id]
-                    temp_depth = node.depth
-                    curr_node = node.below
-                    while True:
-                        if curr_node is None:
-                            # Reached bottom
-                            mld_nodes.append(temp_depth)
-                            break
-                        if density_beg[curr_node.id] >= density_sfc + density_anom:
-                            # Reached critical density anomaly
-                            mld_nodes.append(curr_node.depth)
-                            break
-                        temp_depth = curr_node.depth
-                        curr_node = curr_node.below
-            # For this element, save the mean mixed layer depth across
-            # non-cavity nodes (up to 3)
-            mld_beg.append(mean(array(mld_nodes)))
-    # Last 10 years
-    mld_end = []
-    for elm in elements:
-        if (mask_cavities and not elm.cavity) or (not mask_cavities):
-            # Get mixed layer depth at each node
-            mld_nodes = []
-            # Make sure we exclude ice shelf cavity nodes from element mean
-            # (an Element can be a non-cavity element and still have up to 2
-            # cavity nodes)
-            for i in range(3):
-                if (mask_cavities and not elm.cavity_nodes[i]) or (not mask_cavities):
-                    node = elm.nodes[i]
-                    density_sfc = density_end[node.id]
-                    temp_depth = node.depth
-                    curr_node = node.below
-                    while True:
-                        if curr_node is None:
-                            mld_nodes.append(temp_depth)
-                            break
-                        if density_end[curr_node.id] >= density_sfc + density_anom:
-                            mld_nodes.append(curr_node.depth)
-                            break
-                        temp_depth = curr_node.depth
-                        curr_node = curr_node.below
-            # For this element, save the mean mixed layer depth across
-            # non-cavity nodes (up to 3)
-            mld_end.append(mean(array(mld_nodes)))
+    columns, node_depth = column_table(mesh_path)
+    mld = mixed_layer_depth(density, columns, node_depth, density_anom)
+    # Average to each 2D Element
+    if mask_cavities:
+        plot_elements = [elm for elm in elements if not elm.cavity]
+        # Make sure we exclude ice shelf cavity nodes from element mean
+        # (an Element can be a non-cavity element and still have up to 2
+        # cavity nodes)
+        cavity_nodes = array([elm.cavity_nodes for elm in plot_elements], dtype=bool)
+    else:
+        plot_elements = elements
+        cavity_nodes = None
+    mld_elm = element_mean(mld, element_node_ids(plot_elements), cavity_nodes)
     # Calculate change in mixed layer depth
-    mld_change = array(mld_end) - array(mld_beg)
+    mld_change = mld_elm[1,:] - mld_elm[0,:]
 
     if mask_cavities:
-        # Get mask array of patches for ice shelf cavity elements
-        mask_patches = iceshelf_mask(elements)
+        # Get corners of ice shelf cavity elements, for the mask
+        mask_verts = iceshelf_verts(elements)
 
     # Choose colour bounds
     if limit is not None:
@@ -127,15 +85,14 @@ def mld_jja_diff (mesh_path, file_path_beg, file_path_end, save=False, fig_name=
     # Set up plot
     fig = figure(figsize=(16,12))
     ax = fig.add_subplot(1,1,1, aspect='equal')
-    # Set colourmap for patches, and refer it to the values array
-    img = PatchCollection(patches, cmap='RdBu_r')
-    img.set_array(array(mld_change))
+    # Set colourmap for elements, and refer it to the values array
+    img = element_collection(verts, mld_change, cmap='RdBu_r')
     img.set_edgecolor('face')
-    # Add patches to plot
+    # Add elements to plot
     ax.add_collection(img)
     if mask_cavities:
-        # Set colour to light grey for patches in mask
-        overlay = PatchCollection(mask_patches, facecolor=(0.6, 0.6, 0.6))
+        # Set colour to light grey for elements in mask
+        overlay = element_collection(mask_verts, facecolor=(0.6, 0.6, 0.6))
         overlay.set_edgecolor('face')
         # Add mask to plot
         ax.add_collection(overlay)
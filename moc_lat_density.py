@@ -3,6 +3,13 @@ from numpy import *
 from matplotlib.pyplot import *
 from fesom_grid import *
 from unesco import *
+from column_kernels import *
+from os.path import abspath
+
+# Interface operators which have already been built: absolute mesh path ->
+# (modification times, (nodes, above, below, area, lat))
+_interface_cache = {}
+
 
 # Calculate the meridional overturning streamfunction in latitude-density space.
 # This doesn't seem to quite work yet.
@@ -11,11 +18,9 @@ from unesco import *
 # file_path = path to FESOM output oce.mean.nc file, containing 1 year of output
 # save = optional boolean indicating to save the figure, rather than display
 # fig_name = if save=True, filename for figure
-def moc_lat_density (mesh_path, file_path, save=False, fig_name=None):
-
-    # Options for grid objects
-    circumpolar = False
-    cross_180 = False
+# num_lat, num_density = optional number of latitude and density values to
+#                        calculate the streamfunction at (default 50 and 25)
+def moc_lat_density (mesh_path, file_path, save=False, fig_name=None, num_lat=50, num_density=25):
 
     # Read vertical velocity, temperature, and salinity at every node
     id = Dataset(file_path, 'r')
@@ -27,80 +32,11 @@ def moc_lat_density (mesh_path, file_path, save=False, fig_name=None):
     # Calculate potential density (depth 0) at every node
     density = unesco(temp, salt, zeros(shape(temp)))-1000
 
-    # Build FESOM grid
-    elements = fesom_grid(mesh_path, circumpolar, cross_180)
-
-    # Set up arrays of vertical transport, latitude, upstream density, and
-    # downstream density at every interface between vertical layers of elements
-    transport_all = []
-    lat_all = []
-    density_us_all = []
-    density_ds_all = []
-    # Loop over 2D elements
-    for elm in elements:
-        # Get area and latitude (average over 3 nodes)
-        area = elm.area()
-        lat = mean(elm.lat)
-        nodes_above = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-        nodes = [nodes_above[0].below, nodes_above[1].below, nodes_above[2].below]
-        # Loop from the second layer from the surface, down to the second layer
-        # from the bottom
-        while True:
-            nodes_below = [nodes[0].below, nodes[1].below, nodes[2].below]
-            if None in nodes_below:
-                # Reached the bottom
-                break
-            # Vertical velocity average over 3 nodes
-            w_avg = mean([w[nodes[0].id], w[nodes[1].id], w[nodes[2].id]])
-            # Vertical transport through this triangular interface
-            transport = abs(w_avg)*area*1e-6
-            # Density average over 3D triangular prism above
-            density_above = mean([density[nodes[0].id], density[nodes[1].id], density[nodes[2].id], density[nodes_above[0].id], density[nodes_above[1].id], density[nodes_above[2].id]])
-            # Density average over 3D triangular prism below
-            density_below = mean([density[nodes[0].id], density[nodes[1].id], density[nodes[2].id], density[nodes_below[0].id], density[nodes_below[1].id], density[nodes_below[2].id]])
-            # Figure out which is triangular prism upstream and which is
-            # downstream; save the density values correspondingly
-            if w_avg > 0:
-                density_us = density_below
-                density_ds = density_above
-            else:
-                density_us = density_above
-                density_ds = density_below
-            # Save vertical transport, latitude, upstream and downstream
-            # densities for this interface
-            transport_all.append(transport)
-            lat_all.append(lat)
-            density_us_all.append(density_us)
-            density_ds_all.append(density_ds)
-            # Get ready for next layer down
-            nodes_above = nodes
-            nodes = nodes_below
-
     # Get regular values of latitude and density
-    lat_reg = linspace(-90, 90, num=50)
-    density_reg = linspace(floor(amin(density)), ceil(amax(density)), num=25)
-    # Set up array for overturning streamfunction
-    moc = zeros([size(density_reg), size(lat_reg)])
-    # Loop over latitude
-    for j in range(size(lat_reg)):
-        print 'Processing latitude ' + str(j+1) + ' of ' + str(size(lat_reg))
-        # Make a flag which is 1 for interfaces south of the current latitude,
-        # 0 otherwise
-        flag_lat = zeros(shape(lat_all))
-        index = lat_all <= lat_reg[j]
-        flag_lat[index] = 1
-        # Loop over density
-        for k in range(size(density_reg)):
-            # Make a flag which is 1 or -1 (depending on direction) for
-            # interfaces where the upstream-downstream density gradient crosses
-            # the current density, 0 otherwise
-            flag_density = zeros(shape(density_us_all))
-            index = (density_us_all <= density_reg[k])*(density_ds_all >= density_reg[k])
-            flag_density[index] = 1
-            index = (density_ds_all <= density_reg[k])*(density_us_all >= density_reg[k])
-            flag_density[index] = -1
-            # Calculate MOC
-            moc[k,j] = sum(transport_all*flag_lat*flag_density)            
+    lat_reg = linspace(-90, 90, num=num_lat)
+    density_reg = linspace(floor(amin(density)), ceil(amax(density)), num=num_density)
+    # Calculate overturning streamfunction
+    moc = moc_density(w, density, interface_operator(mesh_path), lat_reg, density_reg)
 
     # Make colour levels
     bound = amax(abs(moc))
@@ -119,7 +55,138 @@ def moc_lat_density (mesh_path, file_path, save=False, fig_name=None):
         fig.savefig(fig_name)
     else:
         fig.show()
-    
+
+
+# Calculate the overturning streamfunction in latitude-density space for
+# every record in a FESOM output file, eg for monitoring how it changes
+# through a simulation.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# file_path = path to FESOM output oce.mean.nc file
+# lat_reg = 1D array of latitude values to calculate the streamfunction at
+# density_reg = 1D array of potential density values (minus 1000 kg/m^3) to
+#               calculate the streamfunction at
+# Output: array of size num_records x size(density_reg) x size(lat_reg)
+#         containing the streamfunction in Sv
+def moc_density_timeseries (mesh_path, file_path, lat_reg, density_reg):
+
+    operator = interface_operator(mesh_path)
+    id = Dataset(file_path, 'r')
+    num_records = id.variables['w'].shape[0]
+    moc = zeros([num_records, size(density_reg), size(lat_reg)])
+    for t in range(num_records):
+        w = id.variables['w'][t,:]
+        temp = id.variables['temp'][t,:]
+        salt = id.variables['salt'][t,:]
+        density = unesco(temp, salt, zeros(shape(temp)))-1000
+        moc[t,:,:] = moc_density(w, density, operator, lat_reg, density_reg)
+    id.close()
+    return moc
+
+
+# Build (or get from the cache) the interfaces between vertical layers of
+# 3D triangular prisms, from the second layer from the surface down to the
+# second layer from the bottom.
+# Input: mesh_path = path to FESOM mesh directory
+# Output:
+# nodes = integer array of size num_interfaces x 3 containing the 3D nodes
+#         at the corners of each interface
+# above, below = same for the nodes one level above and below, ie the other
+#                corners of the prisms on either side of the interface
+# area = array of size num_interfaces containing the area of each interface
+#        in m^2
+# lat = array of size num_interfaces containing the latitude of each
+#       interface (average over 3 nodes)
+def interface_operator (mesh_path):
+
+    key = abspath(mesh_path)
+    # Mesh files for the column table, and the elements
+    stamp = prism_stamp(mesh_path)
+    if key in _interface_cache and _interface_cache[key][0] == stamp:
+        return _interface_cache[key][1]
+
+    # Build FESOM grid, with no elements copied across 180E
+    elements = fesom_grid(mesh_path, False, False)
+    elm_nodes = array([[node.id for node in elm.nodes] for elm in elements])
+    elm_area = array([elm.area() for elm in elements])
+    elm_lat = array([mean(elm.lat) for elm in elements])
+    columns, node_depth = column_table(mesh_path)
+    # Number of levels in each element, ie in the shallowest of its 3 columns
+    num_levels = amin(sum(columns >= 0, axis=1)[elm_nodes], axis=1)
+
+    nodes = []
+    above = []
+    below = []
+    area = []
+    lat = []
+    k = 1
+    while True:
+        # Elements with nodes below this level at all 3 corners
+        index = nonzero(num_levels >= k+2)[0]
+        if size(index) == 0:
+            break
+        nodes.append(columns[elm_nodes[index,:],k])
+        above.append(columns[elm_nodes[index,:],k-1])
+        below.append(columns[elm_nodes[index,:],k+1])
+        area.append(elm_area[index])
+        lat.append(elm_lat[index])
+        k += 1
+    operator = (concatenate(nodes), concatenate(above), concatenate(below), concatenate(area), concatenate(lat))
+    _interface_cache[key] = (stamp, operator)
+    return operator
+
+
+# Calculate the overturning streamfunction in latitude-density space, from
+# the vertical transport through each interface. Each interface transports
+# water from the density of the prism upstream of it to the density of the
+# prism downstream; this counts towards the streamfunction at every density
+# in between, and at every latitude north of the interface. Rather than
+# testing every interface at every point, each interface is added to a 2D
+# histogram at the (density, latitude) point where its contribution starts,
+# and subtracted where it stops, and the histogram is summed cumulatively
+# over both dimensions.
+# Input:
+# w = array of size n3d containing vertical velocity at each node (m/s)
+# density = array of size n3d containing potential density (minus 1000
+#           kg/m^3) at each node
+# operator = interface operator from interface_operator
+# lat_reg, density_reg = 1D arrays of latitude and density values
+#                        (increasing) to calculate the streamfunction at
+# Output: array of size size(density_reg) x size(lat_reg) containing the
+#         streamfunction in Sv
+def moc_density (w, density, operator, lat_reg, density_reg):
+
+    nodes, above, below, area, lat = operator
+    num_lat = size(lat_reg)
+    num_density = size(density_reg)
+
+    # Vertical velocity averaged over 3 nodes
+    w_avg = mean(w[nodes], axis=1)
+    # Vertical transport through each interface in Sv
+    transport = abs(w_avg)*area*1e-6
+    # Density averaged over the triangular prisms above and below
+    density_mid = sum(density[nodes], axis=1)
+    density_above = (density_mid + sum(density[above], axis=1))/6.
+    density_below = (density_mid + sum(density[below], axis=1))/6.
+    # Upstream and downstream densities
+    density_us = where(w_avg > 0, density_below, density_above)
+    density_ds = where(w_avg > 0, density_above, density_below)
+    # Positive if the water gets denser, negative if lighter
+    sign = where(density_us <= density_ds, 1, -1)
+
+    # Range of density indices which each interface counts towards
+    k_start = searchsorted(density_reg, minimum(density_us, density_ds), side='left')
+    k_end = searchsorted(density_reg, maximum(density_us, density_ds), side='right')
+    # First latitude index which each interface counts towards
+    j_start = searchsorted(lat_reg, lat, side='left')
+    # Add the transport where the contribution starts and subtract it where
+    # it stops, then sum up
+    hist_size = (num_density+1)*(num_lat+1)
+    moc = bincount(k_start*(num_lat+1) + j_start, weights=transport*sign, minlength=hist_size)
+    moc -= bincount(k_end*(num_lat+1) + j_start, weights=transport*sign, minlength=hist_size)
+    moc = cumsum(cumsum(reshape(moc, (num_density+1, num_lat+1)), axis=0), axis=1)
+    return moc[:num_density,:num_lat]
+
 
 # Command-line interface
 if __name__ == "__main__":
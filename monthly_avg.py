@@ -1,61 +1,83 @@
 from numpy import *
-from netCDF4 import Dataset
+from read_nodes import *
+from dataset_pool import *
 
 # Calculate a monthly average of the given variable over the given month.
-# This is hard-coded and ugly, because the FESOM output does not have a
-# proper calendar attached to the time axis.
+# The FESOM output does not have a proper calendar attached to the time axis,
+# so this assumes one 365-day year of 5-day averages, and weights each 5-day
+# average by the number of its days which fall in the month (eg January is
+# indices 1-6 (1-based) and 1/5 of index 7).
 # Input:
 # file_path = Path to FESOM output containing 1 year of 5-day averages
 # var = string containing variable name
 # month = month number (0 to 11)
+# nodes = optional array or list of 0-based node indices to read (eg
+#         arange(n2d) for the surface nodes), so the rest of the nodes don't
+#         need to be read at all. Default is all nodes.
 # Output:
-# monthly_data = array of size n containing monthly average of "var"
-def monthly_avg (file_path, var, month):
+# monthly_data = array of size n containing monthly average of "var" (or, if
+#                nodes is set, the monthly average at each of those nodes in
+#                increasing order)
+def monthly_avg (file_path, var, month, nodes=None):
 
-    # Number of days per month
-    ndays_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    return monthly_avg_vars(file_path, [var], month, nodes)[var]
+
+
+# Calculate monthly averages of several variables from the same file at once,
+# as in monthly_avg. The file is kept open in the dataset pool, and the
+# variables are read by a pool of threads (see dataset_pool.py).
+# Input:
+# file_path, month, nodes = as for monthly_avg
+# var_names = list of variable names (eg ['temp', 'salt'])
+# Output: dictionary of variable name -> monthly average as for monthly_avg
+def monthly_avg_vars (file_path, var_names, month, nodes=None):
+
+    t_start, t_end, weights = month_weights(month)
+
+    # Weighted sum over time, converted to an average. This happens in the
+    # reading threads.
+    def time_avg (data):
+        return sum(data*weights[:,None], axis=0)/sum(weights)
 
-    id = Dataset(file_path, 'r')
-    num_pts = id.variables[var].shape[1]
-
-    if month == 0:
-        # January: indices 1-6 (1-based) and 1/5 of index 7
-        monthly_data = sum(id.variables[var][0:6,:]*5, axis=0) + id.variables[var][6,:]
-    elif month == 1:
-        # Feburary: 4/5 of index 7, indices 8-11, and 4/5 of index 12
-        monthly_data = id.variables[var][6,:]*4 + sum(id.variables[var][7:11,:]*5, axis=0) + id.variables[var][11,:]*4
-    elif month == 2:
-        # March: 1/5 of index 12 and indices 13-18
-        monthly_data = id.variables[var][11,:] + sum(id.variables[var][12:18,:]*5, axis=0)
-    elif month == 3:
-        # April: indices 19-24
-        monthly_data = sum(id.variables[var][18:24,:]*5, axis=0)
-    elif month == 4:
-        # May: indices 25-30, 1/5 of index 31
-        monthly_data = sum(id.variables[var][24:30,:]*5, axis=0) + id.variables[var][30,:]
-    elif month == 5:
-        # June: 4/5 of index 31, indices 32-36, 1/5 of index 37
-        monthly_data = id.variables[var][30,:]*4 + sum(id.variables[var][31:36,:]*5, axis=0) + id.variables[var][36,:]
-    elif month == 6:
-        # July: 4/5 of index 37, indices 38-42, 2/5 of index 43
-        monthly_data = id.variables[var][36,:]*4 + sum(id.variables[var][37:42,:]*5, axis=0) + id.variables[var][42,:]*2
-    elif month == 7:
-        # August: 3/5 of index 43, indices 44-48, 3/5 of index 49
-        monthly_data = id.variables[var][42,:]*3 + sum(id.variables[var][43:48,:]*5, axis=0) + id.variables[var][48,:]*3
-    elif month == 8:
-        # September: 2/5 of index 49, indices 50-54, 3/5 of index 55
-        monthly_data = id.variables[var][48,:]*2 + sum(id.variables[var][49:54,:]*5, axis=0) + id.variables[var][54,:]*3
-    elif month == 9:
-        # October: 2/5 of index 55, indices 56-60, 4/5 of index 61
-        monthly_data = id.variables[var][54,:]*2 + sum(id.variables[var][55:60,:]*5, axis=0) + id.variables[var][60,:]*4
-    elif month == 10:
-        # November: 1/5 of index 61, indices 62-66, 4/5 of index 67
-        monthly_data = id.variables[var][60,:] + sum(id.variables[var][61:66,:]*5, axis=0) + id.variables[var][66,:]*4
-    elif month == 11:
-        # December: 1/5 of index 67, indices 68-73
-        monthly_data = id.variables[var][66,:] + sum(id.variables[var][67:73,:]*5, axis=0)
-    id.close()
-    # Convert from sum to average
-    monthly_data /= ndays_month[month]
+    # Only read the output steps we need
+    records = slice(t_start, t_end)
+    if nodes is None:
+        return read_vars(file_path, dict([(var, (var, (records, slice(None)))) for var in var_names]), process=time_avg)
 
+    # Read each variable in a few contiguous ranges of nodes, as in read_nodes
+    nodes, ranges = node_ranges(nodes)
+    requests = {}
+    for var in var_names:
+        for n in range(len(ranges)):
+            requests[(var, n)] = (var, (records, slice(ranges[n][0], ranges[n][1])))
+    range_data = read_vars(file_path, requests, process=time_avg)
+    monthly_data = {}
+    for var in var_names:
+        # Keep only the wanted nodes in each range
+        monthly_data[var] = concatenate([range_data[(var, n)][nodes[(nodes >= start)*(nodes < end)]-start] for n, (start, end) in enumerate(ranges)])
     return monthly_data
+
+
+# Find the output steps which overlap the given month, and how many of their
+# days fall in the month.
+# Input: month = month number (0 to 11)
+# Output:
+# t_start, t_end = range of output steps (0-based, t_end exclusive)
+# weights = integer array of size t_end-t_start containing the number of days
+#           of each output step which fall in the month
+def month_weights (month):
+
+    # Number of days per month
+    ndays_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    # Number of days per output step
+    days_per_output = 5
+
+    # First and last day (exclusive) of this month, 0-based. Use integers
+    # all the way through (numpy's sum of an empty list is a float).
+    start_day = int(sum(ndays_month[:month]))
+    end_day = start_day + ndays_month[month]
+    # Range of output steps which overlap this month
+    t_start = start_day//days_per_output
+    t_end = (end_day-1)//days_per_output + 1
+    weights = array([min(end_day, days_per_output*(t+1)) - max(start_day, days_per_output*t) for t in range(t_start, t_end)])
+    return t_start, t_end, weights
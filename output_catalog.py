@@ -0,0 +1,128 @@
+from netCDF4 import Dataset
+from os import listdir, rename
+from os.path import join, exists, getsize, getmtime
+import json
+import re
+
+# Catalog of the FESOM output files in a simulation directory, so that scripts
+# can ask for "variable X for years A to B" instead of building file names by
+# hand and assuming how many records are in each file. Output files are
+# assumed to be named <experiment>.<year>.<stream>.nc, eg
+# MK44005.1992.oce.mean.nc. For each file the catalog records the experiment
+# name, year, stream (eg oce.mean, ice.mean, forcing.diag, ice.diag), the
+# shape of each variable, and the time values. The catalog is saved to a small
+# index file in the directory, and on the next scan only files which are new
+# or have changed are opened.
+
+# Pattern for output file names
+_file_pattern = re.compile(r'^(.+)\.([0-9]{4})\.([a-z]+\.[a-z]+)\.nc$')
+
+
+# Scan the given output directory and return its catalog, updating the index
+# file if anything has changed.
+# Input:
+# output_path = path to directory containing FESOM output files. Make sure it
+#               ends with a "/".
+# catalog_file = optional path to index file (default output_catalog.json in
+#                output_path)
+# Output: dictionary of file name -> entry for each output file, where each
+#         entry is a dictionary with keys 'path', 'expt', 'year', 'stream',
+#         'size', 'mtime', 'variables' (dictionary of variable name -> shape),
+#         and 'time' (list of time values, empty if there is no time variable)
+def scan_output (output_path, catalog_file=None):
+
+    if catalog_file is None:
+        catalog_file = join(output_path, 'output_catalog.json')
+    old_catalog = {}
+    if exists(catalog_file):
+        f = open(catalog_file, 'r')
+        old_catalog = json.load(f)
+        f.close()
+
+    catalog = {}
+    changed = False
+    for file_name in sorted(listdir(output_path)):
+        match = _file_pattern.match(file_name)
+        if match is None:
+            continue
+        file_path = join(output_path, file_name)
+        size = getsize(file_path)
+        mtime = getmtime(file_path)
+        if file_name in old_catalog and old_catalog[file_name]['size'] == size and old_catalog[file_name]['mtime'] == mtime:
+            entry = old_catalog[file_name]
+        else:
+            print 'Cataloguing ' + file_name
+            entry = {'expt':match.group(1), 'year':int(match.group(2)), 'stream':match.group(3), 'size':size, 'mtime':mtime}
+            id = Dataset(file_path, 'r')
+            entry['variables'] = dict([(str(var), list(id.variables[var].shape)) for var in id.variables])
+            if 'time' in id.variables:
+                entry['time'] = [float(t) for t in id.variables['time'][:]]
+            else:
+                entry['time'] = []
+            id.close()
+            changed = True
+        # The directory might have moved since the catalog was saved
+        entry['path'] = file_path
+        catalog[str(file_name)] = entry
+    if len(catalog) != len(old_catalog):
+        # Some files have disappeared
+        changed = True
+
+    if changed:
+        # Write to a temporary file first so an interrupted scan doesn't
+        # corrupt the index
+        f = open(catalog_file + '.tmp', 'w')
+        json.dump(catalog, f)
+        f.close()
+        rename(catalog_file + '.tmp', catalog_file)
+
+    return catalog
+
+
+# Find the output files containing the given variable for a range of years,
+# one file per year in order. Fails straight away if any year is missing, or
+# if more than one file matches in the same year.
+# Input:
+# catalog = catalog from scan_output
+# var = variable name (eg 'temp')
+# start_year, end_year = integers containing range of years to find
+# expt = optional experiment name (eg 'MK44005') to choose between several
+#        experiments in the same directory
+# stream = optional stream name (eg 'oce.mean') to choose between several
+#          streams containing the same variable
+# Output: list of paths to output files, one for each year
+def find_files (catalog, var, start_year, end_year, expt=None, stream=None):
+
+    files_by_year = {}
+    for entry in catalog.values():
+        if var not in entry['variables']:
+            continue
+        if expt is not None and entry['expt'] != expt:
+            continue
+        if stream is not None and entry['stream'] != stream:
+            continue
+        year = entry['year']
+        if year < start_year or year > end_year:
+            continue
+        if year in files_by_year:
+            raise ValueError('More than one output file contains ' + var + ' for ' + str(year) + ': ' + files_by_year[year] + ' and ' + entry['path'])
+        files_by_year[year] = entry['path']
+
+    missing_years = [year for year in range(start_year, end_year+1) if year not in files_by_year]
+    if len(missing_years) > 0:
+        raise ValueError('No output file contains ' + var + ' for years ' + ', '.join([str(year) for year in missing_years]))
+
+    return [files_by_year[year] for year in range(start_year, end_year+1)]
+
+
+# Look up the catalog entry for the given output file.
+# Input:
+# catalog = catalog from scan_output
+# file_path = path to output file
+# Output: entry dictionary as described in scan_output
+def catalog_entry (catalog, file_path):
+
+    for entry in catalog.values():
+        if entry['path'] == file_path:
+            return entry
+    raise ValueError(file_path + ' is not in the catalog')
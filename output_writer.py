@@ -0,0 +1,114 @@
+from netCDF4 import Dataset
+from numpy import *
+from datetime import datetime
+from os.path import basename
+import sys
+
+# Helpers for writing derived NetCDF files (climatologies, interpolated fields,
+# forcing files, etc.) in a consistent way. Variables can be chunked for the
+# way they will be read: one record at a time (access='map', eg plotting one
+# month of a climatology) or the whole time series at a few nodes
+# (access='timeseries'). Compression (zlib with the shuffle filter) and
+# storing as 32-bit floats are both optional. Every file gets the same global
+# attributes, and every variable gets units and long_name attributes if they
+# are given, so downstream scripts can rely on them.
+
+# Target size of each chunk in bytes, for access='timeseries'
+_chunk_bytes = 2**20
+
+
+# Create a new NetCDF file with the given dimensions and standard global
+# attributes.
+# Input:
+# file_path = path to file to create (overwritten if it exists)
+# dims = list of (dimension name, size) pairs, in order. Use a size of None
+#        for an unlimited dimension (eg time).
+# title = optional string describing what's in the file
+# Output: Dataset open for writing; close it yourself when you're done
+def create_output (file_path, dims, title=None):
+
+    id = Dataset(file_path, 'w')
+    for dim, size_dim in dims:
+        id.createDimension(dim, size_dim)
+    if title is not None:
+        id.title = title
+    id.source = 'FESOM output, processed with fesomtools'
+    id.history = 'Created ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + ' by ' + basename(sys.argv[0])
+
+    return id
+
+
+# Define a new variable in an open file, and optionally fill it in.
+# Input:
+# id = Dataset open for writing
+# var = variable name
+# dims = tuple of dimension names, which must already exist
+# units = optional units string
+# long_name = optional description
+# data = optional array to write to the whole variable straight away
+# access = optional string saying how the variable will mostly be read, which
+#          decides the chunk shape: 'map' for one record (first dimension) at
+#          a time, 'timeseries' for all records at a subset of the other
+#          dimensions (eg nodes), or None for the netCDF default
+# num_records = optional number of records the variable will end up with,
+#               used to choose chunk shapes if the first dimension is
+#               unlimited (default 1 for 'map', 73 for 'timeseries' ie one
+#               year of 5-day averages)
+# zlib = optional boolean flag to compress the variable (with the shuffle
+#        filter; default False)
+# float32 = optional boolean flag to store the variable as 32-bit floats
+#           instead of 64-bit (default False)
+# Output: the new netCDF variable
+def create_var (id, var, dims, units=None, long_name=None, data=None, access=None, num_records=None, zlib=False, float32=False):
+
+    if isinstance(dims, str):
+        dims = (dims,)
+    if float32:
+        var_type = 'f4'
+    else:
+        var_type = 'f8'
+    chunks = None
+    if access is not None:
+        chunks = _chunk_shape(id, dims, access, num_records, dtype(var_type).itemsize)
+    id.createVariable(var, var_type, dims, zlib=zlib, shuffle=zlib, chunksizes=chunks)
+    if units is not None:
+        id.variables[var].units = units
+    if long_name is not None:
+        id.variables[var].long_name = long_name
+    if data is not None:
+        id.variables[var][:] = data
+
+    return id.variables[var]
+
+
+# Helper function to choose chunk sizes for a variable with the given
+# dimensions and access pattern.
+def _chunk_shape (id, dims, access, num_records, itemsize):
+
+    sizes = []
+    for dim in dims:
+        size_dim = len(id.dimensions[dim])
+        if id.dimensions[dim].isunlimited() and dims.index(dim) == 0:
+            if num_records is not None:
+                size_dim = num_records
+            elif access == 'map':
+                size_dim = 1
+            else:
+                size_dim = 365/5
+        sizes.append(max(size_dim, 1))
+
+    if access == 'map':
+        # One record per chunk, everything else in full
+        return [1] + sizes[1:]
+    elif access == 'timeseries':
+        # All records in each chunk, and as much of the other dimensions as
+        # fits in the target chunk size, splitting the first ones first
+        chunks = [sizes[0]]
+        budget = max(_chunk_bytes//(itemsize*sizes[0]), 1)
+        for n in range(1, len(sizes)):
+            rest = int(prod(sizes[n+1:]))
+            chunks.append(int(max(min(sizes[n], budget//rest), 1)))
+            budget = max(budget//chunks[n], 1)
+        return chunks
+    else:
+        raise ValueError('Unknown access pattern ' + str(access))
@@ -1,16 +1,18 @@
 from netCDF4 import Dataset
 from numpy import *
-from matplotlib.collections import PatchCollection
 from matplotlib.pyplot import *
-from patches import *
 from unesco import *
+from column_kernels import *
+from mesh_render import *
+from mesh_raster import *
 
 # Plot the mixed layer depth (defined as in Sallee et al 2013: depth where
 # potential density exceeds surface density by 0.03 kg/m^3).
 # Input:
-# elements = array of Elements for the FESOM grid (created using fesom_grid)
-# patches = array of Polygon patches corresponding to elements (created using
-#           make_patches)
+# mesh_path = path to FESOM mesh directory
+# elements = list of Elements for the FESOM grid (from mesh_geometry)
+# verts = array of the corners of the elements to plot (from mesh_geometry,
+#         with mask_cavities=True)
 # file_path = string containing path to FESOM output file
 # tstep = int specifying index of time axis in file_path (1-based)
 # circumpolar = boolean flag indicating whether to use the circumpolar domain
@@ -19,7 +21,7 @@ from unesco import *
 #        (otherwise will display on screen)
 # fig_name = optional string containing name of figure file, if save = True
 # limit = optional float containing upper bound for colour scale
-def plot_mld (elements, patches, file_path, tstep, circumpolar, save=False, fig_name=None, limit=None):
+def plot_mld (mesh_path, elements, verts, file_path, tstep, circumpolar, save=False, fig_name=None, limit=None):
 
     # Definition of mixed layer depth: where potential density exceeds
     # surface density by this amount (kg/m^3) as in Sallee et al 2013
@@ -51,38 +53,25 @@ def plot_mld (elements, patches, file_path, tstep, circumpolar, save=False, fig_
     print 'Calculating density'
     density = unesco(temp, salt, zeros(shape(temp)))
 
-    # Build an array of mixed layer depth corresponding to each 2D Element
+    # Calculate mixed layer depth in every water column at once
     print 'Calculating mixed layer depth'
-    values = []
-    for elm in elements:
-        if (mask_cavities and not elm.cavity) or (not mask_cavities):
-            # Get mixed layer depth at each node
-            mld_nodes = []
-            # Make sure we exclude ice shelf cavity nodes from element mean
-            # (an Element can be  a non-cavity element and still have up to 2
-            # cavity nodes)
-            for i in range(3):
-                if (mask_cavities and not elm.cavity_nodes[i]) or (not mask_cavities):
-                    node = elm.nodes[i]
-                    density_sfc = density[node.id]
-                    temp_depth = node.depth
-                    curr_node = node.below
-                    while True:
-                        if curr_node is None:
-                            mld_nodes.append(temp_depth)
-                            break
-                        if density[curr_node.id] >= density_sfc + density_anom:
-                            mld_nodes.append(curr_node.depth)
-                            break
-                        temp_depth = curr_node.depth
-                        curr_node = curr_node.below
-            # For this element, save the mean mixed layer depth across
-            # non-cavity nodes (up to 3)
-            values.append(mean(array(mld_nodes)))
+    columns, node_depth = column_table(mesh_path)
+    mld = mixed_layer_depth(density, columns, node_depth, density_anom)
+    # Average to each 2D Element
+    if mask_cavities:
+        plot_elements = [elm for elm in elements if not elm.cavity]
+        # Make sure we exclude ice shelf cavity nodes from element mean
+        # (an Element can be a non-cavity element and still have up to 2
+        # cavity nodes)
+        cavity_nodes = array([elm.cavity_nodes for elm in plot_elements], dtype=bool)
+    else:
+        plot_elements = elements
+        cavity_nodes = None
+    values = element_mean(mld, element_node_ids(plot_elements), cavity_nodes)
 
     if mask_cavities:
-        # Get mask array of patches for ice shelf cavity elements
-        mask_patches = iceshelf_mask(elements)
+        # Get corners of ice shelf cavity elements, for the mask
+        mask_verts = iceshelf_verts(elements)
 
     # Choose colour bounds
     var_min = 0
@@ -99,15 +88,14 @@ def plot_mld (elements, patches, file_path, tstep, circumpolar, save=False, fig_
     else:
         fig = figure(figsize=(16,8))
         ax = fig.add_subplot(1,1,1)
-    # Set colourmap for patches, and refer it to the values array
-    img = PatchCollection(patches, cmap='jet')
-    img.set_array(array(values))
+    # Set colourmap for elements, and refer it to the values array
+    img = element_collection(verts, values, cmap='jet')
     img.set_edgecolor('face')
-    # Add patches to plot
+    # Add elements to plot
     ax.add_collection(img)
     if mask_cavities:
-        # Set colour to light grey for patches in mask
-        overlay = PatchCollection(mask_patches, facecolor=(0.6, 0.6, 0.6))
+        # Set colour to light grey for elements in mask
+        overlay = element_collection(mask_verts, facecolor=(0.6, 0.6, 0.6))
         overlay.set_edgecolor('face')
         # Add mask to plot
         ax.add_collection(overlay)
@@ -165,8 +153,8 @@ if __name__ == "__main__":
         save = False
         fig_name = None
     print "Building grid"
-    elements, patches = make_patches(mesh_path, circumpolar, mask_cavities)
-    plot_mld(elements, patches, file_path, tstep, circumpolar, save, fig_name, limit)
+    elements, verts, index = mesh_geometry(mesh_path, circumpolar, mask_cavities)
+    plot_mld(mesh_path, elements, verts, file_path, tstep, circumpolar, save, fig_name, limit)
 
     # Repeat until user wants to exit
     while True:
@@ -203,8 +191,8 @@ if __name__ == "__main__":
                 fig_name = raw_input("File name for figure: ")
             if new_grid:
                 print "Building grid"
-                elements, patches = make_patches(mesh_path, circumpolar, mask_cavities)
-            plot_mld (elements, patches, file_path, tstep, circumpolar, save, fig_name, limit)
+                elements, verts, index = mesh_geometry(mesh_path, circumpolar, mask_cavities)
+            plot_mld (mesh_path, elements, verts, file_path, tstep, circumpolar, save, fig_name, limit)
         else:
             break
             
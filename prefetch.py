@@ -0,0 +1,115 @@
+from netCDF4 import Dataset
+from numpy import *
+from threading import Thread, Event
+from dataset_pool import netcdf_lock
+import sys
+try:
+    from queue import Queue, Empty, Full
+except ImportError:
+    # Python 2
+    from Queue import Queue, Empty, Full
+
+# Read FESOM output files on a background thread, so that the next file (eg
+# next year's output) is being read while the current one is processed. The
+# queue of files which have been read but not yet processed is bounded, so at
+# most queue_size files are held in memory on top of the one being processed.
+# The netCDF library is not thread-safe, so the background reads hold the same
+# lock as dataset_pool.py. Reads on the main thread which go through
+# dataset_pool.py take turns with them; any other NetCDF access on the main
+# thread must not share file handles with the reads in the background.
+
+# Marker for the end of the files
+_done = object()
+
+
+# Iterate over the given files, reading each one in the background.
+# Input:
+# file_names = list of paths to files
+# read_func = function which takes a file path and returns whatever is needed
+#             from that file (eg annually averaged temperature). It is called
+#             on the background thread while holding netcdf_lock (see
+#             dataset_pool.py). Processing which isn't needed to cut the data
+#             down to size is better left to the main thread.
+# queue_size = optional maximum number of files to read ahead (default 1)
+# Output: generator yielding (file path, result of read_func) for each file,
+#         in order. Any error from read_func is raised here, at the point the
+#         failed file would have been yielded. If the loop over the generator
+#         stops early (eg break or an error in the loop body), the background
+#         thread stops after the file it is currently reading, and anything
+#         already read is thrown away.
+def prefetch (file_names, read_func, queue_size=1):
+
+    queue = Queue(maxsize=queue_size)
+    stop = Event()
+
+    # Put something in the queue, giving up if we are cancelled while waiting
+    # for space
+    def put (item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def worker ():
+        for file_name in file_names:
+            if stop.is_set():
+                return
+            try:
+                with netcdf_lock():
+                    item = (file_name, read_func(file_name), None)
+            except Exception:
+                # Pass the error on to the main thread, with its traceback
+                put((file_name, None, sys.exc_info()))
+                return
+            if not put(item):
+                return
+            # Don't hold on to the data while reading the next file
+            item = None
+        put((_done, None, None))
+
+    thread = Thread(target=worker)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            file_name, data, error = queue.get()
+            if file_name is _done:
+                break
+            if error is not None:
+                raise error[0], error[1], error[2]
+            yield file_name, data
+            data = None
+    finally:
+        stop.set()
+        # Empty the queue so the data can be freed
+        while True:
+            try:
+                queue.get_nowait()
+            except Empty:
+                break
+
+
+# Iterate over the given FESOM output files, reading the annual average of
+# each of the given variables in the background.
+# Input:
+# file_names = list of paths to FESOM output files, each containing one year
+#              of output
+# var_names = list of variable names (eg ['temp', 'salt'])
+# queue_size = optional, as for prefetch
+# Output: generator yielding (file path, dictionary of variable name -> array
+#         of annually averaged values) for each file, in order
+def prefetch_annual_avg (file_names, var_names, queue_size=1):
+
+    # Average in the background, so only the annual averages wait in the queue
+    def read_annual_avg (file_name):
+        id = Dataset(file_name, 'r')
+        data = {}
+        for var in var_names:
+            data[var] = mean(id.variables[var][:,:], axis=0)
+        id.close()
+        return data
+
+    return prefetch(file_names, read_annual_avg, queue_size)
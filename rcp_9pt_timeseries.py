@@ -1,5 +1,6 @@
 from numpy import *
 from matplotlib.pyplot import *
+from expt_timeseries import *
 
 def rcp_9pt_timeseries ():
 
@@ -24,8 +25,6 @@ def rcp_9pt_timeseries ():
     control_skipyears = 28
     # Output steps per year
     peryear = 365/5
-    # Number of ice shelves in timeseries_massloss.py
-    num_shelves_all = 24
     # Indices of ice shelves to plot from timeseries_massloss.py
     shelf_indices = [4, 21, 16, 13, 23, 6, 3, 2, 0]
     # Titles for each ice shelf
@@ -39,42 +38,11 @@ def rcp_9pt_timeseries ():
     num_years = year_end - year_start + 1
     time = arange(year_start, year_end+1)
 
-    # Read timeseries for each experiment
-    massloss = empty([num_rcps+1, num_shelves_all, num_years])
-    # Loop over RCP experiments
-    for expt in range(num_rcps):
-        # Read logfile
-        f = open(directory_head + rcp_expt[expt] + '/massloss.log')
-        f.readline()
-        # Loop over ice shelves
-        for index in range(num_shelves_all):
-            massloss_tmp = []
-            for line in f:
-                try:
-                    massloss_tmp.append(float(line))
-                except(ValueError):
-                    break
-            # Calculate annual averages
-            for year in range(num_years):
-                massloss[expt,index,year] = mean(array(massloss_tmp[peryear*year:peryear*(year+1)]))
-        f.close()
-    # Process control experiment
-    # Read logfile
-    f = open(directory_head + control_expt + '/massloss.log')
-    f.readline()
-    for index in range(num_shelves_all):
-        massloss_tmp = []
-        for line in f:
-            try:
-                massloss_tmp.append(float(line))
-            except(ValueError):
-                break
-        # Throw away spinup years
-        massloss_tmp = massloss_tmp[control_skipyears*peryear:]
-        # Calculate annual averages
-        for year in range(num_years):
-            massloss[-1,index,year] = mean(array(massloss_tmp[peryear*year:peryear*(year+1)]))
-    f.close()
+    # Read timeseries for each experiment, throwing away the spinup years of
+    # the control, and calculate annual averages for all ice shelves at once
+    store_files = [directory_head + expt + '/massloss.nc' for expt in rcp_expt + [control_expt]]
+    skip = [0]*num_rcps + [control_skipyears*peryear]
+    massloss = annual_avg(expt_timeseries(store_files, 'massloss', skip=skip, num_records=num_years*peryear), peryear)
 
     # Set up plot
     fig = figure(figsize=(14,10))
@@ -1,5 +1,7 @@
 from numpy import *
 from matplotlib.pyplot import *
+from timeseries_store import *
+from expt_timeseries import *
 
 def rcp_seaice_formation_timeseries ():
 
@@ -7,8 +9,9 @@ def rcp_seaice_formation_timeseries ():
     directory_beg = '/short/y99/kaa561/FESOM/highres_spinup/'
     directories = ['/short/y99/kaa561/FESOM/rcp45_M/', '/short/y99/kaa561/FESOM/rcp45_A/', '/short/y99/kaa561/FESOM/rcp85_M/', '/short/y99/kaa561/FESOM/rcp85_A/']
     num_expts = len(directories)
-    # Name of logfile from timeseries_seaice_formation.py
-    log_name = 'seaice_formation.log'
+    # Name of timeseries store from timeseries_seaice_formation.py (for the
+    # control, from seaice_formation_concatenate_control.py)
+    store_name = 'seaice_diag.nc'
     # Titles for plot
     beg_title = 'CONTROL'
     rcp_titles = ['RCP 4.5 M', 'RCP 4.5 A', 'RCP 8.5 M', 'RCP 8.5 A']
@@ -26,26 +29,17 @@ def rcp_seaice_formation_timeseries ():
 
     # Set up arrays    
     formation = empty([num_expts+1, num_years])
-    # Read control experiment (correct years already selected)
-    f = open(directory_beg + log_name, 'r')
-    f.readline()
-    t = 0
-    for line in f:
-        formation[-1,t] = float(line)
-        t += 1
-    f.close()
+    # Read control experiment (correct years already selected), and
+    # annually average
+    time_tmp, series = read_timeseries(directory_beg + store_name, ['shelf_formation'])
+    formation[-1,:] = annual_avg(series['shelf_formation'])[:num_years]
     # Loop over RCPs
     for expt in range(num_expts):
         # Copy the beginning of the control
         formation[expt, 0:num_years_rep3] = formation[-1, 0:num_years_rep3]
-        # Now read logfile for the rest of it
-        f = open(directories[expt] + log_name, 'r')
-        f.readline()
-        t = num_years_rep3
-        for line in f:
-            formation[expt,t] = float(line)
-            t += 1
-        f.close()
+        # Now read the store for the rest of it
+        time_tmp, series = read_timeseries(directories[expt] + store_name, ['shelf_formation'])
+        formation[expt, num_years_rep3:] = annual_avg(series['shelf_formation'])[:num_years-num_years_rep3]
 
     beg_mean = mean(formation[-1,1996-year_start:rcp_year_start-year_start])
     print 'Mean over 1996-2005: ' + str(beg_mean) + ' thousand km^3/y'
@@ -2,7 +2,7 @@ from netCDF4 import Dataset
 from numpy import *
 from matplotlib.pyplot import *
 from matplotlib.colors import *
-from fesom_grid import *
+from ts_census import *
 from unesco import *
 
 def rcp_ts_distribution (key=1):
@@ -39,9 +39,6 @@ def rcp_ts_distribution (key=1):
         max_salt_plot = 35
         min_temp_plot = -2.5
         max_temp_plot = -1
-    # FESOM grid generation parameters
-    circumpolar = False
-    cross_180 = False
 
     print 'Setting up bins'
     # Calculate boundaries of temperature bins
@@ -51,11 +48,6 @@ def rcp_ts_distribution (key=1):
     # Repeat for salinity
     salt_bins = linspace(min_salt, max_salt, num=num_bins)
     salt_centres = 0.5*(salt_bins[:-1] + salt_bins[1:])
-    # Set up 3D array of experiment x temperature bins x salinity bins to hold
-    # average depth of water masses, weighted by volume
-    ts_vals = zeros([num_expts+1, size(temp_centres), size(salt_centres)])
-    # Also array to integrate volume of each bin
-    volume = zeros([num_expts+1, size(temp_centres), size(salt_centres)])
     # Calculate surface freezing point as a function of salinity as seen by
     # sea ice model
     freezing_pt = -0.0575*salt_centres + 1.7105e-3*sqrt(salt_centres**3) - 2.155e-4*salt_centres**2
@@ -71,7 +63,11 @@ def rcp_ts_distribution (key=1):
         density_lev = arange(27.2, 28.4, 0.2)
 
     print 'Building grid'
-    elements = fesom_grid(mesh_path, circumpolar, cross_180)
+    elements, elm_index, top, bottom, prism_vol = prism_table(mesh_path)
+    # Only consider prisms in the region of interest
+    in_region = array([all(elm.lat < nbdry) for elm in elements])[elm_index]
+    # Average depth of each prism
+    prism_depth = prism_mean(column_table(mesh_path)[1], top, bottom)
 
     print 'Reading data'
     # 1996-2005
@@ -89,53 +85,13 @@ def rcp_ts_distribution (key=1):
         salt_nodes[expt+1,:] = id.variables['salt'][0,:]
         id.close()
 
-    print 'Binning elements'
-    for elm in elements:
-        # See if we're in the region of interest
-        if all(elm.lat < nbdry):
-            # Get area of 2D triangle
-            area = elm.area()
-            nodes = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-            # Loop downward
-            while True:
-                if nodes[0].below is None or nodes[1].below is None or nodes[2].below is None:
-                    # We've reached the bottom
-                    break
-                # Calculate average temperature and salinity for each
-                # experiment, as well as depth and layer thickness, over this
-                # 3D triangular prism.
-                temp_vals = empty([num_expts+1, 6])
-                salt_vals = empty([num_expts+1, 6])
-                depth_vals = empty(6)
-                dz = empty(3)
-                for i in range(3):
-                    # Loop over experiments
-                    for expt in range(num_expts+1):
-                        # Average temperature over 6 nodes
-                        temp_vals[expt,i] = temp_nodes[expt,nodes[i].id]
-                        temp_vals[expt,i+3] = temp_nodes[expt,nodes[i].below.id]
-                        salt_vals[expt,i] = salt_nodes[expt,nodes[i].id]
-                        salt_vals[expt,i+3] = salt_nodes[expt,nodes[i].below.id]
-                    # Average depth over 6 nodes
-                    depth_vals[i] = nodes[i].depth
-                    depth_vals[i+3] = nodes[i].below.depth
-                    # Average dz over 3 vertical edges
-                    dz[i] = abs(nodes[i].depth - nodes[i].below.depth)
-                    # Get ready for next repetition of loop
-                    nodes[i] = nodes[i].below
-                temp_elm = mean(temp_vals, axis=1)
-                salt_elm = mean(salt_vals, axis=1)
-                depth_elm = mean(depth_vals)
-                # Calculate volume of 3D triangular prism
-                curr_volume = area*mean(dz)
-                # Loop over experiments again
-                for expt in range(num_expts+1):
-                    # Figure out which bins this falls into
-                    temp_index = nonzero(temp_bins > temp_elm[expt])[0][0] - 1
-                    salt_index = nonzero(salt_bins > salt_elm[expt])[0][0] - 1
-                    # Integrate depth*volume in this bin
-                    ts_vals[expt, temp_index, salt_index] += depth_elm*curr_volume
-                    volume[expt, temp_index, salt_index] += curr_volume
+    print 'Binning prisms'
+    # For each experiment x temperature bin x salinity bin, integrate
+    # depth*volume and volume, for all the experiments at once
+    temp_prisms = prism_mean(temp_nodes, top, bottom)
+    salt_prisms = prism_mean(salt_nodes, top, bottom)
+    ts_vals = ts_census(temp_prisms, salt_prisms, prism_depth*prism_vol, temp_bins, salt_bins, in_region)
+    volume = ts_census(temp_prisms, salt_prisms, prism_vol, temp_bins, salt_bins, in_region)
     # Mask bins with zero volume
     ts_vals = ma.masked_where(volume==0, ts_vals)
     volume = ma.masked_where(volume==0, volume)
@@ -0,0 +1,73 @@
+from netCDF4 import Dataset
+from numpy import *
+
+# Read a FESOM output variable at a subset of nodes only (eg the surface
+# nodes, or the nodes in ice shelf cavities), instead of reading every node
+# and then throwing most of them away. The node indices are sorted and grouped
+# into contiguous ranges, with nearby ranges merged so that a few wasted nodes
+# are read rather than making lots of tiny reads.
+
+
+# Group a set of node indices into ranges to read.
+# Input:
+# nodes = array or list of 0-based node indices, in any order, possibly with
+#         repeats
+# max_gap = optional maximum number of unwanted nodes to read between two
+#           wanted nodes rather than starting a new range (default 1000)
+# Output:
+# nodes = sorted array of the unique node indices
+# ranges = list of (start, end) tuples, where end is exclusive as for slicing,
+#          which together cover all the nodes
+def node_ranges (nodes, max_gap=1000):
+
+    nodes = unique(array(nodes, dtype=int))
+    if size(nodes) == 0:
+        return nodes, []
+    # Find where the gap between consecutive nodes is too big
+    breaks = nonzero(nodes[1:] - nodes[:-1] > max_gap+1)[0]
+    starts = concatenate(([nodes[0]], nodes[breaks+1]))
+    ends = concatenate((nodes[breaks], [nodes[-1]])) + 1
+    return nodes, list(zip(starts, ends))
+
+
+# Read the given variable at a subset of nodes.
+# Input:
+# file_path = path to FESOM output file, or a Dataset which is already open
+# var = variable name
+# nodes = array or list of 0-based node indices to read
+# max_gap = optional, as for node_ranges
+# records = optional slice (or index) along the first dimension (eg time) to
+#           read. Default is all records.
+# Output:
+# data = array of size (any leading dimensions, eg time) x number of unique
+#        nodes, with the nodes in increasing order
+# node_map = integer array such that data[...,node_map[n]] is the value at
+#            node n, for any n in nodes. Indices of nodes which weren't read
+#            are -1.
+def read_nodes (file_path, var, nodes, max_gap=1000, records=None):
+
+    nodes, ranges = node_ranges(nodes, max_gap)
+    if hasattr(file_path, 'variables'):
+        id = file_path
+    else:
+        id = Dataset(file_path, 'r')
+    ncvar = id.variables[var]
+    data = None
+    i = 0
+    for start, end in ranges:
+        # Read this range in one go, then keep only the wanted nodes
+        if records is None:
+            data_tmp = ncvar[...,start:end]
+        else:
+            data_tmp = ncvar[records,...,start:end]
+        if data is None:
+            data = empty(data_tmp.shape[:-1] + (size(nodes),))
+        range_nodes = nodes[(nodes >= start)*(nodes < end)]
+        data[...,i:i+size(range_nodes)] = data_tmp[...,range_nodes-start]
+        i += size(range_nodes)
+    if id is not file_path:
+        id.close()
+
+    node_map = -1*ones(amax(nodes)+1 if size(nodes) > 0 else 0, dtype=int)
+    node_map[nodes] = arange(size(nodes))
+    return data, node_map
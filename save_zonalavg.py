@@ -1,6 +1,7 @@
 from numpy import *
 from netCDF4 import Dataset
 from fesom_intersectgrid import *
+from output_writer import *
 
 def save_zonalavg (mesh_path, in_file, tstep, out_file):
 
@@ -23,21 +24,11 @@ def save_zonalavg (mesh_path, in_file, tstep, out_file):
     salt = ma.masked_where(isnan(salt), salt)
 
     print 'Writing ' + out_file
-    id = Dataset(out_file, 'w')
-    id.createDimension('latitude', num_lat)
-    id.createDimension('depth', num_depth)
-    id.createVariable('latitude', 'f8', ('latitude'))
-    id.variables['latitude'].units = 'degrees_north'
-    id.variables['latitude'][:] = lat_vals
-    id.createVariable('depth', 'f8', ('depth'))
-    id.variables['depth'].units = 'm'
-    id.variables['depth'][:] = depth_vals
-    id.createVariable('temp', 'f8', ('depth', 'latitude'))
-    id.variables['temp'].units = 'degC'
-    id.variables['temp'][:,:] = temp
-    id.createVariable('salt', 'f8', ('depth', 'latitude'))
-    id.variables['salt'].units = 'psu'
-    id.variables['salt'][:,:] = salt
+    id = create_output(out_file, [('latitude', num_lat), ('depth', num_depth)], title='zonally averaged temperature and salinity')
+    create_var(id, 'latitude', ('latitude'), units='degrees_north', long_name='latitude', data=lat_vals)
+    create_var(id, 'depth', ('depth'), units='m', long_name='depth', data=depth_vals)
+    create_var(id, 'temp', ('depth', 'latitude'), units='degC', long_name='zonally averaged potential temperature', data=temp, zlib=True)
+    create_var(id, 'salt', ('depth', 'latitude'), units='psu', long_name='zonally averaged salinity', data=salt, zlib=True)
     id.close()
 
 
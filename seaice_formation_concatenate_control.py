@@ -1,47 +1,44 @@
 from numpy import *
+from timeseries_store import *
+from seaice_metrics import *
 
 def seaice_formation_concatenate_control ():
 
     # File paths
     directory_head = '/short/y99/kaa561/FESOM/highres_spinup/'
-    log_name = 'seaice_formation.log'
+    store_name = 'seaice_diag.nc'
     # Years to consider
     start_year = 1992
     end_year = 2100
     # Spinup forcing repetitions to consider
     start_rep = 3
     end_rep = 10
+    # Series from timeseries_seaice_formation.py
+    var_names = ['growth', 'melt', 'net_growth', 'shelf_formation']
+    days_per_output = 5
+    peryear = 365/days_per_output
 
-    num_years = end_year-start_year+1
-    # Set up array to hold timeseries
-    formation = empty(num_years)
-    # Read all but the last repetition
-    year = 0
-    for rep in range(start_rep, end_rep):
-        f = open(directory_head + 'rep' + str(rep) + '/' + log_name, 'r')
-        f.readline()
-        t = year
-        for line in f:
-            formation[t] = float(line)
-            t += 1
-        year = t
-        f.close()
-    # Read what we need from the last repetition
-    f = open(directory_head + 'rep' + str(end_rep) + '/' + log_name, 'r')
-    f.readline()
-    t = year
-    for line in f:
-        if t < num_years:
-            formation[t] = float(line)
-            t += 1
-    f.close()
+    num_records = (end_year-start_year+1)*peryear
+    # Set up arrays to hold timeseries
+    series = {}
+    for var in var_names:
+        series[var] = empty(num_records)
+    # Read each repetition in turn
+    t = 0
+    for rep in range(start_rep, end_rep+1):
+        time_tmp, series_tmp = read_timeseries(directory_head + 'rep' + str(rep) + '/' + store_name, var_names)
+        # Only read what we need from the last repetition
+        num_rep = min(size(time_tmp), num_records-t)
+        for var in var_names:
+            series[var][t:t+num_rep] = series_tmp[var][:num_rep]
+        t += num_rep
 
     # Write output
-    f = open(directory_head + log_name, 'w')
-    f.write('Net sea ice formation on continental shelf (thousand km^3/y):\n')
-    for t in range(num_years):
-        f.write(str(formation[t]) + '\n')
-    f.close()
+    time = start_year + arange(num_records)*days_per_output/365.
+    units = {}
+    for var in var_names:
+        units[var] = seaice_units[var]
+    write_timeseries(directory_head + store_name, time, series, units=units)
 
 
 # Command-line interface
@@ -0,0 +1,178 @@
+from netCDF4 import Dataset
+from numpy import *
+from os.path import abspath, getmtime
+from fesom_grid import *
+from read_nodes import *
+from timeseries_store import *
+
+# Sea ice diagnostics from FESOM ice.mean.nc and ice.diag.nc files, all from
+# one read of each file. The elements south of 30S, their areas, and which
+# ones are on the continental shelf are found once per mesh. Every variable
+# in the file is read in one go (only at the nodes of these elements),
+# averaged over the 3 nodes of each element for all records at once, and
+# integrated over the whole domain and any number of regions with a single
+# matrix product per field. Every series from a file can then be appended to
+# one timeseries store (see timeseries_store.py), so a new year of output
+# costs one read and one pass.
+
+# Units of each series from seaice_metrics. Regional series (with "region_"
+# in front of the name) have the same units.
+seaice_units = {'area':'million km^2', 'volume':'thousand km^3', 'extent':'million km^2', 'growth':'thousand km^3/y', 'melt':'thousand km^3/y', 'net_growth':'thousand km^3/y', 'shelf_formation':'thousand km^3/y'}
+
+# Element tables which have already been built: absolute mesh path ->
+# (modification times, node_ids, area, lon, lat, shelf)
+_seaice_cache = {}
+
+
+# Build (or get from the cache) the table of elements south of 30S.
+# Input: mesh_path = path to FESOM mesh directory
+# Output:
+# node_ids = integer array of size num_elements x 3 containing the 0-based
+#            surface node indices of each element
+# area = array of size num_elements containing the area of each element (m^2)
+# lon, lat = arrays of size num_elements containing the average longitude and
+#            latitude of the nodes of each element
+# shelf = boolean array of size num_elements, True for elements on the
+#         Antarctic continental shelf (south of 60S, average bathymetry
+#         shallower than 1500 m, and not in an ice shelf cavity)
+def seaice_elements (mesh_path):
+
+    # Parameters for selecting continental shelf
+    lat0 = -60
+    h0 = 1500
+
+    key = abspath(mesh_path)
+    stamp = [getmtime(mesh_path + file_name) for file_name in ['nod2d.out', 'nod3d.out', 'aux3d.out', 'elem2d.out']]
+    if key in _seaice_cache and _seaice_cache[key][0] == stamp:
+        return _seaice_cache[key][1:]
+
+    elements = fesom_grid(mesh_path, circumpolar=True, cross_180=False)
+    node_ids = array([[node.id for node in elm.nodes] for elm in elements])
+    area = array([elm.area() for elm in elements])
+    lon = array([mean(elm.lon) for elm in elements])
+    lat = array([mean(elm.lat) for elm in elements])
+    bathy = array([mean([node.find_bottom().depth for node in elm.nodes]) for elm in elements])
+    cavity = array([elm.cavity for elm in elements], dtype=bool)
+    shelf = (lat < lat0)*(bathy < h0)*invert(cavity)
+
+    _seaice_cache[key] = (stamp, node_ids, area, lon, lat, shelf)
+    return node_ids, area, lon, lat, shelf
+
+
+# Calculate every sea ice diagnostic available from one output file, for all
+# of its records.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# file_path = path to FESOM ice.mean.nc file (containing "area" and "hice")
+#             and/or ice.diag.nc file (containing "thdgr")
+# regions = optional list with one entry for each region, containing a list
+#           of (lon_min, lon_max, lat_min, lat_max) boxes. An element counts
+#           towards the region if its centre is inside one of the boxes.
+# min_conc = optional minimum sea ice concentration for the extent (default
+#            0.15)
+# Output:
+# num_time = number of records in the file
+# series = dictionary of series name -> array of size num_time, with units
+#          as in seaice_units. From "area" and "hice":
+#          'area' = total sea ice area
+#          'volume' = total sea ice volume
+#          'extent' = total area of elements with concentration >= min_conc
+#          From "thdgr":
+#          'growth' = total thermodynamic sea ice growth (where positive)
+#          'melt' = total thermodynamic sea ice melt (where growth is
+#                   negative, as a positive number)
+#          'net_growth' = growth minus melt
+#          'shelf_formation' = net growth on the continental shelf (see
+#                              seaice_elements)
+#          If regions is set, each of these (except shelf_formation) also has
+#          a regional version, eg 'region_area', of size len(regions) x
+#          num_time.
+def seaice_metrics (mesh_path, file_path, regions=None, min_conc=0.15):
+
+    # Seconds to years conversion
+    sec_per_year = 365.25*24*60*60
+
+    node_ids, area, lon, lat, shelf = seaice_elements(mesh_path)
+    # Area weights of every element for the whole domain, then each region
+    weights = [area]
+    if regions is not None:
+        for boxes in regions:
+            in_region = zeros(size(area), dtype=bool)
+            for lon_min, lon_max, lat_min, lat_max in boxes:
+                in_region += (lon >= lon_min)*(lon <= lon_max)*(lat >= lat_min)*(lat <= lat_max)
+            weights.append(area*in_region)
+    weights = array(weights)
+
+    # Read every variable which is there, only at the nodes we need
+    id = Dataset(file_path, 'r')
+    num_time = id.variables['time'].shape[0]
+    var_names = [var for var in ['area', 'hice', 'thdgr'] if var in id.variables]
+    data = {}
+    for var in var_names:
+        values, node_map = read_nodes(id, var, node_ids)
+        # Average over the 3 nodes of each element, for all records at once
+        data[var] = mean(ma.filled(values, 0)[:,node_map[node_ids]], axis=-1)
+    id.close()
+
+    integrals = {}
+    if 'area' in data:
+        # Convert to million km^2
+        integrals['area'] = weights.dot(transpose(data['area']))*1e-12
+        integrals['extent'] = weights.dot(transpose(data['area'] >= min_conc))*1e-12
+        if 'hice' in data:
+            # Convert to thousand km^3
+            integrals['volume'] = weights.dot(transpose(data['area']*data['hice']))*1e-12
+    if 'thdgr' in data:
+        # Convert from m/s to m/y, and then to thousand km^3/y
+        thdgr = data['thdgr']*sec_per_year
+        integrals['growth'] = weights.dot(transpose(maximum(thdgr, 0)))*1e-12
+        integrals['melt'] = -1*weights.dot(transpose(minimum(thdgr, 0)))*1e-12
+        integrals['net_growth'] = integrals['growth'] - integrals['melt']
+
+    series = {}
+    for var in integrals:
+        series[var] = integrals[var][0,:]
+        if regions is not None:
+            series['region_' + var] = integrals[var][1:,:]
+    if 'thdgr' in data:
+        series['shelf_formation'] = dot(area*shelf, transpose(thdgr))*1e-12
+    return num_time, series
+
+
+# Calculate every sea ice diagnostic from one output file and append them all
+# to a timeseries store.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# file_path = path to FESOM ice.mean.nc or ice.diag.nc file, as for
+#             seaice_metrics. Use a separate store for each type of file.
+# store_file = path to NetCDF timeseries store (see timeseries_store.py). If
+#              the file has already been processed into the store, nothing
+#              is done.
+# regions = optional list of region boxes, as for seaice_metrics
+# region_names = optional list of names for each region, to label the store
+# days_per_output = optional number of days for each record (default 5)
+# Output: True if the file was processed, False if it was already in the
+#         store
+def update_seaice_store (mesh_path, file_path, store_file, regions=None, region_names=None, days_per_output=5):
+
+    # Skip this file if it's already been processed into the store
+    if len(new_inputs(store_file, [file_path])) == 0:
+        print file_path + ' has already been processed'
+        return False
+
+    start_t = timeseries_length(store_file)
+    num_time, series = seaice_metrics(mesh_path, file_path, regions)
+    time = (start_t + arange(num_time))*days_per_output/365.
+    dims = {}
+    units = {}
+    for var in series:
+        if var.startswith('region_'):
+            dims[var] = ['region']
+            units[var] = seaice_units[var[len('region_'):]]
+        else:
+            units[var] = seaice_units[var]
+    labels = {}
+    if region_names is not None:
+        labels['region'] = region_names
+    append_timeseries(store_file, time, series, dims=dims, labels=labels, units=units, inputs=[(file_path, num_time)])
+    return True
@@ -1,5 +1,7 @@
 from netCDF4 import Dataset
 from numpy import *
+from dataset_pool import *
+from output_writer import *
 
 # Create a seasonal climatology (DJF, MAM, JJA, SON) of ocean variables
 # (3D temperature and salinity) and sea ice variables (2D concentration and
@@ -16,6 +18,15 @@ def seasonal_climatology (directory, start_year, end_year, out_file_oce, out_fil
 
     # Filename head
     expt_name = 'MK44005'
+    # Season index, range of 5-day records overlapping that season (0-based,
+    # end exclusive), and number of days in each record which fall in the
+    # season
+    # Indices 1-11 and 4/5 of index 12 (1-based) are DJF (59 days)
+    # 1/5 of index 12, indices 13-30, and 1/5 of index 31 are MAM (92 days)
+    # 4/5 of index 31, indices 32-48, and 3/5 of index 49 are JJA (92 days)
+    # 2/5 of index 49, indices 50-66, and 4/5 of index 67 are SON (91 days)
+    # 1/5 of index 67 and indices 68-73 are DJF again (31 days)
+    season_records = [(0, 0, 12, array([5]*11 + [4])), (1, 11, 31, array([1] + [5]*18 + [1])), (2, 30, 49, array([4] + [5]*17 + [3])), (3, 48, 67, array([2] + [5]*17 + [4])), (0, 66, 73, array([1] + [5]*6))]
 
     '''print 'Processing ocean velocity'
     # Read number of 3D nodes from first file
@@ -78,9 +89,8 @@ def seasonal_climatology (directory, start_year, end_year, out_file_oce, out_fil
 
     print 'Processing ocean'
     # Read number of 3D nodes from first file
-    id = Dataset(directory + expt_name + '.' + str(start_year) + '.oce.mean.nc', 'r')
+    id = get_dataset(directory + expt_name + '.' + str(start_year) + '.oce.mean.nc')
     n3d = id.variables['temp'].shape[1]
-    id.close()
     # Set up arrays to integrate seasonal climatology of temp and salt
     seasonal_temp = ma.empty([4, n3d]) 
     seasonal_salt = ma.empty([4, n3d])
@@ -91,48 +101,27 @@ def seasonal_climatology (directory, start_year, end_year, out_file_oce, out_fil
     # Loop over years
     for year in range(start_year, end_year+1):
         print '...' + str(year)
-        id = Dataset(directory + expt_name + '.' + str(year) + '.oce.mean.nc', 'r')
-        # Indices 1-11 and 4/5 of index 12 are DJF (59 days)
-        seasonal_temp[0,:] += sum(id.variables['temp'][0:11,:]*5, axis=0) + id.variables['temp'][11,:]*4
-        seasonal_salt[0,:] += sum(id.variables['salt'][0:11,:]*5, axis=0) + id.variables['salt'][11,:]*4
-        ndays[0] += 59
-        # 1/5 of index 12, indices 13-30, and 1/5 of index 31 are MAM (92 days)
-        seasonal_temp[1,:] += id.variables['temp'][11,:] + sum(id.variables['temp'][12:30,:]*5, axis=0) + id.variables['temp'][30,:]
-        seasonal_salt[1,:] += id.variables['salt'][11,:] + sum(id.variables['salt'][12:30,:]*5, axis=0) + id.variables['salt'][30,:]
-        ndays[1] += 92
-        # 4/5 of index 31, indices 32-48, and 3/5 of index 49 are JJA (92 days)
-        seasonal_temp[2,:] += id.variables['temp'][30,:]*4 + sum(id.variables['temp'][31:48]*5, axis=0) + id.variables['temp'][48,:]*3
-        seasonal_salt[2,:] += id.variables['salt'][30,:]*4 + sum(id.variables['salt'][31:48]*5, axis=0) + id.variables['salt'][48,:]*3
-        ndays[2] += 92
-        # 2/5 of index 49, indices 50-66, and 4/5 of index 67 are SON (91 days)
-        seasonal_temp[3,:] += id.variables['temp'][48,:]*2 + sum(id.variables['temp'][49:66,:]*5, axis=0) + id.variables['temp'][66,:]*4
-        seasonal_salt[3,:] += id.variables['salt'][48,:]*2 + sum(id.variables['salt'][49:66,:]*5, axis=0) + id.variables['salt'][66,:]*4
-        ndays[3] += 91
-        # 1/5 of index 67 and indices 68-73 are DJF again (31 days)
-        seasonal_temp[0,:] += id.variables['temp'][66,:] + sum(id.variables['temp'][67:73,:]*5, axis=0)
-        seasonal_salt[0,:] += id.variables['salt'][66,:] + sum(id.variables['salt'][67:73,:]*5, axis=0)
-        ndays[0] += 31
-        id.close()
+        file_path = directory + expt_name + '.' + str(year) + '.oce.mean.nc'
+        for season, t_start, t_end, weights in season_records:
+            # Read temp and salt for the records overlapping this season
+            # together, and weight each record by its number of days in the
+            # season
+            data = read_vars(file_path, {'temp':('temp', slice(t_start, t_end)), 'salt':('salt', slice(t_start, t_end))}, process=lambda data: sum(data*weights[:,None], axis=0))
+            seasonal_temp[season,:] += data['temp']
+            seasonal_salt[season,:] += data['salt']
+            ndays[season] += sum(weights)
     # Convert from sums to averages
     for season in range(4):
         seasonal_temp[season,:] = seasonal_temp[season,:]/ndays[season]
         seasonal_salt[season,:] = seasonal_salt[season,:]/ndays[season]
     # Write to file
     print 'Writing ' + out_file_oce
-    id = Dataset(out_file_oce, 'w')
-    id.createDimension('nodes_3d', n3d)
-    id.createDimension('T', None)
-    id.createVariable('season', 'f8', ('T'))
-    id.variables['season'].long_name = 'DJF, MAM, JJA, SON'
-    id.variables['season'][:] = arange(1,4+1)
-    id.createVariable('temp', 'f8', ('T', 'nodes_3d'))
+    id = create_output(out_file_oce, [('nodes_3d', n3d), ('T', None)], title='seasonal climatology over ' + str(start_year) + '-' + str(end_year))
+    create_var(id, 'season', ('T'), long_name='DJF, MAM, JJA, SON', data=arange(1,4+1))
+    create_var(id, 'temp', ('T', 'nodes_3d'), units='degC', long_name='mean potential temperature', data=seasonal_temp, access='map', zlib=True)
     id.variables['temp'].description = 'mean potential temperature'
-    id.variables['temp'].units = 'degC'
-    id.variables['temp'][:,:] = seasonal_temp
-    id.createVariable('salt', 'f8', ('T', 'nodes_3d'))
+    create_var(id, 'salt', ('T', 'nodes_3d'), units='psu', long_name='mean salinity', data=seasonal_salt, access='map', zlib=True)
     id.variables['salt'].description = 'mean salinity'
-    id.variables['salt'].units = 'psu'
-    id.variables['salt'][:,:] = seasonal_salt
     id.close()
 
     '''print 'Processing sea ice'
@@ -0,0 +1,151 @@
+from numpy import *
+from scipy.sparse import coo_matrix
+from os.path import abspath
+from column_kernels import *
+from read_nodes import *
+
+# Basal mass loss and area-averaged melt rates over any set of ice shelf
+# regions (eg individual ice shelves, or ice shelf draft classes). Each
+# cavity element is assigned to regions once per mesh, and the area of each
+# element is split equally between its 3 nodes in a sparse matrix of size
+# num_regions x n2d. The mass loss of every region at every time step then
+# comes from one sparse product with the melt rate at the nodes, so the
+# whole record in a forcing.diag.nc file is processed at once.
+
+# Area operators which have already been built: (absolute mesh path, region
+# type, options) -> (modification times, operator, area)
+_massloss_cache = {}
+
+
+# Build (or get from the cache) the area operator for a list of ice shelves.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# boxes = list with one entry for each ice shelf, containing a list of
+#         (lon_min, lon_max, lat_min, lat_max) boxes. A cavity element counts
+#         towards the ice shelf if it is entirely inside one of its boxes.
+# Output:
+# operator = sparse matrix of size len(boxes) x n2d, such that
+#            operator.dot(ismr) is the volume loss of each ice shelf (in m^3
+#            per unit time of ismr) for ismr the melt rate at each surface node
+# area = array of size len(boxes) containing the total area of each ice shelf
+#        (m^2)
+def shelf_operator (mesh_path, boxes):
+
+    key = (abspath(mesh_path), 'shelf', tuple([tuple([tuple(box) for box in shelf_boxes]) for shelf_boxes in boxes]))
+    elements, node_ids, elm_area, cavity = _cavity_elements(mesh_path)
+    stamp = prism_stamp(mesh_path)
+    if key in _massloss_cache and _massloss_cache[key][0] == stamp:
+        return _massloss_cache[key][1:]
+
+    lon = array([elm.lon for elm in elements])
+    lat = array([elm.lat for elm in elements])
+    flags = zeros([len(boxes), len(elements)], dtype=bool)
+    for index in range(len(boxes)):
+        for lon_min, lon_max, lat_min, lat_max in boxes[index]:
+            flags[index,:] += all((lon >= lon_min)*(lon <= lon_max)*(lat >= lat_min)*(lat <= lat_max), axis=1)
+
+    operator, area = _area_operator(mesh_path, flags*cavity)
+    _massloss_cache[key] = (stamp, operator, area)
+    return operator, area
+
+
+# Build (or get from the cache) the area operator for a set of ice shelf draft
+# classes.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# draft_min, draft_max = arrays of the bounds on each class (positive, in
+#                        metres). A cavity element counts towards the class
+#                        if the average depth of its 3 surface nodes is
+#                        > draft_min and <= draft_max.
+# Output: operator, area = as for shelf_operator, with one row for each class
+def draft_operator (mesh_path, draft_min, draft_max):
+
+    key = (abspath(mesh_path), 'draft', tuple(draft_min), tuple(draft_max))
+    elements, node_ids, elm_area, cavity = _cavity_elements(mesh_path)
+    stamp = prism_stamp(mesh_path)
+    if key in _massloss_cache and _massloss_cache[key][0] == stamp:
+        return _massloss_cache[key][1:]
+
+    draft = mean(array([[node.depth for node in elm.nodes] for elm in elements]), axis=1)
+    flags = array([(draft > draft_min[n])*(draft <= draft_max[n]) for n in range(len(draft_min))], dtype=bool)
+    for i in nonzero(cavity*invert(any(flags, axis=0)))[0]:
+        print "Couldn't find a depth class for ice shelf draft " + str(draft[i])
+
+    operator, area = _area_operator(mesh_path, flags*cavity)
+    _massloss_cache[key] = (stamp, operator, area)
+    return operator, area
+
+
+# Read the ice shelf melt rate from a forcing.diag.nc file and calculate the
+# basal mass loss of each region at every time step.
+# Input:
+# diag_file = path to FESOM output forcing.diag.nc file containing the
+#             variable "wnet", or a Dataset which is already open
+# operator = from shelf_operator or draft_operator
+# records = optional slice (or index) of time records to read, as for
+#           read_nodes. Default is all records.
+# Output: array of size num_regions x num_time containing the basal mass loss
+#         of each region in Gt/y. Multiply by the factors from
+#         massloss_factors to get area-averaged melt rates in m/y.
+def read_massloss (diag_file, operator, records=None):
+
+    # Density of ice in kg/m^3
+    rho_ice = 916
+    # Seconds per year
+    sec_per_year = 365.25*24*60*60
+
+    # Only read the nodes which contribute to some region
+    nodes = unique(operator.tocoo().col)
+    ismr, node_map = read_nodes(diag_file, 'wnet', nodes, records=records)
+    # Convert from m/s to m/y
+    ismr = reshape(ismr, (-1, size(nodes)))*sec_per_year
+    # Integrate over area to get volume loss, then convert to Gt/y
+    return 1e-12*rho_ice*operator.tocsc()[:,nodes].dot(transpose(ismr))
+
+
+# Calculate conversion factors from mass loss (Gt/y) to area-averaged melt
+# rate (m/y) for each region.
+# Input: area = array of region areas (m^2), from shelf_operator or
+#        draft_operator
+# Output: array of the same size, infinite where the area is zero
+def massloss_factors (area):
+
+    # Density of ice in kg/m^3
+    rho_ice = 916
+    return 1e12/(rho_ice*array(area, dtype=float))
+
+
+# Helper function to get the elements (from prism_table), their 0-based
+# surface node indices, their areas, and a boolean array which is True for
+# elements in an ice shelf cavity.
+def _cavity_elements (mesh_path):
+
+    elements = prism_table(mesh_path)[0]
+    key = (abspath(mesh_path), 'elements')
+    stamp = prism_stamp(mesh_path)
+    if key in _massloss_cache and _massloss_cache[key][0] == stamp:
+        return (elements,) + _massloss_cache[key][1:]
+
+    node_ids = array([[node.id for node in elm.nodes] for elm in elements])
+    elm_area = array([elm.area() for elm in elements])
+    cavity = array([elm.cavity for elm in elements], dtype=bool)
+    _massloss_cache[key] = (stamp, node_ids, elm_area, cavity)
+    return elements, node_ids, elm_area, cavity
+
+
+# Helper function to build the sparse matrix which integrates a field at the
+# surface nodes over each region, given a boolean array of size num_regions x
+# num_elements flagging the elements in each region. Each element's area is
+# split equally between its 3 nodes, which is the same as averaging over the
+# nodes and then multiplying by the element area.
+def _area_operator (mesh_path, flags):
+
+    elements, node_ids, elm_area, cavity = _cavity_elements(mesh_path)
+    n2d = size(column_table(mesh_path)[0], 0)
+    region, elm = nonzero(flags)
+    rows = repeat(region, 3)
+    cols = node_ids[elm,:].ravel()
+    coeffs = repeat(elm_area[elm]/3.0, 3)
+    operator = coo_matrix((coeffs, (rows, cols)), shape=(size(flags,0), n2d)).tocsr()
+    area = dot(flags, elm_area)
+    return operator, area
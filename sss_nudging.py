@@ -2,6 +2,7 @@ from netCDF4 import Dataset
 from numpy import *
 from scipy.interpolate import RegularGridInterpolator
 from scipy.spatial import KDTree
+from output_writer import *
 
 # Interpolate the World Ocean Atlas 2013 monthly climatology of sea surface
 # salinity to the ERA-Interim grid so it can be used as a forcing file by
@@ -59,25 +60,13 @@ def sss_nudging ():
 
     # Set up output file
     print "Setting up " + out_file
-    out_id = Dataset(out_file, 'w')
-    # Define dimensions
-    out_id.createDimension('longitude', num_lon)
-    out_id.createDimension('latitude', num_lat)
-    out_id.createDimension('time', None)
+    out_id = create_output(out_file, [('longitude', num_lon), ('latitude', num_lat), ('time', None)], title='sea surface salinity restoring on the ERA-Interim grid')
     # Define variables
-    out_id.createVariable('longitude', 'f8', ('longitude'))
-    out_id.variables['longitude'].units = 'degrees_east'
-    out_id.variables['longitude'].long_name = 'longitude'
-    out_id.variables['longitude'][:] = lon_era_1d
-    out_id.createVariable('latitude', 'f8', ('latitude'))
-    out_id.variables['latitude'].units = 'degrees_north'
-    out_id.variables['latitude'].long_name = 'latitude'
-    out_id.variables['latitude'][:] = lat_era_1d
-    out_id.createVariable('time', 'f8', ('time'))
-    out_id.variables['time'].units = 'months'
-    out_id.createVariable('SALT', 'f8', ('time', 'latitude', 'longitude'))
-    out_id.variables['SALT'].long_name = 'sea surface salinity'
-    out_id.variables['SALT'].units = 'psu'
+    create_var(out_id, 'longitude', ('longitude'), units='degrees_east', long_name='longitude', data=lon_era_1d)
+    create_var(out_id, 'latitude', ('latitude'), units='degrees_north', long_name='latitude', data=lat_era_1d)
+    create_var(out_id, 'time', ('time'), units='months', long_name='time')
+    # FESOM reads one month at a time
+    create_var(out_id, 'SALT', ('time', 'latitude', 'longitude'), units='psu', long_name='sea surface salinity', access='map')
 
     # Loop over months
     for month in range(12):
@@ -1,10 +1,11 @@
 from numpy import *
+from timeseries_store import *
 
 def subpolar_gyres_concatenate_control ():
 
     # File paths
     directory_head = '/short/y99/kaa561/FESOM/highres_spinup/'
-    log_name = 'subpolar_gyres.log'
+    store_name = 'subpolar_gyres.nc'
     # Years to consider
     start_year = 1992
     end_year = 2100
@@ -16,58 +17,19 @@ def subpolar_gyres_concatenate_control ():
     # Set up arrays to hold timeseries
     ws_trans = empty(num_years)
     rs_trans = empty(num_years)
-    # Read all but the last repetition
+    # Read each repetition in turn
     year = 0
-    for rep in range(start_rep, end_rep):
-        f = open(directory_head + 'rep' + str(rep) + '/' + log_name, 'r')
-        f.readline()
-        t = year
-        for line in f:
-            try:
-                ws_trans[t] = float(line)
-                t += 1
-            except(ValueError):
-                break
-        t = year
-        for line in f:
-            try:
-                rs_trans[t] = float(line)
-                t += 1
-            except(ValueError):
-                break
-        year = t
-    # Read what we need from the last repetition
-    f = open(directory_head + 'rep' + str(end_rep) + '/' + log_name, 'r')
-    f.readline()
-    t = year
-    for line in f:
-        try:
-            tmp = float(line)
-        except(ValueError):
-            break
-        if t < num_years:
-            ws_trans[t] = tmp
-            t += 1
-    t = year
-    for line in f:
-        try:
-            tmp = float(line)
-        except(ValueError):
-            break
-        if t < num_years:
-            rs_trans[t] = tmp
-            t += 1
-    f.close()
+    for rep in range(start_rep, end_rep+1):
+        time_tmp, series = read_timeseries(directory_head + 'rep' + str(rep) + '/' + store_name, ['ws_trans', 'rs_trans'])
+        # Only read what we need from the last repetition
+        num_rep = min(size(time_tmp), num_years-year)
+        ws_trans[year:year+num_rep] = series['ws_trans'][:num_rep]
+        rs_trans[year:year+num_rep] = series['rs_trans'][:num_rep]
+        year += num_rep
 
     # Write output
-    f = open(directory_head + log_name, 'w')
-    f.write('Weddell Sea Gyre transport (Sv)\n')
-    for t in range(num_years):
-        f.write(str(ws_trans[t]) + '\n')
-    f.write('Ross Sea Gyre transport (Sv)\n')
-    for t in range(num_years):
-        f.write(str(rs_trans[t]) + '\n')
-    f.close()
+    time = arange(start_year, end_year+1)
+    write_timeseries(directory_head + store_name, time, {'ws_trans':ws_trans, 'rs_trans':rs_trans}, units={'ws_trans':'Sv', 'rs_trans':'Sv'})
 
 
 # Command-line interface
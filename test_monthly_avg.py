@@ -0,0 +1,58 @@
+from netCDF4 import Dataset
+from numpy import *
+from tempfile import mkdtemp
+from shutil import rmtree
+from monthly_avg import *
+from dataset_pool import close_datasets
+
+# Check monthly_avg against the original hard-coded weights for each month:
+# (first 0-based output step, number of days of each step in the month)
+baseline_weights = [(0, [5, 5, 5, 5, 5, 5, 1]),
+                    (6, [4, 5, 5, 5, 5, 4]),
+                    (11, [1, 5, 5, 5, 5, 5, 5]),
+                    (18, [5, 5, 5, 5, 5, 5]),
+                    (24, [5, 5, 5, 5, 5, 5, 1]),
+                    (30, [4, 5, 5, 5, 5, 5, 1]),
+                    (36, [4, 5, 5, 5, 5, 5, 2]),
+                    (42, [3, 5, 5, 5, 5, 5, 3]),
+                    (48, [2, 5, 5, 5, 5, 5, 3]),
+                    (54, [2, 5, 5, 5, 5, 5, 4]),
+                    (60, [1, 5, 5, 5, 5, 5, 4]),
+                    (66, [1, 5, 5, 5, 5, 5, 5])]
+
+
+def test_month_weights ():
+
+    for month in range(12):
+        t_start, t_end, weights = month_weights(month)
+        assert isinstance(t_start, int) and isinstance(t_end, int)
+        assert t_start == baseline_weights[month][0]
+        assert list(weights) == baseline_weights[month][1]
+
+
+def test_monthly_avg ():
+
+    # One year of 5-day averages at a few nodes
+    num_time = 73
+    num_pts = 10
+    data = random.rand(num_time, num_pts)
+    directory = mkdtemp()
+    try:
+        file_path = directory + '/test.oce.mean.nc'
+        id = Dataset(file_path, 'w')
+        id.createDimension('time', None)
+        id.createDimension('nodes_3d', num_pts)
+        id.createVariable('time', 'f8', ('time'))
+        id.createVariable('temp', 'f8', ('time', 'nodes_3d'))
+        id.variables['temp'][:,:] = data
+        id.close()
+
+        for month in range(12):
+            t_start, weights = baseline_weights[month]
+            weights = array(weights)
+            expected = sum(data[t_start:t_start+size(weights),:]*weights[:,None], axis=0)/sum(weights)
+            assert allclose(monthly_avg(file_path, 'temp', month), expected)
+            assert allclose(monthly_avg(file_path, 'temp', month, nodes=[1, 2, 7]), expected[[1, 2, 7]])
+    finally:
+        close_datasets()
+        rmtree(directory)
@@ -4,6 +4,7 @@ from matplotlib.pyplot import *
 from os.path import *
 from fesom_grid import *
 from unesco import *
+from timeseries_store import *
 
 # Calculate and plot timeseries of ocean heat content, average salinity, and 
 # total kinetic energy (all restricted to the Southern Ocean i.e. south of 30S)
@@ -12,10 +13,12 @@ from unesco import *
 # walltime per year of output (in 5-day averages)
 # Input:
 # ocn_file = path to output oce.mean.nc, assumed to have 5-day averages
-# log_file = path to log file (if it exists, previously calculated values will
-#            be read from it; regardless, it will be overwritten with all
-#            calculated values following computation)
-def timeseries_3D (mesh_path, ocn_file, log_file):
+# store_file = path to NetCDF timeseries store (see timeseries_store.py). If it
+#              exists, previously calculated values will be read from it, and
+#              the new values will be appended to it following computation.
+#              If the input file has already been processed into the store,
+#              nothing is done.
+def timeseries_3D (mesh_path, ocn_file, store_file):
 
     circumpolar = True   # Only consider elements south of 30S
     cross_180 = False    # Don't make second copies of elements that cross 180E
@@ -26,26 +29,19 @@ def timeseries_3D (mesh_path, ocn_file, log_file):
     ohc = []
     avgsalt = []
     tke = []
-    # Check if the log file exists
-    if exists(log_file):
+    # Skip this file if it's already been processed into the store
+    if len(new_inputs(store_file, [ocn_file])) == 0:
+        print ocn_file + ' has already been processed'
+        return
+
+    # Check if the store already has values in it
+    start_t = timeseries_length(store_file)
+    if start_t > 0:
         print 'Reading previously calculated values'
-        f = open(log_file, 'r')
-        # Skip the first line (header)
-        f.readline()
-        for line in f:
-            try:
-                ohc.append(float(line))
-            except(ValueError):
-                # Reached the header for the next variable
-                break
-        for line in f:
-            try:
-                avgsalt.append(float(line))
-            except(ValueError):
-                break
-        for line in f:
-            tke.append(float(line))
-        f.close()
+        old_time, old_series = read_timeseries(store_file, ['ohc', 'avgsalt', 'tke'])
+        ohc = list(old_series['ohc'])
+        avgsalt = list(old_series['avgsalt'])
+        tke = list(old_series['tke'])
 
     print 'Building grid'
     elements = fesom_grid(mesh_path, circumpolar, cross_180)
@@ -157,18 +153,8 @@ def timeseries_3D (mesh_path, ocn_file, log_file):
     grid(True)
     savefig('tke.png')
 
-    print 'Saving results to log file'
-    f = open(log_file, 'w')
-    f.write('Southern Ocean Heat Content (J):\n')
-    for elm in ohc:
-        f.write(str(elm) + '\n')
-    f.write('Southern Ocean Average Salinity (psu):\n')
-    for elm in avgsalt:
-        f.write(str(elm) + '\n')
-    f.write('Southern Ocean Total Kinetic Energy (J):\n')
-    for elm in tke:
-        f.write(str(elm) + '\n')
-    f.close()
+    print 'Saving results to store'
+    append_timeseries(store_file, time[start_t:], {'ohc':array(ohc[start_t:]), 'avgsalt':array(avgsalt[start_t:]), 'tke':array(tke[start_t:])}, units={'ohc':'J', 'avgsalt':'psu', 'tke':'J'}, inputs=[(ocn_file, num_time)])
 
 
 # Command-line interface
@@ -176,8 +162,8 @@ if __name__ == "__main__":
 
     mesh_path = raw_input("Path to FESOM mesh directory: ")
     ocn_file = raw_input("Path to FESOM oce.mean.nc output file: ")
-    log_file = raw_input("Path to logfile to save values and/or read previously calculated values: ")
-    timeseries_3D(mesh_path, ocn_file, log_file)
+    store_file = raw_input("Path to timeseries store to save values and/or read previously calculated values: ")
+    timeseries_3D(mesh_path, ocn_file, store_file)
 
     
         
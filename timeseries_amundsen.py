@@ -2,8 +2,9 @@ from netCDF4 import Dataset
 from numpy import *
 from os.path import *
 from fesom_grid import *
+from timeseries_store import *
 
-def timeseries_amundsen (mesh_path, ice_diag_file, log_file):
+def timeseries_amundsen (mesh_path, ice_diag_file, store_file):
 
     # Mesh parameters
     circumpolar = True
@@ -16,15 +17,17 @@ def timeseries_amundsen (mesh_path, ice_diag_file, log_file):
     lat_max = -71
 
     avg_ice2ocn = []
-    # Check if the log file exists
-    if exists(log_file):
+    # Skip this file if it's already been processed into the store
+    if len(new_inputs(store_file, [ice_diag_file])) == 0:
+        print ice_diag_file + ' has already been processed'
+        return
+
+    # Check if the store already has values in it
+    start_t = timeseries_length(store_file)
+    if start_t > 0:
         print 'Reading previously calculated values'
-        f = open(log_file, 'r')
-        # Skip the first line (header)
-        f.readline()
-        for line in f:
-            avg_ice2ocn.append(float(line))
-        f.close()    
+        old_time, old_series = read_timeseries(store_file, ['ice2ocn'])
+        avg_ice2ocn = list(old_series['ice2ocn'])
 
     print 'Building grid'
     elements = fesom_grid(mesh_path, circumpolar, cross_180)
@@ -63,11 +66,11 @@ def timeseries_amundsen (mesh_path, ice_diag_file, log_file):
         # Average over area of the correct elements
         avg_ice2ocn.append(sum(ice2ocn_elm[t,:]*area_elm*location_flag)/sum(area_elm*location_flag))
 
-    print 'Saving results to log file'
-    f = open(log_file, 'w')
-    f.write('Average ice-to-ocean freshwater flux (1e-8 m/s): \n')
-    for val in avg_ice2ocn:
-        f.write(str(val) + '\n')
+    # Calculate time values
+    time = arange(len(avg_ice2ocn))*days_per_output/365.
+
+    print 'Saving results to store'
+    append_timeseries(store_file, time[start_t:], {'ice2ocn':array(avg_ice2ocn[start_t:])}, units={'ice2ocn':'1e-8 m/s'}, inputs=[(ice_diag_file, num_time)])
 
 
 # Command-line interface
@@ -75,8 +78,8 @@ if __name__ == "__main__":
 
     mesh_path = raw_input("Path to FESOM mesh directory: ")
     forcing_file = raw_input("Path to FESOM ice.diag.nc file: ")
-    log_file = raw_input("Path to logfile to save values and/or read previously calculated values: ")
-    timeseries_amundsen(mesh_path, ice_diag_file, log_file)
+    store_file = raw_input("Path to timeseries store to save values and/or read previously calculated values: ")
+    timeseries_amundsen(mesh_path, ice_diag_file, store_file)
         
     
     
@@ -1,18 +1,20 @@
 from numpy import *
 from matplotlib.pyplot import *
+from timeseries_store import *
 
-# Given the logfiles for 5-day timeseries created using timeseries_dpt.py,
+# Given the timeseries stores for 5-day timeseries created using timeseries_dpt.py,
 # timeseries_seaice.py, timeseries_massloss.py, and
 # timeseries_massloss_depth.py, plot annual averages (for Drake Passage
 # transport and ice shelf melt rates/mass loss) or annual max/mins (for sea ice
 # area and volume).
 # Input:
-# dpt_log = path to logfile from timeseries_dpt.py
-# seaice_log = path to logfile from timeseries_seaice.py
-# massloss_log = path to logfile from timeseries_massloss.py
-# massloss_depth_log = path to logfile from timeseries_massloss_depth.py
+# dpt_store = path to timeseries store from timeseries_dpt.py
+# seaice_store = path to timeseries store from timeseries_seaice.py
+# massloss_store = path to timeseries store from timeseries_massloss.py
+# massloss_depth_store = path to timeseries store from
+#                        timeseries_massloss_depth.py
 # res_flag = integer flag indicating low resolution mesh (1) or high (2)
-def timeseries_annual (dpt_log, seaice_log, massloss_log, massloss_depth_log, res_flag):
+def timeseries_annual (dpt_store, seaice_store, massloss_store, massloss_depth_store, res_flag):
 
     # Number of records per year (assumes 5-day averages)
     peryear = 365/5
@@ -53,14 +55,9 @@ def timeseries_annual (dpt_log, seaice_log, massloss_log, massloss_depth_log, re
     start_year = 1992  # Assumes 1 repetition of present-day forcing, possibly followed by RCP
 
     # Drake Passage transport
-    dpt = []
-    # Read log file
-    f = open(dpt_log, 'r')
-    # Skip header
-    f.readline()
-    for line in f:
-        dpt.append(float(line))
-    f.close()
+    # Read timeseries store
+    time_5day, series = read_timeseries(dpt_store, ['dpt'])
+    dpt = series['dpt']
     # Calculate how many years of output there are
     num_output = len(dpt)
     num_years = num_output/peryear
@@ -81,21 +78,10 @@ def timeseries_annual (dpt_log, seaice_log, massloss_log, massloss_depth_log, re
     savefig('drakepsgtrans_avg.png')
 
     # Sea ice area and volume
-    seaice_area = []
-    seaice_volume = []
-    # Read log file
-    f = open(seaice_log, 'r')
-    # Skip header for sea ice area
-    f.readline()
-    for line in f:
-        try:
-            seaice_area.append(float(line))
-        except(ValueError):
-            # Header for sea ice volume
-            break
-    for line in f:
-        seaice_volume.append(float(line))
-    f.close()
+    # Read timeseries store
+    time_5day, series = read_timeseries(seaice_store, ['area', 'volume'])
+    seaice_area = series['area']
+    seaice_volume = series['volume']
     # Calculate annual max/mins
     area_min = []
     area_max = []
@@ -125,24 +111,9 @@ def timeseries_annual (dpt_log, seaice_log, massloss_log, massloss_depth_log, re
     savefig('seaice_volume_minmax.png')'''
 
     # Mass loss
-    massloss = empty([len(names), num_output])
-    # Read logfile
-    f = open(massloss_log, 'r')
-    # Skip header
-    f.readline()
-    index = 0
-    # Loop over ice shelves
-    while index < len(names):
-        t = 0
-        for line in f:
-            try:
-                massloss[index,t] = float(line)
-                t += 1
-            except(ValueError):
-                # Reached the header for the next ice shelf
-                break
-        index += 1
-    f.close()
+    # Read timeseries store
+    time_5day, series = read_timeseries(massloss_store, ['massloss'])
+    massloss = series['massloss']
     # Calculate annual averages
     massloss_avg = empty([len(names), num_years])
     for index in range(len(names)):
@@ -202,24 +173,9 @@ def timeseries_annual (dpt_log, seaice_log, massloss_log, massloss_depth_log, re
         fig.savefig(fig_heads[index] + '_avg.png')
 
     '''# Mass loss by depth class
-    massloss_depth = empty([num_classes, num_output])
-    # Read logfile
-    f = open(massloss_depth_log, 'r')
-    # Skip header
-    f.readline()
-    n = 0
-    # Loop over depth classes
-    while n < num_classes:
-        t = 0
-        for line in f:
-            try:
-                massloss_depth[n,t] = float(line)
-                t += 1
-            except(ValueError):
-                # Reached the header for the next ice shelf
-                break
-        n += 1
-    f.close()
+    # Read timeseries store
+    time_5day, series = read_timeseries(massloss_depth_store, ['massloss'])
+    massloss_depth = series['massloss']
     # Calculate annual averages
     massloss_depth_avg = empty([num_classes, num_years])
     for n in range(num_classes):
@@ -271,12 +227,12 @@ def timeseries_annual (dpt_log, seaice_log, massloss_log, massloss_depth_log, re
 # Command-line interface
 if __name__ == '__main__':
 
-    dpt_log = raw_input("Path to logfile for timeseries_dpt.py: ")
-    seaice_log = raw_input("Path to logfile for timeseries_seaice.py: ")
-    massloss_log = raw_input("Path to logfile for timeseries_massloss.py: ")
-    massloss_depth_log = raw_input("Path to logfile for timeseries_massloss_depth.py: ")
+    dpt_store = raw_input("Path to timeseries store for timeseries_dpt.py: ")
+    seaice_store = raw_input("Path to timeseries store for timeseries_seaice.py: ")
+    massloss_store = raw_input("Path to timeseries store for timeseries_massloss.py: ")
+    massloss_depth_store = raw_input("Path to timeseries store for timeseries_massloss_depth.py: ")
     res_flag = int(raw_input("Low resolution (1) or high (2)? "))
-    timeseries_annual(dpt_log, seaice_log, massloss_log, massloss_depth_log, res_flag)
+    timeseries_annual(dpt_store, seaice_store, massloss_store, massloss_depth_store, res_flag)
 
     
         
@@ -1,5 +1,6 @@
 from numpy import *
 from matplotlib.pyplot import *
+from timeseries_store import *
 
 # Compare all high-res RCP experiments and control by plotting timeseries on
 # the same axes: annual averages of Drake Passage transport and ice shelf mass
@@ -40,30 +41,21 @@ def timeseries_annual_compare ():
     dpt = empty([len(rcp_expt)+len(control_expt), num_years])
     # Loop over RCP experiments
     for expt in range(len(rcp_expt)):
-        # Read logfile
-        dpt_tmp = []
-        f = open(directory_head + rcp_expt[expt] + '/dpt.log')
-        f.readline()
-        for line in f:
-            dpt_tmp.append(float(line))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + rcp_expt[expt] + '/dpt.nc', ['dpt'])
+        dpt_tmp = series['dpt']
         # Calculate annual averages
         for year in range(num_years):
-            dpt[expt,year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
+            dpt[expt,year] = mean(dpt_tmp[peryear*year:peryear*(year+1)])
     # Loop over control experiments
     for expt in range(len(control_expt)):
-        # Read logfile
-        dpt_tmp = []
-        f = open(directory_head + control_expt[expt] + '/dpt.log')
-        f.readline()
-        for line in f:
-            dpt_tmp.append(float(line))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + control_expt[expt] + '/dpt.nc', ['dpt'])
         # Throw away first 2 repetitions
-        dpt_tmp = dpt_tmp[control_skipyears*peryear:]
+        dpt_tmp = series['dpt'][control_skipyears*peryear:]
         # Calculate annual averages
         for year in range(num_years):
-            dpt[len(rcp_expt)+expt,year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
+            dpt[len(rcp_expt)+expt,year] = mean(dpt_tmp[peryear*year:peryear*(year+1)])
 
     # Plot
     fig, ax = subplots(figsize=(10,6))
@@ -93,19 +85,10 @@ def timeseries_annual_compare ():
     volume_max = empty([len(rcp_expt)+len(control_expt), num_years])
     # Loop over RCP experiments
     for expt in range(len(rcp_expt)):
-        # Read logfile
-        area_tmp = []
-        volume_tmp = []        
-        f = open(directory_head + rcp_expt[expt] + '/seaice.log')
-        f.readline()
-        for line in f:
-            try:
-                area_tmp.append(float(line))
-            except(ValueError):
-                break
-        for line in f:
-            volume_tmp.append(float(line))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + rcp_expt[expt] + '/seaice.nc', ['area', 'volume'])
+        area_tmp = series['area']
+        volume_tmp = series['volume']
         # Get annual min/max of area and volume
         for year in range(num_years):
             area_min[expt,year] = amin(array(area_tmp[peryear*year:peryear*(year+1)]))
@@ -114,22 +97,11 @@ def timeseries_annual_compare ():
             volume_max[expt,year] = amax(array(volume_tmp[peryear*year:peryear*(year+1)]))
     # Loop over control experiments
     for expt in range(len(control_expt)):
-        # Read logfile
-        area_tmp = []
-        volume_tmp = []
-        f = open(directory_head + control_expt[expt] + '/seaice.log')
-        f.readline()
-        for line in f:
-            try:
-                area_tmp.append(float(line))
-            except(ValueError):
-                break
-        for line in f:
-            volume_tmp.append(float(line))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + control_expt[expt] + '/seaice.nc', ['area', 'volume'])
         # Throw away spinup years
-        area_tmp = area_tmp[control_skipyears*peryear:]
-        volume_tmp = volume_tmp[control_skipyears*peryear:]
+        area_tmp = series['area'][control_skipyears*peryear:]
+        volume_tmp = series['volume'][control_skipyears*peryear:]
         # Get annual min/max of area and volume
         for year in range(num_years):
             area_min[len(rcp_expt)+expt,year] = amin(array(area_tmp[peryear*year:peryear*(year+1)]))
@@ -211,28 +183,19 @@ def timeseries_annual_compare ():
     extent_max = empty([len(rcp_expt)+len(control_expt), num_years])
     # Loop over RCP experiments
     for expt in range(len(rcp_expt)):
-        # Read logfile
-        extent_tmp = []
-        f = open(directory_head + rcp_expt[expt] + '/seaice_extent.log')
-        f.readline()
-        for line in f:
-            extent_tmp.append(float(line))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + rcp_expt[expt] + '/seaice_extent.nc', ['extent'])
+        extent_tmp = series['extent']
         # Get annual min/max of extent
         for year in range(num_years):
             extent_min[expt,year] = amin(array(extent_tmp[peryear*year:peryear*(year+1)]))
             extent_max[expt,year] = amax(array(extent_tmp[peryear*year:peryear*(year+1)]))
     # Loop over control experiments
     for expt in range(len(control_expt)):
-        # Read logfile
-        extent_tmp = []
-        f = open(directory_head + control_expt[expt] + '/seaice_extent.log')
-        f.readline()
-        for line in f:
-            extent_tmp.append(float(line))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + control_expt[expt] + '/seaice_extent.nc', ['extent'])
         # Throw away spinup years
-        extent_tmp = extent_tmp[control_skipyears*peryear:]
+        extent_tmp = series['extent'][control_skipyears*peryear:]
         # Get annual min/max of extent
         for year in range(num_years):
             extent_min[len(rcp_expt)+expt,year] = amin(array(extent_tmp[peryear*year:peryear*(year+1)]))
@@ -279,40 +242,21 @@ def timeseries_annual_compare ():
     massloss = empty([len(rcp_expt)+len(control_expt), len(names), num_years])
     # Loop over RCP experiments
     for expt in range(len(rcp_expt)):
-        # Read logfile
-        f = open(directory_head + rcp_expt[expt] + '/massloss.log')
-        f.readline()
-        # Loop over ice shelves
-        for index in range(len(names)):
-            massloss_tmp = []
-            for line in f:
-                try:
-                    massloss_tmp.append(float(line))
-                except(ValueError):
-                    break
-            # Calculate annual averages
-            for year in range(num_years):
-                massloss[expt,index,year] = mean(array(massloss_tmp[peryear*year:peryear*(year+1)]))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + rcp_expt[expt] + '/massloss.nc', ['massloss'])
+        massloss_tmp = series['massloss']
+        # Calculate annual averages for all ice shelves at once
+        for year in range(num_years):
+            massloss[expt,:,year] = mean(massloss_tmp[:,peryear*year:peryear*(year+1)], axis=1)
     # Loop over control experiments
     for expt in range(len(control_expt)):
-        # Read logfile
-        f = open(directory_head + control_expt[expt] + '/massloss.log')
-        f.readline()
-        # Loop over ice shelves
-        for index in range(len(names)):
-            massloss_tmp = []
-            for line in f:
-                try:
-                    massloss_tmp.append(float(line))
-                except(ValueError):
-                    break
-            # Throw away spinup years
-            massloss_tmp = massloss_tmp[control_skipyears*peryear:]
-            # Calculate annual averages
-            for year in range(num_years):
-                massloss[len(rcp_expt)+expt,index,year] = mean(array(massloss_tmp[peryear*year:peryear*(year+1)]))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + control_expt[expt] + '/massloss.nc', ['massloss'])
+        # Throw away spinup years
+        massloss_tmp = series['massloss'][:,control_skipyears*peryear:]
+        # Calculate annual averages for all ice shelves at once
+        for year in range(num_years):
+            massloss[len(rcp_expt)+expt,:,year] = mean(massloss_tmp[:,peryear*year:peryear*(year+1)], axis=1)
 
     # One plot for each ice shelf
     for index in range(len(names)):
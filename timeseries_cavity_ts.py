@@ -3,6 +3,8 @@ from numpy import *
 from matplotlib.pyplot import *
 from os.path import *
 from fesom_grid import *
+from output_catalog import *
+from prefetch import *
 
 # Plot timeseries of the annually-averaged, volume-averaged temperature and
 # salinity in each ice shelf cavity.
@@ -30,11 +32,13 @@ def timeseries_cavity_ts (mesh_path, output_path, start_year, end_year, fig_dir=
 
     circumpolar = True   # Only consider elements south of 30S
     cross_180 = False    # Don't make second copies of elements that cross 180E
-    # Naming conventions for FESOM output files
-    file_head = output_path + 'MK44005.'
-    file_tail = '.oce.mean.nc'
+    # Experiment name at the start of FESOM output file names
+    expt_name = 'MK44005'
     num_years = end_year - start_year + 1
 
+    # Find the output file for each year
+    file_names = find_files(scan_output(output_path), 'temp', start_year, end_year, expt=expt_name, stream='oce.mean')
+
     print 'Building grid'
     elements = fesom_grid(mesh_path, circumpolar, cross_180)
 
@@ -48,6 +52,9 @@ def timeseries_cavity_ts (mesh_path, output_path, start_year, end_year, fig_dir=
     cavity_salt_int = empty(len(names))
     cavity_volume_int = empty(len(names))
 
+    # Read temperature and salinity for each year (annually averaged) in the
+    # background, so the next year is being read while this one is processed
+    annual_data = prefetch_annual_avg([file_names[year-start_year] for year in range(start_year, end_year+1)], ['temp', 'salt'])
     # Loop over years
     for year in range(start_year, end_year+1):
         print 'Processing year ' + str(year)
@@ -55,11 +62,10 @@ def timeseries_cavity_ts (mesh_path, output_path, start_year, end_year, fig_dir=
         cavity_temp_int[:] = 0.0
         cavity_salt_int[:] = 0.0
         cavity_volume_int[:] = 0.0
-        # Read temperature and salinity for this year, annually average
-        id = Dataset(file_head + str(year) + file_tail, 'r')
-        temp = mean(id.variables['temp'][:,:], axis=0)
-        salt = mean(id.variables['salt'][:,:], axis=0)
-        id.close()
+        # Get temperature and salinity for this year, annually averaged
+        file_name, data = next(annual_data)
+        temp = data['temp']
+        salt = data['salt']
         # Loop over elements
         for elm in elements:
             # Check if we're in an ice shelf cavity
@@ -1,24 +1,23 @@
 from numpy import *
+from timeseries_store import *
 
 # WARNING: An earlier version of this script said sea ice volume was in
 # million km^3. This is not true, it's thousand km^3.
 
-# For the logfiles from timeseries_dpt.py, timeseries_seaice.py,
-# timeseries_seaice_extent.py, timeseries_massloss.py,
-# timeseries_massloss_sectors.py, and timeseries_amundsen.py, append the third
-# repetition of the forcing in the control simulation (1992-2005) to the
-# beginning of the RCP (2006-2100).
+# For the timeseries stores from timeseries_dpt.py, timeseries_seaice.py,
+# timeseries_massloss.py, and timeseries_massloss_sectors.py, copy the third
+# repetition of the forcing in the control simulation (1992-2005) into a new
+# store for the RCP. The timeseries scripts will then append 2006-2100 to the
+# end of it when they are run on the RCP output.
 # Input:
 # spinup_path, rcp_path = paths to experiment directories for the control
-#                         simulation and RCP, each containing the following
-#                         logfiles: dpt.log, seaice.log, seaice_extent.log,
-#                         massloss.log, massloss_sectors.log, amundsen.log.
+#                         simulation and RCP. The control directory must
+#                         contain the following stores: dpt.nc, seaice.nc,
+#                         massloss.nc, massloss_sectors.nc.
 def timeseries_concat (spinup_path, rcp_path):
 
-    # Name of each ice shelf cavity
-    names = ['All Ice Shelves', 'Larsen D Ice Shelf', 'Larsen C Ice Shelf', 'Wilkins & George VI & Stange Ice Shelves', 'Ronne-Filchner Ice Shelf', 'Abbot Ice Shelf', 'Pine Island Glacier Ice Shelf', 'Thwaites Ice Shelf', 'Dotson Ice Shelf', 'Getz Ice Shelf', 'Nickerson Ice Shelf', 'Sulzberger Ice Shelf', 'Mertz Ice Shelf', 'Totten & Moscow University Ice Shelves', 'Shackleton Ice Shelf', 'West Ice Shelf', 'Amery Ice Shelf', 'Prince Harald Ice Shelf', 'Baudouin & Borchgrevink Ice Shelves', 'Lazarev Ice Shelf', 'Nivl Ice Shelf', 'Fimbul & Jelbart & Ekstrom Ice Shelves', 'Brunt & Riiser-Larsen Ice Shelves', 'Ross Ice Shelf']
-    # Name of each ice shelf sector
-    sector_names = ['Filchner-Ronne Ice Shelf', 'Eastern Weddell Region', 'Amery Ice Shelf', 'Australian Sector', 'Ross Sea', 'Amundsen Sea', 'Bellingshausen Sea', 'Larsen Ice Shelves', 'Total Antarctica']
+    # Stores to process (add seaice_extent.nc and amundsen.nc here if needed)
+    store_names = ['dpt.nc', 'seaice.nc', 'massloss.nc', 'massloss_sectors.nc']
     # Forcing years for spinup
     year_start = 1992
     year_end = 2005
@@ -26,168 +25,21 @@ def timeseries_concat (spinup_path, rcp_path):
     skipyears = 28
     peryear = 365/5
     numyears = year_end - year_start + 1
-
-    # Drake Passage transport
-    # Read logfile for control simulation
-    dpt = []    
-    f = open(spinup_path + 'dpt.log', 'r')
-    f.readline()
-    for line in f:
-        dpt.append(float(line))
-    f.close()
-    # Select the third repetition
-    dpt = dpt[skipyears*peryear:(skipyears+numyears)*peryear]
-    num_time_spinup = len(dpt)
-    # Read logfile for RCP simulation and append these values to existing array
-    '''f = open(rcp_path + 'dpt.log', 'r')
-    f.readline()
-    for line in f:
-        dpt.append(float(line))
-    f.close()'''
-    num_time = len(dpt)
-    # Write a new logfile for the RCP simulation
-    f = open(rcp_path + 'dpt.log', 'w')
-    f.write('Drake Passage Transport (Sv):\n')
-    for elm in dpt:
-        f.write(str(elm) + '\n')
-    f.close()
-
-    # Repeat for sea ice area and volume
-    seaice_area = []
-    seaice_volume = []
-    f = open(spinup_path + 'seaice.log', 'r')
-    f.readline()
-    for line in f:
-        try:
-            seaice_area.append(float(line))
-        except(ValueError):
-            break
-    for line in f:
-        seaice_volume.append(float(line))
-    f.close()
-    seaice_area = seaice_area[skipyears*peryear:(skipyears+numyears)*peryear]
-    seaice_volume = seaice_volume[skipyears*peryear:(skipyears+numyears)*peryear]
-    '''f = open(rcp_path + 'seaice.log', 'r')
-    f.readline()
-    for line in f:
-        try:
-            seaice_area.append(float(line))
-        except(ValueError):
-            break
-    for line in f:
-        seaice_volume.append(float(line))
-    f.close()'''
-    f = open(rcp_path + 'seaice.log', 'w')
-    f.write('Total Sea Ice Area (million km^2):\n')
-    for elm in seaice_area:
-        f.write(str(elm) + '\n')
-    f.write('Total Sea Ice Volume (thousand km^3):\n')
-    for elm in seaice_volume:
-        f.write(str(elm) + '\n')
-    f.close()
-
-    '''# Repeat for sea ice extent
-    seaice_extent = []
-    f = open(spinup_path + 'seaice_extent.log', 'r')
-    f.readline()
-    for line in f:
-        seaice_extent.append(float(line))
-    f.close()
-    seaice_extent = seaice_extent[skipyears*peryear:(skipyears+numyears)*peryear]
-    f = open(rcp_path + 'seaice_extent.log', 'r')
-    f.readline()
-    for line in f:
-        seaice_extent.append(float(line))
-    f.close()
-    f = open(rcp_path + 'seaice_extent.log', 'w')
-    f.write('Sea Ice Extent (million km^2):\n')
-    for elm in seaice_extent:
-        f.write(str(elm) + '\n')
-    f.close()'''
-
-    # Repeat for ice shelf mass loss for each ice shelf
-    massloss = empty([len(names), num_time])
-    f = open(spinup_path + 'massloss.log', 'r')
-    f.readline()
-    for index in range(len(names)):
-        massloss_tmp = []
-        for line in f:
-            try:
-                massloss_tmp.append(float(line))
-            except(ValueError):
-                break
-        massloss_tmp = massloss_tmp[skipyears*peryear:(skipyears+numyears)*peryear]
-        massloss[index, 0:num_time_spinup] = massloss_tmp
-    f.close()
-    '''f = open(rcp_path + 'massloss.log', 'r')
-    f.readline()
-    for index in range(len(names)):
-        massloss_tmp = []
-        for line in f:
-            try:
-                massloss_tmp.append(float(line))
-            except(ValueError):
-                break
-        massloss[index, num_time_spinup:] = massloss_tmp
-    f.close()'''
-    f = open(rcp_path + 'massloss.log', 'w')
-    for index in range(len(names)):
-        f.write(names[index] + ' Basal Mass Loss\n')
-        for t in range(num_time):
-            f.write(str(massloss[index, t]) + '\n')
-    f.close()
-
-    # Repeat for ice shelf mass loss for each sector
-    massloss_sectors = empty([len(sector_names), num_time])
-    f = open(spinup_path + 'massloss_sectors.log', 'r')
-    f.readline()
-    for index in range(len(sector_names)):
-        massloss_tmp = []
-        for line in f:
-            try:
-                massloss_tmp.append(float(line))
-            except(ValueError):
-                break
-        massloss_tmp = massloss_tmp[skipyears*peryear:(skipyears+numyears)*peryear]
-        massloss_sectors[index, 0:num_time_spinup] = massloss_tmp
-    f.close()
-    '''f = open(rcp_path + 'massloss_sectors.log', 'r')
-    f.readline()
-    for index in range(len(sector_names)):
-        massloss_tmp = []
-        for line in f:
-            try:
-                massloss_tmp.append(float(line))
-            except(ValueError):
-                break
-        massloss_sectors[index, num_time_spinup:] = massloss_tmp
-    f.close()'''
-    f = open(rcp_path + 'massloss_sectors.log', 'w')
-    for index in range(len(sector_names)):
-        f.write(names[index] + ' Basal Mass Loss (Gt/y)\n')
-        for t in range(num_time):
-            f.write(str(massloss_sectors[index, t]) + '\n')
-    f.close()
-
-    '''# Repeat for Amundsen Sea ice-to-ocean freshwater flux
-    ice2ocn = []    
-    f = open(spinup_path + 'amundsen.log', 'r')
-    f.readline()
-    for line in f:
-        ice2ocn.append(float(line))
-    f.close()
-    # Select the third repetition
-    ice2ocn = ice2ocn[skipyears*peryear:(skipyears+numyears)*peryear]
-    f = open(rcp_path + 'amundsen.log', 'r')
-    f.readline()
-    for line in f:
-        ice2ocn.append(float(line))
-    f.close()
-    f = open(rcp_path + 'amundsen.log', 'w')
-    f.write('Average ice-to-ocean freshwater flux (1e-8 m/s):\n')
-    for elm in ice2ocn:
-        f.write(str(elm) + '\n')
-    f.close()'''
+    # Indices of the third repetition
+    t_start = skipyears*peryear
+    t_end = (skipyears+numyears)*peryear
+
+    for store_name in store_names:
+        # Read every series in the store for the control simulation
+        time, series = read_timeseries(spinup_path + store_name)
+        dims, labels, units = read_timeseries_info(spinup_path + store_name)
+        # Select the third repetition
+        for var in series:
+            series[var] = series[var][...,t_start:t_end]
+        # Time axis starts from zero at the beginning of the RCP store
+        time = time[t_start:t_end] - time[t_start]
+        # Write a new store for the RCP simulation
+        write_timeseries(rcp_path + store_name, time, series, dims=dims, labels=labels, units=units)
 
     
 # Command-line interface
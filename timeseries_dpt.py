@@ -5,6 +5,7 @@ from os.path import *
 from fesom_grid import *
 from fesom_sidegrid import *
 from unrotate_vector import *
+from timeseries_store import *
 
 # Calculate and plot timeseries of the Drake Passage transport during a FESOM
 # simulation.
@@ -12,12 +13,14 @@ from unrotate_vector import *
 # Input:
 # mesh_path = path to FESOM mesh directory
 # ocn_file = path to output oce.mean.nc, assumed to have 5-day averages
-# log_file = path to log file (if it exists, previously calculated values will
-#            be read from it; regardless, it will be overwritten with all
-#            calculated values following computation)
+# store_file = path to NetCDF timeseries store (see timeseries_store.py). If it
+#              exists, previously calculated values will be read from it, and
+#              the new values will be appended to it following computation.
+#              If the input file has already been processed into the store,
+#              nothing is done.
 # fig_dir = optional string containing directory to save figures into. Make
 #           sure it ends with a "/". Default is an empty string.
-def timeseries_dpt (mesh_path, ocn_file, log_file, fig_dir=''):
+def timeseries_dpt (mesh_path, ocn_file, store_file, fig_dir=''):
 
     circumpolar = False  # Needs to be global for SideElements
     cross_180 = False    # Don't make second copies of elements that cross 180E
@@ -30,15 +33,17 @@ def timeseries_dpt (mesh_path, ocn_file, log_file, fig_dir=''):
     lat_max = -54.5
 
     dpt = []
-    # Check if the log file exists
-    if exists(log_file):
+    # Skip this file if it's already been processed into the store
+    if len(new_inputs(store_file, [ocn_file])) == 0:
+        print ocn_file + ' has already been processed'
+        return
+
+    # Check if the store already has values in it
+    start_t = timeseries_length(store_file)
+    if start_t > 0:
         print 'Reading previously calculated values'
-        f = open(log_file, 'r')
-        # Skip the first line (header)
-        f.readline()
-        for line in f:
-            dpt.append(float(line))
-        f.close()
+        old_time, old_series = read_timeseries(store_file, ['dpt'])
+        dpt = list(old_series['dpt'])
 
     print 'Building grid'
     # First get regular 2D elements
@@ -107,12 +112,8 @@ def timeseries_dpt (mesh_path, ocn_file, log_file, fig_dir=''):
     grid(True)
     savefig(fig_dir + 'drakepsgtrans.png')
 
-    print 'Saving results to log file'
-    f = open(log_file, 'w')
-    f.write('Drake Passage Transport (Sv):\n')
-    for elm in dpt:
-        f.write(str(elm) + '\n')
-    f.close()
+    print 'Saving results to store'
+    append_timeseries(store_file, time[start_t:], {'dpt':array(dpt[start_t:])}, units={'dpt':'Sv'}, inputs=[(ocn_file, num_time)])
 
 
 # Command-line interface
@@ -120,8 +121,8 @@ if __name__ == "__main__":
 
     mesh_path = raw_input("Path to FESOM mesh directory: ")
     ocn_file = raw_input("Path to FESOM oce.mean.nc output file: ")
-    log_file = raw_input("Path to logfile to save values and/or read previously calculated values: ")
-    timeseries_dpt(mesh_path, ocn_file, log_file)
+    store_file = raw_input("Path to timeseries store to save values and/or read previously calculated values: ")
+    timeseries_dpt(mesh_path, ocn_file, store_file)
     
         
 
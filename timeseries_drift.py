@@ -3,6 +3,9 @@ from numpy import *
 from matplotlib.pyplot import *
 from os.path import *
 from fesom_grid import *
+from timeseries_store import *
+from output_catalog import *
+from prefetch import *
 
 # Plot timeseries of the annually-averaged, volume-averaged temperature and
 # salinity between the given latitude and depth bounds.
@@ -15,20 +18,21 @@ from fesom_grid import *
 # depth_bounds = array of size 2 containing depths to average between, in the
 #                form [shallow_bound, deep_bound], positive, in metres
 # start_year, end_year = integers containing range of years to process
-# log_file = path to log file (if it exists, previously calculated values will
-#            be read from it; regardless, it will be overwritten with all
-#            calculated values following computation)
+# store_file = path to NetCDF timeseries store (see timeseries_store.py). If it
+#              exists, previously calculated values will be read from it, and
+#              the new values will be appended to it following computation.
+#              Any years which have already been processed into the store are
+#              skipped.
 # fig_name = filename to save figure
-def timeseries_drift (mesh_path, output_path, lat_bounds, depth_bounds, start_year, end_year, log_file, fig_name):
+def timeseries_drift (mesh_path, output_path, lat_bounds, depth_bounds, start_year, end_year, store_file, fig_name):
 
     if lat_bounds[0] > -30:
         circumpolar = False
     else:
         circumpolar = True
     cross_180 = False
-    # Naming conventions for FESOM output files
-    file_head = output_path + 'MK44005.'
-    file_tail = '.oce.mean.nc'
+    # Experiment name at the start of FESOM output file names
+    expt_name = 'MK44005'
 
     # Figure out what to say in the title about latitude
     if lat_bounds[0] < 0:
@@ -40,39 +44,43 @@ def timeseries_drift (mesh_path, output_path, lat_bounds, depth_bounds, start_ye
     else:
         lat_max_string = str(lat_bounds[1]) + r'$^{\circ}$N'
 
+    # Find the output file for each year, and only process the ones which
+    # haven't already been processed into the store
+    file_names = find_files(scan_output(output_path), 'temp', start_year, end_year, expt=expt_name, stream='oce.mean')
+    new_files = new_inputs(store_file, file_names)
+    years = [year for year in range(start_year, end_year+1) if file_names[year-start_year] in new_files]
+    if len(years) == 0:
+        print 'All years have already been processed'
+        return
+
     temp_avg = []
     salt_avg = []
-    # Check if the log file exists
-    if exists(log_file):
+    old_time = []
+    # Check if the store already has values in it
+    if timeseries_length(store_file) > 0:
         print 'Reading previously calculated values'
-        f = open(log_file, 'r')
-        # Skip the first line (header)
-        f.readline()
-        for line in f:
-            try:
-                temp_avg.append(float(line))
-            except(ValueError):
-                # Reached the header for the next variable
-                break
-        for line in f:
-            salt_avg.append(float(line))
-        f.close()
+        old_time, old_series = read_timeseries(store_file, ['temp', 'salt'])
+        temp_avg = list(old_series['temp'])
+        salt_avg = list(old_series['salt'])
+    prev_years = len(temp_avg)
 
     print 'Building grid'
     elements = fesom_grid(mesh_path, circumpolar, cross_180)
 
+    # Read temperature and salinity for each year (annually averaged) in the
+    # background, so the next year is being read while this one is processed
+    annual_data = prefetch_annual_avg(new_files, ['temp', 'salt'])
     # Loop over years
-    for year in range(start_year, end_year+1):
+    for year in years:
         print 'Processing year ' + str(year)
         # Initialise integrals
         temp_int = 0.0
         salt_int = 0.0
         volume_int = 0.0
-        # Read temperature and salinity for this year, annually average
-        id = Dataset(file_head + str(year) + file_tail, 'r')
-        temp = mean(id.variables['temp'][:,:], axis=0)
-        salt = mean(id.variables['salt'][:,:], axis=0)
-        id.close()
+        # Get temperature and salinity for this year, annually averaged
+        file_name, data = next(annual_data)
+        temp = data['temp']
+        salt = data['salt']
         # Loop over elements
         for elm in elements:
             # Check if between latitude bounds
@@ -115,7 +123,7 @@ def timeseries_drift (mesh_path, output_path, lat_bounds, depth_bounds, start_ye
         temp_avg.append(temp_int/volume_int)
         salt_avg.append(salt_int/volume_int)
 
-    time = arange(len(temp_avg))
+    time = concatenate((old_time, years))
 
     print 'Plotting'
     fig, ax1 = subplots()
@@ -124,7 +132,7 @@ def timeseries_drift (mesh_path, output_path, lat_bounds, depth_bounds, start_ye
     ax1.set_ylabel(r'Average temperature ($^{\circ}$C)', color='b')
     for t1 in ax1.get_yticklabels():
         t1.set_color('b')
-    ax1.set_xlabel('Years')
+    ax1.set_xlabel('Year')
     ax1.grid(True, axis='x')
     ax2 = ax1.twinx()
     # Salinity
@@ -135,15 +143,8 @@ def timeseries_drift (mesh_path, output_path, lat_bounds, depth_bounds, start_ye
     title(lat_min_string+' to '+lat_max_string+', '+str(depth_bounds[0])+'m to '+str(depth_bounds[1])+'m')
     fig.savefig(fig_name)
 
-    print 'Saving results to log file'
-    f = open(log_file, 'w')
-    f.write('Average temperature (C):\n')
-    for elm in temp_avg:
-        f.write(str(elm) + '\n')
-    f.write('Average salinity (psu):\n')
-    for elm in salt_avg:
-        f.write(str(elm) + '\n')
-    f.close()
+    print 'Saving results to store'
+    append_timeseries(store_file, time[prev_years:], {'temp':array(temp_avg[prev_years:]), 'salt':array(salt_avg[prev_years:])}, units={'temp':'C', 'salt':'psu'}, inputs=[(file_name, 1) for file_name in new_files])
 
 
 # Command-line interface
@@ -159,10 +160,10 @@ if __name__ == "__main__":
     depth_bounds = [depth_min, depth_max]
     start_year = int(raw_input("First year to process: "))
     end_year = int(raw_input("Last year to process: "))
-    log_file = raw_input("Path to logfile to save values and/or read previously calculated values: ")
+    store_file = raw_input("Path to timeseries store to save values and/or read previously calculated values: ")
     fig_name = raw_input("Filename for figure: ")
 
-    timeseries_drift (mesh_path, output_path, lat_bounds, depth_bounds, start_year, end_year, log_file, fig_name)
+    timeseries_drift (mesh_path, output_path, lat_bounds, depth_bounds, start_year, end_year, store_file, fig_name)
 
     
     
@@ -2,7 +2,8 @@ from netCDF4 import Dataset
 from numpy import *
 from matplotlib.pyplot import *
 from os.path import *
-from fesom_grid import *
+from front_zone import *
+from prefetch import *
 
 # Plot timeseries of the annually-averaged, volume-averaged temperature and
 # salinity at the ice shelf front (all depths) for each major ice shelf.
@@ -28,86 +29,36 @@ def timeseries_isfront_ts (mesh_path, output_path, start_year, end_year, fig_dir
     lat_min = [-90, -73.03, -69.35, -74.17, -83.5, -73.28, -75.5, -75.5, -75.33, -74.9, -76.42, -78, -67.83, -67.17, -66.67, -67.83, -73.67, -69.83, -71.67, -70.5, -70.75, -71.83, -76.33, -85, -84.5]
     lat_max = [-30, -69.37, -66.13, -69.5, -74.67, -71.67, -74.17, -74.67, -73.67, -73, -75.17, -76.41, -66.67, -66.5, -64.83, -66.17, -68.33, -68.67, -68.33, -69.33, -69.83, -69.33, -71.5, -77.77, -77]
 
-    circumpolar = True   # Only consider elements south of 30S
-    cross_180 = False    # Don't make second copies of elements that cross 180E
+    # Number of neighbouring elements to widen the front by
+    buffer = 0
     # Naming conventions for FESOM output files
     file_head = output_path + 'MK44005.'
     file_tail = '.oce.mean.nc'
     num_years = end_year - start_year + 1
 
-    print 'Building grid'
-    elements = fesom_grid(mesh_path, circumpolar, cross_180)
+    print 'Finding ice shelf fronts'
+    # Box around each ice shelf, and a second one for Ross
+    boxes = [[(lon_min[index], lon_max[index], lat_min[index], lat_max[index])] for index in range(len(names))]
+    boxes[-1].append((lon_min[-1], lon_max[-1], lat_min[-1], lat_max[-1]))
+    operator, volume = front_operator(mesh_path, boxes, buffer)
 
-    print 'Setting up arrays'
     # Timeseries of temperature and salinity to plot
     front_temp_ts = empty([len(names), num_years])
     front_salt_ts = empty([len(names), num_years])
-    # Temporary arrays containing integrated temperature, salinity, and volume
-    # for each ice shelf front. Will be overwritten every year.
-    front_temp_int = empty(len(names))
-    front_salt_int = empty(len(names))
-    front_volume_int = empty(len(names))
-
+    # Read temperature and salinity for each year (annually averaged) in the
+    # background, so the next year is being read while this one is processed
+    annual_data = prefetch_annual_avg([file_head + str(year) + file_tail for year in range(start_year, end_year+1)], ['temp', 'salt'])
     # Loop over years
     for year in range(start_year, end_year+1):
         print 'Processing year ' + str(year)
-        # Initialise integrals
-        front_temp_int[:] = 0.0
-        front_salt_int[:] = 0.0
-        front_volume_int[:] = 0.0
-        # Read temperature and salinity for this year, annually average
-        id = Dataset(file_head + str(year) + file_tail, 'r')
-        temp = mean(id.variables['temp'][:,:], axis=0)
-        salt = mean(id.variables['salt'][:,:], axis=0)
-        id.close()
-        # Loop over elements
-        for elm in elements:
-            # Select elements where some of the 3 nodes are in a cavity, some
-            # aren't: this is the ice shelf front
-            if count_nonzero(elm.cavity_nodes) in [1,2]:
-                # Loop over ice shelves
-                for index in range(len(names)):
-                    keep = False
-                    # Check if within lat/lon bounds for this ice shelf
-                    if all(elm.lon >= lon_min[index]) and all(elm.lon <= lon_max[index]) and all(elm.lat >= lat_min[index]) and all(elm.lat <= lat_max[index]):
-                        keep = True
-                    # Ross region is split into 2
-                    if index == len(names)-1:
-                        if all(elm.lon >= lon_min[index+1]) and all(elm.lon <= lon_max[index+1]) and all(elm.lat >= lat_min[index+1]) and all(elm.lat <= lat_max[index+1]):
-                            keep = True
-                    if keep:
-                        # Get area of 2D element
-                        area = elm.area()
-                        nodes = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-                        # Loop downward
-                        while True:
-                            if nodes[0].below is None or nodes[1].below is None or nodes[2].below is None:
-                                # Reached the bottom
-                                break
-                            # Calculate average temperature, salinity, and
-                            # layer thickness for this 3D triangular prism
-                            temp_vals = []
-                            salt_vals = []
-                            dz_vals = []
-                            for i in range(3):
-                                temp_vals.append(temp[nodes[i].id])
-                                salt_vals.append(salt[nodes[i].id])
-                                temp_vals.append(temp[nodes[i].below.id])
-                                salt_vals.append(salt[nodes[i].below.id])
-                                dz_vals.append(abs(nodes[i].depth - nodes[i].below.depth))
-                                # Get ready for next iteration of loop
-                                nodes[i] = nodes[i].below
-                            # Calculate volume
-                            volume = area*mean(array(dz_vals))
-                            # Integrate temperature, salinity, volume for this
-                            # cavity
-                            front_temp_int[index] += mean(array(temp_vals))*volume
-                            front_salt_int[index] += mean(array(salt_vals))*volume
-                            front_volume_int[index] += volume
-        # Convert temperature and salinity from integrals to volume-averages,
-        # add to timeseries
-        front_temp_ts[:,year-start_year] = front_temp_int/front_volume_int
-        front_salt_ts[:,year-start_year] = front_salt_int/front_volume_int
+        # Get temperature and salinity for this year, annually averaged
+        file_name, data = next(annual_data)
+        # Volume-average over each ice shelf front
+        front_temp_ts[:,year-start_year] = operator.dot(ma.filled(data['temp'], 0))
+        front_salt_ts[:,year-start_year] = operator.dot(ma.filled(data['salt'], 0))
+    # Ice shelves with no front in this mesh
+    front_temp_ts[volume==0,:] = NaN
+    front_salt_ts[volume==0,:] = NaN
 
     # Make time axis
     time = range(start_year, end_year+1)
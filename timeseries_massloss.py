@@ -2,22 +2,25 @@ from netCDF4 import Dataset
 from numpy import *
 from matplotlib.pyplot import *
 from os.path import *
-from fesom_grid import *
+from shelf_massloss import *
+from timeseries_store import *
+from figure_batch import *
 
 # Calculate and plot timeseries of basal mass loss and area-averaged ice shelf
 # melt rates from major ice shelves and from the entire continent during a 
 # FESOM simulation.
-# Takes 8 GB memory on raijin for Kaitlin's low_res mesh.
 # Input:
 # mesh_path = path to FESOM mesh directory
 # diag_file = path to output forcing.diag.nc file that contains variable "wnet"
 #             (surface freshwater flux), assumed to have 5-day averages
-# log_file = path to log file (if it exists, previously calculated values will
-#            be read from it; regardless, it will be overwritten with all
-#            calculated values following computation)
+# store_file = path to NetCDF timeseries store (see timeseries_store.py). If it
+#              exists, previously calculated values will be read from it, and
+#              the new values will be appended to it following computation.
+#              If the input file has already been processed into the store,
+#              nothing is done.
 # fig_dir = optional string containing directory to save figures into. Make
 #           sure it ends with a "/". Default is an empty string.
-def timeseries_massloss (mesh_path, diag_file, log_file, fig_dir=''):
+def timeseries_massloss (mesh_path, diag_file, store_file, fig_dir=''):
 
     # Titles and figure names for each ice shelf
     names = ['All Ice Shelves', 'Larsen D Ice Shelf', 'Larsen C Ice Shelf', 'Wilkins & George VI & Stange Ice Shelves', 'Ronne-Filchner Ice Shelf', 'Abbot Ice Shelf', 'Pine Island Glacier Ice Shelf', 'Thwaites Ice Shelf', 'Dotson Ice Shelf', 'Getz Ice Shelf', 'Nickerson Ice Shelf', 'Sulzberger Ice Shelf', 'Mertz Ice Shelf', 'Totten & Moscow University Ice Shelves', 'Shackleton Ice Shelf', 'West Ice Shelf', 'Amery Ice Shelf', 'Prince Harald Ice Shelf', 'Baudouin & Borchgrevink Ice Shelves', 'Lazarev Ice Shelf', 'Nivl Ice Shelf', 'Fimbul & Jelbart & Ekstrom Ice Shelves', 'Brunt & Riiser-Larsen Ice Shelves', 'Ross Ice Shelf']
@@ -38,166 +41,119 @@ def timeseries_massloss (mesh_path, diag_file, log_file, fig_dir=''):
     # Observed ice shelf melt rates and uncertainty
     obs_ismr = [0.85, 0.1, 0.4, 3.1, 0.3, 1.7, 16.2, 17.7, 7.8, 4.3, 0.6, 1.5, 1.4, 7.7, 2.8, 1.7, 0.6, -0.4, 0.4, 0.7, 0.5, 0.5, 0.1, 0.1]
     obs_ismr_error = [0.1, 0.6, 1, 0.8, 0.1, 0.6, 1, 1, 0.6, 0.4, 0.3, 0.3, 0.6, 0.7, 0.6, 0.7, 0.4, 0.6, 0.4, 0.2, 0.2, 0.2, 0.2, 0.1]
-    # Density of ice in kg/m^3
-    rho_ice = 916
 
-    circumpolar = True   # Only consider elements south of 30S
-    cross_180 = False    # Don't make second copies of elements that cross 180E
     days_per_output = 5  # Number of days for each output step
 
-    tmp_massloss = []
-    # Check if the log file exists
-    if exists(log_file):
+    # Skip this file if it's already been processed into the store
+    if len(new_inputs(store_file, [diag_file])) == 0:
+        print diag_file + ' has already been processed'
+        return
+
+    # Check if the store already has values in it
+    start_t = timeseries_length(store_file)
+    if start_t > 0:
         print 'Reading previously calculated values'
-        f = open(log_file, 'r')
-        # Skip the first line (header)
-        f.readline()
-        for line in f:
-            try:
-                tmp_massloss.append(float(line))
-            except(ValueError):
-                # Reached the header for the next variable
-                break
-        start_t = len(tmp_massloss)
-        # Set up array for mass loss values at each ice shelf
-        old_massloss = empty([len(names), start_t])
-        # Fill in the first timeseries (entire continent)
-        old_massloss[0,:] = tmp_massloss[:]
-        index = 1
-        # Loop over the individual ice shelves
-        while index < len(names):
-            t = 0
-            for line in f:
-                try:
-                    old_massloss[index, t] = float(line)
-                    t += 1
-                except(ValueError):
-                    # Reached the header for the next ice shelf
-                    break
-            index +=1
-    else:
-        start_t = 0
-
-    print 'Building grid'
-    elements = fesom_grid(mesh_path, circumpolar, cross_180)
-
-    print 'Reading data'
-    id = Dataset(diag_file, 'r')
-    num_time = id.variables['time'].shape[0]
+        old_time, old_series = read_timeseries(store_file, ['massloss'])
+        old_massloss = old_series['massloss']
+
+    print 'Building area operator'
+    # Box around each ice shelf, and a second one for Ross
+    boxes = [[(lon_min[index], lon_max[index], lat_min[index], lat_max[index])] for index in range(len(names))]
+    boxes[-1].append((lon_min[-1], lon_max[-1], lat_min[-1], lat_max[-1]))
+    operator, area = shelf_operator(mesh_path, boxes)
+    # Conversion factors from mass loss to area-averaged melt rate for each
+    # ice shelf
+    factors = massloss_factors(area)
+    for index in range(len(names)):
+        print 'Area of ' + names[index] + ': ' + str(area[index]) + ' m^2'
+
+    print 'Calculating mass loss'
+    # Mass loss for every ice shelf and time step at once
+    new_massloss = read_massloss(diag_file, operator)
+    num_time = size(new_massloss,1)
     # Set up array of mass loss values
     massloss = empty([len(names), start_t+num_time])
-    if exists(log_file):
+    if start_t > 0:
         # Fill first start_t timesteps with existing values
         massloss[:,0:start_t] = old_massloss[:,:]
-    # Read melt rate and convert from m/s to m/y
-    ismr = id.variables['wnet'][:,:]*365.25*24*60*60
-    id.close()
-
-    print 'Setting up arrays'
-    # Melt rate timeseries at each element
-    ismr_elm = zeros([num_time, len(elements)])
-    # Area of each element
-    area_elm = zeros(len(elements))
-    # Flag to indicate which ice shelves the element is part of
-    location_flag = zeros([len(names), len(elements)])
-    # Loop over each element to fill these in
-    for i in range(len(elements)):
-        elm = elements[i]
-        # Make sure we're actually in an ice shelf cavity
-        if elm.cavity:
-            # Average ice shelf melt rate timeseries over 3 component nodes
-            ismr_elm[:,i] = (ismr[:,elm.nodes[0].id] + ismr[:,elm.nodes[1].id] +ismr[:,elm.nodes[2].id])/3
-            # Call area function
-            area_elm[i] = elm.area()
-            # Loop over ice shelves
-            for index in range(len(names)):
-                # Figure out whether or not this element is part of the given
-                # ice shelf
-                if all(elm.lon >= lon_min[index]) and all(elm.lon <= lon_max[index]) and all(elm.lat >= lat_min[index]) and all(elm.lat <= lat_max[index]):
-                    location_flag[index,i] = 1
-                if index == len(names)-1:
-                    # Ross region is split into two
-                    if all(elm.lon >= lon_min[index+1]) and all(elm.lon <= lon_max[index+1]) and all(elm.lat >= lat_min[index+1]) and all(elm.lat <= lat_max[index+1]):
-                        location_flag[index,i] = 1
-
-    # Calculate conversion factors from mass loss to area-averaged melt rate
-    # for each ice shelf
-    factors = empty(len(names))
-    for index in range(len(names)):
-        # Calculate area of the ice shelf
-        tmp_area = sum(area_elm*location_flag[index,:])
-        factors[index] = 1e12/(rho_ice*tmp_area)
-        print 'Area of ' + names[index] + ': ' + str(tmp_area) + ' m^2'
-
-    # Build timeseries
-    for t in range(num_time):
-        # Loop over ice shelves
-        for index in range(len(names)):
-            # Integrate ice shelf melt rate over area to get volume loss
-            volumeloss = sum(ismr_elm[t,:]*area_elm*location_flag[index,:])
-            # Convert to mass loss in Gt/y
-            massloss[index,start_t+t] = 1e-12*rho_ice*volumeloss
+    massloss[:,start_t:] = new_massloss
 
     # Calculate time values
     time = arange(size(massloss,1))*days_per_output/365.
 
     print 'Plotting'
-    for index in range(len(names)):
-        # Calculate the bounds on observed mass loss and melt rate
-        massloss_low = obs_massloss[index] - obs_massloss_error[index]
-        massloss_high = obs_massloss[index] + obs_massloss_error[index]
-        ismr_low = obs_ismr[index] - obs_ismr_error[index]
-        ismr_high = obs_ismr[index] + obs_ismr_error[index]
-        # Set up plot: mass loss and melt rate are directly proportional (with
-        # a different constant of proportionality for each ice shelf depending
-        # on its area) so plot one line with two y-axes
-        fig, ax1 = subplots()
-        ax1.plot(time, massloss[index,:], color='black')
-        # In blue, add dashed lines for observed mass loss
-        ax1.axhline(massloss_low, color='b', linestyle='dashed')
-        ax1.axhline(massloss_high, color='b', linestyle='dashed')
-        # Make sure y-limits won't cut off observed melt rate
-        ymin = amin([ismr_low/factors[index], massloss_low, amin(massloss[index,:])])
-        ymax = amax([ismr_high/factors[index], massloss_high, amax(massloss[index,:])])
-        # Adjust y-limits to line up with ticks
-        ticks = ax1.get_yticks()
-        min_tick = ticks[0]
-        max_tick = ticks[-1]
-        dtick = ticks[1]-ticks[0]
-        while min_tick >= ymin:
-            min_tick -= dtick
-        while max_tick <= ymax:
-            max_tick += dtick
-        ax1.set_ylim([min_tick, max_tick])
-        # Title and ticks in blue for this side of the plot
-        ax1.set_ylabel('Basal Mass Loss (Gt/y)', color='b')
-        for t1 in ax1.get_yticklabels():
-            t1.set_color('b')
-        ax1.set_xlabel('Years')
-        ax1.grid(True)
-        # Twin axis for melt rates
-        ax2 = ax1.twinx()
-        # Make sure the scales line up
-        limits = ax1.get_ylim()
-        ax2.set_ylim([limits[0]*factors[index], limits[1]*factors[index]])
-        # In red, add dashed lines for observed ice shelf melt rates
-        ax2.axhline(ismr_low, color='r', linestyle='dashed')
-        ax2.axhline(ismr_high, color='r', linestyle='dashed')
-        # Title and ticks in red for this side of the plot
-        ax2.set_ylabel('Area-Averaged Ice Shelf Melt Rate (m/y)', color='r')
-        for t2 in ax2.get_yticklabels():
-            t2.set_color('r')
-        # Name of the ice shelf for the main title
-        title(names[index])
-        fig.savefig(fig_dir + fig_names[index])     
-
-    print 'Saving results to log file'
-    f = open(log_file, 'w')
-    for index in range(len(names)):
-        f.write(names[index] + ' Basal Mass Loss\n')
-        for t in range(size(time)):
-            f.write(str(massloss[index, t]) + '\n')
-    f.close()       
+    # Make the figures for each ice shelf in parallel
+    shared = {'time':time, 'massloss':massloss, 'factors':factors, 'names':names, 'fig_names':fig_names, 'fig_dir':fig_dir, 'obs_massloss':obs_massloss, 'obs_massloss_error':obs_massloss_error, 'obs_ismr':obs_ismr, 'obs_ismr_error':obs_ismr_error}
+    render_figures(plot_massloss_shelf, range(len(names)), shared)
+
+    print 'Saving results to store'
+    append_timeseries(store_file, time[start_t:], {'massloss':massloss[:,start_t:]}, dims={'massloss':['shelf']}, labels={'shelf':names}, units={'massloss':'Gt/y'}, inputs=[(diag_file, num_time)])
+
+
+# Plot the timeseries of mass loss and melt rate for one ice shelf. This is
+# called by timeseries_massloss for each ice shelf, in parallel (see
+# figure_batch.py).
+# Input:
+# index = index of ice shelf
+# shared = dictionary containing time, massloss, factors, names, fig_names,
+#          fig_dir, and the observations, all as in timeseries_massloss
+def plot_massloss_shelf (index, shared):
+
+    time = shared['time']
+    massloss = shared['massloss']
+    factors = shared['factors']
+    obs_massloss = shared['obs_massloss']
+    obs_massloss_error = shared['obs_massloss_error']
+    obs_ismr = shared['obs_ismr']
+    obs_ismr_error = shared['obs_ismr_error']
+
+    # Calculate the bounds on observed mass loss and melt rate
+    massloss_low = obs_massloss[index] - obs_massloss_error[index]
+    massloss_high = obs_massloss[index] + obs_massloss_error[index]
+    ismr_low = obs_ismr[index] - obs_ismr_error[index]
+    ismr_high = obs_ismr[index] + obs_ismr_error[index]
+    # Set up plot: mass loss and melt rate are directly proportional (with
+    # a different constant of proportionality for each ice shelf depending
+    # on its area) so plot one line with two y-axes
+    fig, ax1 = subplots()
+    ax1.plot(time, massloss[index,:], color='black')
+    # In blue, add dashed lines for observed mass loss
+    ax1.axhline(massloss_low, color='b', linestyle='dashed')
+    ax1.axhline(massloss_high, color='b', linestyle='dashed')
+    # Make sure y-limits won't cut off observed melt rate
+    ymin = amin([ismr_low/factors[index], massloss_low, amin(massloss[index,:])])
+    ymax = amax([ismr_high/factors[index], massloss_high, amax(massloss[index,:])])
+    # Adjust y-limits to line up with ticks
+    ticks = ax1.get_yticks()
+    min_tick = ticks[0]
+    max_tick = ticks[-1]
+    dtick = ticks[1]-ticks[0]
+    while min_tick >= ymin:
+        min_tick -= dtick
+    while max_tick <= ymax:
+        max_tick += dtick
+    ax1.set_ylim([min_tick, max_tick])
+    # Title and ticks in blue for this side of the plot
+    ax1.set_ylabel('Basal Mass Loss (Gt/y)', color='b')
+    for t1 in ax1.get_yticklabels():
+        t1.set_color('b')
+    ax1.set_xlabel('Years')
+    ax1.grid(True)
+    # Twin axis for melt rates
+    ax2 = ax1.twinx()
+    # Make sure the scales line up
+    limits = ax1.get_ylim()
+    ax2.set_ylim([limits[0]*factors[index], limits[1]*factors[index]])
+    # In red, add dashed lines for observed ice shelf melt rates
+    ax2.axhline(ismr_low, color='r', linestyle='dashed')
+    ax2.axhline(ismr_high, color='r', linestyle='dashed')
+    # Title and ticks in red for this side of the plot
+    ax2.set_ylabel('Area-Averaged Ice Shelf Melt Rate (m/y)', color='r')
+    for t2 in ax2.get_yticklabels():
+        t2.set_color('r')
+    # Name of the ice shelf for the main title
+    title(shared['names'][index])
+    fig.savefig(shared['fig_dir'] + shared['fig_names'][index])
 
 
 # Command-line interface
@@ -205,9 +161,9 @@ if __name__ == "__main__":
 
     mesh_path = raw_input("Path to FESOM mesh directory: ")
     diag_file = raw_input("Path to FESOM forcing.diag.nc output file: ")
-    log_file = raw_input("Path to logfile to save values and/or read previously calculated values: ")
+    store_file = raw_input("Path to timeseries store to save values and/or read previously calculated values: ")
 
-    timeseries_massloss(mesh_path, diag_file, log_file)
+    timeseries_massloss(mesh_path, diag_file, store_file)
             
                 
                 
@@ -1,15 +1,18 @@
 from netCDF4 import Dataset
 from numpy import *
 from fesom_grid import *
+from timeseries_store import *
 
 # Calculate timeseries of basal mass loss for the Wilkins, Stange, and
-# George VI ice shelves separately. Output to a log file.
+# George VI ice shelves separately. Output to a timeseries store.
 # Input:
 # mesh_path = path to FESOM mesh directory
 # directory = path to output directory for FESOM simulation
 # start_year, end_year = integers containing first and last years to process
-# log_file = path to desired output log file
-def timeseries_massloss_bellingshausen (mesh_path, directory, start_year, end_year, log_file):
+# store_file = path to NetCDF timeseries store (see timeseries_store.py). If it
+#              exists, the new values will be appended to it, and any years
+#              which have already been processed into it are skipped.
+def timeseries_massloss_bellingshausen (mesh_path, directory, start_year, end_year, store_file):
 
     # Name of each ice shelf
     names = ['Wilkins Ice Shelf', 'Stange Ice Shelf', 'George VI Ice Shelf']
@@ -29,7 +32,17 @@ def timeseries_massloss_bellingshausen (mesh_path, directory, start_year, end_ye
 
     circumpolar = True   # Only consider elements south of 30S
     cross_180 = False    # Don't make second copies of elements that cross 180E
-    peryear = 365/5      # Number of output steps per year (5-day averages)
+    days_per_output = 5  # Number of days for each output step
+    peryear = 365/days_per_output  # Number of output steps per year
+
+    # Only process the years whose output files haven't already been
+    # processed into the store
+    file_names = [directory + expt_name + '.' + str(year) + '.forcing.diag.nc' for year in range(start_year, end_year+1)]
+    new_files = new_inputs(store_file, file_names)
+    years = [year for year in range(start_year, end_year+1) if file_names[year-start_year] in new_files]
+    if len(years) == 0:
+        print 'All years have already been processed'
+        return
 
     print 'Building grid'
     elements = fesom_grid(mesh_path, circumpolar, cross_180)
@@ -57,12 +70,11 @@ def timeseries_massloss_bellingshausen (mesh_path, directory, start_year, end_ye
                     if all(elm.lon >= lon_min[shelf+1]) and all(elm.lon <= lon_max[shelf+1]) and all(elm.lat >= lat_min[shelf+1]) and all(elm.lat <= lat_max[shelf+1]):
                         location_flag[shelf,i] = 1
     # Set up array of mass loss values for each ice shelf
-    num_time = (end_year-start_year+1)*peryear
+    num_time = len(new_files)*peryear
     massloss = empty([len(names), num_time])
 
     t_posn = 0
-    for year in range(start_year, end_year+1):
-        file = directory + expt_name + '.' + str(year) + '.forcing.diag.nc'
+    for file in new_files:
         print 'Processing ' + file
         # Read melt rate and convert from m/s to m/y
         id = Dataset(file, 'r')        
@@ -85,13 +97,11 @@ def timeseries_massloss_bellingshausen (mesh_path, directory, start_year, end_ye
                 massloss[shelf, t_posn+t] = 1e-12*rho_ice*volumeloss
         t_posn += peryear
 
-    print 'Saving results to log file'
-    f = open(log_file, 'w')
-    for index in range(len(names)):
-        f.write(names[index] + ' Basal Mass Loss\n')
-        for t in range(num_time):
-            f.write(str(massloss[index, t]) + '\n')
-    f.close()   
+    # Calculate time values, starting from the beginning of each year
+    time = concatenate([year + arange(peryear)*days_per_output/365. for year in years])
+
+    print 'Saving results to store'
+    append_timeseries(store_file, time, {'massloss':massloss}, dims={'massloss':['shelf']}, labels={'shelf':names}, units={'massloss':'Gt/y'}, inputs=[(file, peryear) for file in new_files])
 
 
 # Command-line interface
@@ -101,7 +111,7 @@ if __name__ == "__main__":
     directory = raw_input("Path to FESOM output directory: ")
     start_year = int(raw_input("First year to process: "))
     end_year = int(raw_input("Last year to process: "))
-    log_file = raw_input("Path to desired logfile: ")
-    timeseries_massloss_bellingshausen(mesh_path, directory, start_year, end_year, log_file)
+    store_file = raw_input("Path to timeseries store: ")
+    timeseries_massloss_bellingshausen(mesh_path, directory, start_year, end_year, store_file)
 
             
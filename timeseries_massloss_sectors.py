@@ -3,8 +3,10 @@ from numpy import *
 from matplotlib.pyplot import *
 from os.path import *
 from fesom_grid import *
+from read_nodes import *
+from timeseries_store import *
 
-def timeseries_massloss_sectors (mesh_path, diag_file, log_file, fig_dir=''):
+def timeseries_massloss_sectors (mesh_path, diag_file, store_file, fig_dir=''):
 
     # Titles and figure names for each sector
     names = ['Filchner-Ronne Ice Shelf', 'Eastern Weddell Region', 'Amery Ice Shelf', 'Australian Sector', 'Ross Sea', 'Amundsen Sea', 'Bellingshausen Sea', 'Larsen Ice Shelves', 'Total Antarctica']
@@ -21,38 +23,17 @@ def timeseries_massloss_sectors (mesh_path, diag_file, log_file, fig_dir=''):
     # Number of days for each output step
     days_per_output = 5
 
-    tmp_massloss = []
-    # Check if the log file exists
-    if exists(log_file):
+    # Skip this file if it's already been processed into the store
+    if len(new_inputs(store_file, [diag_file])) == 0:
+        print diag_file + ' has already been processed'
+        return
+
+    # Check if the store already has values in it
+    start_t = timeseries_length(store_file)
+    if start_t > 0:
         print 'Reading previously calculated values'
-        f = open(log_file, 'r')
-        # Skip the first line (header)
-        f.readline()
-        for line in f:
-            try:
-                tmp_massloss.append(float(line))
-            except(ValueError):
-                # Reached the header for the next variable
-                break
-        start_t = len(tmp_massloss)
-        # Set up array for mass loss values for each sector
-        old_massloss = empty([num_sectors, start_t])
-        # Fill in the first sector
-        old_massloss[0,:] = tmp_massloss[:]
-        index = 1
-        # Loop over the rest of the sectors
-        while index < num_sectors:
-            t = 0
-            for line in f:
-                try:
-                    old_massloss[index, t] = float(line)
-                    t += 1
-                except(ValueError):
-                    # Reached the header for the next sector
-                    break
-            index +=1
-    else:
-        start_t = 0
+        old_time, old_series = read_timeseries(store_file, ['massloss'])
+        old_massloss = old_series['massloss']
 
     print 'Building grid'
     elements = fesom_grid(mesh_path, circumpolar, cross_180)
@@ -62,11 +43,14 @@ def timeseries_massloss_sectors (mesh_path, diag_file, log_file, fig_dir=''):
     num_time = id.variables['time'].shape[0]
     # Set up array of mass loss values
     massloss = empty([num_sectors, start_t+num_time])
-    if exists(log_file):
+    if start_t > 0:
         # Fill first start_t timesteps with existing values
         massloss[:,0:start_t] = old_massloss[:,:]
-    # Read melt rate and convert from m/s to m/y
-    ismr = id.variables['wnet'][:,:]*sec_per_year
+    # Read melt rate at the nodes in ice shelf cavities only, and convert
+    # from m/s to m/y
+    cavity_nodes = [elm.nodes[n].id for elm in elements if elm.cavity for n in range(3)]
+    ismr, node_map = read_nodes(id, 'wnet', cavity_nodes)
+    ismr = ismr*sec_per_year
     id.close()
 
     print 'Setting up arrays'
@@ -81,7 +65,7 @@ def timeseries_massloss_sectors (mesh_path, diag_file, log_file, fig_dir=''):
         # Make sure we're actually in an ice shelf cavity
         if elm.cavity:
             # Average ice shelf melt rate timeseries over 3 component nodes
-            ismr_elm[:,i] = (ismr[:,elm.nodes[0].id] + ismr[:,elm.nodes[1].id] +ismr[:,elm.nodes[2].id])/3
+            ismr_elm[:,i] = (ismr[:,node_map[elm.nodes[0].id]] + ismr[:,node_map[elm.nodes[1].id]] + ismr[:,node_map[elm.nodes[2].id]])/3
             # Call area function
             area_elm[i] = elm.area()            
             # Get average lon and lat across 3 Nodes
@@ -165,13 +149,8 @@ def timeseries_massloss_sectors (mesh_path, diag_file, log_file, fig_dir=''):
         title(names[index])
         fig.savefig(fig_dir + fig_names[index])    
 
-    print 'Saving results to log file'
-    f = open(log_file, 'w')
-    for index in range(num_sectors):
-        f.write(names[index] + ' Basal Mass Loss (Gt/y)\n')
-        for t in range(size(time)):
-            f.write(str(massloss[index, t]) + '\n')
-    f.close()   
+    print 'Saving results to store'
+    append_timeseries(store_file, time[start_t:], {'massloss':massloss[:,start_t:]}, dims={'massloss':['sector']}, labels={'sector':names}, units={'massloss':'Gt/y'}, inputs=[(diag_file, num_time)])
 
 
 # Command-line interface
@@ -179,7 +158,7 @@ if __name__ == "__main__":
 
     mesh_path = raw_input("Path to FESOM mesh directory: ")
     diag_file = raw_input("Path to FESOM forcing.diag.nc output file: ")
-    log_file = raw_input("Path to logfile to save values and/or read previously calculated values: ")
+    store_file = raw_input("Path to timeseries store to save values and/or read previously calculated values: ")
 
-    timeseries_massloss_sectors(mesh_path, diag_file, log_file)
+    timeseries_massloss_sectors(mesh_path, diag_file, store_file)
     
@@ -1,16 +1,17 @@
 from numpy import *
 from matplotlib.pyplot import *
+from expt_timeseries import *
 
-# Given the logfiles for 5-day timeseries created using timeseries_dpt.py,
-# timeseries_seaice.py, and timeseries_massloss.py for a given control
-# simulation (1992-2005 repeated a bunch of times), plot just the third
-# repetition of the forcing.
+# Given the timeseries stores for 5-day timeseries created using
+# timeseries_dpt.py, timeseries_seaice.py, and timeseries_massloss.py for a
+# given control simulation (1992-2005 repeated a bunch of times), plot just the
+# third repetition of the forcing.
 # Input:
-# dpt_log = path to logfile from timeseries_dpt.py
-# seaice_log = path to logfile from timeseries_seaice.py
-# massloss_log = path to logfile from timeseries_massloss.py
+# dpt_store = path to timeseries store from timeseries_dpt.py
+# seaice_store = path to timeseries store from timeseries_seaice.py
+# massloss_store = path to timeseries store from timeseries_massloss.py
 # res_flag = integer flag indicating low resolution mesh (1) or high (2)
-def timeseries_rep3 (dpt_log, seaice_log, massloss_log, res_flag):
+def timeseries_rep3 (dpt_store, seaice_store, massloss_store, res_flag):
 
     year_start = 1992
     year_end = 2005
@@ -43,19 +44,10 @@ def timeseries_rep3 (dpt_log, seaice_log, massloss_log, res_flag):
 
     # Make time axis
     time = arange(year_start, year_end+1, 1.0/peryear)    
-    num_time = size(time)
     num_years = year_end - year_start + 1
 
     # Drake Passage transport
-    dpt = []
-    # Read log file
-    f = open(dpt_log, 'r')
-    # Skip header
-    f.readline()
-    for line in f:
-        dpt.append(float(line))
-    f.close()
-    dpt = dpt[skipyears*peryear:(skipyears+num_years)*peryear]
+    dpt = expt_timeseries([dpt_store], 'dpt', skip=skipyears*peryear, num_records=num_years*peryear)[0,:]
     # Plot
     clf()
     plot(time, dpt)
@@ -65,23 +57,8 @@ def timeseries_rep3 (dpt_log, seaice_log, massloss_log, res_flag):
     savefig('drakepsgtrans_rep3.png')
 
     # Sea ice area and volume
-    seaice_area = []
-    seaice_volume = []
-    # Read log file
-    f = open(seaice_log, 'r')
-    # Skip header for sea ice area
-    f.readline()
-    for line in f:
-        try:
-            seaice_area.append(float(line))
-        except(ValueError):
-            # Header for sea ice volume
-            break
-    for line in f:
-        seaice_volume.append(float(line))
-    f.close()
-    seaice_area = seaice_area[skipyears*peryear:(skipyears+num_years)*peryear]
-    seaice_volume = seaice_volume[skipyears*peryear:(skipyears+num_years)*peryear]
+    seaice_area = expt_timeseries([seaice_store], 'area', skip=skipyears*peryear, num_records=num_years*peryear)[0,:]
+    seaice_volume = expt_timeseries([seaice_store], 'volume', skip=skipyears*peryear, num_records=num_years*peryear)[0,:]
     # Plot
     clf()
     plot(time, seaice_area)
@@ -96,25 +73,8 @@ def timeseries_rep3 (dpt_log, seaice_log, massloss_log, res_flag):
     grid(True)
     savefig('seaice_volume_rep3.png')
 
-    # Mass loss
-    massloss = empty([len(names), len(dpt)])
-    # Read logfile
-    f = open(massloss_log, 'r')
-    # Skip header
-    f.readline()
-    index = 0
-    # Loop over ice shelves
-    while index < len(names):
-        massloss_tmp = []
-        for line in f:
-            try:
-                massloss_tmp.append(float(line))
-            except(ValueError):
-                # Reached the header for the next ice shelf
-                break
-        massloss[index,:] = massloss_tmp[skipyears*peryear:(skipyears+num_years)*peryear]
-        index += 1
-    f.close()
+    # Mass loss for each ice shelf
+    massloss = expt_timeseries([massloss_store], 'massloss', skip=skipyears*peryear, num_records=num_years*peryear)[0,:,:]
     # Plot each ice shelf
     for index in range(len(names)):
         # Calculate conversion factor from mass loss to area-averaged melt rate
@@ -171,11 +131,11 @@ def timeseries_rep3 (dpt_log, seaice_log, massloss_log, res_flag):
 # Command-line interface
 if __name__ == '__main__':
 
-    dpt_log = raw_input("Path to logfile for timeseries_dpt.py: ")
-    seaice_log = raw_input("Path to logfile for timeseries_seaice.py: ")
-    massloss_log = raw_input("Path to logfile for timeseries_massloss.py: ")
+    dpt_store = raw_input("Path to timeseries store for timeseries_dpt.py: ")
+    seaice_store = raw_input("Path to timeseries store for timeseries_seaice.py: ")
+    massloss_store = raw_input("Path to timeseries store for timeseries_massloss.py: ")
     res_flag = int(raw_input("Low resolution (1) or high (2)? "))
-    timeseries_rep3(dpt_log, seaice_log, massloss_log, res_flag)
+    timeseries_rep3(dpt_store, seaice_store, massloss_store, res_flag)
 
     
         
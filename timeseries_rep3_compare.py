@@ -1,5 +1,6 @@
 from numpy import *
 from matplotlib.pyplot import *
+from timeseries_store import *
 
 # Plot Drake Passage transport and ice shelf melt rates/mass loss for the third
 # repetition of the spinup forcing (1992-2005), for both the low-res and
@@ -42,16 +43,10 @@ def timeseries_rep3_compare ():
     dpt = empty([2, num_time])
     # Loop over experiments
     for expt in range(2):
-        # Read logfile
-        dpt_tmp = []
-        f = open(directory_head + expt_dir[expt] + 'dpt.log')
-        f.readline()
-        for line in f:
-            dpt_tmp.append(float(line))
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + expt_dir[expt] + 'dpt.nc', ['dpt'])
         # Select third repetition
-        dpt_tmp = dpt_tmp[skipyears*peryear:(skipyears+num_years)*peryear]
-        dpt[expt,:] = array(dpt_tmp)
+        dpt[expt,:] = series['dpt'][skipyears*peryear:(skipyears+num_years)*peryear]
 
     # Plot
     fig, ax = subplots(figsize=(10,6))
@@ -76,21 +71,10 @@ def timeseries_rep3_compare ():
     massloss = empty([2, len(names), num_time])
     # Loop over experiments
     for expt in range(2):
-        # Read logfile
-        f = open(directory_head + expt_dir[expt] + 'massloss.log')
-        f.readline()
-        # Loop over ice shelves
-        for index in range(len(names)):
-            massloss_tmp = []
-            for line in f:
-                try:
-                    massloss_tmp.append(float(line))
-                except(ValueError):
-                    break
-            # Select third repetition
-            massloss_tmp = massloss_tmp[skipyears*peryear:(skipyears+num_years)*peryear]
-            massloss[expt,index,:] = array(massloss_tmp)
-        f.close()
+        # Read timeseries store
+        time_tmp, series = read_timeseries(directory_head + expt_dir[expt] + 'massloss.nc', ['massloss'])
+        # Select third repetition
+        massloss[expt,:,:] = series['massloss'][:,skipyears*peryear:(skipyears+num_years)*peryear]
 
     # One plot for each ice shelf
     for index in range(len(names)):
@@ -0,0 +1,315 @@
+from netCDF4 import Dataset
+from numpy import *
+from os import rename, remove
+from os.path import exists, abspath, getsize, getmtime
+from shutil import copyfile
+
+# Binary store for diagnostic timeseries, replacing the text log files (one
+# float per line, separated by header lines) written by the timeseries_*.py
+# scripts. Each store is a NetCDF file with an unlimited time axis and any
+# number of named series. A series can have extra dimensions (eg ice shelf,
+# sector, water mass) which are labelled with string coordinate variables.
+# On disk each series is stored as (time, ...) so that appending is cheap,
+# but all routines here pass arrays in and out with time as the LAST axis,
+# to match the arrays built by the timeseries scripts (eg massloss[shelf, t]).
+# Writes are atomic: everything goes to a temporary copy of the store which is
+# renamed over the original once it is complete, so an interrupted job never
+# leaves a half-written store behind.
+# Each store also records the input files it was built from (path, size,
+# modification time, and which time records they produced), so that a
+# diagnostic can be rerun over a whole simulation and only process the files
+# it hasn't seen before.
+
+
+# Write one or more timeseries to the given store, either creating it from
+# scratch or appending new time records to the end of it.
+# Input:
+# store_file = path to NetCDF store
+# time = 1D array of time values (in years) for the new records
+# series = dictionary of variable name -> array with time as the last axis.
+#          Any leading axes become extra dimensions of the variable.
+# dims = optional dictionary of variable name -> list of names for the leading
+#        dimensions (eg ['shelf']). Variables with the same dimension names
+#        share dimensions. Default is <var>_<n> for the nth leading axis.
+# labels = optional dictionary of dimension name -> list of strings labelling
+#          each index along that dimension (eg ice shelf names)
+# units = optional dictionary of variable name -> units string
+# append = optional boolean flag indicating that the new records should be
+#          added after any that already exist in the store (default False,
+#          which overwrites the store)
+# inputs = optional list of (file path, number of records) pairs for the input
+#          files which produced the new records, in order
+def write_timeseries (store_file, time, series, dims=None, labels=None, units=None, append=False, inputs=None):
+
+    if dims is None:
+        dims = {}
+    if labels is None:
+        labels = {}
+    if units is None:
+        units = {}
+    time = atleast_1d(array(time, dtype=float))
+    num_time = size(time)
+
+    # Everything is written to a temporary file first
+    tmp_file = store_file + '.tmp'
+    if append and exists(store_file):
+        copyfile(store_file, tmp_file)
+        id = Dataset(tmp_file, 'a')
+        t0 = len(id.dimensions['time'])
+    else:
+        id = Dataset(tmp_file, 'w')
+        id.createDimension('time', None)
+        id.createVariable('time', 'f8', ('time'))
+        id.variables['time'].units = 'years'
+        t0 = 0
+    try:
+        id.variables['time'][t0:t0+num_time] = time
+        for var in series:
+            data = array(series[var], dtype=float)
+            if data.shape[-1] != num_time:
+                raise ValueError('Series ' + var + ' has ' + str(data.shape[-1]) + ' records but there are ' + str(num_time) + ' time values')
+            if var not in id.variables:
+                _create_series(id, var, data.shape[:-1], dims.get(var), labels, units.get(var))
+            # Move time from the last axis to the first
+            id.variables[var][t0:t0+num_time] = rollaxis(data, data.ndim-1)
+        if inputs is not None:
+            _record_inputs(id, inputs, t0, num_time)
+    except:
+        id.close()
+        remove(tmp_file)
+        raise
+    id.close()
+    rename(tmp_file, store_file)
+
+
+# Append new time records to the given store (creating it if it doesn't
+# exist yet). Arguments are as for write_timeseries.
+def append_timeseries (store_file, time, series, dims=None, labels=None, units=None, inputs=None):
+
+    write_timeseries(store_file, time, series, dims=dims, labels=labels, units=units, append=True, inputs=inputs)
+
+
+# Read timeseries from the given store. Each variable is read with a single
+# call, so there is no per-record parsing.
+# Input:
+# store_file = path to NetCDF store
+# var_names = optional list of variable names to read (default all)
+# Output:
+# time = 1D array of time values in years
+# series = dictionary of variable name -> array with time as the last axis.
+#          Missing values (eg series added to the store partway through) are
+#          NaN.
+def read_timeseries (store_file, var_names=None):
+
+    id = Dataset(store_file, 'r')
+    time = array(id.variables['time'][:])
+    if var_names is None:
+        var_names = [var for var in id.variables if var != 'time' and id.variables[var].dimensions[0] == 'time']
+    series = {}
+    for var in var_names:
+        data = id.variables[var][:]
+        if ma.isMaskedArray(data):
+            data = data.astype(float).filled(nan)
+        # Move time from the first axis to the last
+        series[var] = rollaxis(array(data), 0, data.ndim)
+    id.close()
+
+    return time, series
+
+
+# Read the string labels along the given dimension of the store.
+# Input:
+# store_file = path to NetCDF store
+# dim = name of dimension (eg 'shelf')
+# Output: list of strings, or None if the dimension isn't labelled
+def read_labels (store_file, dim):
+
+    id = Dataset(store_file, 'r')
+    if dim in id.variables:
+        labels = [str(label) for label in id.variables[dim][:]]
+    else:
+        labels = None
+    id.close()
+
+    return labels
+
+
+# Read the dimensions, labels and units of every series in the given store, in
+# the form accepted by write_timeseries. Useful for copying a subset of one
+# store into another.
+# Input: store_file = path to NetCDF store
+# Output: dims, labels, units = dictionaries as for write_timeseries
+def read_timeseries_info (store_file):
+
+    dims = {}
+    labels = {}
+    units = {}
+    id = Dataset(store_file, 'r')
+    for var in id.variables:
+        var_dims = id.variables[var].dimensions
+        if var == 'time' or var_dims[0] != 'time':
+            continue
+        dims[var] = list(var_dims[1:])
+        for dim in dims[var]:
+            if dim in id.variables:
+                labels[dim] = [str(label) for label in id.variables[dim][:]]
+        if 'units' in id.variables[var].ncattrs():
+            units[var] = id.variables[var].units
+    id.close()
+
+    return dims, labels, units
+
+
+# Return the number of time records in the given store, or 0 if the store
+# doesn't exist yet.
+def timeseries_length (store_file):
+
+    if not exists(store_file):
+        return 0
+    id = Dataset(store_file, 'r')
+    num_time = len(id.dimensions['time'])
+    id.close()
+
+    return num_time
+
+
+# Read the record of input files which have been processed into the store.
+# Input: store_file = path to NetCDF store
+# Output: dictionary of absolute file path -> (size in bytes, modification
+#         time, first time index, last time index + 1). Empty if the store
+#         doesn't exist or has no record of its inputs.
+def read_inputs (store_file):
+
+    inputs = {}
+    if not exists(store_file):
+        return inputs
+    id = Dataset(store_file, 'r')
+    if 'input_file' in id.variables:
+        for n in range(len(id.dimensions['input'])):
+            inputs[str(id.variables['input_file'][n])] = (int(id.variables['input_size'][n]), float(id.variables['input_mtime'][n]), int(id.variables['input_start'][n]), int(id.variables['input_end'][n]))
+    id.close()
+
+    return inputs
+
+
+# Given a list of input files, find which ones haven't been processed into the
+# store yet. A file which has been processed but has since changed on disk is
+# an error, because its old records are already in the store.
+# Input:
+# store_file = path to NetCDF store
+# file_paths = list of paths to input files
+# Output: list of the files in file_paths which are new, in the same order
+def new_inputs (store_file, file_paths):
+
+    inputs = read_inputs(store_file)
+    new_files = []
+    for file_path in file_paths:
+        key = abspath(file_path)
+        if key not in inputs:
+            new_files.append(file_path)
+        elif inputs[key][:2] != (getsize(file_path), getmtime(file_path)):
+            raise ValueError(file_path + ' has changed since it was processed into ' + store_file + '; delete the store to start again')
+
+    return new_files
+
+
+# Read a text log file in the old format (one value per line, with a header
+# line before each block of values).
+# Input:
+# log_file = path to log file
+# Output:
+# headers = list of header strings, one for each block
+# blocks = list of 1D arrays containing the values in each block
+def read_log (log_file):
+
+    headers = []
+    blocks = []
+    values = []
+    f = open(log_file, 'r')
+    for line in f:
+        try:
+            values.append(float(line))
+        except(ValueError):
+            # Reached the header for the next block
+            if len(headers) > 0:
+                blocks.append(array(values))
+            headers.append(line.strip())
+            values = []
+    f.close()
+    blocks.append(array(values))
+
+    return headers, blocks
+
+
+# Convert a text log file in the old format to a store. The blocks in the log
+# file are assigned to the given variables in order, with each variable taking
+# one block for every combination of indices along its dimensions.
+# Input:
+# log_file = path to log file
+# store_file = path to NetCDF store to create
+# var_names = list of variable names, in the order they appear in the log file
+# time = 1D array of time values in years for each record
+# dims, labels, units = as for write_timeseries. The size of each dimension
+#                       is taken from the length of its labels, and a variable
+#                       with no dimensions must have exactly one block.
+def log_to_store (log_file, store_file, var_names, time, dims=None, labels=None, units=None):
+
+    if dims is None:
+        dims = {}
+    if labels is None:
+        labels = {}
+    headers, blocks = read_log(log_file)
+    series = {}
+    b = 0
+    for var in var_names:
+        shape = [len(labels[dim]) for dim in dims.get(var, [])]
+        num_blocks = int(prod(shape))
+        series[var] = reshape(array(blocks[b:b+num_blocks]), shape + [size(time)])
+        b += num_blocks
+    write_timeseries(store_file, time, series, dims=dims, labels=labels, units=units)
+
+
+# Helper function to define a new series in an open store, including any
+# dimensions and label variables it needs.
+def _create_series (id, var, shape, dim_names, labels, var_units):
+
+    if dim_names is None:
+        dim_names = [var + '_' + str(n) for n in range(len(shape))]
+    for dim, size_dim in zip(dim_names, shape):
+        if dim in id.dimensions:
+            if len(id.dimensions[dim]) != size_dim:
+                raise ValueError('Dimension ' + dim + ' already has size ' + str(len(id.dimensions[dim])))
+            continue
+        id.createDimension(dim, size_dim)
+        if dim in labels:
+            id.createVariable(dim, str, (dim))
+            for n in range(size_dim):
+                id.variables[dim][n] = str(labels[dim][n])
+    id.createVariable(var, 'f8', tuple(['time'] + list(dim_names)))
+    if var_units is not None:
+        id.variables[var].units = var_units
+
+
+# Helper function to add records of the given input files to an open store.
+# Their records start at time index t0 and there are num_time of them in total.
+def _record_inputs (id, inputs, t0, num_time):
+
+    if 'input' not in id.dimensions:
+        id.createDimension('input', None)
+        id.createVariable('input_file', str, ('input'))
+        id.createVariable('input_size', 'i8', ('input'))
+        id.createVariable('input_mtime', 'f8', ('input'))
+        id.createVariable('input_start', 'i4', ('input'))
+        id.createVariable('input_end', 'i4', ('input'))
+    if sum([num_records for file_path, num_records in inputs]) != num_time:
+        raise ValueError('Input files account for a different number of records than were written')
+    n = len(id.dimensions['input'])
+    t = t0
+    for file_path, num_records in inputs:
+        id.variables['input_file'][n] = abspath(file_path)
+        id.variables['input_size'][n] = getsize(file_path)
+        id.variables['input_mtime'][n] = getmtime(file_path)
+        id.variables['input_start'][n] = t
+        id.variables['input_end'][n] = t + num_records
+        n += 1
+        t += num_records
@@ -1,5 +1,6 @@
 from numpy import *
 from matplotlib.pyplot import *
+from expt_timeseries import *
 
 def transport_3pt ():
 
@@ -29,9 +30,9 @@ def transport_3pt ():
     #rsg_trends = ['n/a', '+0.10 %/y', '+0.18 %/y', '+0.15 %/y', 'n/a']
 
     # Subpolar gyre parameters
-    subpolar_log = 'subpolar_gyres.log'
+    subpolar_store = 'subpolar_gyres.nc'
     # Drake Passage transport parameters
-    dpt_log = 'dpt.log'
+    dpt_store = 'dpt.nc'
     # Spinup years to discard (first 2 repetitions of 1992-2005)
     control_skipyears = 28
     # Output steps per year
@@ -43,71 +44,23 @@ def transport_3pt ():
     time = arange(year_start, year_end+1)
 
     # Drake Passage transport, annual averages
-    dpt = empty([num_rcps+1, num_years])
-    # Loop over RCP experiments
-    for expt in range(num_rcps):
-        # Read logfile
-        dpt_tmp = []
-        f = open(directory_head + rcp_expt[expt] + dpt_log)
-        f.readline()
-        for line in f:
-            dpt_tmp.append(float(line))
-        f.close()
-        # Calculate annual averages
-        for year in range(num_years):
-            dpt[expt,year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
-    # Read control experiment
-    # Read logfile
-    dpt_tmp = []
-    f = open(directory_head + control_expt + dpt_log)
-    f.readline()
-    for line in f:
-        dpt_tmp.append(float(line))
-    f.close()
-    # Throw away first 2 repetitions
-    dpt_tmp = dpt_tmp[control_skipyears*peryear:]
-    # Calculate annual averages
-    for year in range(num_years):
-        dpt[-1,year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
+    rcp_files = [directory_head + expt + dpt_store for expt in rcp_expt]
+    control_file = directory_head + control_expt + dpt_store
+    # Throw away first 2 repetitions of the control
+    skip = [0]*num_rcps + [control_skipyears*peryear]
+    dpt = annual_avg(expt_timeseries(rcp_files + [control_file], 'dpt', skip=skip, num_records=num_years*peryear), peryear)
 
     # Weddell Sea Gyre and Ross Sea Gyre transport, already annually averaged
-    ws_trans = empty([num_rcps+1, num_years])
-    rs_trans = empty([num_rcps+1, num_years])
-    # First read control experiment (correct years already selected)
-    f = open(directory_head + control_expt + subpolar_log, 'r')
-    f.readline()
-    t = 0
-    for line in f:
-        try:
-            ws_trans[-1, t] = float(line)
-            t += 1
-        except(ValueError):
-            break
-    t = 0
-    for line in f:
-        rs_trans[-1, t] = float(line)
-        t += 1
-    f.close()
-    # Loop over RCP experiments
-    for expt in range(num_rcps):
-        # Copy the beginning of the control
-        ws_trans[expt, 0:num_years_rep3] = ws_trans[-1, 0:num_years_rep3]
-        rs_trans[expt, 0:num_years_rep3] = rs_trans[-1, 0:num_years_rep3]
-        # Now read logfile for the rest of it
-        f = open(directory_head + rcp_expt[expt] + subpolar_log, 'r')
-        f.readline()
-        t = num_years_rep3
-        for line in f:
-            try:
-                ws_trans[expt, t] = float(line)
-                t += 1
-            except(ValueError):
-                break
-        t = num_years_rep3
-        for line in f:
-            rs_trans[expt, t] = float(line)
-            t += 1
-        f.close()
+    # Control experiment has the correct years already selected, and the RCPs
+    # start in 2006
+    rcp_files = [directory_head + expt + subpolar_store for expt in rcp_expt]
+    control_file = directory_head + control_expt + subpolar_store
+    offset = [num_years_rep3]*num_rcps + [0]
+    ws_trans = expt_timeseries(rcp_files + [control_file], 'ws_trans', offset=offset, num_records=num_years)
+    rs_trans = expt_timeseries(rcp_files + [control_file], 'rs_trans', offset=offset, num_records=num_years)
+    # Copy the beginning of the control into each RCP
+    ws_trans[:-1,0:num_years_rep3] = ws_trans[-1,0:num_years_rep3]
+    rs_trans[:-1,0:num_years_rep3] = rs_trans[-1,0:num_years_rep3]
 
     # Plot
     fig = figure(figsize=(15,5))
@@ -1,6 +1,7 @@
 from numpy import *
 from scipy.stats import linregress
 from matplotlib.pyplot import *
+from expt_timeseries import *
 
 def trends ():
 
@@ -17,10 +18,10 @@ def trends ():
     # Years to consider
     calc_start = 2006
     calc_end = 2100
-    # Logfile names
-    massloss_log = 'massloss_sectors.log'
-    dpt_log = 'dpt.log'
-    subpolar_log = 'subpolar_gyres.log'
+    # Timeseries store names
+    massloss_store = 'massloss_sectors.nc'
+    dpt_store = 'dpt.nc'
+    subpolar_store = 'subpolar_gyres.nc'
     # Present-day years to discard (1992-2005)
     beg_skipyears = 14
     # Spinup years to discard (first 2 repetitions of 1992-2005)
@@ -35,119 +36,39 @@ def trends ():
     num_years = calc_end - calc_start + 1
 
     # Read all the timeseries for the correct years
+    # Everything is lined up to start in 1992, so the first beg_skipyears
+    # years of the control give the baseline
+    rcp_files = [directory_head + expt + massloss_store for expt in rcp_expt]
+    control_file = directory_head + control_expt + massloss_store
+    # Throw away the first two repetitions of the control
+    skip = [0]*num_rcps + [control_skipyears*peryear]
+    num_records = (beg_skipyears+num_years)*peryear
 
-    # Mass loss timeseries for each sector
-    massloss = empty([num_rcps+1, num_sectors, num_years])
-    # 1992-2005 average for each sector
-    massloss_baseline = empty(num_sectors)
-    # Loop over RCP experiments
-    for expt in range(num_rcps):
-        # Read logfile
-        f = open(directory_head + rcp_expt[expt] + massloss_log, 'r')
-        f.readline()
-        # Loop over sectors
-        for sector in range(num_sectors):
-            massloss_tmp = []
-            for line in f:
-                try:
-                    massloss_tmp.append(float(line))
-                except(ValueError):
-                    break
-            # Throw away 1992-2005
-            massloss_tmp = massloss_tmp[beg_skipyears*peryear:]
-            # Calculate annual averages
-            for year in range(num_years):
-                massloss[expt, sector, year] = mean(array(massloss_tmp[peryear*year:peryear*(year+1)]))
-        f.close()
-    # Control experiment
-    f = open(directory_head + control_expt + massloss_log, 'r')
-    f.readline()
-    for sector in range(num_sectors):
-        massloss_tmp = []
-        for line in f:
-            try:
-                massloss_tmp.append(float(line))
-            except(ValueError):
-                break
-        # Throw away first two repetitions
-        massloss_tmp = massloss_tmp[control_skipyears*peryear:]
-        # Calculate 1992-2005 average
-        massloss_baseline[sector] = mean(array(massloss_tmp[:beg_skipyears*peryear]))
-        # Throw away 1992-2005
-        massloss_tmp = massloss_tmp[beg_skipyears*peryear:]
-        # Calculate annual averages
-        for year in range(num_years):
-            massloss[-1, sector, year] = mean(array(massloss_tmp[peryear*year:peryear*(year+1)]))
-    f.close()
-    # Now scale as a percentage of 1992-2005 average for each sector
-    for sector in range(num_sectors):
-        massloss[:,sector,:] = massloss[:,sector,:]/massloss_baseline[sector]*100
+    # Mass loss timeseries for each sector, annually averaged
+    massloss = annual_avg(expt_timeseries(rcp_files + [control_file], 'massloss', skip=skip, num_records=num_records), peryear)
+    # Calculate 1992-2005 average for each sector
+    massloss_baseline = baseline_avg(massloss[-1,:,:], 0, beg_skipyears)
+    # Throw away 1992-2005 and scale as a percentage of the baseline
+    massloss = massloss[:,:,beg_skipyears:]/massloss_baseline*100
 
     # Drake Passage transport
-    dpt = empty([num_rcps+1, num_years])
-    for expt in range(num_rcps):
-        f = open(directory_head + rcp_expt[expt] + dpt_log, 'r')
-        f.readline()
-        dpt_tmp = []
-        for line in f:
-            dpt_tmp.append(float(line))
-        f.close()
-        dpt_tmp = dpt_tmp[beg_skipyears*peryear:]
-        for year in range(num_years):
-            dpt[expt, year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
-    f = open(directory_head + control_expt + dpt_log, 'r')
-    f.readline()
-    dpt_tmp = []
-    for line in f:
-        dpt_tmp.append(float(line))
-    f.close()
-    dpt_tmp = dpt_tmp[control_skipyears*peryear:]
-    dpt_baseline = mean(array(dpt_tmp[:beg_skipyears*peryear]))
-    dpt_tmp = dpt_tmp[beg_skipyears*peryear:]
-    for year in range(num_years):
-        dpt[-1, year] = mean(array(dpt_tmp[peryear*year:peryear*(year+1)]))
-    dpt = dpt/dpt_baseline*100
+    rcp_files = [directory_head + expt + dpt_store for expt in rcp_expt]
+    control_file = directory_head + control_expt + dpt_store
+    dpt = annual_avg(expt_timeseries(rcp_files + [control_file], 'dpt', skip=skip, num_records=num_records), peryear)
+    dpt_baseline = baseline_avg(dpt[-1,:], 0, beg_skipyears)
+    dpt = dpt[:,beg_skipyears:]/dpt_baseline*100
 
     # Subpolar gyre transport
     # These are already annually averaged: 2006-2100 for the RCPs, 1992-2100
-    # for the control experiment
-    ws_trans = empty([num_rcps+1, num_years])
-    rs_trans = empty([num_rcps+1, num_years])
-    for expt in range(num_rcps):
-        f = open(directory_head + rcp_expt[expt] + subpolar_log, 'r')
-        f.readline()
-        year = 0
-        for line in f:
-            try:
-                ws_trans[expt, year] = float(line)
-                year += 1
-            except(ValueError):
-                break
-        year = 0
-        for line in f:
-            rs_trans[expt, year] = float(line)
-            year += 1
-        f.close()
-    f = open(directory_head + control_expt + subpolar_log, 'r')
-    f.readline()
-    ws_trans_tmp = []
-    for line in f:
-        try:
-            ws_trans_tmp.append(float(line))
-        except(ValueError):
-            break
-    rs_trans_tmp = []
-    for line in f:
-        rs_trans_tmp.append(float(line))
-    # Calculate 1992-2005 averages
-    ws_trans_baseline = mean(array(ws_trans_tmp[:beg_skipyears]))
-    rs_trans_baseline = mean(array(rs_trans_tmp[:beg_skipyears]))
-    # Throw away 1992-2005
-    ws_trans[-1,:] = ws_trans_tmp[beg_skipyears:]
-    rs_trans[-1,:] = rs_trans_tmp[beg_skipyears:]
-    # Scale against 1992-2005 average
-    ws_trans = ws_trans/ws_trans_baseline*100
-    rs_trans = rs_trans/rs_trans_baseline*100
+    # for the control experiment, so pad the RCPs to start in 1992
+    rcp_files = [directory_head + expt + subpolar_store for expt in rcp_expt]
+    control_file = directory_head + control_expt + subpolar_store
+    offset = [beg_skipyears]*num_rcps + [0]
+    ws_trans = expt_timeseries(rcp_files + [control_file], 'ws_trans', offset=offset, num_records=beg_skipyears+num_years)
+    rs_trans = expt_timeseries(rcp_files + [control_file], 'rs_trans', offset=offset, num_records=beg_skipyears+num_years)
+    # Scale against 1992-2005 average of the control, and throw away 1992-2005
+    ws_trans = ws_trans[:,beg_skipyears:]/baseline_avg(ws_trans[-1,:], 0, beg_skipyears)*100
+    rs_trans = rs_trans[:,beg_skipyears:]/baseline_avg(rs_trans[-1,:], 0, beg_skipyears)*100
 
     '''# Calculate and print trends, including p-values
     print 'Trends in basal mass loss:\n'
@@ -1,8 +1,11 @@
 from netCDF4 import Dataset
 from numpy import *
 from matplotlib.pyplot import *
-from fesom_grid import *
+from ts_census import *
 from unesco import *
+from prefetch import *
+from figure_batch import *
+from multiprocessing import cpu_count
 
 # Make one (annually-averaged) temperature-salinity distribution plot for every
 # year in the given date range. Save as a bunch of png files which can be
@@ -19,9 +22,6 @@ def ts_animation (mesh_path, directory, start_year, end_year, fig_dir):
     nbdry = -50
     # Number of temperature and salinity bins
     num_bins = 1000
-    # Plotting parameters
-    circumpolar = False
-    cross_180 = False
     # Bounds on temperature and salinity bins (pre-computed, change if needed)
     min_salt = 31.8
     max_salt = 35.2
@@ -53,81 +53,77 @@ def ts_animation (mesh_path, directory, start_year, end_year, fig_dir):
     # Density contours to plot
     density_lev = arange(24.4, 28.4, 0.2)
 
-    # Make FESOM grid elements
-    elements = fesom_grid(mesh_path, circumpolar, cross_180)
+    # Get the prisms making up the mesh, and the ones in the region of
+    # interest
+    elements, elm_index, top, bottom, volume = prism_table(mesh_path)
+    in_region = array([all(elm.lat < nbdry) for elm in elements])[elm_index]
 
+    # Read temperature and salinity for each year (annually averaged) in the
+    # background, so the next year is being read while this one is processed
+    annual_data = prefetch_annual_avg([directory + file_head + str(year) + file_tail for year in range(start_year, end_year+1)], ['temp', 'salt'])
+    # Everything the frames need, shared with the plotting processes when
+    # they start (see figure_batch.py)
+    shared = {'salt_centres':salt_centres, 'temp_centres':temp_centres, 'freezing_pt':freezing_pt, 'density':density, 'density_lev':density_lev, 'min_salt':min_salt, 'max_salt':max_salt, 'min_temp':min_temp, 'max_temp':max_temp, 'min_vol':min_vol, 'max_vol':max_vol, 'nbdry':nbdry, 'fig_dir':fig_dir}
+    # Volume in each bin for the years which haven't been plotted yet. The
+    # frames are made in parallel one batch of years at a time (one year
+    # per processor), so only one batch of these is in memory at once.
+    shared['ts_vals'] = {}
+    batch_size = cpu_count()
     # Loop over years
     for year in range(start_year, end_year+1):
         print 'Processing ' + str(year)
-        # Read temperature and salinity at each 3D node, annually averaged
-        id = Dataset(directory + file_head + str(year) + file_tail, 'r')
-        temp = mean(id.variables['temp'][:,:], axis=0)
-        salt = mean(id.variables['salt'][:,:], axis=0)
-        id.close()
-        # Set up a 2D array of temperature bins x salinity bins to increment
-        # with volume of water masses
-        ts_vals = zeros([size(temp_centres), size(salt_centres)])
-        # Loop over elements
-        for elm in elements:
-            # See if we're in the region of interest
-            if all(elm.lat < nbdry):
-                # Get area of 2D triangle
-                area = elm.area()
-                nodes = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-                # Loop downward
-                while True:
-                    if nodes[0].below is None or nodes[1].below is None or nodes[2].below is None:
-                        # We've reached the bottom
-                        break
-                    # Calculate average temperature, salinity, and layer
-                    # thickness over this 3D triangular prism
-                    temp_vals = []
-                    salt_vals = []
-                    dz = []
-                    for i in range(3):
-                        # Average temperature over 6 nodes
-                        temp_vals.append(temp[nodes[i].id])
-                        temp_vals.append(temp[nodes[i].below.id])
-                        # Average salinity over 6 nodes
-                        salt_vals.append(salt[nodes[i].id])
-                        salt_vals.append(salt[nodes[i].below.id])
-                        # Average dz over 3 vertical edges
-                        dz.append(abs(nodes[i].depth - nodes[i].below.depth))
-                        # Get ready for next repetition of loop
-                        nodes[i] = nodes[i].below
-                    temp_elm = mean(array(temp_vals))
-                    salt_elm = mean(array(salt_vals))
-                    # Calculate volume of 3D triangular prism
-                    volume = area*mean(array(dz))
-                    # Figure out which bins this falls into
-                    temp_index = nonzero(temp_bins > temp_elm)[0][0] - 1
-                    salt_index = nonzero(salt_bins > salt_elm)[0][0] - 1
-                    # Increment bins with volume
-                    ts_vals[temp_index, salt_index] += volume
+        # Get temperature and salinity for this year, annually averaged
+        file_name, data = next(annual_data)
+        temp = data['temp']
+        salt = data['salt']
+        # Add up the volume of the prisms in each temperature and salinity
+        # bin
+        ts_vals = ts_census(prism_mean(temp, top, bottom), prism_mean(salt, top, bottom), volume, temp_bins, salt_bins, in_region)
         # Mask bins with zero volume
-        ts_vals = ma.masked_where(ts_vals==0, ts_vals)
-        # Plot
-        fig = figure(figsize=(12,12))
-        # Log scale is more visible
-        img=pcolor(salt_centres, temp_centres, log(ts_vals), vmin=min_vol, vmax=max_vol, cmap='jet')
-        # Add surface freezing point line
-        plot(salt_centres, freezing_pt, color='black', linestyle='dashed')
-        # Add density contours
-        cs=contour(salt_centres, temp_centres, density, density_lev, colors=(0.6,0.6,0.6), linestyles='dotted')
-        # Label density contours
-        manual_locations = [(32,11.4),(32.3,11.4),(32.5,11.4),(32.8,11.4),(33.1,11.4),(33.3,11.4),(33.5,11.3),(33.8,11.3),(34.1,11.3),(34.3,11.3),(34.6,11.3),(34.8,11.4),(35,10.8),(35,9.9),(35,8.1),(35,7.5),(35,6),(35,4.4),(35,2.6),(35.1,0)]
-        clabel(cs, inline=1, fontsize=12, color=(0.6,0.6,0.6), fmt='%1.1f', manual=manual_locations)
-        xlim([min_salt, max_salt])
-        ylim([min_temp, max_temp])
-        xlabel('Salinity (psu)', fontsize=16)
-        ylabel(r'Temperature ($^{\circ}$C)', fontsize=16)
-        title('Water masses south of ' + str(-nbdry) + r'$^{\circ}$S, log(volume)', fontsize=24)
-        colorbar(img)
-        # Add year in the bottom corner
-        text(35.8, -4, str(year), fontsize=30)
+        shared['ts_vals'][year] = ma.masked_where(ts_vals==0, ts_vals)
+        if len(shared['ts_vals']) == batch_size or year == end_year:
+            print 'Plotting'
+            # Only the years are passed to the plotting processes
+            render_figures(plot_ts_frame, sorted(shared['ts_vals'].keys()), shared)
+            shared['ts_vals'] = {}
 
-        # Save figure with year in the filename
-        fig.savefig(fig_dir + str(year) + '.png')
+
+# Plot one frame of the animation. This is called by ts_animation for each
+# year, in parallel (see figure_batch.py).
+# Input:
+# year = year to plot
+# shared = dictionary containing the bins, freezing point, density, plotting
+#          bounds, nbdry, and fig_dir, all as in ts_animation, and 'ts_vals',
+#          a dictionary of year -> masked array of volume in each temperature
+#          bin x salinity bin
+def plot_ts_frame (year, shared):
+
+    ts_vals = shared['ts_vals'][year]
+    salt_centres = shared['salt_centres']
+    temp_centres = shared['temp_centres']
+
+    # Plot
+    fig = figure(figsize=(12,12))
+    # Log scale is more visible
+    img=pcolor(salt_centres, temp_centres, log(ts_vals), vmin=shared['min_vol'], vmax=shared['max_vol'], cmap='jet')
+    # Add surface freezing point line
+    plot(salt_centres, shared['freezing_pt'], color='black', linestyle='dashed')
+    # Add density contours
+    cs=contour(salt_centres, temp_centres, shared['density'], shared['density_lev'], colors=(0.6,0.6,0.6), linestyles='dotted')
+    # Label density contours
+    manual_locations = [(32,11.4),(32.3,11.4),(32.5,11.4),(32.8,11.4),(33.1,11.4),(33.3,11.4),(33.5,11.3),(33.8,11.3),(34.1,11.3),(34.3,11.3),(34.6,11.3),(34.8,11.4),(35,10.8),(35,9.9),(35,8.1),(35,7.5),(35,6),(35,4.4),(35,2.6),(35.1,0)]
+    clabel(cs, inline=1, fontsize=12, color=(0.6,0.6,0.6), fmt='%1.1f', manual=manual_locations)
+    xlim([shared['min_salt'], shared['max_salt']])
+    ylim([shared['min_temp'], shared['max_temp']])
+    xlabel('Salinity (psu)', fontsize=16)
+    ylabel(r'Temperature ($^{\circ}$C)', fontsize=16)
+    title('Water masses south of ' + str(-shared['nbdry']) + r'$^{\circ}$S, log(volume)', fontsize=24)
+    colorbar(img)
+    # Add year in the bottom corner
+    text(35.8, -4, str(year), fontsize=30)
+
+    # Save figure with year in the filename
+    fig.savefig(shared['fig_dir'] + str(year) + '.png')
 
 
 # Command-line interface
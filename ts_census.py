@@ -0,0 +1,52 @@
+from numpy import *
+from column_kernels import *
+
+# Volume of water in each bin of temperature and salinity (a T-S census), for
+# drawing volumetric T-S diagrams. Every prism of the mesh is averaged and
+# binned at once (see prism_table in column_kernels.py), and the volumes are
+# added up with a single bincount, so a census with a million bins takes a
+# few seconds. Several experiments or years can be done in the same call.
+
+
+# Add up the volume of the given prisms in each temperature and salinity
+# bin.
+# Input:
+# temp, salt = arrays of size num_prisms containing the average temperature
+#              and salinity of each prism (eg from prism_mean), or of size
+#              (any leading dimensions, eg experiments or years) x num_prisms
+# volume = array of size num_prisms containing the volume of each prism (from
+#          prism_table), or any other quantity to add up in each bin (eg
+#          depth times volume). Can also have the same leading dimensions as
+#          temp and salt.
+# temp_bins, salt_bins = 1D arrays containing the boundaries of the
+#                        temperature and salinity bins, increasing. Values
+#                        outside the first and last boundaries (or NaN) are
+#                        left out.
+# mask = optional boolean array of size num_prisms, True for prisms to
+#        include (eg those in a region of interest). Default is all of them.
+# Output: array of size (any leading dimensions) x (size(temp_bins)-1) x
+#         (size(salt_bins)-1) containing the total volume in each bin
+def ts_census (temp, salt, volume, temp_bins, salt_bins, mask=None):
+
+    temp = ma.filled(temp, NaN)
+    salt = ma.filled(salt, NaN)
+    lead_shape = shape(temp)[:-1]
+    num_prisms = shape(temp)[-1]
+    num_temp = size(temp_bins)-1
+    num_salt = size(salt_bins)-1
+    temp = reshape(temp, (-1, num_prisms))
+    salt = reshape(salt, (-1, num_prisms))
+    num_records = size(temp,0)
+    volume = reshape(volume*ones(shape(temp)), (-1, num_prisms))
+    if mask is None:
+        mask = ones(num_prisms, dtype=bool)
+
+    # Index of the bin each prism falls into: bins[i] <= value < bins[i+1]
+    temp_index = searchsorted(temp_bins, temp, side='right') - 1
+    salt_index = searchsorted(salt_bins, salt, side='right') - 1
+    valid = (temp_index >= 0)*(temp_index < num_temp)*(salt_index >= 0)*(salt_index < num_salt)*mask
+    # Flatten record, temperature bin and salinity bin into a single index
+    record = arange(num_records)[:,None]*ones([1, num_prisms], dtype=int)
+    index = (record*num_temp + temp_index)*num_salt + salt_index
+    census = bincount(index[valid], weights=volume[valid], minlength=num_records*num_temp*num_salt)
+    return reshape(census, lead_shape + (num_temp, num_salt))
@@ -1,7 +1,7 @@
 from netCDF4 import Dataset
 from numpy import *
 from matplotlib.pyplot import *
-from fesom_grid import *
+from ts_census import *
 from unesco import *
 
 # Make a temperature-salinity distribution plot, showing the volume of each
@@ -19,9 +19,6 @@ def ts_distribution (mesh_path, file_path, tstep, save=False, fig_name=None):
     nbdry = -50
     # Number of temperature and salinity bins
     num_bins = 1000
-    # Plotting parameters
-    circumpolar = False
-    cross_180 = False
     # Bounds on temperature and salinity bins (pre-computed, change if needed)
     min_salt = 31.8
     max_salt = 35.2
@@ -41,9 +38,6 @@ def ts_distribution (mesh_path, file_path, tstep, save=False, fig_name=None):
     # Repeat for salinity
     salt_bins = linspace(min_salt, max_salt, num=num_bins)
     salt_centres = 0.5*(salt_bins[:-1] + salt_bins[1:])
-    # Set up a 2D array of temperature bins x salinity bins to increment with
-    # volume of water masses
-    ts_vals = zeros([size(temp_centres), size(salt_centres)])
 
     # Calculate surface freezing point as a function of salinity: this is the
     # equation the FESOM sea ice code uses
@@ -56,46 +50,12 @@ def ts_distribution (mesh_path, file_path, tstep, save=False, fig_name=None):
     # Density contours to plot
     density_lev = arange(24.4, 28.4, 0.2)
 
-    # Make FESOM grid elements
-    elements = fesom_grid(mesh_path, circumpolar, cross_180)
-
-    # Loop over elements
-    for elm in elements:
-        # See if we're in the region of interest
-        if all(elm.lat < nbdry):
-            # Get area of 2D triangle
-            area = elm.area()
-            nodes = [elm.nodes[0], elm.nodes[1], elm.nodes[2]]
-            # Loop downward
-            while True:
-                if nodes[0].below is None or nodes[1].below is None or nodes[2].below is None:
-                    # We've reached the bottom
-                    break
-                # Calculate average temperature, salinity, and layer thickness
-                # over this 3D triangular prism
-                temp_vals = []
-                salt_vals = []
-                dz = []
-                for i in range(3):
-                    # Average temperature over 6 nodes
-                    temp_vals.append(temp[nodes[i].id])
-                    temp_vals.append(temp[nodes[i].below.id])
-                    # Average salinity over 6 nodes
-                    salt_vals.append(salt[nodes[i].id])
-                    salt_vals.append(salt[nodes[i].below.id])
-                    # Average dz over 3 vertical edges
-                    dz.append(abs(nodes[i].depth - nodes[i].below.depth))
-                    # Get ready for next repetition of loop
-                    nodes[i] = nodes[i].below
-                temp_elm = mean(array(temp_vals))
-                salt_elm = mean(array(salt_vals))
-                # Calculate volume of 3D triangular prism
-                volume = area*mean(array(dz))
-                # Figure out which bins this falls into
-                temp_index = nonzero(temp_bins > temp_elm)[0][0] - 1
-                salt_index = nonzero(salt_bins > salt_elm)[0][0] - 1
-                # Increment bins with volume
-                ts_vals[temp_index, salt_index] += volume
+    # Get the prisms making up the mesh
+    elements, elm_index, top, bottom, volume = prism_table(mesh_path)
+    # Only consider prisms in the region of interest
+    in_region = array([all(elm.lat < nbdry) for elm in elements])[elm_index]
+    # Add up the volume of the prisms in each temperature and salinity bin
+    ts_vals = ts_census(prism_mean(temp, top, bottom), prism_mean(salt, top, bottom), volume, temp_bins, salt_bins, in_region)
 
     # Mask bins with zero volume
     ts_vals = ma.masked_where(ts_vals==0, ts_vals)
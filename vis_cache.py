@@ -0,0 +1,89 @@
+from numpy import *
+from os.path import abspath, getmtime
+from collections import OrderedDict
+from dataset_pool import *
+from unrotate_vector import *
+
+# Session cache for interactive plotting (see fesom_vis.py), so that making
+# the same plot again with a different colour scale, depth, or timestep
+# doesn't start from scratch. The rotated node coordinates needed to unrotate
+# vector variables are read once per mesh file, and the most recently read
+# fields (one variable at one timestep, already unrotated if needed) are kept
+# in memory, up to max_fields of them. A file which has changed on disk since
+# it was read is read again.
+
+# Maximum number of fields to keep in memory
+max_fields = 8
+
+# Vector variables which need to be unrotated, and the name of the other
+# component of each
+vector_pairs = {'uwind':'vwind', 'vwind':'uwind', 'stress_x':'stress_y', 'stress_y':'stress_x', 'uhice':'vhice', 'vhice':'uhice', 'uhsnow':'vhsnow', 'vhsnow':'uhsnow', 'uice':'vice', 'vice':'uice', 'u':'v', 'v':'u'}
+# Which of these are u-components
+u_vars = ['uwind', 'stress_x', 'uhice', 'uhsnow', 'uice', 'u']
+
+# Rotated coordinates: absolute path to mesh file -> (modification time, lon,
+# lat)
+_coord_cache = {}
+# Fields: (absolute file path, modification time, variable name, timestep)
+# -> data, in order of use
+_field_cache = OrderedDict()
+
+
+# Read (or get from the cache) the rotated longitude and latitude of every
+# node in a mesh file.
+# Input: mesh_file = path to nod2d.out or nod3d.out
+# Output: lon, lat = 1D arrays of rotated longitude (between -180 and 180)
+#         and latitude at each node
+def rotated_lonlat (mesh_file):
+
+    key = abspath(mesh_file)
+    mtime = getmtime(mesh_file)
+    if key in _coord_cache and _coord_cache[key][0] == mtime:
+        return _coord_cache[key][1:]
+    coords = loadtxt(mesh_file, skiprows=1, usecols=(1,2))
+    lon = coords[:,0]
+    lat = coords[:,1]
+    lon[lon < -180] += 360
+    lon[lon > 180] -= 360
+    _coord_cache[key] = (mtime, lon, lat)
+    return lon, lat
+
+
+# Read (or get from the cache) one timestep of a variable from a FESOM output
+# file, unrotating vector variables to lon-lat space.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# file_path = path to FESOM output file
+# var_name = variable name
+# tstep = 1-based index of time axis
+# Output: array of data at each node. Don't modify it, because it is shared
+#         with anyone else who asks for this field.
+def read_field (mesh_path, file_path, var_name, tstep):
+
+    key = (abspath(file_path), getmtime(file_path), var_name, tstep)
+    if key in _field_cache:
+        # Move to the end, as the most recently used
+        data = _field_cache.pop(key)
+        _field_cache[key] = data
+        return data
+
+    id = get_dataset(file_path)
+    data = id.variables[var_name][tstep-1,:]
+    if var_name in vector_pairs:
+        if var_name in ['u', 'v']:
+            # 3D variable
+            lon, lat = rotated_lonlat(mesh_path + 'nod3d.out')
+        else:
+            # 2D variable
+            lon, lat = rotated_lonlat(mesh_path + 'nod2d.out')
+        other_data = id.variables[vector_pairs[var_name]][tstep-1,:]
+        if var_name in u_vars:
+            data, v_data = unrotate_vector(lon, lat, data, other_data)
+        else:
+            u_data, data = unrotate_vector(lon, lat, other_data, data)
+
+    while len(_field_cache) >= max_fields:
+        # Forget the least recently used field
+        _field_cache.popitem(last=False)
+    _field_cache[key] = data
+    return data
@@ -0,0 +1,203 @@
+from numpy import *
+from os.path import abspath
+from column_kernels import *
+from unesco import *
+from timeseries_store import *
+from output_catalog import *
+from prefetch import *
+
+# Water masses in the ice shelf cavities, broken down by sector. Every cavity
+# prism (see prism_table in column_kernels.py) is classified into a water
+# mass by its average temperature and salinity, all at once, and each
+# cavity element is labelled with its sector once per mesh. The volume,
+# average temperature and salinity, heat content and melt potential of each
+# water mass in each sector then come from a bincount over the (sector,
+# water mass) pairs. The census for a range of years can be appended to a
+# timeseries store (see timeseries_store.py) with dimensions (watermass,
+# sector, time).
+
+# Water masses, in the order of their keys from classify_watermass
+wm_names = ['ISW', 'HSSW', 'LSSW', 'AASW', 'MCDW', 'CDW']
+# Ice shelf sectors, in the order of their keys from element_sectors. The
+# last one is all the cavities together.
+sector_names = ['Filchner-Ronne Ice Shelf Cavity', 'Eastern Weddell Region Cavities', 'Amery Ice Shelf Cavity', 'Australian Sector Cavities', 'Ross Sea Cavities', 'Amundsen Sea Cavities', 'Bellingshausen Sea Cavities', 'Larsen Ice Shelf Cavities', 'All Ice Shelf Cavities']
+
+# Units of each series from watermass_census
+census_units = {'volume':'m^3', 'temp':'C', 'salt':'psu', 'ohc':'J', 'melt_potential':'J'}
+
+# Cavity prisms which have already been found: absolute mesh path ->
+# (modification times, top, bottom, volume, depth, sector)
+_cavity_cache = {}
+
+
+# Classify water by temperature and salinity.
+# Input: temp, salt = arrays (any size) of temperature and salinity
+# Output: integer array of the same size containing the index in wm_names
+#         of each water mass
+def classify_watermass (temp, salt):
+
+    # Surface freezing point at this salinity
+    tfrz = -0.0575*salt + 1.7105e-3*sqrt(salt**3) - 2.155e-4*salt**2
+    # Start with the last test and work backwards, so that the earlier tests
+    # take priority
+    wm_key = where(salt < 34.5, 2, 1)
+    wm_key = where(temp > -1.5, 4, wm_key)
+    wm_key = where(temp > 0, 5, wm_key)
+    wm_key = where(salt < 34, 3, wm_key)
+    wm_key = where(temp < tfrz, 0, wm_key)
+    return wm_key
+
+
+# Find which ice shelf sector each element is in, based on the average
+# longitude and latitude of its nodes.
+# Input: elements = list of Element objects
+# Output: integer array of size len(elements) containing the index in
+#         sector_names of the sector each element is in (not counting the
+#         last one, which is all of them), or -1 for elements which aren't in
+#         an ice shelf cavity
+def element_sectors (elements):
+
+    lon = array([mean(elm.lon) for elm in elements])
+    lat = array([mean(elm.lat) for elm in elements])
+    cavity = array([elm.cavity for elm in elements], dtype=bool)
+    conditions = [(lon >= -85)*(lon < -30)*(lat < -74),
+                  (lon >= -30)*(lon < 65),
+                  (lon >= 65)*(lon < 76),
+                  (lon >= 76)*(lon < 165)*(lat >= -74),
+                  (lon >= 155)*(lon < 165)*(lat < -74) + (lon >= 165) + (lon < -140),
+                  (lon >= -140)*(lon < -105) + (lon >= -105)*(lon < -98)*(lat < -73.1),
+                  (lon >= -104)*(lon < -98)*(lat >= -73.1) + (lon >= -98)*(lon < -66)*(lat >= -75),
+                  (lon >= -66)*(lon < -59)*(lat >= -74)]
+    # The first sector which matches takes priority
+    sector = select(conditions, range(len(conditions)), default=-1)
+    for i in nonzero(cavity*(sector == -1))[0]:
+        print 'No region found for lon=',str(lon[i]),', lat=',str(lat[i])
+    sector[invert(cavity)] = -1
+    return sector
+
+
+# Get (or get from the cache) the prisms in the ice shelf cavities and the
+# sector each one is in.
+# Input: mesh_path = path to FESOM mesh directory
+# Output:
+# top, bottom = integer arrays of size num_prisms x 3 containing the 3D node
+#               indices at the top and bottom of each cavity prism
+# volume = array of size num_prisms containing the volume of each prism (m^3)
+# depth = array of size num_prisms containing the average depth of each prism
+#         (positive, in metres)
+# sector = integer array of size num_prisms containing the index in
+#          sector_names of the sector each prism is in
+def cavity_prisms (mesh_path):
+
+    key = abspath(mesh_path)
+    elements, elm_index, top, bottom, volume = prism_table(mesh_path)
+    stamp = prism_stamp(mesh_path)
+    if key in _cavity_cache and _cavity_cache[key][0] == stamp:
+        return _cavity_cache[key][1:]
+
+    sector = element_sectors(elements)[elm_index]
+    index = nonzero(sector >= 0)[0]
+    top = top[index,:]
+    bottom = bottom[index,:]
+    depth = prism_mean(column_table(mesh_path)[1], top, bottom)
+
+    _cavity_cache[key] = (stamp, top, bottom, volume[index], depth, sector[index])
+    return _cavity_cache[key][1:]
+
+
+# Break down the water in the ice shelf cavities by water mass and sector.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# temp, salt = arrays of size n3d containing temperature and salinity at each
+#              3D node (eg annually averaged)
+# Output: dictionary with the following keys, each an array of size
+#         num_watermasses x num_sectors (in the order of wm_names and
+#         sector_names):
+# 'volume' = total volume (m^3)
+# 'temp', 'salt' = volume-averaged temperature (C) and salinity (psu), NaN
+#                  where there is none of this water mass
+# 'ohc' = total heat content relative to 0 K (J)
+# 'melt_potential' = total heat available to melt ice, relative to the
+#                    in-situ freezing point (J)
+def watermass_census (mesh_path, temp, salt):
+
+    # Volumetric heat capacity of seawater (J/K/m^3)
+    rhoCp = 4.2e6
+    # Celsius to Kelvin conversion
+    C2K = 273.15
+    # Specific heat of seawater (J/K/kg)
+    cpw = 4180
+    # Coefficients for in-situ freezing point calculation
+    a = -0.0575  # Salinity dependence (K/psu)
+    b = 0.0901   # Surface freezing point at 0 salinity (C)
+    c = 7.61e-4  # Depth dependence (K/m)
+
+    top, bottom, volume, depth, sector = cavity_prisms(mesh_path)
+    num_watermasses = len(wm_names)
+    num_sectors = len(sector_names)
+    prism_temp = prism_mean(temp, top, bottom)
+    prism_salt = prism_mean(salt, top, bottom)
+    # Flatten sector and water mass into a single index
+    index = sector*num_watermasses + classify_watermass(prism_temp, prism_salt)
+    tfrz_insitu = a*prism_salt + b + c*(-1*depth)
+    weights = {'volume':volume, 'temp':prism_temp*volume, 'salt':prism_salt*volume, 'ohc':(prism_temp+C2K)*rhoCp*volume, 'melt_potential':(prism_temp-tfrz_insitu)*volume*cpw*unesco(prism_temp, prism_salt, 0)}
+    census = {}
+    for var in weights:
+        totals = zeros([num_sectors, num_watermasses])
+        totals[:-1,:] = reshape(bincount(index, weights=weights[var], minlength=(num_sectors-1)*num_watermasses), (num_sectors-1, num_watermasses))
+        # The last sector is all of them
+        totals[-1,:] = sum(totals[:-1,:], axis=0)
+        census[var] = transpose(totals)
+    # Convert temperature and salinity from integrals to averages
+    for var in ['temp', 'salt']:
+        census[var] = where(census['volume'] == 0, NaN, census[var]/maximum(census['volume'], 1e-30))
+    return census
+
+
+# Calculate the water mass census for each year of a simulation, and append
+# the given series to a timeseries store. Years whose output files have
+# already been processed into the store are skipped.
+# Input:
+# mesh_path = path to FESOM mesh directory
+# output_path = path to FESOM output directory containing one oce.mean.nc
+#               file for each year
+# start_year, end_year = integers containing range of years to process
+# store_file = path to NetCDF timeseries store
+# var_names = list of keys from watermass_census to save (eg ['ohc'])
+# expt_name = optional experiment name at the start of the output file names
+#             (default 'MK44005')
+# Output: number of years which were processed
+def update_watermass_store (mesh_path, output_path, start_year, end_year, store_file, var_names, expt_name='MK44005'):
+
+    # Only process the years whose output files haven't already been
+    # processed into the store
+    file_names = find_files(scan_output(output_path), 'temp', start_year, end_year, expt=expt_name, stream='oce.mean')
+    new_files = new_inputs(store_file, file_names)
+    years = [year for year in range(start_year, end_year+1) if file_names[year-start_year] in new_files]
+    num_years = len(years)
+    if num_years == 0:
+        print 'All years have already been processed'
+        return 0
+
+    series = {}
+    for var in var_names:
+        series[var] = empty([len(wm_names), len(sector_names), num_years])
+    # Read temperature and salinity for each year (annually averaged) in the
+    # background, so the next year is being read while this one is processed
+    annual_data = prefetch_annual_avg(new_files, ['temp', 'salt'])
+    for t in range(num_years):
+        print 'Processing year ' + str(years[t])
+        # Get temperature and salinity for this year, annually averaged
+        file_name, data = next(annual_data)
+        census = watermass_census(mesh_path, data['temp'], data['salt'])
+        for var in var_names:
+            series[var][:,:,t] = census[var]
+
+    print 'Saving results to store'
+    dims = {}
+    units = {}
+    for var in var_names:
+        dims[var] = ['watermass', 'sector']
+        units[var] = census_units[var]
+    append_timeseries(store_file, years, series, dims=dims, labels={'watermass':wm_names, 'sector':sector_names}, units=units, inputs=[(file_name, 1) for file_name in new_files])
+    return num_years
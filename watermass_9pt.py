@@ -1,15 +1,16 @@
 from numpy import *
 from matplotlib.pyplot import *
+from timeseries_store import *
 
 def watermass_9pt (control, rcp, model, fig_name):
 
-    # Paths to logfiles
+    # Paths to timeseries stores
     directory_head = '/short/y99/kaa561/FESOM/'
     if control:
-        log_file = directory_head + 'highres_spinup/water_masses.log'
+        store_file = directory_head + 'highres_spinup/water_masses.nc'
     else:
-        beg_log = directory_head + 'highres_spinup/rep3/water_masses.log'
-        rcp_log = directory_head + 'rcp' + rcp + '_' + model + '/water_masses.log'
+        beg_store = directory_head + 'highres_spinup/rep3/water_masses.nc'
+        rcp_store = directory_head + 'rcp' + rcp + '_' + model + '/water_masses.nc'
     # Years to consider
     start_year_control = 1992
     end_year_control = 2005
@@ -37,54 +38,15 @@ def watermass_9pt (control, rcp, model, fig_name):
     percent_watermass = empty([num_watermasses, num_sectors, num_years_control + num_years_rcp])
     if control:
         # Read control timeseries (already concatenated to the right years)
-        f = open(log_file, 'r')
-        f.readline()
-        wm_key = 0
-        while wm_key < num_watermasses:
-            sector = 0
-            while sector < num_sectors:
-                year = 0
-                for line in f:
-                    try:
-                        percent_watermass[wm_key, sector, year] = float(line)
-                        year += 1
-                    except(ValueError):
-                        break
-                sector += 1
-            wm_key += 1
+        time_tmp, series = read_timeseries(store_file, ['percent_watermass'])
+        percent_watermass[:,:,:] = series['percent_watermass']
     else:   
         # Read present-day timeseries (rep3, 1992-2005)
-        f = open(beg_log, 'r')
-        f.readline()
-        wm_key = 0
-        while wm_key < num_watermasses:
-            sector = 0
-            while sector < num_sectors:
-                year = 0
-                for line in f:
-                    try:
-                        percent_watermass[wm_key, sector, year] = float(line)
-                        year += 1
-                    except(ValueError):
-                        break
-                sector += 1
-            wm_key += 1
+        time_tmp, series = read_timeseries(beg_store, ['percent_watermass'])
+        percent_watermass[:,:,:num_years_control] = series['percent_watermass']
         # Read RCP timeseries (2006-2100)
-        f = open(rcp_log, 'r')
-        f.readline()
-        wm_key = 0
-        while wm_key < num_watermasses:
-            sector = 0
-            while sector < num_sectors:
-                year = 0
-                for line in f:
-                    try:
-                        percent_watermass[wm_key, sector, num_years_control+year] = float(line)
-                        year += 1
-                    except(ValueError):
-                        break
-                sector += 1
-            wm_key += 1
+        time_tmp, series = read_timeseries(rcp_store, ['percent_watermass'])
+        percent_watermass[:,:,num_years_control:] = series['percent_watermass']
 
     # Set up plot
     fig = figure(figsize=(12,10))
@@ -1,12 +1,13 @@
 from numpy import *
 from matplotlib.pyplot import *
+from timeseries_store import *
 
 def watermass_mp_9pt (rcp, model, fig_name):
 
-    # Paths to logfiles
+    # Paths to timeseries stores (see timeseries_store.py)
     directory_head = '/short/y99/kaa561/FESOM/'
-    beg_log = directory_head + 'highres_spinup/rep3/water_masses_mp.log'
-    rcp_log = directory_head + 'rcp' + rcp + '_' + model + '/water_masses_mp.log'
+    beg_store = directory_head + 'highres_spinup/rep3/water_masses_mp.nc'
+    rcp_store = directory_head + 'rcp' + rcp + '_' + model + '/water_masses_mp.nc'
     # Years to consider
     start_year_control = 1992
     end_year_control = 2005
@@ -34,39 +35,11 @@ def watermass_mp_9pt (rcp, model, fig_name):
     # Set up array to hold initial timeseries
     mp_watermass = empty([num_watermasses, num_sectors, num_years_control+num_years_rcp])
     # Read present-day timeseries (rep3, 1992-2005)
-    f = open(beg_log, 'r')
-    f.readline()
-    wm_key = 0
-    while wm_key < num_watermasses:
-        sector = 0
-        while sector < num_sectors:
-            year = 0
-            for line in f:
-                try:
-                    mp_watermass[wm_key, sector, year] = float(line)
-                    year += 1
-                except(ValueError):
-                    break
-            sector += 1
-        wm_key += 1
-    f.close()
+    time_tmp, series = read_timeseries(beg_store, ['melt_potential'])
+    mp_watermass[:,:,:num_years_control] = series['melt_potential'][:,:,:num_years_control]
     # Read RCP timeseries (2006-2100)
-    f = open(rcp_log, 'r')
-    f.readline()
-    wm_key = 0
-    while wm_key < num_watermasses:
-        sector = 0
-        while sector < num_sectors:
-            year = 0
-            for line in f:
-                try:
-                    mp_watermass[wm_key, sector, num_years_control+year] = float(line)
-                    year += 1
-                except(ValueError):
-                    break
-            sector += 1
-        wm_key += 1
-    f.close()
+    time_tmp, series = read_timeseries(rcp_store, ['melt_potential'])
+    mp_watermass[:,:,num_years_control:] = series['melt_potential'][:,:,:num_years_rcp]
     
     # Calculate total melt potential of each region, 1992-2005 average
     mp_watermass_beg = mean(mp_watermass[:,:,0:num_years_control], axis=2)
@@ -1,12 +1,13 @@
 from numpy import *
 from matplotlib.pyplot import *
+from timeseries_store import *
 
 def watermass_temp_9pt (rcp, model, fig_name):
 
-    # Paths to logfiles
+    # Paths to timeseries stores (see timeseries_store.py)
     directory_head = '/short/y99/kaa561/FESOM/'
-    beg_log = directory_head + 'highres_spinup/rep3/water_masses_temp_salt.log'
-    rcp_log = directory_head + 'rcp' + rcp + '_' + model + '/water_masses_temp_salt.log'
+    beg_store = directory_head + 'highres_spinup/rep3/water_masses_temp_salt.nc'
+    rcp_store = directory_head + 'rcp' + rcp + '_' + model + '/water_masses_temp_salt.nc'
     # Years to consider
     start_year_control = 1992
     end_year_control = 2005
@@ -34,69 +35,13 @@ def watermass_temp_9pt (rcp, model, fig_name):
     temp_watermass = empty([num_watermasses, num_sectors, num_years_control + num_years_rcp])
     salt_watermass = empty([num_watermasses, num_sectors, num_years_control + num_years_rcp])
     # Read present-day timeseries (rep3, 1992-2005)
-    f = open(beg_log, 'r')
-    f.readline()
-    # Temperature
-    wm_key = 0
-    while wm_key < num_watermasses:
-        sector = 0
-        while sector < num_sectors:
-            year = 0
-            for line in f:
-                try:
-                    temp_watermass[wm_key, sector, year] = float(line)
-                    year += 1
-                except(ValueError):
-                    break
-            sector += 1
-        wm_key += 1
-    # Salinity
-    wm_key = 0
-    while wm_key < num_watermasses:
-        sector = 0
-        while sector < num_sectors:
-            year = 0
-            for line in f:
-                try:
-                    salt_watermass[wm_key, sector, year] = float(line)
-                    year += 1
-                except(ValueError):
-                    break
-            sector += 1
-        wm_key += 1
-    f.close()
+    time_tmp, series = read_timeseries(beg_store, ['temp', 'salt'])
+    temp_watermass[:,:,:num_years_control] = series['temp'][:,:,:num_years_control]
+    salt_watermass[:,:,:num_years_control] = series['salt'][:,:,:num_years_control]
     # Read RCP timeseries (2006-2100)
-    f = open(rcp_log, 'r')
-    f.readline()
-    # Temperature
-    wm_key = 0
-    while wm_key < num_watermasses:
-        sector = 0
-        while sector < num_sectors:
-            year = 0
-            for line in f:
-                try:
-                    temp_watermass[wm_key, sector, num_years_control+year] = float(line)
-                    year += 1
-                except(ValueError):
-                    break
-            sector += 1
-        wm_key += 1
-    # Salinity
-    wm_key = 0
-    while wm_key < num_watermasses:
-        sector = 0
-        while sector < num_sectors:
-            year = 0
-            for line in f:
-                try:
-                    salt_watermass[wm_key, sector, num_years_control+year] = float(line)
-                    year += 1
-                except(ValueError):
-                    break
-            sector += 1
-        wm_key += 1
-    f.close()
+    time_tmp, series = read_timeseries(rcp_store, ['temp', 'salt'])
+    temp_watermass[:,:,num_years_control:] = series['temp'][:,:,:num_years_rcp]
+    salt_watermass[:,:,num_years_control:] = series['salt'][:,:,:num_years_rcp]
 
     # Set up plot
     fig = figure(figsize=(12,10))
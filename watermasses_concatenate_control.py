@@ -1,74 +1,38 @@
 from numpy import *
+from timeseries_store import *
 
 def watermasses_concatenate_control ():
 
     # File paths
     directory_head = '/short/y99/kaa561/FESOM/highres_spinup/'
-    log_name = 'water_masses.log'
+    store_name = 'water_masses.nc'
     # Years to consider
     start_year = 1992
     end_year = 2100
     # Spinup forcing repetitions to consider
     start_rep = 3
     end_rep = 10
-    # Sectors
-    sector_names = ['Filchner-Ronne Ice Shelf', 'Eastern Weddell Region', 'Amery Ice Shelf', 'Australian Sector', 'Ross Sea', 'Amundsen Sea', 'Bellingshausen Sea', 'Larsen Ice Shelf', 'All Ice Shelves']
-    num_sectors = len(sector_names)
-    # Water masses
-    wm_names = ['ISW', 'AASW', 'CDW', 'MCDW', 'WW', 'HSSW']
-    num_watermasses = len(wm_names)
 
     num_years = end_year-start_year+1
 
+    # Get the sizes and labels of each dimension from the first repetition
+    dims, labels, units = read_timeseries_info(directory_head + 'rep' + str(start_rep) + '/' + store_name)
+    num_watermasses = len(labels['watermass'])
+    num_sectors = len(labels['sector'])
     # Set up array to hold timeseries
     percent_watermass = empty([num_watermasses, num_sectors, num_years])
-    # Read all but the last repetition
+    # Read each repetition in turn
     year = 0
-    for rep in range(start_rep, end_rep):
-        f = open(directory_head + 'rep' + str(rep) + '/' + log_name, 'r')
-        f.readline()
-        wm_key = 0
-        while wm_key < num_watermasses:
-            sector = 0
-            while sector < num_sectors:
-                t = year
-                for line in f:
-                    try:
-                        percent_watermass[wm_key, sector, t] = float(line)
-                        t += 1
-                    except(ValueError):
-                        break
-                sector += 1
-            wm_key += 1
-        year = t
-    # Read what we need from the last repetition
-    f = open(directory_head + 'rep' + str(end_rep) + '/' + log_name, 'r')
-    f.readline()
-    wm_key = 0
-    while wm_key < num_watermasses:
-        sector = 0
-        while sector < num_sectors:
-            t = year
-            for line in f:
-                try:
-                    tmp = float(line)
-                except(ValueError):
-                    break                
-                if t < num_years:
-                    percent_watermass[wm_key, sector, t] = tmp
-                    t += 1
-            sector += 1
-        wm_key += 1
-    f.close()
+    for rep in range(start_rep, end_rep+1):
+        time_tmp, series = read_timeseries(directory_head + 'rep' + str(rep) + '/' + store_name, ['percent_watermass'])
+        # Only read what we need from the last repetition
+        num_rep = min(size(time_tmp), num_years-year)
+        percent_watermass[:,:,year:year+num_rep] = series['percent_watermass'][:,:,:num_rep]
+        year += num_rep
 
     # Write output
-    f = open(directory_head + log_name, 'w')
-    for wm_key in range(num_watermasses):
-        for sector in range(num_sectors):
-            f.write(wm_names[wm_key] + 'in ' + sector_names[sector] + '(%)\n')
-            for t in range(num_years):
-                f.write(str(percent_watermass[wm_key, sector, t]) + '\n')
-    f.close()
+    time = arange(start_year, end_year+1)
+    write_timeseries(directory_head + store_name, time, {'percent_watermass':percent_watermass}, dims=dims, labels=labels, units=units)
 
 
 # Command-line interface
@@ -6,6 +6,8 @@ from matplotlib.cm import *
 from unrotate_vector import *
 from fesom_grid import *
 from fesom_sidegrid import *
+from mesh_render import *
+from vis_cache import *
 
 # Create a plot of a specified variable at a specified zonal slice, i.e. depth
 # vs latitude.
@@ -31,7 +33,7 @@ def zonal_slice_plot (mesh_path, file_path, var_name, tstep, lon0, depth_min, sa
     font_sizes = [30, 24, 20]
 
     # Read variable name and units for title
-    id = Dataset(file_path, 'r')
+    id = get_dataset(file_path)
     varid = id.variables[var_name]
     name = varid.getncattr('description')
     units = varid.getncattr('units')
@@ -40,42 +42,12 @@ def zonal_slice_plot (mesh_path, file_path, var_name, tstep, lon0, depth_min, sa
     else:
         lon_string = 'at ' + str(lon0) + 'E'
 
-    # Read data
-    data = id.variables[var_name][tstep-1,:]
-    # Check for vector variables that need to be unrotated
-    if var_name in ['u', 'v']:
-        # Read the rotated lat and lon
-        fid = open(mesh_path + 'nod3d.out', 'r')
-        fid.readline()
-        lon = []
-        lat = []
-        for line in fid:
-            tmp = line.split()
-            lon_tmp = float(tmp[1])
-            lat_tmp = float(tmp[2])
-            if lon_tmp < -180:
-                lon_tmp += 360
-            elif lon_tmp > 180:
-                lon_tmp -= 360
-            lon.append(lon_tmp)
-            lat.append(lat_tmp)
-        fid.close()
-        lon = array(lon)
-        lat = array(lat)
-        if var_name == 'u':
-            u_data = data[:]
-            v_data = id.variables['v'][tstep-1,:]
-            u_data_lonlat, v_data_lonlat = unrotate_vector(lon, lat, u_data, v_data)
-            data = u_data_lonlat[:]
-        elif var_name == 'v':
-            v_data = data[:]
-            u_data = id.variables['u'][tstep-1,:]
-            u_data_lonlat, v_data_lonlat = unrotate_vector(lon, lat, u_data, v_data)
-            data = v_data_lonlat[:]
-    id.close()    
+    # Read data (or get it from the session cache), unrotating vector
+    # variables
+    data = read_field(mesh_path, file_path, var_name, tstep)
 
-    # Build the regular FESOM grid
-    elm2D = fesom_grid(mesh_path)
+    # Build the regular FESOM grid (or get it from the cache)
+    elm2D = mesh_geometry(mesh_path)[0]
 
     # Build the array of SideElements making up the zonal slice
     selements = fesom_sidegrid(elm2D, data, lon0, lat_max)